@@ -0,0 +1,153 @@
+"""Compare bof_eierforhold matched through a registered Arrow table with the IN-list SQL it replaced.
+
+Run with `python benchmarks/bof_eierforhold.py --orgnr 100000 5000000`, results
+are printed and appended to `bench_output.txt` in the current directory.
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+from functools import partial
+
+import duckdb as db
+import pandas as pd
+
+from nudb_use.variables.derive import bof as bof_module
+
+
+def _legacy_eierforhold(con: db.DuckDBPyConnection, df: pd.DataFrame) -> pd.Series:
+    """The IN-list query and pandas merges bof_eierforhold used before."""
+    unique_orgnr_foretak = "', '".join(
+        df["orgnr_foretak"].replace("000000000", pd.NA).dropna().unique()
+    )
+    unique_orgnrbed = "', '".join(
+        df["orgnrbed"].replace("000000000", pd.NA).dropna().unique()
+    )
+    catalogue = con.sql(f"""
+        SELECT orgnr_foretak, orgnrbed, bof_eierforhold
+        FROM catalogue
+        WHERE orgnr_foretak in ('{unique_orgnr_foretak}') or orgnrbed in ('{unique_orgnrbed}')
+    """).df()
+    eierf = (
+        df.merge(
+            catalogue[["orgnr_foretak", "bof_eierforhold"]].drop_duplicates(
+                subset=["orgnr_foretak"], keep="last"
+            ),
+            on="orgnr_foretak",
+            how="left",
+            validate="m:1",
+        )["bof_eierforhold"]
+        .astype("string[pyarrow]")
+        .set_axis(df.index)
+    )
+    orgnr_bed_missing_value = (
+        df.loc[eierf.isna(), "orgnrbed"].replace("000000000", pd.NA).dropna().unique()
+    )
+    filtered_catalogue = catalogue[
+        catalogue["orgnrbed"].isin(orgnr_bed_missing_value).astype("bool[pyarrow]")
+    ][["orgnrbed", "bof_eierforhold"]].drop_duplicates(subset="orgnrbed", keep="last")
+    return eierf.fillna(
+        df.merge(filtered_catalogue, on="orgnrbed", how="left", validate="m:1")[
+            "bof_eierforhold"
+        ]
+        .astype("string[pyarrow]")
+        .set_axis(df.index)
+    )
+
+
+def _registered_eierforhold(con: db.DuckDBPyConnection, df: pd.DataFrame) -> pd.Series:
+    """The semi-join on the registered Arrow table bof_eierforhold uses now."""
+    con.register("orgnr_keys", bof_module._orgnr_keys(df))
+    try:
+        matched = con.sql(
+            bof_module._bof_eierforhold_lookup_sql("orgnr_keys", "catalogue")
+        ).df()
+    finally:
+        con.unregister("orgnr_keys")
+    return (
+        matched["eierforhold_foretak"]
+        .fillna(matched["eierforhold_bedrift"])
+        .astype("string[pyarrow]")
+        .set_axis(df.index)
+    )
+
+
+def _synthetic_data(
+    con: db.DuckDBPyConnection, n_orgnr: int, n_periods: int, seed: int = 0
+) -> pd.DataFrame:
+    """Create a catalogue with every orgnr in each period, and get input rows with `n_orgnr` distinct orgnr."""
+    con.execute(f"SELECT setseed({seed / 100})")
+    # Twice as many orgnr in BOF as in the input, with one bedrift per foretak
+    con.execute(f"""
+        CREATE TABLE catalogue AS
+        SELECT
+            '9' || LPAD(CAST(orgnr AS VARCHAR), 8, '0') AS orgnr_foretak,
+            '8' || LPAD(CAST(orgnr AS VARCHAR), 8, '0') AS orgnrbed,
+            CAST(MAKE_DATE(2024 - period, 10, 1) AS DATE) AS bof_period_date,
+            ['1', '3', '4', '5'][1 + CAST(FLOOR(4 * RANDOM()) AS INTEGER)] AS bof_eierforhold
+        FROM range({2 * n_orgnr}) AS o(orgnr), range({n_periods}) AS p(period)
+    """)
+    # Half of the input foretak are not in BOF, but their bedrift is
+    inputs: pd.DataFrame = con.sql(f"""
+        SELECT
+            '9' || LPAD(CAST(CASE WHEN RANDOM() < 0.5 THEN orgnr ELSE orgnr + {2 * n_orgnr} END AS VARCHAR), 8, '0') AS orgnr_foretak,
+            '8' || LPAD(CAST(orgnr AS VARCHAR), 8, '0') AS orgnrbed
+        FROM (SELECT orgnr FROM range({2 * n_orgnr}) AS o(orgnr) ORDER BY RANDOM() LIMIT {n_orgnr})
+    """).df()
+    return inputs.astype("string[pyarrow]")
+
+
+def _time(label: str, func: Callable[[], pd.Series], results: list[str]) -> pd.Series:
+    start = time.perf_counter()
+    result = func()
+    results.append(f"{label:<45} {time.perf_counter() - start:8.2f}s")
+    print(results[-1])
+    return result
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orgnr", type=int, nargs="+", default=[100_000, 5_000_000])
+    parser.add_argument("--periods", type=int, default=3)
+    parser.add_argument(
+        "--skip-legacy-above",
+        type=int,
+        default=5_000_000,
+        help="Only time the IN-list query up to this many distinct orgnr.",
+    )
+    args = parser.parse_args()
+
+    results: list[str] = []
+    for n_orgnr in args.orgnr:
+        con = db.connect()
+        inputs = _synthetic_data(con, n_orgnr, args.periods)
+
+        results.append(
+            f"bof_eierforhold, {n_orgnr} distinct orgnr, {2 * n_orgnr * args.periods} catalogue rows"
+        )
+        print(results[-1])
+        registered = _time(
+            "semi-join on registered Arrow table",
+            partial(_registered_eierforhold, con, inputs),
+            results,
+        )
+        if n_orgnr <= args.skip_legacy_above:
+            legacy = _time(
+                "IN-list SQL and pandas merges",
+                partial(_legacy_eierforhold, con, inputs),
+                results,
+            )
+            # Each orgnr has one eierforhold per period, so only the pick of period differs
+            results.append(
+                f"{'rows matched, registered / IN-list':<45} {registered.notna().sum()} / {legacy.notna().sum()}"
+            )
+            print(results[-1])
+        con.close()
+
+    with open("bench_output.txt", "a", encoding="utf-8") as f:
+        f.write("\n".join(results) + "\n\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Compare the BOF orgnr lookups built on ASOF joins with the correlated subqueries they replaced.
+
+Run with `python benchmarks/bof_lookups.py --rows 1000000`, results are
+printed and appended to `bench_output.txt` in the current directory.
+"""
+
+import argparse
+import re
+import time
+from collections.abc import Callable
+
+import duckdb as db
+import numpy as np
+import pandas as pd
+
+from nudb_use.datasets import bof as bof_module
+
+# The resolution step the ASOF join replaced, run on the CTEs of the current lookup
+LEGACY_RESOLVED_KEYS = """resolved_keys AS (
+            SELECT
+                k.orgnrbed,
+                k.join_date,
+                COALESCE(
+                    (
+                        SELECT c.orgnr
+                        FROM conn_changes AS c
+                        WHERE c.orgnrbed = k.orgnrbed
+                          AND c.bof_period_date <= k.join_date
+                        ORDER BY c.bof_period_date DESC
+                        LIMIT 1
+                    ),
+                    (
+                        SELECT c.orgnr
+                        FROM conn_changes AS c
+                        WHERE c.orgnrbed = k.orgnrbed
+                          AND c.bof_period_date > k.join_date
+                        ORDER BY c.bof_period_date ASC
+                        LIMIT 1
+                    )
+                ) AS orgnr
+            FROM input_keys AS k
+        ),
+
+        resolved AS ("""
+
+
+def _with_correlated_subqueries(lookup_sql: str) -> str:
+    """Swap the ASOF resolution of the orgnrbed lookup for the correlated subqueries."""
+    legacy_sql, n_replaced = re.subn(
+        r"resolved_keys AS \(.*?\n        \),\s*resolved AS \(",
+        lambda _match: LEGACY_RESOLVED_KEYS,
+        lookup_sql,
+        flags=re.DOTALL,
+    )
+    if n_replaced != 1:
+        raise ValueError("Could not find the resolved_keys CTE in the lookup SQL.")
+    return legacy_sql
+
+
+def _synthetic_data(
+    rows: int, n_bedrifter: int, seed: int = 0
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    periods = pd.to_datetime([f"{year}-10-01" for year in range(1995, 2025)])
+    bed = np.repeat(np.arange(n_bedrifter), len(periods))
+    connections = pd.DataFrame(
+        {
+            "orgnr": [f"9{x:08d}" for x in rng.integers(0, n_bedrifter // 3, len(bed))],
+            "orgnrbed": [f"8{x:08d}" for x in bed],
+            "bof_period_date": np.tile(periods, n_bedrifter),
+        }
+    ).sample(frac=0.5, random_state=seed)
+    inputs = pd.DataFrame(
+        {
+            "_row_id": np.arange(rows),
+            "orgnrbed": [f"8{x:08d}" for x in rng.integers(0, n_bedrifter, rows)],
+            "orgnr": [f"9{x:08d}" for x in rng.integers(0, n_bedrifter // 3, rows)],
+            "join_date": pd.Timestamp("1990-01-01")
+            + pd.to_timedelta(rng.integers(0, 365 * 36, rows), unit="D"),
+        }
+    )
+    return connections, inputs
+
+
+def _time(label: str, func: Callable[[], object], results: list[str]) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    results.append(f"{label:<45} {elapsed:8.2f}s")
+    print(results[-1])
+    return elapsed
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--bedrifter", type=int, default=50_000)
+    args = parser.parse_args()
+
+    connections, inputs = _synthetic_data(args.rows, args.bedrifter)
+    con = db.connect()
+    con.register("bof_connections", connections)
+    con.register("input_rows", inputs)
+    bof_module._bof_connection_lookup_sql_parts = lambda alias: (  # type: ignore[assignment]
+        "SELECT orgnr, orgnrbed, CAST(bof_period_date AS DATE) AS bof_period_date FROM bof_connections",
+        """latest_placement AS (
+            SELECT DISTINCT orgnr, 'foretak' AS orgnr_type FROM bof_connections
+            UNION ALL
+            SELECT DISTINCT orgnrbed, 'orgnrbed' FROM bof_connections
+        )""",
+    )
+    bed_sql = bof_module._bof_orgnrbed_to_foretak_lookup_sql(
+        "input_rows", "orgnrbed", "join_date", "_row_id"
+    )
+    foretak_sql = bof_module._bof_foretak_to_orgnrbed_lookup_sql(
+        "input_rows", "orgnr", "join_date", "_row_id"
+    )
+    if bed_sql is None or foretak_sql is None:
+        raise ValueError("The BOF lookups were not built.")
+
+    results = [
+        f"BOF lookups, {args.rows} input rows, {len(connections)} BOF connections"
+    ]
+    print(results[0])
+    legacy = _time(
+        "orgnrbed -> foretak, correlated subqueries",
+        lambda: con.execute(_with_correlated_subqueries(bed_sql)).df(),
+        results,
+    )
+    asof = _time(
+        "orgnrbed -> foretak, ASOF join",
+        lambda: con.execute(bed_sql).df(),
+        results,
+    )
+    results.append(f"{'speedup':<45} {legacy / asof:8.1f}x")
+    print(results[-1])
+    _time(
+        "full foretak -> orgnrbed lookup",
+        lambda: con.execute(foretak_sql).df(),
+        results,
+    )
+
+    with open("bench_output.txt", "a", encoding="utf-8") as f:
+        f.write("\n".join(results) + "\n\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measure the logging overhead per call of a derive function.
+
+Compares reading the source code with `inspect.getsource` on every call, as the
+derive wrapper used to, with the cached source that is only read at DEBUG level.
+
+Run with `python benchmarks/derive_call_overhead.py --calls 500`, results are
+printed and appended to `bench_output.txt` in the current directory.
+"""
+
+import argparse
+import inspect
+import logging
+import os
+import sys
+import time
+from collections.abc import Callable
+from unittest.mock import patch
+
+import pandas as pd
+
+from nudb_use import nudb_logger
+from nudb_use.nudb_logger import logger
+from nudb_use.variables.derive import derive_decorator
+from nudb_use.variables.derive.utd_skoleaar import utd_skoleaar_slutt
+
+
+def _legacy_log_source_code(func: Callable[..., object], name: str) -> None:
+    logger.debug(f"Source code for {name}:\n{inspect.getsource(func)}")
+
+
+def _per_call(func: Callable[[], object], calls: int) -> float:
+    func()  # Warm up caches
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.INFO)
+    # Keep printing and the in-memory log out of the timings
+    devnull = open(os.devnull, "w", encoding="utf-8")
+    nudb_logger.handler.setStream(devnull)
+    nudb_logger.set_log_sinks(nudb_logger.RingBufferSink(capacity=100))
+    df = pd.DataFrame({"utd_skoleaar_start": ["2020", "2021", None] * 10})
+    basefunc = inspect.getclosurevars(utd_skoleaar_slutt).nonlocals["basefunc"]
+
+    def derive_call() -> object:
+        return utd_skoleaar_slutt(df)
+
+    results = [f"Derive call overhead, mean of {args.calls} calls, log level INFO"]
+    timings = {
+        "source lookup, inspect.getsource every call": _per_call(
+            lambda: _legacy_log_source_code(basefunc, "utd_skoleaar_slutt"),
+            args.calls,
+        ),
+        "source lookup, lazy and cached": _per_call(
+            lambda: nudb_logger._log_source_code(basefunc, "utd_skoleaar_slutt"),
+            args.calls,
+        ),
+    }
+    with patch.object(derive_decorator, "_log_source_code", _legacy_log_source_code):
+        timings["derive call, inspect.getsource every call"] = _per_call(
+            derive_call, args.calls
+        )
+    timings["derive call, lazy and cached"] = _per_call(derive_call, args.calls)
+
+    for label, seconds in timings.items():
+        results.append(f"{label:<50} {seconds * 1e6:10.1f}us")
+
+    nudb_logger.handler.setStream(sys.stdout)
+    devnull.close()
+    for line in results:
+        print(line)
+    with open("bench_output.txt", "a", encoding="utf-8") as f:
+        f.write("\n".join(results) + "\n\n")
+
+
+if __name__ == "__main__":
+    main()
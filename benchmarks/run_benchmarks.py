@@ -0,0 +1,277 @@
+"""Time the NudbData datasets, derive functions, orgnr cleanup and quality suite on synthetic data.
+
+The synthetic data for the scale is written by `synthetic_data.py` the first
+time, and reused after that. Every benchmark starts from an empty NUDB database
+and BOF cache. The results are stored as JSON, one file per run, named by the
+commit that was checked out, so runs can be compared between commits:
+
+    python benchmarks/run_benchmarks.py --scale 1m
+    git switch my-branch
+    python benchmarks/run_benchmarks.py --scale 1m --compare main
+
+Comparing exits with status 1 if a benchmark got slower than `--max-slowdown`.
+The pandas benchmarks run on the first `--pandas-rows` rows of avslutta, so the
+largest scale does not have to fit in memory.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import duckdb as db
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from synthetic_data import SCALES
+from synthetic_data import nudb_dataset_path
+from synthetic_data import synthetic_data_ready
+from synthetic_data import use_synthetic_data
+from synthetic_data import write_synthetic_data
+
+from nudb_use import nudb_logger
+from nudb_use.datasets import NudbData
+from nudb_use.datasets import bof as bof_module
+from nudb_use.datasets import reset_nudb_database
+from nudb_use.nudb_logger import logger
+from nudb_use.quality import run_quality_suite
+from nudb_use.variables.derive import get_derive_function
+from nudb_use.variables.specific_vars.orgnr import cleanup_orgnr_bedrift_foretak
+
+BENCHMARK_DIR = Path(".benchmarks")
+NUDB_DATA_BENCHMARKS = (
+    "avslutta",
+    "igang",
+    "eksamen",
+    "eksamen_hoeyeste",
+    "utd_hoeyeste",
+    "slekt_snr",
+    "utd_foreldres_utdnivaa",
+    "_bof_eierforhold",
+)
+DERIVE_BENCHMARKS = (
+    "utd_skoleaar_slutt",
+    "pers_kjoenn",
+    "pers_foedselsdato",
+    "snr_mrk",
+    "uh_gruppering_nus",
+    "nus2000_label",
+    "vg_ervgo_fullfoert",
+    "utd_hoeyeste_nus2000",
+)
+
+
+def _git(*args: str) -> str:
+    return subprocess.run(
+        ["git", *args], capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def _first_rows(path: Path, rows: int) -> pd.DataFrame:
+    batches = pq.ParquetFile(path).iter_batches(batch_size=rows)
+    df: pd.DataFrame = pa.Table.from_batches([next(batches)]).to_pandas()
+    return df
+
+
+def _benchmarks(
+    root: Path, output_dir: Path, pandas_rows: int
+) -> dict[str, Callable[[], object]]:
+    avslutta = _first_rows(nudb_dataset_path(root, "avslutta"), pandas_rows)
+
+    def nudb_data(name: str) -> Callable[[], object]:
+        return lambda: NudbData(name).to_parquet(
+            output_dir / f"{name}.parquet", overwrite=True
+        )
+
+    def derive(name: str) -> Callable[[], object]:
+        def run() -> object:
+            derive_func = get_derive_function(name)
+            if derive_func is None:
+                raise KeyError(f"Found no derive function for {name}")
+            return derive_func(avslutta.drop(columns=name, errors="ignore"))
+
+        return run
+
+    benchmarks: dict[str, Callable[[], object]] = {}
+    for name in NUDB_DATA_BENCHMARKS:
+        benchmarks[f"nudb_data.{name}"] = nudb_data(name)
+    for name in DERIVE_BENCHMARKS:
+        benchmarks[f"derive.{name}"] = derive(name)
+    benchmarks["cleanup_orgnr_bedrift_foretak"] = lambda: cleanup_orgnr_bedrift_foretak(
+        avslutta.copy()
+    )
+    benchmarks["run_quality_suite"] = lambda: run_quality_suite(
+        avslutta, "avslutta", raise_errors=False, use_external_datasets=False
+    )
+    return benchmarks
+
+
+def _time_benchmark(func: Callable[[], object], repeat: int) -> dict[str, Any]:
+    seconds: list[float] = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            reset_nudb_database()
+            bof_module.BOF_CACHE_DIR = Path(cache_dir)
+            start = time.perf_counter()
+            func()
+            seconds.append(time.perf_counter() - start)
+    return {
+        "min": min(seconds),
+        "median": statistics.median(seconds),
+        "max": max(seconds),
+        "repeat": repeat,
+    }
+
+
+def run_benchmarks(
+    scale: str, repeat: int, pandas_rows: int, only: str | None = None
+) -> dict[str, Any]:
+    """Run the benchmarks on synthetic data, writing the data first if needed.
+
+    Args:
+        scale: One of `SCALES`, the number of persons in the synthetic data.
+        repeat: Times to run each benchmark.
+        pandas_rows: Rows of avslutta to run the pandas benchmarks on.
+        only: Only run the benchmarks with this in their name.
+
+    Returns:
+        dict[str, Any]: The commit, environment and timings of the run.
+    """
+    root = BENCHMARK_DIR / "data" / scale
+    if not synthetic_data_ready(root):
+        write_synthetic_data(root, SCALES[scale])
+    use_synthetic_data(root)
+
+    results: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        benchmarks = _benchmarks(root, Path(output_dir), pandas_rows)
+        for name, func in benchmarks.items():
+            if only and only not in name:
+                continue
+            try:
+                results[name] = _time_benchmark(func, repeat)
+                print(f"{name:<45} {results[name]['median']:10.3f}s")
+            except Exception as err:
+                results[name] = {"error": repr(err)}
+                print(f"{name:<45} {'failed':>11}: {err!r}")
+
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "scale": scale,
+        "pandas_rows": pandas_rows,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "duckdb": db.__version__,
+        "results": results,
+    }
+
+
+def _results_dir(scale: str) -> Path:
+    return BENCHMARK_DIR / "results" / scale
+
+
+def save_results(run: dict[str, Any]) -> Path:
+    """Store the results of a run, named by time and commit.
+
+    Args:
+        run: The results from `run_benchmarks`.
+
+    Returns:
+        Path: The JSON file the results were written to.
+    """
+    stamp = run["time"].replace(":", "").replace("-", "")
+    path = _results_dir(run["scale"]) / f"{stamp}_{run['commit']}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(run, indent=2), encoding="utf-8")
+    return path
+
+
+def load_results(scale: str, ref: str) -> dict[str, Any]:
+    """Load the latest stored results for a commit.
+
+    Args:
+        scale: The scale the results were run at.
+        ref: A git ref, such as a branch name or commit hash.
+
+    Returns:
+        dict[str, Any]: The stored results.
+
+    Raises:
+        FileNotFoundError: If there are no results for the commit.
+    """
+    commit = _git("rev-parse", "--short", ref)
+    paths = sorted(_results_dir(scale).glob(f"*_{commit}.json"))
+    if not paths:
+        raise FileNotFoundError(
+            f"No {scale} benchmark results for {ref} ({commit}), check it out and run the benchmarks first."
+        )
+    loaded: dict[str, Any] = json.loads(paths[-1].read_text(encoding="utf-8"))
+    return loaded
+
+
+def compare_results(
+    base: dict[str, Any], current: dict[str, Any], max_slowdown: float
+) -> list[str]:
+    """Print the change in median time per benchmark, and list the regressions.
+
+    Args:
+        base: Results to compare against.
+        current: The new results.
+        max_slowdown: Ratio of current to base median time counted as a regression.
+
+    Returns:
+        list[str]: The benchmarks that got slower than `max_slowdown`.
+    """
+    print(f"\n{'benchmark':<45} {base['commit']:>10} {current['commit']:>10}  ratio")
+    regressions: list[str] = []
+    for name, result in current["results"].items():
+        base_result = base["results"].get(name, {})
+        if "median" not in result or "median" not in base_result:
+            continue
+        ratio = result["median"] / base_result["median"]
+        flag = "  <- slower" if ratio > max_slowdown else ""
+        print(
+            f"{name:<45} {base_result['median']:9.3f}s {result['median']:9.3f}s {ratio:6.2f}x{flag}"
+        )
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    """Run the benchmarks, store the results and compare them."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--scale", choices=SCALES, default="10k")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pandas-rows", type=int, default=1_000_000)
+    parser.add_argument("--only", help="Only run benchmarks with this in their name.")
+    parser.add_argument("--compare", metavar="REF", help="Git ref to compare with.")
+    parser.add_argument("--max-slowdown", type=float, default=1.2)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    nudb_logger.set_log_sinks()
+    run = run_benchmarks(args.scale, args.repeat, args.pandas_rows, args.only)
+    print(f"Stored results in {save_results(run)}")
+
+    if args.compare:
+        base = load_results(args.scale, args.compare)
+        if compare_results(base, run, args.max_slowdown):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
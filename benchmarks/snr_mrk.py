@@ -0,0 +1,89 @@
+"""Compare the vectorized snr_mrk with the row-wise isascii check it replaced.
+
+Run with `python benchmarks/snr_mrk.py --rows 10000000`, results are printed
+and appended to `bench_output.txt` in the current directory.
+"""
+
+import argparse
+import logging
+import time
+from collections.abc import Callable
+
+import numpy as np
+import pandas as pd
+
+from nudb_use import nudb_logger
+from nudb_use.nudb_logger import logger
+from nudb_use.variables.derive.person_idents import BOOL_DTYPE
+from nudb_use.variables.derive.person_idents import snr_mrk
+
+
+def _legacy_snr_mrk(df: pd.DataFrame) -> pd.Series:
+    # The checks for spaces and all-digit snr that were logged before the derivation
+    df["snr"].str.contains(" ").any()
+    ((df["snr"].str.len() == 7) & df["snr"].str.isnumeric()).sum()
+
+    stripped = df["snr"].str.strip()
+    legacy: pd.Series = (
+        (df["snr"].notna())
+        & (stripped.str.len() == 7)
+        & (stripped.str.isalnum())
+        & (
+            stripped.apply(lambda x: isinstance(x, str) and x.isascii()).astype(
+                BOOL_DTYPE
+            )
+        )
+    ).astype(BOOL_DTYPE)
+    return legacy
+
+
+def _snr(rows: int, seed: int = 42) -> pd.Series:
+    """Mostly valid snr, with some missing, short, padded and UUID values."""
+    rng = np.random.default_rng(seed)
+    alphabet = np.frombuffer(
+        b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789", np.uint8
+    )
+    chars = alphabet[rng.integers(0, len(alphabet), size=(rows, 7))]
+    snr = pd.Series(chars.view("S7").ravel().astype(str), dtype="string[pyarrow]")
+    kind = rng.random(rows)
+    snr[kind < 0.02] = pd.NA
+    snr[(kind >= 0.02) & (kind < 0.03)] = "12345"
+    snr[(kind >= 0.03) & (kind < 0.04)] = " abc1234 "
+    snr[(kind >= 0.04) & (kind < 0.05)] = "00000000-0000-4000-8000-000000000000"
+    return snr
+
+
+def _timed(func: Callable[[], pd.Series]) -> tuple[float, pd.Series]:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    nudb_logger.set_log_sinks()
+    df = pd.DataFrame({"snr": _snr(args.rows)})
+
+    legacy_seconds, legacy = _timed(lambda: _legacy_snr_mrk(df))
+    vectorized_seconds, vectorized = _timed(lambda: snr_mrk(df)["snr_mrk"])
+    if not legacy.equals(vectorized.rename(None)):
+        raise AssertionError("The vectorized snr_mrk differs from the row-wise one")
+
+    results = [
+        f"snr_mrk on {args.rows} rows",
+        f"{'row-wise isascii check':<30} {legacy_seconds:8.2f}s",
+        f"{'vectorized':<30} {vectorized_seconds:8.2f}s",
+    ]
+    for line in results:
+        print(line)
+    with open("bench_output.txt", "a", encoding="utf-8") as f:
+        f.write("\n".join(results) + "\n\n")
+
+
+if __name__ == "__main__":
+    main()
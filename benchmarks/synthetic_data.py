@@ -0,0 +1,371 @@
+"""Write synthetic NUDB datasets as parquet files, scaled by a number of persons.
+
+The files are laid out like the buckets NUDB reads from, so `NudbData` finds
+them after `use_synthetic_data` has pointed the path lookups at the directory:
+
+    <root>/nudb-data/klargjorte-data/{avslutta,igang,eksamen}_p1970_p2025_v1.parquet
+    <root>/shared/bef-statistikk/snrkat/2026/snrkat_p2026-01-31_v1.parquet
+    <root>/shared/bef-statistikk/folketall/slekt/2025/slekt_p2025-01-01_v1.parquet
+    <root>/shared/bef-statistikk/freg-situttak/2026/freg_situasjonsuttak_p2026-01-31_v1.parquet
+    <root>/shared/vof/situttak/vof-situasjonsuttak_data/klargjorte-data/parquet/vof-situasjonsuttak_pYYYY-MM_v1.parquet
+
+The columns of avslutta, igang and eksamen come from the config, coded columns
+get codes from KLASS. The persons are written a chunk at a time, so the larger
+scales do not need to fit in memory.
+
+Run with `python benchmarks/synthetic_data.py --scale 1m --output .benchmarks/data/1m`.
+"""
+
+import argparse
+import logging
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from nudb_config import settings
+
+from nudb_use import nudb_logger
+from nudb_use.datasets import bof as bof_module
+from nudb_use.metadata.nudb_config.map_get_dtypes import DTYPE_MAPPINGS
+from nudb_use.metadata.nudb_klass.codes import get_klass_codes
+from nudb_use.metadata.nudb_klass.klass_utils import _resolve_date_range
+from nudb_use.nudb_logger import logger
+from nudb_use.paths import latest
+
+SCALES: dict[str, int] = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+ROWS_PER_PERSON: dict[str, float] = {"avslutta": 3.0, "igang": 0.5, "eksamen": 2.0}
+PERSONS_PER_BEDRIFT: int = 50
+BEDRIFTER_PER_FORETAK: int = 3
+CHUNK_PERSONS: int = 250_000
+FIRST_YEAR: int = 1970
+LAST_YEAR: int = 2025
+BOF_YEARS: range = range(2015, LAST_YEAR + 1)
+BIRTH_DAYS: int = (
+    20_000  # Birth dates from 1950, with at most 500 persons born each day
+)
+# Codes of columns without a codelist are drawn from this many values
+MAX_CODES: int = 1_000
+
+STRING_DTYPE: Literal["string[pyarrow]"] = "string[pyarrow]"
+NUDB_DIR = Path("nudb-data") / "klargjorte-data"
+SHARED_DIR = Path("shared")
+EXTERNAL_PATHS: dict[str, Path] = {
+    "snrkat": SHARED_DIR / "bef-statistikk/snrkat/2026/snrkat_p2026-01-31_v1.parquet",
+    "slekt": SHARED_DIR
+    / "bef-statistikk/folketall/slekt/2025/slekt_p2025-01-01_v1.parquet",
+    "freg_situttak": SHARED_DIR
+    / "bef-statistikk/freg-situttak/2026/freg_situasjonsuttak_p2026-01-31_v1.parquet",
+}
+BOF_DIR = SHARED_DIR / "vof/situttak/vof-situasjonsuttak_data/klargjorte-data/parquet"
+COMPLETE_MARKER = "synthetic_data_complete.txt"
+
+
+def _strings(values: np.ndarray, width: int, prefix: str = "") -> pd.Series:
+    return (prefix + pd.Series(values).astype(str).str.zfill(width)).astype(
+        STRING_DTYPE
+    )
+
+
+def _dates(rng: np.random.Generator, n: int) -> pd.Series:
+    days = rng.integers(0, (LAST_YEAR - FIRST_YEAR + 1) * 365, n)
+    return pd.Series(np.datetime64(f"{FIRST_YEAR}-01-01") + days).astype(
+        "datetime64[s]"
+    )
+
+
+def nudb_dataset_path(root: Path, dataset: str) -> Path:
+    """The path of the synthetic avslutta, igang or eksamen file under `root`.
+
+    Args:
+        root: The directory of the synthetic data.
+        dataset: The name of the dataset.
+
+    Returns:
+        Path: The parquet file.
+    """
+    return root / NUDB_DIR / f"{dataset}_p{FIRST_YEAR}_p{LAST_YEAR}_v1.parquet"
+
+
+def _persons(ids: np.ndarray) -> pd.DataFrame:
+    """Identifiers, birth date and sex of the persons with these ids."""
+    birth = pd.Series(
+        np.datetime64("1950-01-01") + (ids % BIRTH_DAYS).astype("timedelta64[D]")
+    ).astype("datetime64[s]")
+    return pd.DataFrame(
+        {
+            "snr": _strings(ids, 7),
+            "fnr": (
+                birth.dt.strftime("%d%m%y") + _strings(ids // BIRTH_DAYS, 5)
+            ).astype(STRING_DTYPE),
+            "pers_foedselsdato": birth,
+            "pers_kjoenn": pd.Series(np.where(ids % 2, "1", "2")).astype(STRING_DTYPE),
+        }
+    )
+
+
+def _bedrift_orgnr(bedrift: np.ndarray) -> pd.Series:
+    return _strings(bedrift, 8, prefix="8")
+
+
+def _foretak_orgnr(bedrift: np.ndarray, year: int) -> pd.Series:
+    # Every 20th bedrift changes owner every year
+    moves = np.where(bedrift % 20 == 0, year - BOF_YEARS[0], 0)
+    return _strings(bedrift // BEDRIFTER_PER_FORETAK + moves, 8, prefix="9")
+
+
+class _ColumnCodes:
+    """The codes to draw each configured column from, KLASS is only asked once per codelist."""
+
+    def __init__(self) -> None:
+        self._codes: dict[str, np.ndarray] = {}
+
+    def get(self, var: str) -> np.ndarray | None:
+        metadata = settings.variables[var]
+        if not metadata.klass_codelist:
+            return None
+        if var not in self._codes:
+            from_date, to_date = _resolve_date_range(
+                klassid=int(metadata.klass_codelist),
+                klass_codelist_from_date=metadata.klass_codelist_from_date,
+                data_time_start=None,
+                data_time_end=None,
+            )
+            codes = get_klass_codes(
+                int(metadata.klass_codelist),
+                data_time_start=from_date,
+                data_time_end=to_date,
+            )
+            self._codes[var] = np.array(sorted(codes), dtype=object)
+        return self._codes[var]
+
+
+def _config_column(
+    var: str,
+    n: int,
+    rng: np.random.Generator,
+    codes: _ColumnCodes,
+) -> pd.Series:
+    """Random values for a column in the config, by its codelist, width and dtype."""
+    metadata = settings.variables[var]
+    dtype = metadata.dtype
+    pandas_dtype = DTYPE_MAPPINGS["pandas"][dtype]
+    codelist = codes.get(var)
+    if codelist is not None:
+        return pd.Series(rng.choice(codelist, n)).astype(pandas_dtype)
+
+    match dtype:
+        case "STRING":
+            width = (metadata.length or [4])[0]
+            return _strings(rng.integers(0, min(10**width, MAX_CODES), n), width)
+        case "INTEGER":
+            return pd.Series(rng.integers(0, 100, n)).astype(pandas_dtype)
+        case "FLOAT":
+            return pd.Series(rng.random(n) * 100).astype(pandas_dtype)
+        case "BOOLEAN":
+            return pd.Series(rng.random(n) < 0.5).astype(pandas_dtype)
+        case "DATETIME":
+            return _dates(rng, n).astype(pandas_dtype)
+        case _:
+            raise TypeError(f"Unknown dtype for {var}: {dtype}")
+
+
+def _nudb_chunk(
+    dataset: str,
+    ids: np.ndarray,
+    n_bedrifter: int,
+    rng: np.random.Generator,
+    codes: _ColumnCodes,
+) -> pd.DataFrame:
+    """Rows of avslutta, igang or eksamen for a chunk of persons."""
+    person_ids = np.repeat(ids, rng.poisson(ROWS_PER_PERSON[dataset], len(ids)))
+    n = len(person_ids)
+    persons = _persons(person_ids)
+    years = rng.integers(FIRST_YEAR, LAST_YEAR + 1, n)
+    bedrift = rng.integers(0, n_bedrifter, n)
+
+    columns: dict[str, pd.Series] = {}
+    for var in settings.datasets[dataset].variables or []:
+        if var in persons.columns:
+            columns[var] = persons[var]
+        elif var == "nudb_dataset_id":
+            columns[var] = pd.Series([dataset] * n, dtype=STRING_DTYPE)
+        elif var == "utd_skoleaar_start":
+            columns[var] = _strings(years, 4)
+        elif var == "orgnrbed":
+            columns[var] = _bedrift_orgnr(bedrift).where(rng.random(n) < 0.7)
+        elif var == "orgnr_foretak":
+            foretak = _foretak_orgnr(bedrift, BOF_YEARS[-1])
+            columns[var] = foretak.where(rng.random(n) < 0.2)
+        elif var == "snr_mrk":
+            columns[var] = pd.Series(np.ones(n, dtype=bool)).astype("bool[pyarrow]")
+        else:
+            columns[var] = _config_column(var, n, rng, codes)
+    return pd.DataFrame(columns)
+
+
+def _external_chunk(
+    dataset: str, ids: np.ndarray, n_persons: int, rng: np.random.Generator
+) -> pd.DataFrame:
+    """Rows of snrkat, slekt or freg_situttak for a chunk of persons, one per person."""
+    persons = _persons(ids)
+    if dataset == "snrkat":
+        return pd.DataFrame(
+            {
+                "snr": persons["snr"],
+                "fnr": persons["fnr"],
+                "fnr_naa": persons["fnr"],
+                "snr_utgatt": pd.Series([pd.NA] * len(ids), dtype=STRING_DTYPE),
+            }
+        )
+    if dataset == "slekt":
+        parents = {
+            parent: _persons(rng.integers(0, n_persons, len(ids)))["fnr"].where(
+                rng.random(len(ids)) < 0.9
+            )
+            for parent in ("mor_fnr", "far_fnr")
+        }
+        return pd.DataFrame({"fnr": persons["fnr"], **parents})
+    if dataset == "freg_situttak":
+        return pd.DataFrame(
+            {
+                "snr": persons["snr"],
+                "kjoenn": persons["pers_kjoenn"],
+                "foedselsdato": persons["pers_foedselsdato"],
+            }
+        )
+    raise ValueError(f"No synthetic data for the dataset {dataset}.")
+
+
+def _person_chunks(n_persons: int) -> Iterator[np.ndarray]:
+    for start in range(0, n_persons, CHUNK_PERSONS):
+        yield np.arange(start, min(start + CHUNK_PERSONS, n_persons), dtype=np.int64)
+
+
+def _write_chunks(path: Path, chunks: Iterator[pd.DataFrame]) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer: pq.ParquetWriter | None = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+def _write_bof(root: Path, n_bedrifter: int, seed: int) -> list[Path]:
+    """Monthly BOF situation files, with the bedrifter and the foretak owning them."""
+    paths: list[Path] = []
+    rng = np.random.default_rng(seed)
+    for year in BOF_YEARS:
+        for month in range(1, 13):
+            bedrift = np.flatnonzero(rng.random(n_bedrifter) < 0.95)
+            n = len(bedrift)
+            chunk = pd.DataFrame(
+                {
+                    "org_nr": _foretak_orgnr(bedrift, year),
+                    "orgnrbed": _bedrift_orgnr(bedrift),
+                    "org_form": pd.Series(
+                        rng.choice(np.array(["AS", "ENK", "STAT", "KOMM"]), n)
+                    ).astype(STRING_DTYPE),
+                    "sektor_2014": pd.Series(
+                        rng.choice(np.array(["2100", "6100", "6500", "3900"]), n)
+                    ).astype(STRING_DTYPE),
+                    "undersektor_2014": _strings(rng.integers(0, 10, n), 2),
+                }
+            )
+            path = (
+                root / BOF_DIR / f"vof-situasjonsuttak_p{year}-{month:02d}_v1.parquet"
+            )
+            paths.append(_write_chunks(path, iter([chunk])))
+    return paths
+
+
+def write_synthetic_data(root: Path, n_persons: int, seed: int = 0) -> dict[str, Path]:
+    """Write synthetic avslutta, igang, eksamen, snrkat, slekt, freg_situttak and BOF files.
+
+    Args:
+        root: Directory to write the files to, laid out as described in the module docstring.
+        n_persons: Number of persons in the data, every dataset is scaled by this.
+        seed: Seed for the random values, the same seed gives the same files.
+
+    Returns:
+        dict[str, Path]: The path of each dataset, the BOF files by their period.
+    """
+    n_bedrifter = max(n_persons // PERSONS_PER_BEDRIFT, 100)
+    codes = _ColumnCodes()
+    paths: dict[str, Path] = {}
+
+    for i, dataset in enumerate(ROWS_PER_PERSON):
+        with nudb_logger.LoggerStack(f"Writing synthetic {dataset}"):
+            rng = np.random.default_rng([seed, i])
+            paths[dataset] = _write_chunks(
+                nudb_dataset_path(root, dataset),
+                (
+                    _nudb_chunk(dataset, ids, n_bedrifter, rng, codes)
+                    for ids in _person_chunks(n_persons)
+                ),
+            )
+
+    for i, (dataset, relative_path) in enumerate(EXTERNAL_PATHS.items()):
+        rng = np.random.default_rng([seed, len(ROWS_PER_PERSON) + i])
+        paths[dataset] = _write_chunks(
+            root / relative_path,
+            (
+                _external_chunk(dataset, ids, n_persons, rng)
+                for ids in _person_chunks(n_persons)
+            ),
+        )
+
+    for path in _write_bof(root, n_bedrifter, seed):
+        paths[f"bof_{path.stem.split('_p')[-1]}"] = path
+
+    (root / COMPLETE_MARKER).write_text(f"{n_persons} persons, seed {seed}\n")
+    logger.info(f"Wrote synthetic data for {n_persons} persons to {root}")
+    return paths
+
+
+def use_synthetic_data(root: Path) -> None:
+    """Make NudbData and the BOF lookups read the synthetic files under `root`.
+
+    Args:
+        root: A directory written by `write_synthetic_data`.
+    """
+    latest.POSSIBLE_PATHS[:] = [root / NUDB_DIR.parent]
+    latest.SHARED_ROOT_EXTERNAL = str(root / SHARED_DIR)
+    settings.paths.daplalab_mounted.shared_root_external = str(root / SHARED_DIR)
+    bof_module._get_all_bof_situttak_october_paths.cache_clear()
+
+
+def synthetic_data_ready(root: Path) -> bool:
+    """Whether `write_synthetic_data` has finished writing to `root`.
+
+    Args:
+        root: The directory to look in.
+
+    Returns:
+        bool: True if all the synthetic files are written.
+    """
+    return (root / COMPLETE_MARKER).is_file()
+
+
+def main() -> None:
+    """Write the synthetic data."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", choices=SCALES, default="10k")
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    write_synthetic_data(args.output, SCALES[args.scale], seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,7 +20,7 @@ from nudb_use.nudb_logger import logger
 from nudb_use.paths import get_periods_from_path
 from nudb_use.paths import latest_shared_paths
 from nudb_use.quality import run_quality_suite
-from nudb_use.utils.packages import _try_check_package_version
+from nudb_use.utils.packages import check_package_versions_in_background
 from nudb_use.variables import derive
 
 __all__ = [
@@ -45,8 +45,7 @@ __all__ = [
 ]
 
 
-_try_check_package_version("ssb-nudb-use")
-_try_check_package_version("ssb-nudb-config")
+check_package_versions_in_background(["ssb-nudb-use", "ssb-nudb-config"])
 
 
 try:
@@ -2,7 +2,20 @@
 
 from .microdata import MicroData
 from .nudb_data import NudbData
+from .nudb_data import fetch_concurrently
 from .nudb_database import reset_nudb_database
+from .nudb_database import set_nudb_database_path
 from .nudb_database import show_nudb_datasets
+from .profiling import QueryProfile
+from .profiling import profile_dataset_generators
 
-__all__ = ["MicroData", "NudbData", "reset_nudb_database", "show_nudb_datasets"]
+__all__ = [
+    "MicroData",
+    "NudbData",
+    "QueryProfile",
+    "fetch_concurrently",
+    "profile_dataset_generators",
+    "reset_nudb_database",
+    "set_nudb_database_path",
+    "show_nudb_datasets",
+]
@@ -1,4 +1,9 @@
 import datetime
+import hashlib
+import json
+import os
+import time
+import uuid
 from collections.abc import Iterable
 from functools import lru_cache
 from pathlib import Path
@@ -8,78 +13,189 @@ from fagfunksjoner.paths.versions import get_latest_fileversions
 from nudb_config import settings
 
 from nudb_use.datasets.nudb_read_parquet import _nudb_read_parquet
+from nudb_use.nudb_logger import LoggerStack
 from nudb_use.nudb_logger import logger
 from nudb_use.paths.path_parse import get_periods_from_path
 from nudb_use.variables.checks import pyarrow_columns_from_metadata
 
 UNION_ALL = "\nUNION ALL\n"
 
+# Materialized BOF placements are stored here, bump the version when their layout change
+BOF_CACHE_DIR: Path = Path(
+    os.environ.get("NUDB_BOF_CACHE_DIR", Path.home() / ".cache" / "nudb_use" / "bof")
+)
+BOF_CACHE_FORMAT_VERSION: int = 1
+# Tables for other versions of the BOF files are removed when unused for this long
+BOF_CACHE_MAX_AGE_DAYS: float = float(
+    os.environ.get("NUDB_BOF_CACHE_MAX_AGE_DAYS", "7")
+)
+
+
+def _bof_cache_key(paths: list[Path]) -> str:
+    """Fingerprint the BOF input files by path, modification time and size."""
+    fingerprint = [BOF_CACHE_FORMAT_VERSION] + [
+        (str(path), path.stat().st_mtime_ns, path.stat().st_size) for path in paths
+    ]
+    return hashlib.sha256(json.dumps(fingerprint).encode("utf-8")).hexdigest()[:16]
 
-def _bof_latest_orgnr_placement_ctes_sql(
-    relevant_orgnr_cte: str | None = None, alias: str = ""
-) -> str | None:
-    """Return CTE SQL for latest BOF placement of each orgnr."""
-    paths = _get_all_bof_situttak_october_paths()
+
+def _bof_connections_union_sql(paths: list[Path]) -> str:
+    """SQL reading orgnr, orgnrbed and the period from each BOF file in a single scan."""
     union_parts: list[str] = []
     for path in paths:
         path_str = str(path).replace("'", "''")
         path_period = _first_date_from_path_period(path).strftime(r"%Y-%m-%d")
 
         union_parts.append(f"""
-            SELECT DISTINCT
-                CAST(orgnrbed AS VARCHAR) AS orgnr,
-                'orgnrbed' AS orgnr_type,
-                CAST('{path_period}' AS DATE) AS bof_period_date
-            FROM {_nudb_read_parquet(path_str, alias)}
-
-            UNION ALL
-
             SELECT DISTINCT
                 CAST(org_nr AS VARCHAR) AS orgnr,
-                'foretak' AS orgnr_type,
+                CAST(orgnrbed AS VARCHAR) AS orgnrbed,
                 CAST('{path_period}' AS DATE) AS bof_period_date
-            FROM {_nudb_read_parquet(path_str, alias)}
+            FROM read_parquet('{path_str}')
             """)
+    return UNION_ALL.join(union_parts)
 
-    if not union_parts:
+
+def _materialize_bof_placements() -> tuple[Path, Path] | None:
+    """Build the BOF connection and latest placement tables as parquet, once per set of BOF files.
+
+    The connection table has the distinct (orgnr, orgnrbed, bof_period_date) in
+    the BOF files, and the placement table has the latest placement of each orgnr
+    as either "orgnrbed" or "foretak". Both are derived from one pass over the files,
+    and reused until the files returned by `_get_all_bof_situttak_october_paths`
+    or their modification times change.
+
+    Views in this or other sessions may still read tables built from older BOF
+    files, so those are only removed after `BOF_CACHE_MAX_AGE_DAYS` without use.
+
+    Returns:
+        tuple[Path, Path] | None: Paths to the connection and placement parquet files,
+            or None if there are no BOF files.
+    """
+    paths = _get_all_bof_situttak_october_paths(want_cols=("org_nr", "orgnrbed"))
+    if not paths:
+        return None
+
+    key = _bof_cache_key(paths)
+    connections_path = BOF_CACHE_DIR / f"bof_connections_{key}.parquet"
+    placements_path = BOF_CACHE_DIR / f"bof_latest_placement_{key}.parquet"
+    if connections_path.is_file() and placements_path.is_file():
+        logger.debug(f"Reusing materialized BOF placements in {BOF_CACHE_DIR} ({key}).")
+        # Mark them as used, so they are not removed as old
+        for path in (connections_path, placements_path):
+            os.utime(path)
+        return connections_path, placements_path
+
+    with LoggerStack(f"Materializing BOF placements from {len(paths)} BOF files..."):
+        BOF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Unique per process, so sessions building at the same time do not mix their output
+        tmp_suffix = f".{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        tmp_connections = connections_path.with_name(connections_path.name + tmp_suffix)
+        tmp_placements = placements_path.with_name(placements_path.name + tmp_suffix)
+
+        try:
+            with db.connect() as connection:
+                connection.execute(f"""
+                    CREATE TABLE connections AS
+                    SELECT DISTINCT * FROM ({_bof_connections_union_sql(paths)})
+                """)
+                connection.execute(f"""
+                    COPY (
+                        SELECT * FROM connections ORDER BY orgnr, bof_period_date
+                    ) TO '{str(tmp_connections).replace("'", "''")}' (FORMAT parquet)
+                """)
+                connection.execute(f"""
+                    COPY (
+                        WITH placements AS (
+                            SELECT DISTINCT
+                                orgnrbed AS orgnr,
+                                'orgnrbed' AS orgnr_type,
+                                bof_period_date
+                            FROM connections
+
+                            UNION ALL
+
+                            SELECT DISTINCT
+                                orgnr,
+                                'foretak' AS orgnr_type,
+                                bof_period_date
+                            FROM connections
+                        )
+                        SELECT
+                            orgnr,
+                            orgnr_type
+                        FROM placements
+                        WHERE
+                            orgnr IS NOT NULL AND
+                            TRIM(orgnr) != '' AND
+                            orgnr != '000000000'
+                        QUALIFY ROW_NUMBER() OVER (
+                            PARTITION BY orgnr
+                            ORDER BY
+                                bof_period_date DESC,
+                                CASE orgnr_type
+                                    WHEN 'orgnrbed' THEN 1
+                                    ELSE 0
+                                END DESC
+                        ) = 1
+                        ORDER BY orgnr
+                    ) TO '{str(tmp_placements).replace("'", "''")}' (FORMAT parquet)
+                """)
+
+            os.replace(tmp_connections, connections_path)
+            os.replace(tmp_placements, placements_path)
+        finally:
+            tmp_connections.unlink(missing_ok=True)
+            tmp_placements.unlink(missing_ok=True)
+        _remove_unused_bof_tables(keep=(connections_path, placements_path))
+
+        logger.info(f"Stored materialized BOF placements in {BOF_CACHE_DIR} ({key}).")
+
+    return connections_path, placements_path
+
+
+def _remove_unused_bof_tables(keep: tuple[Path, ...]) -> None:
+    """Remove tables, and leftovers of failed builds, unused for `BOF_CACHE_MAX_AGE_DAYS`."""
+    oldest = time.time() - BOF_CACHE_MAX_AGE_DAYS * 24 * 60 * 60
+    for old_path in [
+        *BOF_CACHE_DIR.glob("bof_*.parquet"),
+        *BOF_CACHE_DIR.glob("bof_*.parquet.*.tmp"),
+    ]:
+        try:
+            if old_path not in keep and old_path.stat().st_mtime < oldest:
+                old_path.unlink()
+                logger.debug(f"Removed the unused BOF table {old_path}.")
+        except FileNotFoundError:  # Removed by another session
+            continue
+
+
+def _bof_latest_orgnr_placement_ctes_sql(
+    relevant_orgnr_cte: str | None = None, alias: str = ""
+) -> str | None:
+    """Return CTE SQL for latest BOF placement of each orgnr."""
+    materialized = _materialize_bof_placements()
+    if materialized is None:
         return None
+    _connections_path, placements_path = materialized
+    return _latest_placement_ctes_sql(placements_path, relevant_orgnr_cte, alias)
 
+
+def _latest_placement_ctes_sql(
+    placements_path: Path, relevant_orgnr_cte: str | None, alias: str
+) -> str:
+    """Return CTE SQL reading the materialized latest placements."""
     relevant_orgnr_filter = (
         ""
         if relevant_orgnr_cte is None
-        else f"AND orgnr IN (SELECT orgnr FROM {relevant_orgnr_cte})"
+        else f"WHERE orgnr IN (SELECT orgnr FROM {relevant_orgnr_cte})"
     )
-    placements_sql = UNION_ALL.join(union_parts)
     return f"""
-        placements AS (
-            {placements_sql}
-        ),
-
         latest_placement AS (
             SELECT
                 orgnr,
                 orgnr_type
-            FROM (
-                SELECT
-                    orgnr,
-                    orgnr_type,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY orgnr
-                        ORDER BY
-                            bof_period_date DESC,
-                            CASE orgnr_type
-                                WHEN 'orgnrbed' THEN 1
-                                ELSE 0
-                            END DESC
-                    ) AS placement_rank
-                FROM placements
-                WHERE
-                    orgnr IS NOT NULL AND
-                    TRIM(orgnr) != '' AND
-                    orgnr != '000000000'
-                    {relevant_orgnr_filter}
-            )
-            WHERE placement_rank = 1
+            FROM {_nudb_read_parquet(placements_path, alias)}
+            {relevant_orgnr_filter}
         )
     """
 
@@ -298,27 +414,22 @@ def _first_date_from_path_period(path_with_date: str | Path) -> datetime.date:
 
 
 def _bof_connection_lookup_sql_parts(alias: str) -> tuple[str, str] | None:
-    paths = _get_all_bof_situttak_october_paths(want_cols=("org_nr", "orgnrbed"))
-    latest_placement_ctes_sql = _bof_latest_orgnr_placement_ctes_sql(
-        relevant_orgnr_cte="relevant_orgnr", alias=alias
-    )
-    union_parts: list[str] = []
-    for path in paths:
-        path_str = str(path).replace("'", "''")
-        path_period = _first_date_from_path_period(path).strftime(r"%Y-%m-%d")
-
-        union_parts.append(f"""
-            SELECT DISTINCT
-                CAST(org_nr AS VARCHAR) AS orgnr,
-                CAST(orgnrbed AS VARCHAR) AS orgnrbed,
-                CAST('{path_period}' AS DATE) AS bof_period_date
-            FROM {_nudb_read_parquet(path_str, alias)}
-            """)
-
-    if not union_parts or latest_placement_ctes_sql is None:
+    materialized = _materialize_bof_placements()
+    if materialized is None:
         return None
+    connections_path, placements_path = materialized
+    latest_placement_ctes_sql = _latest_placement_ctes_sql(
+        placements_path, relevant_orgnr_cte="relevant_orgnr", alias=alias
+    )
 
-    return UNION_ALL.join(union_parts), latest_placement_ctes_sql
+    union_sql = f"""
+        SELECT
+            orgnr,
+            orgnrbed,
+            bof_period_date
+        FROM {_nudb_read_parquet(connections_path, alias)}
+    """
+    return union_sql, latest_placement_ctes_sql
 
 
 def _bof_dated_orgnr_connections_lookup_sql(
@@ -477,29 +588,26 @@ def _bof_orgnrbed_to_foretak_lookup_sql(
                OR orgnr IS DISTINCT FROM prev_orgnr
         ),
 
+        first_changes AS (
+            SELECT
+                orgnrbed,
+                ARG_MIN(orgnr, bof_period_date) AS orgnr
+            FROM conn_changes
+            GROUP BY orgnrbed
+        ),
+
         resolved_keys AS (
+            -- Latest connection at or before the join date, or the first one after it
             SELECT
                 k.orgnrbed,
                 k.join_date,
-                COALESCE(
-                    (
-                        SELECT c.orgnr
-                        FROM conn_changes AS c
-                        WHERE c.orgnrbed = k.orgnrbed
-                          AND c.bof_period_date <= k.join_date
-                        ORDER BY c.bof_period_date DESC
-                        LIMIT 1
-                    ),
-                    (
-                        SELECT c.orgnr
-                        FROM conn_changes AS c
-                        WHERE c.orgnrbed = k.orgnrbed
-                          AND c.bof_period_date > k.join_date
-                        ORDER BY c.bof_period_date ASC
-                        LIMIT 1
-                    )
-                ) AS orgnr
+                COALESCE(c.orgnr, f.orgnr) AS orgnr
             FROM input_keys AS k
+            ASOF LEFT JOIN conn_changes AS c
+                ON k.orgnrbed = c.orgnrbed
+               AND k.join_date >= c.bof_period_date
+            LEFT JOIN first_changes AS f
+                ON k.orgnrbed = f.orgnrbed
         ),
 
         resolved AS (
@@ -606,43 +714,45 @@ def _bof_foretak_to_orgnrbed_lookup_sql(
                 bof_period_date
         ),
 
+        first_periods AS (
+            SELECT
+                orgnr,
+                orgnrbed_count,
+                single_orgnrbed
+            FROM conn_periods
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY orgnr
+                ORDER BY bof_period_date
+            ) = 1
+        ),
+
         chosen_periods AS (
+            -- Latest period at or before the join date, or the first one after it
             SELECT
                 k.orgnr,
                 k.join_date,
-                COALESCE(
-                    (
-                        SELECT p.bof_period_date
-                        FROM conn_periods AS p
-                        WHERE p.orgnr = k.orgnr
-                          AND p.bof_period_date <= k.join_date
-                        ORDER BY p.bof_period_date DESC
-                        LIMIT 1
-                    ),
-                    (
-                        SELECT p.bof_period_date
-                        FROM conn_periods AS p
-                        WHERE p.orgnr = k.orgnr
-                          AND p.bof_period_date > k.join_date
-                        ORDER BY p.bof_period_date ASC
-                        LIMIT 1
-                    )
-                ) AS chosen_period
+                COALESCE(p.orgnrbed_count, f.orgnrbed_count) AS orgnrbed_count,
+                CASE
+                    WHEN p.orgnrbed_count IS NOT NULL THEN p.single_orgnrbed
+                    ELSE f.single_orgnrbed
+                END AS single_orgnrbed
             FROM input_keys AS k
+            ASOF LEFT JOIN conn_periods AS p
+                ON k.orgnr = p.orgnr
+               AND k.join_date >= p.bof_period_date
+            LEFT JOIN first_periods AS f
+                ON k.orgnr = f.orgnr
         ),
 
         resolved_keys AS (
             SELECT
-                cp.orgnr,
-                cp.join_date,
+                orgnr,
+                join_date,
                 CASE
-                    WHEN p.orgnrbed_count = 1 THEN p.single_orgnrbed
+                    WHEN orgnrbed_count = 1 THEN single_orgnrbed
                     ELSE NULL
                 END AS orgnrbed
-            FROM chosen_periods AS cp
-            LEFT JOIN conn_periods AS p
-                ON p.orgnr = cp.orgnr
-               AND p.bof_period_date = cp.chosen_period
+            FROM chosen_periods
         ),
 
         resolved AS (
@@ -1,5 +1,4 @@
 import duckdb as db
-import pandas as pd
 
 from nudb_use.nudb_logger import LoggerStack
 from nudb_use.nudb_logger import logger
@@ -18,94 +17,182 @@ def _generate_bu_igang_table(
     igang = NudbData("igang")
     utd_hoeyeste = NudbData("utd_hoeyeste")
 
-    years = pd.concat(
-        [
-            # all years in avslutta
-            avslutta.select_distinct("utd_skoleaar_start").df()["utd_skoleaar_start"],
-            # all years in igang
-            igang.select_distinct("utd_skoleaar_start").df()["utd_skoleaar_start"],
-        ]
-    )
-
-    yfirst = int(years.min()) if from_year is None else from_year
-    ylast = int(years.max()) if to_year is None else to_year
+    yfirst, ylast = from_year, to_year
+    if yfirst is None or ylast is None:
+        # all years in avslutta and igang
+        first_year, last_year = connection.sql(f"""
+            SELECT
+                CAST(MIN(utd_skoleaar_start) AS INTEGER),
+                CAST(MAX(utd_skoleaar_start) AS INTEGER)
+            FROM (
+                SELECT utd_skoleaar_start FROM {avslutta.alias} UNION ALL
+                SELECT utd_skoleaar_start FROM {igang.alias}
+            )
+        """).fetchone()  # type: ignore[misc]
+        yfirst = first_year if yfirst is None else yfirst
+        ylast = last_year if ylast is None else ylast
 
-    bu_igang = connection.sql(f"""
-        SELECT DISTINCT
-            snr
-        FROM (
-            SELECT DISTINCT snr FROM {igang.alias}    UNION
-            SELECT DISTINCT snr FROM {avslutta.alias} UNION
-            SELECT DISTINCT snr FROM {eksamen.alias}
+    with LoggerStack(f"Generating BU_IGANG_p{yfirst}_p{ylast}..."):
+        _check_one_utd_hoeyeste_per_year(connection, utd_hoeyeste.alias, ylast)
+        query = _bu_igang_sql(
+            igang=igang.alias,
+            avslutta=avslutta.alias,
+            eksamen=eksamen.alias,
+            utd_hoeyeste=utd_hoeyeste.alias,
+            yfirst=yfirst,
+            ylast=ylast,
         )
-        WHERE
-            LENGTH(snr) == 7 /* Keep only valid snrs */
-    """).df()
+        logger.debug(query)
+        connection.execute(f"CREATE TABLE {alias} AS {query}")
 
-    with LoggerStack(f"Generating BU_IGANG_p{yfirst}_p{ylast}..."):
 
-        for year in range(yfirst, ylast + 1):
-            logger.info(f"{year}/{ylast}...")
+def _check_one_utd_hoeyeste_per_year(
+    connection: db.DuckDBPyConnection, utd_hoeyeste: str, ylast: int
+) -> None:
+    """Check that no snr has several utd_hoeyeste_nus2000 in the same year.
 
-            igang_y = (
-                connection.query(f"""
-                    SELECT
-                        snr,
-                        nus2000,
-                        utd_hovedaktivitet_prio
-                    FROM (
-                        SELECT DISTINCT
-                            snr,
-                            nus2000,
-                            UTD_HOVEDAKTIVITET_PRIO(
-                                uh_erhovedaktivitet,
-                                fa_erhovedaktivitet,
-                                vg_erhovedaktivitet
-                            ) AS utd_hovedaktivitet_prio
-                        FROM
-                            {igang.alias}
-                        WHERE
-                            utd_skoleaar_start = '{year}'
-                    )
-                    QUALIFY
-                        row_number() OVER (
-                            PARTITION BY snr
-                            ORDER BY
-                            utd_hovedaktivitet_prio DESC,
-                            nus2000 DESC
-                        ) = 1;
-                """)
-                .df()[["snr", "nus2000"]]
-                .rename(columns={"nus2000": f"igang_{year}"})
-            )
+    The year by year merges this replaced validated 1:1, so a duplicate failed
+    there. In the set-based query it would give an empty period, and one of the
+    values would be picked at random.
 
-            bu_y = connection.sql(f"""
-                SELECT DISTINCT
-                    snr, utd_hoeyeste_nus2000 AS bu_{year}
-                FROM (
-                    SELECT
-                        snr,
-                        utd_hoeyeste_nus2000,
-                        utd_hoeyeste_aar,
-                        MAX(utd_hoeyeste_aar) OVER (PARTITION BY SNR) AS last_utd_hoeyeste_aar
-                    FROM
-                        {utd_hoeyeste.alias}
-                    WHERE
-                        LENGTH(snr) = 7 AND
-                        utd_hoeyeste_aar <= {year}
-                )
-                WHERE
-                    last_utd_hoeyeste_aar = utd_hoeyeste_aar;
-          """).df()
+    Args:
+        connection: The connection to query on.
+        utd_hoeyeste: The alias of utd_hoeyeste.
+        ylast: The last year in bu_igang.
+
+    Raises:
+        ValueError: If an snr has several utd_hoeyeste_nus2000 in the same year.
+    """
+    duplicated = connection.sql(f"""
+        SELECT
+            snr,
+            utd_hoeyeste_aar
+        FROM
+            {utd_hoeyeste}
+        WHERE
+            LENGTH(snr) = 7 AND
+            utd_hoeyeste_aar <= {ylast}
+        GROUP BY
+            snr, utd_hoeyeste_aar
+        HAVING
+            COUNT(DISTINCT utd_hoeyeste_nus2000) > 1
+        LIMIT 5
+    """).fetchall()
+    if duplicated:
+        raise ValueError(
+            f"Found several utd_hoeyeste_nus2000 for the same snr and year in utd_hoeyeste, should not happen: {duplicated}"
+        )
 
-            bu_igang = bu_igang.merge(
-                igang_y, how="left", on="snr", validate="1:1"
-            ).merge(bu_y, how="left", on="snr", validate="1:1")
 
-    bu_igang = bu_igang.astype("string[pyarrow]")
+def _bu_igang_sql(
+    igang: str,
+    avslutta: str,
+    eksamen: str,
+    utd_hoeyeste: str,
+    yfirst: int,
+    ylast: int,
+) -> str:
+    """Build one query for the wide bu_igang layout, with igang_{year} and bu_{year} per snr.
 
-    query = f"""
-        CREATE TABLE {alias} AS SELECT * FROM bu_igang
+    Both sources are first made long, with one row per snr and year. For igang we
+    keep the highest prioritized nus2000 per school year. For utd_hoeyeste each
+    row is valid from its year until the next row for the same snr, so it is
+    range-joined to the years it covers. Both are unique per snr and year, igang
+    by its prioritization and utd_hoeyeste by `_check_one_utd_hoeyeste_per_year`,
+    so each pivoted cell has at most one value. The long table is pivoted to columns
+    with conditional aggregates.
     """
+    select_cols = ["base.snr"]
+    for year in range(yfirst, ylast + 1):
+        select_cols += [
+            f"CAST(ANY_VALUE(igang) FILTER (WHERE aar = {year}) AS VARCHAR) AS igang_{year}",
+            f"CAST(ANY_VALUE(bu) FILTER (WHERE aar = {year}) AS VARCHAR) AS bu_{year}",
+        ]
+    select_sql = ",\n            ".join(select_cols)
 
-    connection.execute(query)
+    return f"""
+        WITH
+        years AS (
+            SELECT CAST(range AS INTEGER) AS aar FROM range({yfirst}, {ylast + 1})
+        ),
+        base AS (
+            SELECT DISTINCT
+                snr
+            FROM (
+                SELECT DISTINCT snr FROM {igang}    UNION
+                SELECT DISTINCT snr FROM {avslutta} UNION
+                SELECT DISTINCT snr FROM {eksamen}
+            )
+            WHERE
+                LENGTH(snr) == 7 /* Keep only valid snrs */
+        ),
+        igang_long AS (
+            SELECT
+                snr,
+                aar,
+                nus2000 AS igang,
+                NULL AS bu
+            FROM (
+                SELECT DISTINCT
+                    snr,
+                    nus2000,
+                    years.aar,
+                    UTD_HOVEDAKTIVITET_PRIO(
+                        uh_erhovedaktivitet,
+                        fa_erhovedaktivitet,
+                        vg_erhovedaktivitet
+                    ) AS utd_hovedaktivitet_prio
+                FROM
+                    {igang}
+                    JOIN years ON utd_skoleaar_start = CAST(years.aar AS VARCHAR)
+            )
+            QUALIFY
+                row_number() OVER (
+                    PARTITION BY snr, aar
+                    ORDER BY
+                    utd_hovedaktivitet_prio DESC,
+                    nus2000 DESC
+                ) = 1
+        ),
+        bu_periods AS (
+            SELECT
+                snr,
+                utd_hoeyeste_nus2000,
+                utd_hoeyeste_aar AS valid_from,
+                LEAD(utd_hoeyeste_aar) OVER (
+                    PARTITION BY snr ORDER BY utd_hoeyeste_aar
+                ) AS valid_to
+            FROM (
+                SELECT DISTINCT
+                    snr, utd_hoeyeste_nus2000, utd_hoeyeste_aar
+                FROM
+                    {utd_hoeyeste}
+                WHERE
+                    LENGTH(snr) = 7 AND
+                    utd_hoeyeste_aar <= {ylast}
+            )
+        ),
+        bu_long AS (
+            SELECT
+                snr,
+                years.aar,
+                NULL AS igang,
+                utd_hoeyeste_nus2000 AS bu
+            FROM
+                bu_periods
+                JOIN years ON
+                    years.aar >= bu_periods.valid_from AND
+                    (bu_periods.valid_to IS NULL OR years.aar < bu_periods.valid_to)
+        ),
+        bu_igang_long AS (
+            SELECT * FROM igang_long UNION ALL
+            SELECT * FROM bu_long
+        )
+        SELECT
+            {select_sql}
+        FROM
+            base
+            LEFT JOIN bu_igang_long USING (snr)
+        GROUP BY
+            base.snr
+    """
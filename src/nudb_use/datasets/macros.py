@@ -7,7 +7,14 @@ _MACRO = "CREATE OR REPLACE MACRO"
 _UHNUS = ["6", "7", "8"]
 _DATE_WIDTH = 8
 _MAX_DATE = "9" * _DATE_WIDTH
-_MIN_DATE = "0" * _DATE_WIDTH
+# UTD_HOEYESTE_RANGERING packs 33 decimal digits, which fit losslessly in a parquet DECIMAL
+RANGERING_WIDTH = 33
+RANGERING_TYPE = "DECIMAL(38, 0)"
+
+
+def _rangering_digit(position: int, width: int = 1) -> str:
+    """The factor placing a field of `width` digits at `position` in the ranking number."""
+    return f"{10 ** (RANGERING_WIDTH - position - width)}::HUGEINT"
 
 
 _DUCKDB_MACROS = f"""
@@ -33,7 +40,11 @@ _DUCKDB_MACROS = f"""
 
 
 {_MACRO} PREP_AND_INVERT_UTD_STUDIELAND(utd_studieland) AS /* Use substr to avoid underflow in 999 - .... */
-    LPAD(CAST(999 - CAST(SUBSTR(COALESCE(utd_studieland, '999'), 1, 3) AS INTEGER) AS VARCHAR), 3, '0');
+    999 - CAST(SUBSTR(COALESCE(utd_studieland, '999'), 1, 3) AS INTEGER);
+
+
+{_MACRO} CODE2INT(code) AS /* Codes that are not digits are ranked as 0 in UTD_HOEYESTE_RANGERING */
+    COALESCE(TRY_CAST(code AS UINTEGER), 0);
 
 
 {_MACRO} YEAR_PLUS_ONE(utd_skoleaar_start) AS
@@ -75,21 +86,21 @@ _DUCKDB_MACROS = f"""
    utd_rectype
 ) AS
     CASE
-        WHEN nivaa2000 IN {_UHNUS} AND utd_rectype == '4'                                                                 THEN '4'
-        WHEN nivaa2000 IN {_UHNUS} AND utd_rectype == '3'               AND is_eksamener_120_studp                        THEN '3'
-        WHEN nivaa2000 == '3'      AND utd_klassetrinn IN ['10', '11']  AND utd_aktivitet_slutt >= make_date(1975, 10, 1) THEN '1'
-        WHEN nivaa2000 == '3'                                           AND utd_aktivitet_slutt >= make_date(1995, 10, 1) THEN '1'
-        WHEN   nus2000 == '999999'                                                                                        THEN '0'
-                                                                                                                          ELSE '2'
+        WHEN nivaa2000 IN {_UHNUS} AND utd_rectype == '4'                                                                 THEN 4
+        WHEN nivaa2000 IN {_UHNUS} AND utd_rectype == '3'               AND is_eksamener_120_studp                        THEN 3
+        WHEN nivaa2000 == '3'      AND utd_klassetrinn IN ['10', '11']  AND utd_aktivitet_slutt >= make_date(1975, 10, 1) THEN 1
+        WHEN nivaa2000 == '3'                                           AND utd_aktivitet_slutt >= make_date(1995, 10, 1) THEN 1
+        WHEN   nus2000 == '999999'                                                                                        THEN 0
+                                                                                                                          ELSE 2
     END;
 
 
-{_MACRO} DATE2STR(x) AS
-    strftime(x, '%Y%m%d');
+{_MACRO} DATE2INT(x) AS /* The date as the number YYYYMMDD, missing dates as 0 */
+    COALESCE(YEAR(x) * 10000 + MONTH(x) * 100 + DAY(x), 0);
 
 
 {_MACRO} INVERT_DATE(x) AS
-    LPAD(CAST({_MAX_DATE} - CAST(DATE2STR(x) AS INTEGER) AS VARCHAR), {_DATE_WIDTH}, '0');
+    {_MAX_DATE} - DATE2INT(x);
 
 
 {_MACRO} UTD_HOEYESTE_AAR(utd_hoeyeste_dato) AS
@@ -183,25 +194,27 @@ _DUCKDB_MACROS = f"""
     /*     For record type 0 and 1 we prioritize the latest/newest records.                                                    */
     /*     We overflow nivaa2000 such that 9 gets mapped to 0, as 9 should be prioritized last.                                */
     /*     We identify and down prioritize allmenne fag                                                                        */
+    /*     Dates are numbers YYYYMMDD. Missing dates, and nus2000 that is not six digits, are ranked as 0.                     */
     /* ======================================================================================================================= */
 
     T3 AS (
         SELECT
             *,
             CASE
-                WHEN SUBSTR(trinn_plassering, 1, 1) == '3'        THEN INVERT_DATE(utd_aktivitet_slutt)
-                WHEN SUBSTR(trinn_plassering, 1, 1) IN ('2', '4') THEN '{_MIN_DATE}'
-                                                                  ELSE DATE2STR(utd_aktivitet_slutt)
+                WHEN trinn_plassering == 3        THEN INVERT_DATE(utd_aktivitet_slutt)
+                WHEN trinn_plassering IN (2, 4)   THEN 0
+                                                  ELSE DATE2INT(utd_aktivitet_slutt)
             END AS first_date_tiebreak,
-            DATE2STR(utd_aktivitet_slutt) AS last_date_tiebreak,
-            RIGHT(CAST(CAST(nivaa2000 AS INTEGER) + 1 AS VARCHAR), 1) AS nivaa2000_overflowed,
-            CASE WHEN SUBSTR(nus2000, 2, 1) == '0' THEN '0'
-                                                   ELSE '1'
+            DATE2INT(utd_aktivitet_slutt) AS last_date_tiebreak,
+            (CAST(nivaa2000 AS INTEGER) + 1) % 10 AS nivaa2000_overflowed,
+            CASE WHEN SUBSTR(nus2000, 2, 1) == '0' THEN 0
+                                                   ELSE 1
             END AS allmenne_fag,
-            CASE WHEN uh_gruppering_nus == '01' THEN '0'
-                 WHEN uh_gruppering_nus == '23' THEN '1'
-                                                ELSE '9'
-            END AS ppu_forberedende_proever
+            CASE WHEN uh_gruppering_nus == '01' THEN 0
+                 WHEN uh_gruppering_nus == '23' THEN 1
+                                                ELSE 9
+            END AS ppu_forberedende_proever,
+            CASE WHEN LENGTH(nus2000) == 6 THEN CODE2INT(nus2000) ELSE 0 END AS nus2000_tiebreak
         FROM
             T2
     )
@@ -213,28 +226,38 @@ _DUCKDB_MACROS = f"""
     /*    Kjell (01/06/26): Added utd_datakilde to the end of the ranking number. The main idea here, is that we use the last  */
     /*    8 digits as tiebreakers, ensuring that we don't get duplicates. They are not 'faglig' sound, but they are            */
     /*    deterministic. I.e., they don't really decide what record is the best, but they stop us from getting duplicates.     */
+    /*    The fields are packed as decimal digits in one integer, so rankings are compared as integers. Written with leading  */
+    /*    zeros (RANGERING2STR), it is the same as the string of digits the fields were concatenated to before.                */
     /* ======================================================================================================================= */
 
-    SELECT CONCAT(
-        trinn_plassering,           /* [   00] [1] Record Type.                                                                */
-        first_date_tiebreak,        /* [01-09] [8] First Date Tiebreak with Inverted Date for Exam Records.                    */
-        nivaa2000_overflowed,       /* [   10] [1] Nivaa nus2000 overflowed such that 9 is mapped to 0.                        */
-        utd_klassetrinn,            /* [11-12] [2] Klassetrinn (Higher = better).                                              */
-        allmenne_fag,               /* [   13] [1] Allmenne Fag (Allmenne fag = 0, other = 1).                                 */
-        ppu_forberedende_proever,   /* [   14] [1] Forberedene Prøver is Worst (0) PPU is better (1) Other is best (9).        */
-        last_date_tiebreak,         /* [15-22] [8] Last Date Tiebreak. Newer is Better.                                        */
-        nus2000,                    /* [23-28] [6] NUS2000 Tiebreak. Higher NUS2000 is "Better".                               */
-        utd_inverse_studieland,     /* [29-31] [3] Studieland Tiebreak. Lower Studieland is "Better" (Norway is "Best")        */
-        utd_datakilde               /* [32-33] [2] Kilde Tiebreak. Higher Kilde is "Better."                                   */
-    ) FROM T3
+    SELECT CAST(
+        trinn_plassering            * {_rangering_digit(0)}     + /* [   00] [1] Record Type.                                       */
+        first_date_tiebreak         * {_rangering_digit(1, 8)}  + /* [01-08] [8] First Date Tiebreak with Inverted Date for Exams.  */
+        nivaa2000_overflowed        * {_rangering_digit(9)}     + /* [   09] [1] Nivaa nus2000 overflowed such that 9 is mapped to 0. */
+        CODE2INT(utd_klassetrinn)   * {_rangering_digit(10, 2)} + /* [10-11] [2] Klassetrinn (Higher = better).                     */
+        allmenne_fag                * {_rangering_digit(12)}    + /* [   12] [1] Allmenne Fag (Allmenne fag = 0, other = 1).        */
+        ppu_forberedende_proever    * {_rangering_digit(13)}    + /* [   13] [1] Forberedene Prøver (0), PPU (1), Other (9).         */
+        last_date_tiebreak          * {_rangering_digit(14, 8)} + /* [14-21] [8] Last Date Tiebreak. Newer is Better.               */
+        nus2000_tiebreak            * {_rangering_digit(22, 6)} + /* [22-27] [6] NUS2000 Tiebreak. Higher NUS2000 is "Better".      */
+        utd_inverse_studieland      * {_rangering_digit(28, 3)} + /* [28-30] [3] Studieland Tiebreak. Lower Studieland is "Better". */
+        CODE2INT(utd_datakilde)     * {_rangering_digit(31, 2)}   /* [31-32] [2] Kilde Tiebreak. Higher Kilde is "Better."          */
+    AS {RANGERING_TYPE}) FROM T3
 
 );
 
 
+{_MACRO} RANGERING2STR(utd_hoeyeste_rangering) AS
+    LPAD(CAST(utd_hoeyeste_rangering AS VARCHAR), {RANGERING_WIDTH}, '0');
+
+
+{_MACRO} UTD_HOEYESTE_RANGERING_TRINN(utd_hoeyeste_rangering) AS
+    /* The record type, the first digit of the ranking number */
+    CAST(CAST(utd_hoeyeste_rangering AS HUGEINT) // {_rangering_digit(0)} AS INTEGER);
+
+
 {_MACRO} DOWNGRADE_UTD_HOEYESTE_NUS2000(utd_hoeyeste_nus2000, utd_hoeyeste_nus2000_rangering) AS
-    /* This code is volatile! It depends on how the ranking number is created! */
     CASE
-        WHEN SUBSTR(utd_hoeyeste_nus2000_rangering, 1, 1) == '1' THEN '{FULLF_GRUNNSKOLE_NUS2000}'
+        WHEN UTD_HOEYESTE_RANGERING_TRINN(utd_hoeyeste_nus2000_rangering) == 1 THEN '{FULLF_GRUNNSKOLE_NUS2000}'
         ELSE utd_hoeyeste_nus2000
     END;
 
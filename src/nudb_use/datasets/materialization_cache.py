@@ -0,0 +1,213 @@
+"""Fingerprinted reuse of materialized NUDB tables in a persistent DuckDB file.
+
+When the NUDB database is stored in a file, datasets created with
+`CREATE TABLE` survive between Python sessions. Each table is stored together
+with a fingerprint of the SQL that created it, of every parquet file it was
+built from (size, modification time and row-group statistics), of the
+definitions of the datasets it reads from, and of the macros and the nudb_use
+and DuckDB versions. A new session reuses the table when the fingerprint still
+matches, and rebuilds it otherwise.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.metadata
+import json
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING
+from typing import Any
+
+import duckdb as db
+import pyarrow.parquet as pq
+
+from nudb_use.datasets.macros import _DUCKDB_MACROS
+from nudb_use.nudb_logger import logger
+
+if TYPE_CHECKING:
+    from nudb_use.datasets.nudb_database import _NudbDatabase
+
+# Bump this when the fingerprint changes, all stored tables are then rebuilt
+MATERIALIZATION_FORMAT_VERSION: int = 2
+MATERIALIZATION_TABLE = "_nudb_materializations"
+
+_CREATE_TABLE_PATTERN = re.compile(
+    r"^\s*CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(\w+)\s+AS\s+(.*)$",
+    flags=re.IGNORECASE | re.DOTALL,
+)
+
+
+def _prepare_persistent_database(connection: db.DuckDBPyConnection) -> None:
+    """Make a database file ready for a new session.
+
+    Views are cheap and are recreated by their generators, so they are dropped.
+    Tables are kept, and checked against their fingerprint when they are requested.
+    """
+    connection.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MATERIALIZATION_TABLE} (
+            alias VARCHAR PRIMARY KEY,
+            fingerprint VARCHAR,
+            input_paths VARCHAR[],
+            created_at TIMESTAMP
+        )
+    """)
+    views = connection.sql("""
+        SELECT view_name
+        FROM duckdb_views()
+        WHERE NOT internal AND NOT temporary AND schema_name = 'main'
+    """).fetchall()
+    for (view_name,) in views:
+        connection.execute(f'DROP VIEW IF EXISTS "{view_name}"')
+
+
+def _parquet_file_fingerprint(path: Path) -> dict[str, Any]:
+    stat = path.stat()
+    fingerprint: dict[str, Any] = {
+        "path": str(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    try:
+        metadata = pq.ParquetFile(path).metadata
+        fingerprint["row_groups"] = [
+            [metadata.row_group(i).num_rows, metadata.row_group(i).total_byte_size]
+            for i in range(metadata.num_row_groups)
+        ]
+    except Exception as err:  # Size and mtime are still a usable fingerprint
+        logger.debug(f"Could not read row-group statistics from {path}: {err}")
+    return fingerprint
+
+
+def _nudb_use_version() -> str:
+    try:
+        return importlib.metadata.version("ssb-nudb-use")
+    except importlib.metadata.PackageNotFoundError:
+        return "0.0.0"
+
+
+def _upstream_definitions(
+    connection: db.DuckDBPyConnection, upstream: list[str]
+) -> dict[str, str]:
+    """Get the SQL of the upstream views, and the fingerprint of the upstream tables.
+
+    The stored fingerprint of an upstream table already covers its own upstream.
+    """
+    aliases = [alias.lower() for alias in upstream]
+    definitions = connection.execute(
+        """
+        SELECT lower(view_name), sql
+        FROM duckdb_views()
+        WHERE NOT internal AND list_contains(?, lower(view_name))
+        """,
+        [aliases],
+    ).fetchall()
+    definitions += connection.execute(
+        f"""
+        SELECT lower(alias), fingerprint
+        FROM {MATERIALIZATION_TABLE}
+        WHERE list_contains(?, lower(alias))
+        """,
+        [aliases],
+    ).fetchall()
+    return {alias: " ".join(str(sql).split()) for alias, sql in definitions}
+
+
+def _materialization_fingerprint(
+    sql: str, input_paths: list[Path], upstream: dict[str, str] | None = None
+) -> str:
+    """Hash the SQL of a table together with the state of its inputs and the code that reads them.
+
+    Args:
+        sql: The SELECT the table is created from.
+        input_paths: The parquet files the table is built from, also through other datasets.
+        upstream: The definitions of the datasets the table reads from, see `_upstream_definitions`.
+
+    Returns:
+        str: The fingerprint, as a hex digest.
+    """
+    payload = {
+        "format": MATERIALIZATION_FORMAT_VERSION,
+        "sql": " ".join(sql.split()),
+        "inputs": [
+            _parquet_file_fingerprint(path) for path in sorted(set(input_paths))
+        ],
+        "upstream": upstream or {},
+        "macros": _DUCKDB_MACROS,
+        "nudb_use": _nudb_use_version(),
+        "duckdb": db.__version__,
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def _stored_fingerprint(connection: db.DuckDBPyConnection, alias: str) -> str | None:
+    row = connection.execute(
+        f"SELECT fingerprint FROM {MATERIALIZATION_TABLE} WHERE alias = ?", [alias]
+    ).fetchone()
+    exists = connection.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ? AND NOT temporary",
+        [alias],
+    ).fetchone()
+    if row is None or exists is None or not exists[0]:
+        return None
+    return str(row[0])
+
+
+class _MaterializationCachingConnection:
+    """Connection handed to a dataset generator when the database is stored in a file.
+
+    Everything is passed on to the real connection, except the `CREATE TABLE`
+    statement for the dataset being generated, which is skipped when an
+    up-to-date table is already stored.
+    """
+
+    def __init__(self, database: _NudbDatabase, alias: str) -> None:
+        self._database = database
+        self._alias = alias
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._database.get_connection(), name)
+
+    def execute(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        """Run a query, reusing the stored table if the query materializes the dataset."""
+        if not args and not kwargs and self._materialize(query):
+            return self._database.get_connection()
+        return self._database.get_connection().execute(query, *args, **kwargs)
+
+    def sql(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        """Run a query, reusing the stored table if the query materializes the dataset."""
+        if not args and not kwargs and self._materialize(query):
+            return None
+        return self._database.get_connection().sql(query, *args, **kwargs)
+
+    def _materialize(self, query: str) -> bool:
+        match = _CREATE_TABLE_PATTERN.match(query)
+        if match is None or match.group(1).upper() != self._alias.upper():
+            return False
+
+        select_sql = match.group(2).strip().rstrip(";")
+        input_paths = self._database._input_paths(self._alias)
+        connection = self._database.get_connection()
+        upstream = _upstream_definitions(
+            connection, self._database._upstream_datasets(self._alias)
+        )
+        fingerprint = _materialization_fingerprint(select_sql, input_paths, upstream)
+
+        if not input_paths:
+            # Nothing to fingerprint the data by, e.g. tables built from KLASS
+            logger.info(f"{self._alias} has no input files, building it again.")
+        elif _stored_fingerprint(connection, self._alias) == fingerprint:
+            logger.info(f"Reusing stored {self._alias}, its inputs are unchanged.")
+            self._database._materialization_stats["reused"] += 1
+            return True
+
+        logger.info(f"Materializing {self._alias} in {self._database._database_path}")
+        connection.execute(f"CREATE OR REPLACE TABLE {self._alias} AS {select_sql}")
+        connection.execute(
+            f"INSERT OR REPLACE INTO {MATERIALIZATION_TABLE} VALUES (?, ?, ?, current_timestamp)",
+            [self._alias, fingerprint, [str(path) for path in input_paths]],
+        )
+        self._database._materialization_stats["built"] += 1
+        return True
@@ -1,5 +1,8 @@
 import copy
 from collections.abc import Callable
+from collections.abc import Iterator
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from pathlib import Path
 from typing import Any
@@ -7,15 +10,21 @@ from typing import cast
 
 import duckdb as db
 import pandas as pd
+import pyarrow as pa
 
 from nudb_use.datasets.nudb_database import STRING_DTYPE
+from nudb_use.datasets.nudb_database import _SharedFrame
 from nudb_use.datasets.nudb_database import nudb_database
 from nudb_use.datasets.nudb_read_parquet import _nudb_read_parquet
+from nudb_use.datasets.profiling import QueryProfile
+from nudb_use.datasets.profiling import _ProfilingConnection
+from nudb_use.datasets.profiling import profile_query
 from nudb_use.datasets.utils import _default_alias_from_name
 from nudb_use.nudb_logger import LoggerStack
 from nudb_use.nudb_logger import logger
 
 JOIN_TYPES = {"left", "right", "inner", "cross", "full", "outer", "self"}
+ARROW_BATCH_SIZE = 1_000_000
 
 
 def _indent(
@@ -52,12 +61,14 @@ class NudbData:
     def __init__(
         self, name: str, attach_using_init: bool = True, *args: Any, **kwargs: Any
     ) -> None:
-        with LoggerStack(f"Getting NUDB dataset ({name.upper()})"):
+        # Datasets are attached by one thread at a time, each logging to its own log stack
+        with nudb_database._lock, LoggerStack(f"Getting NUDB dataset ({name.upper()})"):
             name = name.lower()
 
             if name in nudb_database._datasets.keys():
                 logger.info("Dataset is already initialized!")
                 self._copy_attributes_from_existing(nudb_database._datasets[name])
+                nudb_database._record_dependency(self.alias)
                 return None
 
             elif name not in nudb_database._dataset_generators.keys():
@@ -89,7 +100,10 @@ class NudbData:
             self._using = ""
             self._as = ""
             self._on = ""
+            # Keep the tables of the DataFrames joined into the query alive
+            self._frames: tuple[_SharedFrame, ...] = ()
 
+            nudb_database._record_dependency(self.alias)
             if attach_using_init:  # Setting the default to `True` may be a bad idea...
                 logger.info("Initializing dataset!")
                 self._attach()
@@ -170,7 +184,18 @@ QUERY:
         return cls(name=name, alias=alias, **kwargs)
 
     def _attach(self) -> None:
-        self.generator(alias=self.alias, connection=nudb_database.get_connection())
+        # Datasets created by the generator are recorded as dependencies of this one
+        nudb_database._attaching.append(self.alias)
+        connection = nudb_database._generator_connection(self.alias)
+        if nudb_database._profiles is not None:
+            connection = cast(
+                db.DuckDBPyConnection,
+                _ProfilingConnection(connection, self.name, nudb_database._profiles),
+            )
+        try:
+            self.generator(alias=self.alias, connection=connection)
+        finally:
+            nudb_database._attaching.pop()
         self.is_view = _is_view(self.alias)
         self.exists = _is_in_database(self.alias)
 
@@ -209,6 +234,7 @@ QUERY:
         self._using = other._using
         self._as = other._as
         self._on = other._on
+        self._frames = other._frames
 
     def _check_query_validity(self) -> None:
         if self._join and not self._using and not self._on:
@@ -321,6 +347,7 @@ QUERY:
         Raises:
             ValueError: If `how` is not a supported join type.
         """
+        frames: tuple[_SharedFrame, ...] = ()
         if isinstance(data, str):
             try:
                 logger.debug("Checking if string is the name of an NUDB datasett")
@@ -344,14 +371,15 @@ QUERY:
             logger.debug("Getting query from NudbData")
             expr = f"(\n{data._get_query(check_validity = True)}\n)"
             _as = data._as
+            frames = data._frames
 
         elif isinstance(data, pd.DataFrame):
-            logger.debug("Registering pandas DataFrame in Database...")
-            connection = nudb_database.get_connection()
-            name = "_TMP_DATAFRAME_INPUT"
+            logger.debug("Copying pandas DataFrame into the database...")
+            # Unique, and readable from the cursors of other threads
+            frame = nudb_database.shared_frame(data)
             _as = ""
-            connection.register(name, data.copy())
-            expr = _indent(name)
+            expr = _indent(frame.name)
+            frames = (frame,)
 
         if how.lower() not in JOIN_TYPES:
             raise ValueError(f"how must be one of: {list(JOIN_TYPES)}")
@@ -360,6 +388,7 @@ QUERY:
         out._join = expr
         out._join_type = how.upper()
         out._join_as = as_name if as_name is not None else _as
+        out._frames = (*self._frames, *frames)
 
         return out
 
@@ -483,6 +512,140 @@ QUERY:
         query = self._get_query(check_validity=True)
         return nudb_database.get_connection().sql(query).df()
 
+    def arrow(self, batch_size: int = ARROW_BATCH_SIZE) -> pa.Table:
+        """Return dataset as an Arrow table, without going through pandas.
+
+        Args:
+            batch_size: Rows per record batch in the table.
+
+        Returns:
+            pa.Table: The result of the query.
+        """
+        query = self._get_query(check_validity=True)
+        return nudb_database.get_connection().sql(query).to_arrow_table(batch_size)
+
+    def profile(self, path: str | Path | None = None) -> QueryProfile:
+        """Run the query with DuckDB profiling, and log the plan with the time of each operator.
+
+        The result of the query is discarded. The profile is attached to the JSON log output.
+
+        Args:
+            path: Also write the profile to this JSON or HTML file.
+
+        Returns:
+            QueryProfile: The plan, operator timings and cardinalities, and spill to disk.
+        """
+        query = self._get_query(check_validity=True)
+        with LoggerStack(f"Profiling the query of {self.name}"):
+            profile = profile_query(nudb_database.get_connection(), query, self.name)
+            profile.log()
+            if path is not None:
+                profile.write(path)
+        return profile
+
+    def record_batches(
+        self, batch_size: int = ARROW_BATCH_SIZE
+    ) -> Iterator[pa.RecordBatch]:
+        """Stream the dataset as Arrow record batches, so only one batch is in memory at a time.
+
+        The batches are read from the connection of this thread, so run other queries
+        after the iteration is done, or in another thread.
+
+        Args:
+            batch_size: Max rows per record batch.
+
+        Yields:
+            pa.RecordBatch: The next batch of rows.
+        """
+        query = self._get_query(check_validity=True)
+        relation = nudb_database.get_connection().sql(query)
+        # to_arrow_reader replaces fetch_record_batch from duckdb 1.5
+        to_reader = getattr(relation, "to_arrow_reader", relation.fetch_record_batch)
+        yield from to_reader(batch_size)
+
+    def to_parquet(
+        self,
+        path: str | Path,
+        partition_by: list[str] | None = None,
+        row_group_size: int | None = None,
+        compression: str = "zstd",
+        overwrite: bool = False,
+    ) -> Path:
+        """Write the dataset to parquet with DuckDB, without passing through Python memory.
+
+        Args:
+            path: The parquet file, or directory when partitioning.
+            partition_by: Columns to hive-partition the output by (e.g. ["utd_skoleaar_start"]).
+            row_group_size: Rows per row group, uses the DuckDB default if None.
+            compression: Parquet compression codec.
+            overwrite: Replace existing output at `path`.
+
+        Returns:
+            Path: The path that was written to.
+        """
+        options = [f"COMPRESSION {compression}"]
+        if row_group_size is not None:
+            options.append(f"ROW_GROUP_SIZE {int(row_group_size)}")
+        return self._copy_to(path, "PARQUET", options, partition_by, overwrite)
+
+    def to_csv(
+        self,
+        path: str | Path,
+        partition_by: list[str] | None = None,
+        delimiter: str = ",",
+        header: bool = True,
+        overwrite: bool = False,
+    ) -> Path:
+        """Write the dataset to CSV with DuckDB, without passing through Python memory.
+
+        Args:
+            path: The CSV file, or directory when partitioning.
+            partition_by: Columns to hive-partition the output by (e.g. ["utd_skoleaar_start"]).
+            delimiter: Separator between values.
+            header: Write the column names on the first line.
+            overwrite: Replace existing output at `path`.
+
+        Returns:
+            Path: The path that was written to.
+        """
+        options = [
+            f"DELIMITER {_sql_string(delimiter)}",
+            f"HEADER {str(header).lower()}",
+        ]
+        return self._copy_to(path, "CSV", options, partition_by, overwrite)
+
+    def _copy_to(
+        self,
+        path: str | Path,
+        file_format: str,
+        options: list[str],
+        partition_by: list[str] | None,
+        overwrite: bool,
+    ) -> Path:
+        path = Path(path)
+        if path.exists() and not overwrite:
+            raise FileExistsError(f"{path} already exists, pass `overwrite=True`.")
+
+        options = [f"FORMAT {file_format}", *options]
+        if partition_by:
+            columns = ", ".join(f'"{col}"' for col in partition_by)
+            options.append(f"PARTITION_BY ({columns})")
+            if overwrite:
+                options.append("OVERWRITE true")
+        elif overwrite and path.is_dir():
+            raise IsADirectoryError(
+                f"{path} is a directory, cannot write a file to it."
+            )
+
+        query = f"""
+COPY (
+{_indent(self._get_query(check_validity=True))}
+) TO {_sql_string(str(path))} ({", ".join(options)})"""
+        with LoggerStack(f"Writing {self.name} to {path}"):
+            logger.debug(query)
+            nudb_database.get_connection().execute(query)
+        return path
+
     def sql(self, expr: str | None = None) -> Any:
         """Use sql method of database connection."""
         if expr is None:
@@ -503,6 +666,34 @@ QUERY:
             return None
 
 
+def fetch_concurrently(
+    datasets: Sequence[NudbData], max_workers: int = 4
+) -> list[pd.DataFrame]:
+    """Run the queries of several datasets at the same time, each on its own cursor.
+
+    The datasets should be initialized before, so they are not attached from
+    several threads at once.
+
+    Args:
+        datasets: The datasets to fetch, as NudbData with their selects, filters and joins.
+        max_workers: Queries to run at the same time.
+
+    Returns:
+        list[pd.DataFrame]: The result of each dataset, in the order they were given.
+    """
+    if not datasets:
+        return []
+    with (
+        LoggerStack(f"Fetching {len(datasets)} datasets with {max_workers} threads"),
+        ThreadPoolExecutor(max_workers=min(max_workers, len(datasets))) as executor,
+    ):
+        return list(executor.map(NudbData.df, datasets))
+
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
 def _is_view(alias: str) -> bool:
     views = _fetch_string_column(
         "SELECT view_name FROM duckdb_views()",
@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import os
 import tempfile
+import threading
+import uuid
+import weakref
 from collections.abc import Callable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextlib import suppress
 from pathlib import Path
 from typing import TYPE_CHECKING
 from typing import Any
+from typing import cast
 
 import duckdb as db
 
@@ -21,6 +29,8 @@ from nudb_use.datasets.eksamen import _generate_eksamen_hoeyeste_view
 from nudb_use.datasets.eksamen import _generate_eksamen_view
 from nudb_use.datasets.igang import _generate_igang_view
 from nudb_use.datasets.macros import _DUCKDB_MACROS
+from nudb_use.datasets.materialization_cache import _MaterializationCachingConnection
+from nudb_use.datasets.materialization_cache import _prepare_persistent_database
 from nudb_use.datasets.microdata_variables import (
     _generate_microdata_utd_hoeyeste_nus2000_view,
 )
@@ -45,11 +55,23 @@ from nudb_use.metadata.nudb_config.map_get_dtypes import STRING_DTYPE_NAME
 from nudb_use.nudb_logger import logger
 
 if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
     from nudb_use.datasets.nudb_data import NudbData
+    from nudb_use.datasets.profiling import QueryProfile
 
 MICRODATA_PREFIX = "_microdata_"
 STRING_DTYPE = DTYPE_MAPPINGS["pandas"][STRING_DTYPE_NAME]
 GeneratorFunc = Callable[..., None] | Callable[[str, db.DuckDBPyConnection], None]
+# Opt-in DuckDB file to keep materialized datasets in between sessions, in memory if unset
+NUDB_DATABASE_PATH: Path | None = (
+    Path(os.environ["NUDB_DATABASE_PATH"])
+    if os.environ.get("NUDB_DATABASE_PATH")
+    else None
+)
+# In-memory database for the DataFrames joined into queries, read by every cursor
+_SHARED_FRAMES_CATALOG = "_nudb_shared_frames"
 
 
 class _NudbDatabase:
@@ -57,11 +79,26 @@ class _NudbDatabase:
 
     Please do not use this class directly, get it out of the nudb_database module attribute instead.
     It is nice to have this as a non-singleton class for testing purposes.
+
+    The thread that created the database uses its connection, other threads get
+    their own cursor of it. The cursors share the attached datasets, macros and
+    shared frames, but not the DataFrames registered on them.
+
+    Args:
+        database_path: DuckDB file to store the database in, so that materialized
+            datasets are reused in later sessions. Kept in memory if None.
     """
 
-    def __init__(self) -> None:
-        self._connection: db.DuckDBPyConnection = db.connect(":memory:")
-        self._connection.execute(_DUCKDB_MACROS)
+    def __init__(self, database_path: str | Path | None = None) -> None:
+        self._database_path: Path | None = (
+            Path(database_path) if database_path is not None else None
+        )
+        self._connection: db.DuckDBPyConnection = self._connect()
+        # Attaching datasets is done by one thread at a time
+        self._lock = threading.RLock()
+        self._owner_thread = threading.get_ident()
+        self._thread_cursors = threading.local()
+        self._cursors: weakref.WeakSet[db.DuckDBPyConnection] = weakref.WeakSet()
         self._duckdb_temp_dir: tempfile.TemporaryDirectory[str] | None = None
         self._duckdb_temp_dir_path: Path | None = None
 
@@ -100,6 +137,11 @@ class _NudbDatabase:
         }
 
         self._dataset_paths: dict[str, list[Path]] = {}
+        self._dataset_dependencies: dict[str, set[str]] = {}
+        self._attaching: list[str] = []
+        self._materialization_stats: dict[str, int] = {"reused": 0, "built": 0}
+        # Profiles of the generator statements, while profile_dataset_generators runs
+        self._profiles: list[QueryProfile] | None = None
 
         for dataset_name in external_datasets.EXTERNAL_DATASETS:
             self._dataset_generators[dataset_name] = getattr(
@@ -109,20 +151,122 @@ class _NudbDatabase:
         self._dataset_names = list(self._dataset_generators.keys())
         self._datasets: dict[str, NudbData] = {}
 
+    def _connect(self) -> db.DuckDBPyConnection:
+        if self._database_path is None:
+            connection = db.connect(":memory:")
+        else:
+            logger.info(f"Using persistent NUDB database: {self._database_path}")
+            self._database_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = db.connect(str(self._database_path))
+            _prepare_persistent_database(connection)
+        connection.execute(_DUCKDB_MACROS)
+        connection.execute(f"ATTACH ':memory:' AS {_SHARED_FRAMES_CATALOG}")
+        return connection
+
     def _reset(self) -> None:
+        for cursor in list(self._cursors):
+            cursor.close()
         self._connection.close()
-        self._connection = db.connect(":memory:")
-        self._connection.execute(_DUCKDB_MACROS)
+        self._connection = self._connect()
+        self._owner_thread = threading.get_ident()
+        self._thread_cursors = threading.local()
         self._datasets = {}
         self._dataset_paths = {}
+        self._dataset_dependencies = {}
+        self._attaching = []
+
+    def _generator_connection(self, alias: str) -> db.DuckDBPyConnection:
+        """Get the connection to give the generator of a dataset."""
+        if self._database_path is None:
+            return self.get_connection()
+        return cast(
+            db.DuckDBPyConnection, _MaterializationCachingConnection(self, alias)
+        )
+
+    def _record_dependency(self, alias: str) -> None:
+        """Note that the dataset currently being generated reads from `alias`."""
+        if self._attaching and self._attaching[-1] != alias:
+            self._dataset_dependencies.setdefault(self._attaching[-1], set()).add(alias)
+
+    def _upstream_datasets(self, alias: str) -> list[str]:
+        """Get the datasets a dataset reads from, directly or through other datasets."""
+        upstream: list[str] = []
+        stack = sorted(self._dataset_dependencies.get(alias, set()))
+        while stack:
+            current = stack.pop()
+            if current in upstream or current == alias:
+                continue
+            upstream.append(current)
+            stack += sorted(self._dataset_dependencies.get(current, set()))
+        return upstream
+
+    def _input_paths(self, alias: str) -> list[Path]:
+        """Get the parquet files a dataset is built from, also through other datasets."""
+        paths: list[Path] = []
+        for current in [alias, *self._upstream_datasets(alias)]:
+            paths += self._dataset_paths.get(current, [])
+        return paths
 
     def __del__(self) -> None:
         """Destructor for _NudbDatabase."""
         self._connection.close()  # close before deleting
 
     def get_connection(self) -> db.DuckDBPyConnection:
-        """Get database connection."""
-        return self._connection
+        """Get database connection, or the cursor of this thread in other threads."""
+        if threading.get_ident() == self._owner_thread:
+            return self._connection
+        return self.cursor()
+
+    def cursor(self) -> db.DuckDBPyConnection:
+        """Get the DuckDB cursor of this thread, created the first time it is asked for.
+
+        Returns:
+            db.DuckDBPyConnection: A cursor sharing the catalog of the database connection.
+        """
+        cursor: db.DuckDBPyConnection | None = getattr(
+            self._thread_cursors, "cursor", None
+        )
+        if cursor is None:
+            cursor = self._connection.cursor()
+            self._thread_cursors.cursor = cursor
+            self._cursors.add(cursor)
+        return cursor
+
+    @contextmanager
+    def registered(
+        self, data: pd.DataFrame | pa.Table, prefix: str = "_tmp_df"
+    ) -> Iterator[str]:
+        """Register a DataFrame under a unique name, and unregister it afterwards.
+
+        Args:
+            data: The DataFrame or Arrow table to query.
+            prefix: Start of the name, the rest is random.
+
+        Yields:
+            str: The name to query the data by.
+        """
+        name = f"{prefix}_{uuid.uuid4().hex[:12]}"
+        connection = self.get_connection()
+        connection.register(name, data)
+        try:
+            yield name
+        finally:
+            connection.unregister(name)
+
+    def shared_frame(self, data: pd.DataFrame | pa.Table) -> _SharedFrame:
+        """Copy a DataFrame into a table under a unique name, which every cursor can read.
+
+        Unlike `registered`, the table is not tied to the connection of this
+        thread, so queries on it can run in other threads. It is dropped when
+        the returned object is no longer referenced.
+
+        Args:
+            data: The DataFrame or Arrow table to query.
+
+        Returns:
+            _SharedFrame: Holds the name of the table, and keeps it alive.
+        """
+        return _SharedFrame(self, data)
 
     def show_datasets(self, show_private: bool = False) -> list[str]:
         """Get datasets in _NudbDatabase."""
@@ -190,7 +334,25 @@ class _NudbDatabase:
         return config
 
 
-nudb_database = _NudbDatabase()
+nudb_database = _NudbDatabase(NUDB_DATABASE_PATH)
+
+
+class _SharedFrame:
+    """A DataFrame copied into the shared frames catalog, dropped with the last reference to it."""
+
+    def __init__(self, database: _NudbDatabase, data: pd.DataFrame | pa.Table) -> None:
+        self.name = f"{_SHARED_FRAMES_CATALOG}._tmp_df_{uuid.uuid4().hex[:12]}"
+        with database.registered(data) as registered_name:
+            database.get_connection().execute(
+                f"CREATE TABLE {self.name} AS SELECT * FROM {registered_name}"
+            )
+        weakref.finalize(self, _drop_shared_frame, database, self.name)
+
+
+def _drop_shared_frame(database: _NudbDatabase, name: str) -> None:
+    # The connection may be closed or reset, taking the table with it
+    with suppress(db.Error):
+        database.get_connection().execute(f"DROP TABLE IF EXISTS {name}")
 
 
 def reset_nudb_database() -> None:
@@ -198,6 +360,23 @@ def reset_nudb_database() -> None:
     nudb_database._reset()
 
 
+def set_nudb_database_path(database_path: str | Path | None) -> None:
+    """Store the internal database in a DuckDB file, or in memory, and reset it.
+
+    In a file, tables such as bu_igang and eksamen_hoeyeste are kept between
+    sessions, and only rebuilt when their input files or SQL change. Only one
+    Python session at a time can use the same file. The default can be set
+    with the `NUDB_DATABASE_PATH` environment variable.
+
+    Args:
+        database_path: Path to the DuckDB file, or None to keep the database in memory.
+    """
+    nudb_database._database_path = (
+        Path(database_path) if database_path is not None else None
+    )
+    nudb_database._reset()
+
+
 def show_nudb_datasets(show_private: bool = False) -> list[str]:
     """Get datasets in _nudb_database.
 
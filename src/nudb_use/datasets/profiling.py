@@ -0,0 +1,354 @@
+"""Profile NudbData queries and dataset generators with the DuckDB profiler.
+
+Each profiled query gives a `QueryProfile` with the physical plan, the time
+and cardinality of each operator, and the peak memory and spill to disk. The
+summary is logged, with the profile attached to the `nudb_logger` JSON output,
+and can be written to a JSON or HTML file.
+"""
+
+from __future__ import annotations
+
+import html
+import json
+from collections.abc import Iterator
+from collections.abc import Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import duckdb as db
+
+from nudb_use.nudb_logger import LoggerStack
+from nudb_use.nudb_logger import logger
+
+# The metrics DuckDB collects while profiling, see `custom_profiling_settings`
+PROFILING_METRICS: tuple[str, ...] = (
+    "LATENCY",
+    "CPU_TIME",
+    "ROWS_RETURNED",
+    "QUERY_NAME",
+    "OPERATOR_NAME",
+    "OPERATOR_TYPE",
+    "OPERATOR_TIMING",
+    "OPERATOR_CARDINALITY",
+    "OPERATOR_ROWS_SCANNED",
+    "EXTRA_INFO",
+    "SYSTEM_PEAK_BUFFER_MEMORY",
+    "SYSTEM_PEAK_TEMP_DIR_SIZE",
+    "TOTAL_BYTES_READ",
+    "TOTAL_BYTES_WRITTEN",
+)
+
+
+class QueryProfile:
+    """The DuckDB profile of one query.
+
+    Args:
+        name: The dataset the query belongs to.
+        query: The SQL that was profiled.
+        profile: The profile from DuckDB, as a tree of operators in "children".
+        seconds: Wall time of the query, measured in Python.
+    """
+
+    def __init__(
+        self, name: str, query: str, profile: dict[str, Any], seconds: float
+    ) -> None:
+        self.name = name
+        self.query = query
+        self.profile = profile
+        self.seconds = seconds
+
+    def operators(self) -> list[dict[str, Any]]:
+        """Flatten the physical plan, in the order it is printed.
+
+        Returns:
+            list[dict[str, Any]]: One dict per operator, with its depth in the plan.
+        """
+        operators: list[dict[str, Any]] = []
+        stack = [(child, 0) for child in reversed(self.profile.get("children", []))]
+        while stack:
+            node, depth = stack.pop()
+            operators.append(
+                {
+                    "depth": depth,
+                    "operator": node.get("operator_name", ""),
+                    "type": node.get("operator_type", ""),
+                    "seconds": node.get("operator_timing", 0.0),
+                    "cardinality": node.get("operator_cardinality", 0),
+                    "rows_scanned": node.get("operator_rows_scanned", 0),
+                    "extra_info": node.get("extra_info", {}),
+                }
+            )
+            stack += [(child, depth + 1) for child in reversed(node["children"])]
+        return operators
+
+    def summary(self) -> dict[str, Any]:
+        """Summarize the profile, as attached to the log.
+
+        Returns:
+            dict[str, Any]: Query totals, including spill to disk, and the operators.
+        """
+        return {
+            "name": self.name,
+            "seconds": self.seconds,
+            "latency": self.profile.get("latency"),
+            "cpu_time": self.profile.get("cpu_time"),
+            "rows_returned": self.profile.get("rows_returned"),
+            "peak_buffer_memory": self.profile.get("system_peak_buffer_memory"),
+            "peak_temp_dir_size": self.profile.get("system_peak_temp_dir_size"),
+            "bytes_read": self.profile.get("total_bytes_read"),
+            "bytes_written": self.profile.get("total_bytes_written"),
+            "operators": self.operators(),
+        }
+
+    def plan(self) -> str:
+        """Get the physical plan as text, with the time and rows of each operator.
+
+        Returns:
+            str: One line per operator, indented by its depth in the plan.
+        """
+        return "\n".join(
+            f"{'  ' * op['depth']}{op['operator']:<{40 - 2 * op['depth']}}"
+            f" {op['seconds']:9.4f}s {op['cardinality']:>14,} rows"
+            for op in self.operators()
+        )
+
+    def log(self) -> None:
+        """Log the plan, with the summary attached to the JSON log output."""
+        spill = self.profile.get("system_peak_temp_dir_size") or 0
+        logger.info(
+            f"Profiled {self.name} in {self.seconds:.3f}s"
+            f" ({self.profile.get('rows_returned')} rows, {spill} bytes spilled to disk):"
+            f"\n{self.plan()}",
+            extra={"nudb_data": self.summary()},
+        )
+
+    def write(self, path: str | Path) -> Path:
+        """Write the profile to a JSON or HTML file, chosen by the file suffix.
+
+        Args:
+            path: The file to write, ending in ".json" or ".html".
+
+        Returns:
+            Path: The file that was written.
+        """
+        return write_profiles([self], path)
+
+
+@contextmanager
+def duckdb_profiling(connection: db.DuckDBPyConnection) -> Iterator[None]:
+    """Collect DuckDB profiles on the connection, without printing them.
+
+    Args:
+        connection: The connection or cursor to profile.
+
+    Yields:
+        None: While the queries are profiled.
+    """
+    metrics = json.dumps({metric: "true" for metric in PROFILING_METRICS})
+    connection.execute("SET enable_profiling = 'no_output'")
+    connection.execute(f"SET custom_profiling_settings = '{metrics}'")
+    try:
+        yield
+    finally:
+        connection.execute("RESET custom_profiling_settings")
+        connection.execute("RESET enable_profiling")
+
+
+def _last_profile(connection: db.DuckDBPyConnection) -> dict[str, Any]:
+    profile: dict[str, Any] = json.loads(
+        connection.get_profiling_information(format="json")
+    )
+    return profile
+
+
+def profile_query(
+    connection: db.DuckDBPyConnection, query: str, name: str
+) -> QueryProfile:
+    """Run a query to the end with profiling on, and discard its result.
+
+    Args:
+        connection: The connection to run the query on.
+        query: The SELECT to profile.
+        name: The dataset the query belongs to.
+
+    Returns:
+        QueryProfile: The profile of the query.
+    """
+    with duckdb_profiling(connection):
+        start = perf_counter()
+        connection.sql(query).to_arrow_table()
+        seconds = perf_counter() - start
+        profile = _last_profile(connection)
+    return QueryProfile(name, query, profile, seconds)
+
+
+class _ProfilingConnection:
+    """Connection handed to a dataset generator while profiling the generators.
+
+    Everything is passed on to the connection, and the profile of each statement
+    that is run right away is kept. Relations from `sql` are only run later, and
+    are not profiled.
+    """
+
+    def __init__(
+        self,
+        connection: db.DuckDBPyConnection,
+        name: str,
+        profiles: list[QueryProfile],
+    ) -> None:
+        self._connection = connection
+        self._name = name
+        self._profiles = profiles
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+    def _profiled(self, method: str, query: str, *args: Any, **kwargs: Any) -> Any:
+        start = perf_counter()
+        result = getattr(self._connection, method)(query, *args, **kwargs)
+        if method == "execute" or result is None:
+            self._profiles.append(
+                QueryProfile(
+                    self._name,
+                    query,
+                    _last_profile(self._connection),
+                    perf_counter() - start,
+                )
+            )
+        return result
+
+    def execute(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        """Run a statement, and keep its profile."""
+        return self._profiled("execute", query, *args, **kwargs)
+
+    def sql(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        """Run a statement, and keep its profile if it was run right away."""
+        return self._profiled("sql", query, *args, **kwargs)
+
+
+def profile_dataset_generators(
+    *names: str, path: str | Path | None = None
+) -> list[QueryProfile]:
+    """Attach datasets with profiling on, to time the statements of each generator.
+
+    The datasets they read from are generated and profiled as well. Datasets
+    that are already attached are not generated again, so reset the database
+    with `reset_nudb_database` first to profile all of them.
+
+    Args:
+        *names: The datasets to attach, as given to NudbData.
+        path: Also write the profiles to this JSON or HTML file.
+
+    Returns:
+        list[QueryProfile]: One profile per statement, in the order they were run.
+    """
+    from nudb_use.datasets.nudb_data import NudbData
+    from nudb_use.datasets.nudb_database import nudb_database
+
+    profiles: list[QueryProfile] = []
+    with (
+        nudb_database._lock,
+        LoggerStack(f"Profiling the generators of {', '.join(names)}"),
+        duckdb_profiling(nudb_database.get_connection()),
+    ):
+        nudb_database._profiles = profiles
+        try:
+            for name in names:
+                NudbData(name)
+        finally:
+            nudb_database._profiles = None
+        for profile in profiles:
+            profile.log()
+
+    if path is not None:
+        write_profiles(profiles, path)
+    return profiles
+
+
+def write_profiles(profiles: Sequence[QueryProfile], path: str | Path) -> Path:
+    """Write profiles to a JSON or HTML file, chosen by the file suffix.
+
+    Args:
+        profiles: The profiles to write.
+        path: The file to write, ending in ".json" or ".html".
+
+    Returns:
+        Path: The file that was written.
+
+    Raises:
+        ValueError: If the file is not a JSON or HTML file.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".json":
+        content = json.dumps(
+            [
+                {
+                    "name": p.name,
+                    "query": p.query,
+                    "seconds": p.seconds,
+                    "profile": p.profile,
+                }
+                for p in profiles
+            ],
+            indent=2,
+            default=str,
+        )
+    elif suffix in (".html", ".htm"):
+        content = _profiles_html(profiles)
+    else:
+        raise ValueError(f"Can only write profiles to .json or .html, not {path}")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+    logger.info(f"Wrote {len(profiles)} query profiles to {path}")
+    return path
+
+
+def _profiles_html(profiles: Sequence[QueryProfile]) -> str:
+    sections = []
+    for profile in profiles:
+        summary = profile.summary()
+        totals = "".join(
+            f"<tr><th>{html.escape(key)}</th><td>{html.escape(str(value))}</td></tr>"
+            for key, value in summary.items()
+            if key != "operators"
+        )
+        rows = "".join(
+            "<tr>"
+            f"<td style='padding-left:{1.5 * op['depth']}em'>{html.escape(op['operator'])}</td>"
+            f"<td>{op['seconds']:.4f}</td><td>{op['cardinality']:,}</td>"
+            f"<td>{op['rows_scanned']:,}</td>"
+            f"<td>{html.escape(json.dumps(op['extra_info'], default=str))}</td>"
+            "</tr>"
+            for op in summary["operators"]
+        )
+        sections.append(f"""
+<section>
+<h2>{html.escape(profile.name)} ({profile.seconds:.3f}s)</h2>
+<table>{totals}</table>
+<table>
+<tr><th>Operator</th><th>Seconds</th><th>Rows</th><th>Rows scanned</th><th>Info</th></tr>
+{rows}
+</table>
+<details><summary>SQL</summary><pre>{html.escape(profile.query)}</pre></details>
+</section>""")
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>NUDB query profiles</title>
+<style>
+body {{ font-family: sans-serif; }}
+table {{ border-collapse: collapse; margin-bottom: 1em; }}
+th, td {{ border: 1px solid #ccc; padding: 0.2em 0.5em; text-align: left; vertical-align: top; }}
+</style>
+</head>
+<body>
+<h1>NUDB query profiles</h1>
+{"".join(sections)}
+</body>
+</html>
+"""
@@ -1,4 +1,23 @@
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+
 import duckdb as db
+import numpy as np
+import pandas as pd
+
+from nudb_use.nudb_logger import LoggerStack
+from nudb_use.nudb_logger import logger
+
+# Sorted snrkat lookups are stored here, bump the version when their layout change
+SNRKAT_CACHE_DIR: Path = Path(
+    os.environ.get(
+        "NUDB_SNRKAT_CACHE_DIR", Path.home() / ".cache" / "nudb_use" / "snrkat"
+    )
+)
+SNRKAT_CACHE_FORMAT_VERSION: int = 1
 
 
 def _generate_snrkat_fnr2snr_view(
@@ -17,3 +36,182 @@ def _generate_snrkat_fnr2snr_view(
     """
 
     connection.sql(query)
+
+
+class SnrkatLookup:
+    """A lookup from one snrkat column to another, as sorted fixed-width byte arrays.
+
+    The keys are sorted, so identifiers are resolved with a binary search. When
+    the arrays are memory-mapped from the cache, a lookup only reads the pages
+    the search touches, instead of loading the whole catalogue.
+
+    Args:
+        keys: Sorted identifiers, as a numpy bytes array.
+        values: The value of each key, as a numpy bytes array.
+
+    Raises:
+        ValueError: If the keys and values are not the same length.
+    """
+
+    def __init__(self, keys: np.ndarray, values: np.ndarray) -> None:
+        if len(keys) != len(values):
+            raise ValueError("The snrkat lookup needs one value per key.")
+        self.keys = keys
+        self.values = values
+
+    @classmethod
+    def from_pairs(cls, keys: pd.Series, values: pd.Series) -> "SnrkatLookup":
+        """Build a lookup from key and value columns, skipping pairs with missing values.
+
+        Args:
+            keys: The identifiers to look up from.
+            values: The identifier each key maps to.
+
+        Returns:
+            SnrkatLookup: The lookup, with its keys sorted.
+        """
+        pairs = (
+            pd.DataFrame({"key": keys.to_numpy(), "value": values.to_numpy()})
+            .dropna(how="any")
+            .drop_duplicates()
+        )
+        return cls._sorted(
+            _encode(pairs["key"].to_numpy()), _encode(pairs["value"].to_numpy())
+        )
+
+    @classmethod
+    def _sorted(cls, keys: np.ndarray, values: np.ndarray) -> "SnrkatLookup":
+        order = np.argsort(keys, kind="stable")
+        return cls(keys[order], values[order])
+
+    def resolve(self, idents: pd.Series) -> pd.Series:
+        """Look up the value of each identifier, missing where the key is not in snrkat.
+
+        Args:
+            idents: The identifiers to resolve.
+
+        Returns:
+            pd.Series: The value for each identifier, with the index of `idents`.
+
+        Raises:
+            ValueError: If an identifier has several different values in snrkat.
+        """
+        idents_str = idents.astype("string[pyarrow]")
+        uniques = pd.unique(idents_str.dropna())
+        query = _encode(np.asarray(uniques, dtype=object))
+        found_values = pd.Series(
+            pd.NA, index=pd.Index(uniques), dtype="string[pyarrow]"
+        )
+        # Longer identifiers would be truncated to the key width and falsely match
+        fits = np.char.str_len(query) <= self.keys.dtype.itemsize
+        fitted = query[fits].astype(self.keys.dtype)
+
+        first = np.searchsorted(self.keys, fitted, side="left")
+        last = np.searchsorted(self.keys, fitted, side="right")
+        if (last - first > 1).any():
+            ambiguous = [x.decode("utf-8") for x in fitted[last - first > 1][:5]]
+            raise ValueError(
+                f"Found several values in snrkat for the identifiers, should not happen: {ambiguous}"
+            )
+
+        found = last > first
+        matched = np.flatnonzero(fits)[found]
+        found_values.iloc[matched] = np.char.decode(self.values[first[found]], "utf-8")
+        return idents_str.map(found_values).astype("string[pyarrow]")
+
+
+def _encode(strings: np.ndarray) -> np.ndarray:
+    """Encode an array of strings as UTF-8, in a fixed-width numpy bytes array."""
+    if not len(strings):
+        return np.array([], dtype="S1")
+    return np.char.encode(strings.astype(str), "utf-8")
+
+
+def _snrkat_cache_key(paths: list[Path], key_col: str, value_col: str) -> str:
+    """Fingerprint the snrkat files by path, modification time and size."""
+    fingerprint = [SNRKAT_CACHE_FORMAT_VERSION, key_col, value_col] + [
+        (str(path), path.stat().st_mtime_ns, path.stat().st_size)
+        for path in sorted(set(paths))
+    ]
+    return hashlib.sha256(json.dumps(fingerprint).encode("utf-8")).hexdigest()[:16]
+
+
+def _save_array(path: Path, array: np.ndarray) -> None:
+    # Unique, so sessions building the same lookup do not write into the same file
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(tmp_path, "wb") as file:
+            np.save(file, array)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _build_snrkat_lookup(
+    snrkat_alias: str, key_col: str, value_col: str
+) -> SnrkatLookup:
+    """Read the distinct key-value pairs from snrkat into a sorted lookup."""
+    from nudb_use.datasets.nudb_database import nudb_database
+
+    # Encoded in DuckDB, so the bytes go straight into numpy
+    pairs = nudb_database.get_connection().sql(f"""
+            SELECT DISTINCT
+                encode(CAST({key_col} AS VARCHAR)) AS key,
+                encode(CAST({value_col} AS VARCHAR)) AS value
+            FROM {snrkat_alias}
+            WHERE {key_col} IS NOT NULL AND {value_col} IS NOT NULL
+        """).to_arrow_table()
+    if not pairs.num_rows:
+        return SnrkatLookup(_encode(np.array([])), _encode(np.array([])))
+    return SnrkatLookup._sorted(
+        pairs["key"].to_numpy(zero_copy_only=False).astype(np.bytes_),
+        pairs["value"].to_numpy(zero_copy_only=False).astype(np.bytes_),
+    )
+
+
+def snrkat_lookup(key_col: str, value_col: str) -> SnrkatLookup:
+    """Get a lookup from one snrkat column to another, built once per version of snrkat.
+
+    The sorted lookup is stored as numpy arrays in `SNRKAT_CACHE_DIR`, keyed by
+    the snrkat files and their modification times, and memory-mapped when reused.
+
+    Args:
+        key_col: The snrkat column to look up from, like "fnr" or "snr_utgatt".
+        value_col: The snrkat column to look up, like "snr" or "fnr_naa".
+
+    Returns:
+        SnrkatLookup: The lookup from `key_col` to `value_col`.
+    """
+    from nudb_use.datasets.nudb_data import NudbData
+    from nudb_use.datasets.nudb_database import nudb_database
+
+    snrkat = NudbData("snrkat")
+    paths = nudb_database._input_paths(snrkat.alias)
+    if not paths:
+        logger.debug("Found no snrkat files to key the lookup by, not caching it.")
+        return _build_snrkat_lookup(snrkat.alias, key_col, value_col)
+
+    key = _snrkat_cache_key(paths, key_col, value_col)
+    prefix = f"snrkat_{key_col}-{value_col}"
+    keys_path = SNRKAT_CACHE_DIR / f"{prefix}_{key}_keys.npy"
+    values_path = SNRKAT_CACHE_DIR / f"{prefix}_{key}_values.npy"
+    if not (keys_path.is_file() and values_path.is_file()):
+        with LoggerStack(f"Building the snrkat lookup {key_col} -> {value_col}"):
+            lookup = _build_snrkat_lookup(snrkat.alias, key_col, value_col)
+            SNRKAT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            _save_array(values_path, lookup.values)
+            _save_array(keys_path, lookup.keys)
+
+            # Remove lookups built from older versions of snrkat
+            for old_path in SNRKAT_CACHE_DIR.glob(f"{prefix}_{'?' * len(key)}_*"):
+                # Temporary files may belong to another session building a lookup
+                if (
+                    old_path not in (keys_path, values_path)
+                    and old_path.suffix != ".tmp"
+                ):
+                    old_path.unlink(missing_ok=True)
+            logger.info(f"Stored the snrkat lookup in {SNRKAT_CACHE_DIR} ({key}).")
+
+    return SnrkatLookup(
+        np.load(keys_path, mmap_mode="r"), np.load(values_path, mmap_mode="r")
+    )
@@ -1,6 +1,72 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
 import duckdb as db
 
+from nudb_use.datasets.macros import _DUCKDB_MACROS
+from nudb_use.nudb_logger import LoggerStack
 from nudb_use.nudb_logger import logger
+from nudb_use.utils.file_lock import directory_lock
+
+# The incremental build of utd_hoeyeste is stored here, in versions partitioned by year
+UTD_HOEYESTE_STATE_DIR: Path = Path(
+    os.environ.get(
+        "NUDB_UTD_HOEYESTE_STATE_DIR",
+        Path.home() / ".cache" / "nudb_use" / "utd_hoeyeste",
+    )
+)
+UTD_HOEYESTE_INCREMENTAL: bool = (
+    os.environ.get("NUDB_UTD_HOEYESTE_INCREMENTAL", "0") == "1"
+)
+UTD_HOEYESTE_STATE_FORMAT_VERSION: int = 2
+# Seconds to wait for another session building the stored state
+UTD_HOEYESTE_LOCK_TIMEOUT: float = float(
+    os.environ.get("NUDB_UTD_HOEYESTE_LOCK_TIMEOUT", 60 * 60)
+)
+# Seconds after which a lock is taken over, even if its holder may still be running
+UTD_HOEYESTE_LOCK_STALE_AFTER: float = float(
+    os.environ.get("NUDB_UTD_HOEYESTE_LOCK_STALE_AFTER", 3 * 60 * 60)
+)
+# Replaced versions are kept this long, for the views of sessions still reading them
+UTD_HOEYESTE_OLD_VERSIONS_MAX_AGE_DAYS: float = float(
+    os.environ.get("NUDB_UTD_HOEYESTE_OLD_VERSIONS_MAX_AGE_DAYS", 7)
+)
+
+_STATE_FILE = "state.json"
+_VERSIONS_DIR = "versions"
+# Rows without a year come last in the cumulative max, like NULLS LAST in the window
+_NULL_YEAR = "null"
+_SOURCE_YEAR = "UTD_HOEYESTE_AAR(COALESCE(utd_aktivitet_slutt, uh_eksamen_dato))"
+_SOURCE_COLUMNS = [
+    "snr",
+    "nus2000",
+    "uh_eksamen_dato",
+    "uh_eksamen_studpoeng",
+    "uh_gruppering_nus",
+    "utd_aktivitet_slutt",
+    "utd_klassetrinn",
+    "utd_skoleaar_start",
+    "utd_rectype",
+    "utd_studieland",
+    "utd_datakilde",
+]
+_UTD_HOEYESTE_COLUMNS = [
+    "snr",
+    "utd_datakilde",
+    "utd_klassetrinn",
+    "utd_studieland",
+    "utd_foerste_aar",
+    "utd_hoeyeste_dato",
+    "utd_hoeyeste_aar",
+    "utd_hoeyeste_rangering",
+    "utd_hoeyeste_nus2000_ujustert",
+    "utd_hoeyeste_nus2000",
+]
 
 
 def _generate_utd_hoeyeste_last_view(
@@ -29,14 +95,92 @@ def _generate_utd_hoeyeste_last_view(
     connection.execute(query)
 
 
+def _utd_hoeyeste_rows_sql(source: str, where: str = "") -> str:
+    """SQL for the distinct records of each person, with their ranking and year."""
+    return f"""
+            SELECT DISTINCT
+                snr,
+                PREP_NUS2000(nus2000) AS nus2000,
+                COALESCE(utd_aktivitet_slutt, uh_eksamen_dato) AS utd_hoeyeste_dato,
+                UTD_HOEYESTE_RANGERING(
+                    nus2000,
+                    uh_eksamen_dato,
+                    uh_eksamen_studpoeng,
+                    uh_gruppering_nus,
+                    utd_aktivitet_slutt,
+                    utd_klassetrinn,
+                    utd_skoleaar_start,
+                    utd_rectype,
+                    utd_studieland,
+                    utd_datakilde
+                ) AS utd_hoeyeste_rangering,
+                PREP_UTD_DATAKILDE(utd_datakilde) AS utd_datakilde,
+                PREP_UTD_KLASSETRINN(utd_klassetrinn) AS utd_klassetrinn,
+                utd_studieland,
+                UTD_HOEYESTE_AAR(utd_hoeyeste_dato) AS utd_hoeyeste_aar
+            FROM
+                {source}
+            {where}
+    """
+
+
+def _utd_hoeyeste_select_sql(utd_foerste_aar: str) -> str:
+    """SQL for the columns of utd_hoeyeste, selected from the ranked records."""
+    return f"""
+        SELECT
+            /*=== PERSON ====================================================================================*/
+            snr,
+
+            /*=== RECORD INFO================================================================================*/
+            utd_datakilde,
+            utd_klassetrinn,
+            utd_studieland,
+
+            /* First year we a have registered value. Relevant for utd_foreldres_utdnivaa_16aar */
+            {utd_foerste_aar} AS utd_foerste_aar,
+
+            utd_hoeyeste_dato,
+            utd_hoeyeste_aar,
+            utd_hoeyeste_rangering,
+
+            /*=== NUS2000 ===================================================================================*/
+            nus2000                                                         AS utd_hoeyeste_nus2000_ujustert,
+            DOWNGRADE_UTD_HOEYESTE_NUS2000(nus2000, utd_hoeyeste_rangering) AS utd_hoeyeste_nus2000 /* 3 -> 2 */
+    """
+
+
 def _generate_utd_hoeyeste_view(
     alias: str,
     connection: db.DuckDBPyConnection,
+    incremental: bool | None = None,
 ) -> None:
+    """Create utd_hoeyeste, the records that were the highest education of a person when they were registered.
+
+    Args:
+        alias: Name of the view to create.
+        connection: Connection to create the view with.
+        incremental: Build from the stored state in `UTD_HOEYESTE_STATE_DIR`,
+            only recomputing new or changed years. `UTD_HOEYESTE_INCREMENTAL` if None.
+
+    Raises:
+        ValueError: If `eksamen_avslutta_hoeyeste` has no data.
+    """
     from nudb_use.datasets import NudbData  # Avoids circular import
 
     eksamen_avslutta_hoeyeste = NudbData("eksamen_avslutta_hoeyeste")
 
+    if UTD_HOEYESTE_INCREMENTAL if incremental is None else incremental:
+        state_files = _update_utd_hoeyeste_state(
+            connection, eksamen_avslutta_hoeyeste.alias
+        )
+        columns = ", ".join(_UTD_HOEYESTE_COLUMNS)
+        connection.execute(f"""
+            CREATE VIEW {alias} AS
+            SELECT {columns}
+            FROM read_parquet([{_sql_paths(state_files)}], hive_partitioning = false)
+        """)
+        return
+
     # Find the latest year present in the source after computing the derived date
     last_year_data = connection.sql(f"""
         SELECT
@@ -58,28 +202,7 @@ def _generate_utd_hoeyeste_view(
         CREATE VIEW {alias} AS
 
         WITH T0 AS (
-            SELECT DISTINCT
-                snr,
-                PREP_NUS2000(nus2000) AS nus2000,
-                COALESCE(utd_aktivitet_slutt, uh_eksamen_dato) AS utd_hoeyeste_dato,
-                UTD_HOEYESTE_RANGERING(
-                    nus2000,
-                    uh_eksamen_dato,
-                    uh_eksamen_studpoeng,
-                    uh_gruppering_nus,
-                    utd_aktivitet_slutt,
-                    utd_klassetrinn,
-                    utd_skoleaar_start,
-                    utd_rectype,
-                    utd_studieland,
-                    utd_datakilde
-                ) AS utd_hoeyeste_rangering,
-                PREP_UTD_DATAKILDE(utd_datakilde) AS utd_datakilde,
-                PREP_UTD_KLASSETRINN(utd_klassetrinn) AS utd_klassetrinn,
-                utd_studieland,
-                UTD_HOEYESTE_AAR(utd_hoeyeste_dato) AS utd_hoeyeste_aar
-            FROM
-                {eksamen_avslutta_hoeyeste.alias}
+            {_utd_hoeyeste_rows_sql(eksamen_avslutta_hoeyeste.alias)}
         ),
 
         T1 AS (
@@ -93,25 +216,7 @@ def _generate_utd_hoeyeste_view(
             FROM T0
         )
 
-        SELECT
-            /*=== PERSON ====================================================================================*/
-            snr,
-
-            /*=== RECORD INFO================================================================================*/
-            utd_datakilde,
-            utd_klassetrinn,
-            utd_studieland,
-
-            /* First year we a have registered value. Relevant for utd_foreldres_utdnivaa_16aar */
-            MIN(utd_hoeyeste_aar) OVER (PARTITION BY snr) AS utd_foerste_aar,
-
-            utd_hoeyeste_dato,
-            utd_hoeyeste_aar,
-            utd_hoeyeste_rangering,
-
-            /*=== NUS2000 ===================================================================================*/
-            nus2000                                                         AS utd_hoeyeste_nus2000_ujustert,
-            DOWNGRADE_UTD_HOEYESTE_NUS2000(nus2000, utd_hoeyeste_rangering) AS utd_hoeyeste_nus2000 /* 3 -> 2 */
+        {_utd_hoeyeste_select_sql("MIN(utd_hoeyeste_aar) OVER (PARTITION BY snr)")}
         FROM
             T1
         WHERE
@@ -119,3 +224,298 @@ def _generate_utd_hoeyeste_view(
     """
 
     connection.execute(query)
+
+
+def _utd_hoeyeste_logic_version() -> str:
+    """Fingerprint the SQL the stored state was built with, a change means a full rebuild."""
+    logic = [
+        str(UTD_HOEYESTE_STATE_FORMAT_VERSION),
+        db.__version__,  # The row hashes can change between versions
+        _DUCKDB_MACROS,
+        _utd_hoeyeste_rows_sql("source"),
+        _utd_hoeyeste_select_sql("utd_foerste_aar"),
+    ]
+    return hashlib.sha256("\n".join(logic).encode("utf-8")).hexdigest()
+
+
+def _year_fingerprints(
+    connection: db.DuckDBPyConnection, source: str
+) -> dict[str, str]:
+    """Count and hash the source rows of each utd_hoeyeste_aar in one scan."""
+    rows = connection.sql(f"""
+        SELECT
+            COALESCE(CAST({_SOURCE_YEAR} AS VARCHAR), '{_NULL_YEAR}') AS aar,
+            COUNT(*) AS n_rows,
+            SUM(hash({", ".join(_SOURCE_COLUMNS)})::HUGEINT) AS row_hash
+        FROM {source}
+        GROUP BY ALL
+    """).fetchall()
+    return {str(aar): f"{n_rows}:{row_hash}" for aar, n_rows, row_hash in rows}
+
+
+def _year_order(aar: str) -> float:
+    return float("inf") if aar == _NULL_YEAR else float(aar)
+
+
+def _sql_paths(paths: list[Path]) -> str:
+    return ", ".join("'" + str(path).replace("'", "''") + "'" for path in paths)
+
+
+def _read_state() -> dict[str, object] | None:
+    """Read the stored state, or None if there is none or its files are gone."""
+    state_path = UTD_HOEYESTE_STATE_DIR / _STATE_FILE
+    if not state_path.is_file():
+        return None
+    state: dict[str, object] = json.loads(state_path.read_text(encoding="utf-8"))
+    dirs = state.get("dirs")
+    if not isinstance(dirs, dict) or not all(
+        (UTD_HOEYESTE_STATE_DIR / path).is_dir() for path in dirs.values()
+    ):
+        return None
+    return state
+
+
+def _state_dirs(state: dict[str, object] | None) -> dict[str, str]:
+    """The directory of each stored year, relative to `UTD_HOEYESTE_STATE_DIR`."""
+    dirs = state.get("dirs") if state is not None else None
+    return (
+        {str(aar): str(path) for aar, path in dirs.items()}
+        if isinstance(dirs, dict)
+        else {}
+    )
+
+
+def _state_files(state: dict[str, object] | None) -> list[Path]:
+    return [
+        file
+        for aar, path in sorted(
+            _state_dirs(state).items(), key=lambda item: _year_order(item[0])
+        )
+        for file in sorted((UTD_HOEYESTE_STATE_DIR / path).glob("*.parquet"))
+    ]
+
+
+def _write_state(
+    logic_version: str, years: dict[str, str], dirs: dict[str, str]
+) -> None:
+    """Point the state to new year directories, replacing state.json atomically."""
+    state_path = UTD_HOEYESTE_STATE_DIR / _STATE_FILE
+    tmp_path = state_path.with_name(f"{_STATE_FILE}.{os.getpid()}.tmp")
+    tmp_path.write_text(
+        json.dumps({"logic": logic_version, "years": years, "dirs": dirs}, indent=2),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, state_path)
+
+
+def _version_of(path: str) -> str:
+    return Path(path).parts[1]
+
+
+def _remove_old_versions(referenced: set[str]) -> None:
+    """Remove the versions no longer in the state, once no session should read them.
+
+    Versions are marked when they are replaced, by their modification time.
+    Builds that crashed before they were stored, and the directories of the
+    previous state format, are removed after the same time.
+    """
+    cutoff = time.time() - UTD_HOEYESTE_OLD_VERSIONS_MAX_AGE_DAYS * 24 * 60 * 60
+    old = [
+        *(UTD_HOEYESTE_STATE_DIR / _VERSIONS_DIR).glob("*"),
+        *UTD_HOEYESTE_STATE_DIR.glob("aar=*"),
+        *UTD_HOEYESTE_STATE_DIR.glob("staging"),
+    ]
+    for path in old:
+        if path.name not in referenced and path.stat().st_mtime < cutoff:
+            logger.info(f"Removing the old `utd_hoeyeste` files in {path}.")
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _first_changed_year(
+    stored: dict[str, object] | None, logic_version: str, years: dict[str, str]
+) -> str | None:
+    """Find the first year to recompute from, or None if nothing changed."""
+    if stored is None or stored.get("logic") != logic_version:
+        return min(years, key=_year_order) if years else None
+    stored_years = stored.get("years")
+    if not isinstance(stored_years, dict):
+        return min(years, key=_year_order) if years else None
+    changed = [
+        aar
+        for aar in set(years) | set(stored_years)
+        if years.get(aar) != stored_years.get(aar)
+    ]
+    return min(changed, key=_year_order) if changed else None
+
+
+def _year_filter(first_year: str) -> str:
+    if first_year == _NULL_YEAR:
+        return f"{_SOURCE_YEAR} IS NULL"
+    return f"({_SOURCE_YEAR} >= {int(first_year)} OR {_SOURCE_YEAR} IS NULL)"
+
+
+def _update_utd_hoeyeste_state(
+    connection: db.DuckDBPyConnection, source: str
+) -> list[Path]:
+    """Fold new or changed years of the source into the stored utd_hoeyeste.
+
+    The stored rows of the years before the first changed year are kept. They
+    hold the running state of each person: the best ranking so far is the
+    highest stored ranking, and the first year is the earliest stored year,
+    since the best record of a person's first year is always kept. Only the
+    records from the first changed year on are ranked, and compared with it.
+
+    The recomputed years are written to a new version directory, and the state
+    is switched to it by replacing state.json, so a crash leaves the previous
+    state intact. Sessions building at the same time wait for each other, and
+    replaced versions are kept for `UTD_HOEYESTE_OLD_VERSIONS_MAX_AGE_DAYS`,
+    since the views of other sessions may still read them.
+
+    Args:
+        connection: Connection with the source view.
+        source: Alias of the `eksamen_avslutta_hoeyeste` view.
+
+    Returns:
+        list[Path]: The parquet files of the stored utd_hoeyeste.
+
+    Raises:
+        ValueError: If the source has no data.
+    """
+    years = _year_fingerprints(connection, source)
+    if not years or set(years) == {_NULL_YEAR}:
+        raise ValueError("No data found in `eksamen_avslutta_hoeyeste`.")
+
+    logic_version = _utd_hoeyeste_logic_version()
+    stored = _read_state()
+    if _first_changed_year(stored, logic_version, years) is None:
+        logger.info(f"Reusing the stored `utd_hoeyeste` in {UTD_HOEYESTE_STATE_DIR}.")
+        return _state_files(stored)
+
+    with directory_lock(
+        UTD_HOEYESTE_STATE_DIR,
+        timeout=UTD_HOEYESTE_LOCK_TIMEOUT,
+        stale_after=UTD_HOEYESTE_LOCK_STALE_AFTER,
+    ):
+        # Another session may have stored the same source while we waited
+        stored = _read_state()
+        first_year = _first_changed_year(stored, logic_version, years)
+        if first_year is None:
+            logger.info(
+                f"Reusing the stored `utd_hoeyeste` in {UTD_HOEYESTE_STATE_DIR}."
+            )
+            return _state_files(stored)
+        _build_utd_hoeyeste_version(
+            connection, source, stored, logic_version, years, first_year
+        )
+        return _state_files(_read_state())
+
+
+def _build_utd_hoeyeste_version(
+    connection: db.DuckDBPyConnection,
+    source: str,
+    stored: dict[str, object] | None,
+    logic_version: str,
+    years: dict[str, str],
+    first_year: str,
+) -> None:
+    """Recompute the years from `first_year` into a new version, and store it."""
+    rebuild_all = stored is None or stored.get("logic") != logic_version
+    stored_dirs = _state_dirs(stored)
+    kept_dirs = {
+        aar: path
+        for aar, path in stored_dirs.items()
+        if not rebuild_all and _year_order(aar) < _year_order(first_year)
+    }
+
+    with LoggerStack(
+        f"Recomputing `utd_hoeyeste` from the year {first_year}, keeping {len(kept_dirs)} stored years."
+    ):
+        kept_files = _sql_paths(
+            [
+                file
+                for path in kept_dirs.values()
+                for file in (UTD_HOEYESTE_STATE_DIR / path).glob("*.parquet")
+            ]
+        )
+        prior_state = (
+            f"""
+            SELECT
+                snr,
+                MAX(utd_hoeyeste_rangering) AS prior_rangering,
+                MIN(utd_hoeyeste_aar) AS prior_foerste_aar
+            FROM read_parquet([{kept_files}])
+            GROUP BY snr
+            """
+            if kept_files
+            else """
+            SELECT
+                snr,
+                utd_hoeyeste_rangering AS prior_rangering,
+                utd_hoeyeste_aar AS prior_foerste_aar
+            FROM T0
+            WHERE FALSE
+            """
+        )
+        # Unique to this build, so a crashed or concurrent build never writes to it
+        version = (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        )
+        version_dir = UTD_HOEYESTE_STATE_DIR / _VERSIONS_DIR / version
+        version_dir.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            connection.execute(f"""
+                COPY (
+                    WITH T0 AS (
+                        {_utd_hoeyeste_rows_sql(source, f"WHERE {_year_filter(first_year)}")}
+                    ),
+
+                    T1 AS (
+                        SELECT
+                            T0.*,
+                            MAX(utd_hoeyeste_rangering) OVER (
+                                PARTITION BY snr
+                                ORDER BY utd_hoeyeste_aar
+                                RANGE BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                            ) AS cummax_between_max_within_rangering,
+                            MIN(utd_hoeyeste_aar) OVER (PARTITION BY snr) AS new_foerste_aar
+                        FROM T0
+                    ),
+
+                    prior_state AS ({prior_state})
+
+                    {_utd_hoeyeste_select_sql("COALESCE(prior_foerste_aar, new_foerste_aar)")},
+                        COALESCE(CAST(utd_hoeyeste_aar AS VARCHAR), '{_NULL_YEAR}') AS aar
+                    FROM
+                        T1 LEFT JOIN prior_state USING (snr)
+                    WHERE
+                        utd_hoeyeste_rangering==cummax_between_max_within_rangering AND
+                        (prior_rangering IS NULL OR utd_hoeyeste_rangering >= prior_rangering)
+                ) TO '{str(version_dir).replace("'", "''")}' (FORMAT parquet, PARTITION_BY (aar))
+            """)
+        except BaseException:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+
+        # Years no longer in the source are left out of the new state
+        dirs = dict(kept_dirs)
+        for path in version_dir.glob("aar=*"):
+            dirs[path.name.removeprefix("aar=")] = path.relative_to(
+                UTD_HOEYESTE_STATE_DIR
+            ).as_posix()
+        _write_state(logic_version, years, dirs)
+
+        # Mark the replaced versions, they are removed once they are old enough
+        referenced = {_version_of(path) for path in dirs.values()}
+        for replaced in {
+            _version_of(path) for path in stored_dirs.values()
+        } - referenced:
+            os.utime(UTD_HOEYESTE_STATE_DIR / _VERSIONS_DIR / replaced)
+        _remove_old_versions(referenced)
+
+        recomputed = sorted(
+            (aar for aar in years if _year_order(aar) >= _year_order(first_year)),
+            key=_year_order,
+        )
+        logger.info(
+            f"Stored `utd_hoeyeste` in {version_dir}, recomputed the years {recomputed}."
+        )
@@ -11,3 +11,9 @@ class NudbDerivedFromNotFoundError(Exception):
     """Domain-specific error for NUDB deriving issues when looking for columns needed."""
 
     ...
+
+
+class NudbKlassOfflineError(Exception):
+    """Domain-specific error for KLASS lookups that are not cached while running offline."""
+
+    ...
@@ -2,10 +2,17 @@
 
 import csv
 import gzip
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
 from io import StringIO
+from io import TextIOWrapper
+from pathlib import Path
 from typing import Any
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import requests
 from brreg.enhetsregisteret import Client
 from brreg.enhetsregisteret import Cursor
@@ -20,6 +27,23 @@ from nudb_use.nudb_logger import logger
 
 UTD_NACEKODER = settings.constants.brreg_utd_nacekoder
 
+ENHETER_CSV_URL = "https://data.brreg.no/enhetsregisteret/api/enheter/lastned/csv"
+BRREG_CSV_CHUNKSIZE = 100_000
+NACE_COLS = ["naeringskode1.kode", "naeringskode2.kode", "naeringskode3.kode"]
+# Columns in the bulk CSV that are not strings, everything else is kept as a string
+BRREG_CSV_ARROW_TYPES: dict[str, pa.DataType] = {
+    "antallAnsatte": pa.int64(),
+    "stiftelsesdato": pa.date32(),
+    "registreringsdatoEnhetsregisteret": pa.date32(),
+    "registrertIMvaregisteret": pa.bool_(),
+    "registrertIForetaksregisteret": pa.bool_(),
+    "registrertIStiftelsesregisteret": pa.bool_(),
+    "registrertIFrivillighetsregisteret": pa.bool_(),
+    "konkurs": pa.bool_(),
+    "underAvvikling": pa.bool_(),
+    "underTvangsavviklingEllerTvangsopplosning": pa.bool_(),
+}
+
 
 def download_csv_content_enheter() -> pd.DataFrame:
     """Download and parse organisation data from Brønnøysundregisteret and convert it to a DataFrame.
@@ -45,26 +69,153 @@ def download_csv_content_enheter() -> pd.DataFrame:
     return pd.DataFrame(reader)
 
 
-def filter_utd_csv_enheter() -> pd.DataFrame:
-    """Download organisation data from Brønnøysundregisteret using the download_csv_content_enheter function and extract UTD-nacecodes.
+def filter_utd_csv_enheter(source: str | Path | None = None) -> pd.DataFrame:
+    """Stream organisation data from Brønnøysundregisteret and keep the enheter with UTD-nacecodes.
+
+    The CSV is decompressed, parsed and filtered in chunks, so only the enheter
+    with UTD-nacecodes are kept in memory.
+
+    Args:
+        source: Url or local path to the gzipped CSV, defaults to the bulk download of enheter.
 
     Returns:
         pd.DataFrame: Dataframe contaaining UTD-nacecodes from Brønnøysundregisteret.
     """
-    df = download_csv_content_enheter()
-    logger.info("Filtering brreg-data down to UTD-nacecodes.")
-    result: pd.DataFrame = (
-        df[
-            df["naeringskode1.kode"].isin(UTD_NACEKODER)
-            | df["naeringskode2.kode"].isin(UTD_NACEKODER)
-            | df["naeringskode3.kode"].isin(UTD_NACEKODER)
-        ]
-        .convert_dtypes()
-        .copy()
-    )
+    logger.info("Filtering brreg-data down to UTD-nacecodes while streaming.")
+    chunks = list(iter_utd_csv_enheter_chunks(source))
+    if not chunks:
+        return pd.DataFrame()
+    result: pd.DataFrame = pd.concat(chunks, ignore_index=True).convert_dtypes().copy()
     return result
 
 
+@contextmanager
+def _open_gzip_csv(source: str | Path) -> Iterator[gzip.GzipFile]:
+    """Open a gzipped CSV from an url or a local path, decompressing it as it is read."""
+    if str(source).startswith(("http://", "https://")):
+        with requests.get(str(source), stream=True, timeout=60) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True  # Only undo transfer-encoding here
+            with gzip.GzipFile(fileobj=response.raw) as decompressed:
+                yield decompressed
+    else:
+        with gzip.open(source, "rb") as decompressed:
+            yield decompressed
+
+
+def iter_csv_enheter_chunks(
+    source: str | Path | None = None,
+    chunksize: int = BRREG_CSV_CHUNKSIZE,
+    usecols: list[str] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Stream a gzipped bulk CSV from Brønnøysundregisteret as DataFrames of at most `chunksize` rows.
+
+    Values are read as strings, and empty values are kept as empty strings, like the csv module does.
+
+    Args:
+        source: Url or local path to the gzipped CSV, defaults to the bulk download of enheter.
+        chunksize: Rows to parse at a time.
+        usecols: Only parse these columns.
+
+    Yields:
+        pd.DataFrame: The next chunk of rows.
+    """
+    source = ENHETER_CSV_URL if source is None else source
+    logger.info(f"Streaming CSV from brreg: {source}")
+    with _open_gzip_csv(source) as f:
+        yield from pd.read_csv(
+            TextIOWrapper(f, encoding="utf-8"),
+            chunksize=chunksize,
+            usecols=usecols,
+            dtype="string[pyarrow]",
+            keep_default_na=False,
+            na_filter=False,
+        )
+
+
+def iter_utd_csv_enheter_chunks(
+    source: str | Path | None = None,
+    chunksize: int = BRREG_CSV_CHUNKSIZE,
+) -> Iterator[pd.DataFrame]:
+    """Stream the bulk CSV of enheter, yielding only the rows with UTD-nacecodes.
+
+    Args:
+        source: Url or local path to the gzipped CSV, defaults to the bulk download of enheter.
+        chunksize: Rows to parse at a time, before filtering.
+
+    Yields:
+        pd.DataFrame: The rows with UTD-nacecodes in the next chunk, empty chunks are skipped.
+    """
+    for chunk in iter_csv_enheter_chunks(source, chunksize=chunksize):
+        nace_cols = [c for c in NACE_COLS if c in chunk.columns]
+        filtered = chunk[chunk[nace_cols].isin(UTD_NACEKODER).any(axis=1)]
+        if len(filtered):
+            yield filtered
+
+
+def _brreg_chunk_to_arrow(chunk: pd.DataFrame) -> pa.Table:
+    """Convert a chunk of string columns to Arrow, with known columns as ints, dates and bools."""
+    arrays: dict[str, pa.Array] = {}
+    for col in chunk.columns:
+        values = chunk[col].replace("", pd.NA)
+        arrow_type = BRREG_CSV_ARROW_TYPES.get(col, pa.string())
+        if arrow_type == pa.int64():
+            arrays[col] = pa.array(
+                pd.to_numeric(values, errors="coerce").astype("Int64")
+            )
+        elif arrow_type == pa.date32():
+            dates = pd.to_datetime(values, errors="coerce", format="%Y-%m-%d")
+            arrays[col] = pa.array(dates.dt.date, type=pa.date32())
+        elif arrow_type == pa.bool_():
+            bools = values.str.lower().map({"true": True, "false": False})
+            arrays[col] = pa.array(bools.astype("boolean"), type=pa.bool_())
+        else:
+            arrays[col] = pa.array(values, type=pa.string())
+    return pa.table(arrays)
+
+
+def write_utd_csv_enheter_parquet(
+    path: str | Path,
+    source: str | Path | None = None,
+    chunksize: int = BRREG_CSV_CHUNKSIZE,
+) -> Path:
+    """Stream the enheter with UTD-nacecodes from Brønnøysundregisteret into a typed parquet file.
+
+    Each filtered chunk is written as it arrives, so memory use is bounded by the chunksize.
+
+    Args:
+        path: The parquet file to write.
+        source: Url or local path to the gzipped CSV, defaults to the bulk download of enheter.
+        chunksize: Rows to parse at a time, before filtering.
+
+    Returns:
+        Path: The path to the written parquet file.
+
+    Raises:
+        ValueError: If no enheter in the source have UTD-nacecodes.
+    """
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    writer: pq.ParquetWriter | None = None
+    rows = 0
+    try:
+        for chunk in iter_utd_csv_enheter_chunks(source, chunksize=chunksize):
+            table = _brreg_chunk_to_arrow(chunk)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += len(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        raise ValueError(f"Found no enheter with UTD-nacecodes in {source}.")
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote {rows} enheter with UTD-nacecodes to {path}")
+    return path
+
+
 def orgnr_is_underenhet(orgnr: str) -> bool:
     """Check if a given organisation is a sub-unit (underenhet).
 
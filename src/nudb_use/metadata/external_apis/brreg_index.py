@@ -0,0 +1,164 @@
+"""Local index of all orgnr in Brreg, built from the bulk downloads of enheter and underenheter.
+
+Looking up many orgnr in the Brreg API one at a time is slow. The index is a
+parquet file with one row per organisation number, and whether it is an
+enhet (foretak) or an underenhet (bedrift). It is rebuilt when it is older
+than `BRREG_INDEX_MAX_AGE_DAYS`, and can be configured with these environment variables:
+
+- `NUDB_BRREG_CACHE_DIR`: Directory to store the index in.
+- `NUDB_BRREG_INDEX_MAX_AGE_DAYS`: Days before the index is downloaded again.
+- `NUDB_BRREG_API_RESIDUE_LIMIT`: Max orgnr missing from the index to look up in the API,
+  the rest are handled as not found in Brreg.
+"""
+
+import os
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+import duckdb as db
+import pandas as pd
+
+from nudb_use.metadata.external_apis.brreg_api import iter_csv_enheter_chunks
+from nudb_use.nudb_logger import LoggerStack
+from nudb_use.nudb_logger import logger
+
+BRREG_CACHE_DIR: Path = Path(
+    os.environ.get(
+        "NUDB_BRREG_CACHE_DIR", Path.home() / ".cache" / "nudb_use" / "brreg"
+    )
+)
+BRREG_INDEX_MAX_AGE_DAYS: float = float(
+    os.environ.get("NUDB_BRREG_INDEX_MAX_AGE_DAYS", 7)
+)
+BRREG_API_RESIDUE_LIMIT: int = int(os.environ.get("NUDB_BRREG_API_RESIDUE_LIMIT", 1000))
+
+BRREG_BULK_CSV_URLS: dict[str, str] = {
+    "enhet": "https://data.brreg.no/enhetsregisteret/api/enheter/lastned/csv",
+    "underenhet": "https://data.brreg.no/enhetsregisteret/api/underenheter/lastned/csv",
+}
+BRREG_INDEX_FILENAME = "brreg_orgnr_index.parquet"
+
+
+def build_brreg_orgnr_index(
+    sources: dict[str, str | Path] | None = None,
+    index_path: Path | None = None,
+) -> Path:
+    """Download the bulk registers from Brreg and store all orgnr in a local parquet index.
+
+    Args:
+        sources: Gzipped CSV per enhet type ("enhet" and "underenhet"), as urls or local paths.
+            Defaults to the bulk downloads from data.brreg.no.
+        index_path: Where to write the index. Defaults to a file in `BRREG_CACHE_DIR`.
+
+    Returns:
+        Path: The path to the written index.
+    """
+    source_map: dict[str, str | Path] = (
+        dict(BRREG_BULK_CSV_URLS) if sources is None else sources
+    )
+    index_path = (
+        BRREG_CACHE_DIR / BRREG_INDEX_FILENAME if index_path is None else index_path
+    )
+
+    with LoggerStack("Building local index of orgnr in Brreg"):
+        parts: list[pd.DataFrame] = []
+        for enhet_type, source in source_map.items():
+            logger.info(f"Reading {enhet_type} from {source}")
+            # Only the orgnr column is kept from each chunk, so this streams in bounded memory
+            orgnr_chunks = iter_csv_enheter_chunks(
+                source, usecols=["organisasjonsnummer"]
+            )
+            part = pd.concat(orgnr_chunks, ignore_index=True).rename(
+                columns={"organisasjonsnummer": "orgnr"}
+            )
+            part["enhet_type"] = pd.Series(
+                enhet_type, index=part.index, dtype="string[pyarrow]"
+            )
+            parts.append(part)
+
+        index = pd.concat(parts, ignore_index=True).drop_duplicates("orgnr")
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = index_path.with_suffix(".parquet.tmp")
+        index.sort_values("orgnr").to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, index_path)
+        logger.info(f"Wrote {len(index)} orgnr to {index_path}")
+
+    return index_path
+
+
+def brreg_orgnr_index_path(max_age_days: float | None = None) -> Path | None:
+    """Get the path to a fresh local Brreg index, rebuilding it if it is missing or too old.
+
+    Args:
+        max_age_days: Days before the index is rebuilt, defaults to `BRREG_INDEX_MAX_AGE_DAYS`.
+
+    Returns:
+        Path | None: The path to the index, or None if it could not be built.
+    """
+    max_age_days = BRREG_INDEX_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    index_path = BRREG_CACHE_DIR / BRREG_INDEX_FILENAME
+    if index_path.is_file():
+        age_days = (time.time() - index_path.stat().st_mtime) / (24 * 60 * 60)
+        if age_days < max_age_days:
+            return index_path
+        logger.info(f"The local Brreg index is {age_days:.1f} days old, rebuilding.")
+
+    try:
+        return build_brreg_orgnr_index(index_path=index_path)
+    except Exception as err:
+        logger.warning(f"Could not build the local Brreg index: {err}")
+        if index_path.is_file():
+            logger.warning(f"Using the outdated Brreg index at {index_path}.")
+            return index_path
+        return None
+
+
+def _clean_orgnr(orgnr: pd.Series) -> pd.Series:
+    """Keep only the digits, the same way the Brreg API lookups do."""
+    return orgnr.astype("string[pyarrow]").str.replace(r"\D", "", regex=True)
+
+
+def lookup_brreg_enhet_types(
+    orgnr: Iterable[str], index_path: Path | None = None
+) -> dict[str, str] | None:
+    """Find the enhet type for many orgnr with one join against the local Brreg index.
+
+    Args:
+        orgnr: The organisation numbers to look up.
+        index_path: Path to the index, defaults to `brreg_orgnr_index_path()`.
+
+    Returns:
+        dict[str, str] | None: Maps each orgnr found in the index to "enhet" or "underenhet",
+            orgnr missing from the index are left out. None if there is no index to look in.
+    """
+    orgnr_unique = pd.Series(pd.unique(pd.Series(list(orgnr), dtype="object")))
+    orgnr_unique = orgnr_unique[orgnr_unique.notna()]
+    if not len(orgnr_unique):
+        return {}
+    index_path = brreg_orgnr_index_path() if index_path is None else index_path
+    if index_path is None:
+        return None
+
+    input_df = pd.DataFrame(
+        {
+            "orgnr": orgnr_unique.astype("string[pyarrow]"),
+            "orgnr_clean": _clean_orgnr(orgnr_unique),
+        }
+    )
+    path_str = str(index_path).replace("'", "''")
+    with db.connect() as connection:
+        connection.register("input_orgnr", input_df)
+        result = connection.sql(f"""
+            SELECT
+                input_orgnr.orgnr,
+                brreg.enhet_type
+            FROM input_orgnr
+            JOIN read_parquet('{path_str}') AS brreg
+                ON input_orgnr.orgnr_clean = brreg.orgnr
+        """).df()
+
+    logger.info(
+        f"Found {len(result)} of {len(input_df)} orgnr in the local Brreg index."
+    )
+    return dict(zip(result["orgnr"], result["enhet_type"], strict=True))
@@ -0,0 +1,252 @@
+"""Persistent on-disk cache for lookups against the KLASS API.
+
+Results from KLASS are stored as small JSON files, keyed by the kind of lookup
+and its arguments (classification id, version dates, variant, correspondence).
+Entries expire after a configurable time-to-live, and a strict offline mode
+serves only what is already cached. The cache can be configured with
+`configure_klass_cache`, or through these environment variables:
+
+- `NUDB_KLASS_CACHE_DIR`: Directory to store cached entries in.
+- `NUDB_KLASS_CACHE_TTL`: Seconds before an entry is refetched, "none" never expires.
+- `NUDB_KLASS_CACHE`: Set to "0" to disable the cache entirely.
+- `NUDB_KLASS_OFFLINE`: Set to "1" to never contact the KLASS API.
+"""
+
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+from typing import TypeVar
+
+import pandas as pd
+
+from nudb_use.exceptions.exception_classes import NudbKlassOfflineError
+from nudb_use.nudb_logger import logger
+
+T = TypeVar("T")
+
+# Bump this when the layout of cached values change, old entries are then ignored
+KLASS_CACHE_FORMAT_VERSION: int = 1
+DEFAULT_KLASS_CACHE_TTL_SECONDS: float = 24 * 60 * 60
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_ttl(name: str, default: float | None) -> float | None:
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    if value.strip().lower() == "none":
+        return None
+    return float(value)
+
+
+KLASS_CACHE_DIR: Path = Path(
+    os.environ.get(
+        "NUDB_KLASS_CACHE_DIR", Path.home() / ".cache" / "nudb_use" / "klass"
+    )
+)
+KLASS_CACHE_TTL_SECONDS: float | None = _env_ttl(
+    "NUDB_KLASS_CACHE_TTL", DEFAULT_KLASS_CACHE_TTL_SECONDS
+)
+KLASS_CACHE_ENABLED: bool = _env_flag("NUDB_KLASS_CACHE", True)
+KLASS_OFFLINE: bool = _env_flag("NUDB_KLASS_OFFLINE", False)
+
+KLASS_CACHE_STATS: dict[str, int] = {"hits": 0, "disk_hits": 0, "misses": 0}
+_MEMORY_CACHE: dict[str, tuple[float, Any]] = {}
+_UNSET: Any = object()
+
+
+def configure_klass_cache(
+    cache_dir: str | Path | None = _UNSET,
+    ttl_seconds: float | None = _UNSET,
+    enabled: bool = _UNSET,
+    offline: bool = _UNSET,
+) -> None:
+    """Change how lookups against KLASS are cached, arguments left out are kept as is.
+
+    Args:
+        cache_dir: Directory to store cached entries in.
+        ttl_seconds: Seconds before a cached entry is refetched. None never expires.
+        enabled: Set to False to always ask the KLASS API, and not store anything.
+        offline: Set to True to only serve cached entries, and never contact the API.
+    """
+    global KLASS_CACHE_DIR, KLASS_CACHE_TTL_SECONDS, KLASS_CACHE_ENABLED, KLASS_OFFLINE
+    if cache_dir is not _UNSET:
+        KLASS_CACHE_DIR = Path(cache_dir) if cache_dir is not None else KLASS_CACHE_DIR
+        _MEMORY_CACHE.clear()
+    if ttl_seconds is not _UNSET:
+        KLASS_CACHE_TTL_SECONDS = ttl_seconds
+    if enabled is not _UNSET:
+        KLASS_CACHE_ENABLED = enabled
+    if offline is not _UNSET:
+        KLASS_OFFLINE = offline
+    logger.info(
+        f"KLASS cache: {KLASS_CACHE_DIR=}, {KLASS_CACHE_TTL_SECONDS=}, {KLASS_CACHE_ENABLED=}, {KLASS_OFFLINE=}"
+    )
+
+
+def klass_cache_stats() -> dict[str, int]:
+    """Get the hit and miss counters of the KLASS cache since import or the last reset.
+
+    Returns:
+        dict[str, int]: Counts of "hits" (of which "disk_hits" were read from disk) and "misses".
+    """
+    return dict(KLASS_CACHE_STATS)
+
+
+def reset_klass_cache_stats() -> None:
+    """Set the hit and miss counters of the KLASS cache back to zero."""
+    for key in KLASS_CACHE_STATS:
+        KLASS_CACHE_STATS[key] = 0
+
+
+def clear_klass_cache(memory_only: bool = False) -> None:
+    """Remove cached KLASS lookups.
+
+    Args:
+        memory_only: Only empty the in-memory layer, keep the files on disk.
+    """
+    _MEMORY_CACHE.clear()
+    if memory_only or not KLASS_CACHE_DIR.exists():
+        return
+    for path in KLASS_CACHE_DIR.glob("*/*.json"):
+        path.unlink(missing_ok=True)
+    logger.info(f"Cleared the KLASS cache in {KLASS_CACHE_DIR}")
+
+
+def _cache_key(kind: str, arguments: dict[str, Any]) -> str:
+    return json.dumps(
+        {"format": KLASS_CACHE_FORMAT_VERSION, "kind": kind, "args": arguments},
+        sort_keys=True,
+        default=str,
+    )
+
+
+def _json_default(obj: Any) -> Any:
+    """Convert the numpy and pandas scalars found in KLASS data to plain JSON values."""
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Cannot store {type(obj)} in the KLASS cache.")
+
+
+def _entry_path(kind: str, key: str) -> Path:
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return KLASS_CACHE_DIR / kind / f"{digest}.json"
+
+
+def _is_fresh(created: float) -> bool:
+    if KLASS_CACHE_TTL_SECONDS is None:
+        return True
+    return (time.time() - created) < KLASS_CACHE_TTL_SECONDS
+
+
+def _read_entry(path: Path, key: str) -> tuple[float, Any] | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as err:
+        logger.warning(f"Ignoring unreadable KLASS cache entry {path}: {err}")
+        return None
+    if entry.get("key") != key:  # Guards against hash collisions and old formats
+        return None
+    return float(entry["created"]), entry["value"]
+
+
+def _write_entry(path: Path, key: str, created: float, value: Any) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so parallel runs never read half a file
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=path.parent, suffix=".tmp", delete=False
+        ) as f:
+            json.dump({"key": key, "created": created, "value": value}, f)
+        os.replace(f.name, path)
+    except OSError as err:
+        logger.warning(f"Could not write KLASS cache entry {path}: {err}")
+
+
+def _lookup(kind: str, key: str) -> tuple[bool, Any]:
+    """Find an entry in memory or on disk, stale entries are only served offline."""
+    path = _entry_path(kind, key)
+    entry = _MEMORY_CACHE.get(key)
+    from_disk = False
+    if entry is None:
+        entry = _read_entry(path, key)
+        from_disk = entry is not None
+    if entry is None:
+        return False, None
+
+    created, value = entry
+    if not _is_fresh(created) and not KLASS_OFFLINE:
+        return False, None
+    if from_disk:
+        _MEMORY_CACHE[key] = entry
+        KLASS_CACHE_STATS["disk_hits"] += 1
+    KLASS_CACHE_STATS["hits"] += 1
+    return True, value
+
+
+def klass_cached(kind: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorate a function that fetches from KLASS, so its results are cached.
+
+    The decorated function must return a JSON-serializable value, and its
+    arguments make up the cache key together with the kind.
+
+    Args:
+        kind: Name for the type of lookup, used as a sub folder in the cache directory.
+
+    Returns:
+        Callable[[Callable[..., T]], Callable[..., T]]: The decorator.
+    """
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            if not KLASS_CACHE_ENABLED:
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = _cache_key(kind, dict(bound.arguments))
+
+            found, value = _lookup(kind, key)
+            if found:
+                logger.debug(f"KLASS cache hit for {kind}: {dict(bound.arguments)}")
+                return copy.deepcopy(value)  # type: ignore[no-any-return]
+
+            KLASS_CACHE_STATS["misses"] += 1
+            if KLASS_OFFLINE:
+                raise NudbKlassOfflineError(
+                    f"KLASS is in offline mode, and nothing is cached for {kind}: {dict(bound.arguments)}. Run once with access to KLASS to fill the cache in {KLASS_CACHE_DIR}."
+                )
+
+            result = func(*args, **kwargs)
+            # Store what a JSON round trip gives back, so hits and misses return the same types
+            created = time.time()
+            value = json.loads(json.dumps(result, default=_json_default))
+            _MEMORY_CACHE[key] = (created, value)
+            _write_entry(_entry_path(kind, key), key, created, value)
+            return copy.deepcopy(value)  # type: ignore[no-any-return]
+
+        return wrapper
+
+    return decorator
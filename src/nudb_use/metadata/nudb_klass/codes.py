@@ -13,6 +13,7 @@ from nudb_use.metadata.nudb_config.get_variable_info import get_var_metadata
 from nudb_use.nudb_logger import LoggerStack
 from nudb_use.nudb_logger import logger
 
+from .cache import klass_cached
 from .klass_utils import _include_codelist_extras
 from .klass_utils import _outside_codes_handeling
 from .klass_utils import _resolve_date_range
@@ -20,6 +21,7 @@ from .variants import _check_klass_variant_column_id
 from .variants import _check_klass_variant_column_search_term
 
 
+@klass_cached("codes")
 def get_klass_codes(
     klassid: int,
     data_time_start: str | None = None,
@@ -27,6 +29,8 @@ def get_klass_codes(
 ) -> list[str]:
     """Fetch code dictionaries for a classification scheme within a given time range.
 
+    Results are cached on disk, see `nudb_use.metadata.nudb_klass.cache`.
+
     Args:
         klassid: Identifier from Klass.
         data_time_start: Start date (YYYY-MM-DD) for code filtering.
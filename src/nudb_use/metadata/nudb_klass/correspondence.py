@@ -1,6 +1,7 @@
 import klass
 from nudb_config.pydantic.variables import Variable
 
+from .cache import klass_cached
 from .klass_utils import find_earliest_latest_klass_version_date
 
 
@@ -34,11 +35,23 @@ def klass_correspondence_to_mapping(var_meta: Variable) -> dict[str, str | None]
 
     _first_date, last_date = find_earliest_latest_klass_version_date(klass_codelist)
 
-    correspondence = klass.KlassCorrespondence(
+    # Future development, do we want to pass time down to this function to not always get the latest versions?
+    return _get_klass_correspondence_mapping(
         source_classification_id=correspondence_to,
         target_classification_id=klass_codelist,
-        from_date=last_date,  # Future development, do we want to pass time down to this function to not always get the latest versions?
-        # to_date=?,
+        from_date=last_date,
     )
 
-    return correspondence.to_dict()
+
+@klass_cached("correspondences")
+def _get_klass_correspondence_mapping(
+    source_classification_id: int,
+    target_classification_id: int,
+    from_date: str,
+) -> dict[str, str | None]:
+    correspondence = klass.KlassCorrespondence(
+        source_classification_id=source_classification_id,
+        target_classification_id=target_classification_id,
+        from_date=from_date,
+    )
+    return dict(correspondence.to_dict())
@@ -8,6 +8,8 @@ import pandas as pd
 from nudb_use.exceptions.exception_classes import NudbQualityError
 from nudb_use.nudb_logger import logger
 
+from .cache import klass_cached
+
 
 def _outside_codes_handeling(
     series: pd.Series, codes: set[str], col: str
@@ -42,7 +44,7 @@ def find_earliest_latest_klass_version_date(
     """
     min_date: str = ""
     max_date: str = ""
-    for version in klass.KlassClassification(klass_classification_id).versions:
+    for version in _get_klass_classification_versions(klass_classification_id):
         valid_from = version["validFrom"]
         if not min_date:
             min_date = valid_from
@@ -55,6 +57,17 @@ def find_earliest_latest_klass_version_date(
     return min_date, max_date
 
 
+@klass_cached("versions")
+def _get_klass_classification_versions(
+    klass_classification_id: int,
+) -> list[dict[str, Any]]:
+    """Fetch the version parts of a KLASS classification, cached on disk."""
+    return [
+        dict(version)
+        for version in klass.KlassClassification(klass_classification_id).versions
+    ]
+
+
 def _resolve_date_range(
     klassid: int,
     klass_codelist_from_date: object,
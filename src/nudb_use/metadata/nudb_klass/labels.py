@@ -3,6 +3,7 @@ from nudb_config import settings
 
 from nudb_use.nudb_logger import logger
 
+from .cache import klass_cached
 from .variants import klass_variant_search_term_mapping
 
 
@@ -34,5 +35,10 @@ def get_klass_label_mapping(variable: str) -> dict[str, str] | None:
             metadata, key="code", value="name", select_level=1
         )
     else:
-        codes = klass.KlassClassification(codelist).get_codes()
-        return codes.to_dict(key="code", value="name")
+        return _get_klass_code_name_mapping(codelist)
+
+
+@klass_cached("labels")
+def _get_klass_code_name_mapping(codelist: int) -> dict[str, str]:
+    codes = klass.KlassClassification(codelist).get_codes()
+    return dict(codes.to_dict(key="code", value="name"))
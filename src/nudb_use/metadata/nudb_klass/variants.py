@@ -1,19 +1,21 @@
 import datetime
+from typing import Any
 
 import dateutil.parser
 import klass
 import pandas as pd
-from klass.requests.klass_types import VersionPartType
 from nudb_config.pydantic.variables import Variable
 
 from nudb_use.exceptions.exception_classes import NudbQualityError
 from nudb_use.nudb_logger import logger
 
+from .cache import klass_cached
+from .klass_utils import _get_klass_classification_versions
 from .klass_utils import _outside_codes_handeling
 from .klass_utils import find_earliest_latest_klass_version_date
 
 
-def klass_variant_search_term_mapping(
+def klass_variant_search_term_mapping(  # noqa: DOC503
     var_meta: Variable,
     key: str = "code",
     value: str = "parentCode",
@@ -50,6 +52,34 @@ def klass_variant_search_term_mapping(
     else:
         search_term: str = search_term_maybe_none
 
+    return _get_klass_variant_search_term_mapping(
+        klass_codelist, search_term, key, value, select_level
+    )
+
+
+@klass_cached("variant_mappings")
+def _get_klass_variant_search_term_mapping(
+    klass_codelist: int,
+    search_term: str,
+    key: str,
+    value: str,
+    select_level: int | None,
+) -> dict[str, str]:
+    """Get the mapping of the single variant matching the search term, cached on disk.
+
+    Args:
+        klass_codelist: The KLASS classification to look for the variant in.
+        search_term: The start of the variant name.
+        key: key argument passed to 'klass.KlassVariant.to_dict'
+        value: value argument passed to 'klass.KlassVariant.to_dict'
+        select_level: Only map codes on this level, if given.
+
+    Returns:
+        dict[str, str]: The mapping dict from klass.
+
+    Raises:
+        ValueError: If no variant or multiple variants match the search term.
+    """
     version = klass.KlassClassification(
         klass_codelist
     ).get_version()  # Future development: Could we support "refdate" in the klass package on this to get the version by date?
@@ -82,12 +112,17 @@ def klass_variant_search_term_mapping(
 def _check_klass_variant_column_id(
     series: pd.Series, col: str, klass_variant: int
 ) -> list[NudbQualityError]:
-    codes = set(
-        x.strip() for x in klass.KlassVariant(variant_id=klass_variant).to_dict().keys()
-    )
+    codes = set(_get_klass_variant_codes(klass_variant))
     return _outside_codes_handeling(series=series, codes=codes, col=col)
 
 
+@klass_cached("variant_codes")
+def _get_klass_variant_codes(klass_variant: int) -> list[str]:
+    return [
+        x.strip() for x in klass.KlassVariant(variant_id=klass_variant).to_dict().keys()
+    ]
+
+
 def _check_klass_variant_column_search_term(
     series: pd.Series,
     col: str,
@@ -111,14 +146,13 @@ def _check_klass_variant_column_search_term(
     refdate_datetime = dateutil.parser.parse(refdate)
 
     # Go backwards from the future until we find an earlier date
-    classification = klass.KlassClassification(klass_codelist)
-    date_keyed: dict[datetime.datetime, VersionPartType] = {
+    date_keyed: dict[datetime.datetime, dict[str, Any]] = {
         dateutil.parser.parse(version_part["validFrom"]): version_part
-        for version_part in classification.versions
+        for version_part in _get_klass_classification_versions(klass_codelist)
     }
     date_keyed_sorted_reversed = {k: date_keyed[k] for k in sorted(date_keyed)[::-1]}
 
-    ver_final: None | VersionPartType = None
+    ver_final: dict[str, Any] | None = None
     ver_date: datetime.datetime
     for ver_date, ver in date_keyed_sorted_reversed.items():
         if ver_date <= refdate_datetime:
@@ -130,11 +164,21 @@ def _check_klass_variant_column_search_term(
             f"Couldnt find a version for classification {klass_codelist}, that matches refdate {refdate}."
         )
     ver_id: int = ver_final["version_id"]
-    version = klass.KlassVersion(ver_id)
-    variant = version.get_variant(search_term=klass_variant_search_term)
+    variant = _get_klass_version_variant(ver_id, klass_variant_search_term)
     logger.info(
-        f"For `{col}` found a klass-variant with id {variant.variant_id}, dated {variant.validFrom}, with variant-name {variant.name}, based on search-term {klass_variant_search_term}."
+        f"For `{col}` found a klass-variant with id {variant['variant_id']}, dated {variant['validFrom']}, with variant-name {variant['name']}, based on search-term {klass_variant_search_term}."
     )
 
-    codes = set(x.strip() for x in variant.to_dict().keys())
+    codes = set(variant["codes"])
     return _outside_codes_handeling(series=series, codes=codes, col=col)
+
+
+@klass_cached("version_variants")
+def _get_klass_version_variant(ver_id: int, search_term: str) -> dict[str, Any]:
+    variant = klass.KlassVersion(ver_id).get_variant(search_term=search_term)
+    return {
+        "variant_id": variant.variant_id,
+        "validFrom": variant.validFrom,
+        "name": variant.name,
+        "codes": [x.strip() for x in variant.to_dict().keys()],
+    }
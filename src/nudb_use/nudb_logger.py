@@ -2,18 +2,25 @@
 
 from __future__ import annotations
 
+import atexit
 import copy
 import functools
 import inspect
+import itertools
 import json
 import logging
 import math
 import sys
+import threading
+from abc import ABC
+from abc import abstractmethod
+from collections import deque
 from collections.abc import Callable
 from collections.abc import Sequence
 from datetime import datetime
 from pathlib import Path
 from types import TracebackType
+from typing import IO
 from typing import Any
 from typing import TypeVar
 
@@ -22,27 +29,34 @@ from colorama import Fore
 from colorama import Style
 from fagfunksjoner import logger as faglogger  # type: ignore[attr-defined]
 
-STACK_LEVEL: int = 0
-STACK_LABELS: list[str] = []
 INDENT_WIDTH: int = 4
-ENTERING_STACK: bool = False
-EXITING_STACK: bool = False
 WIDTH_LEVEL_NAME: int = 8
 
 
 T = TypeVar("T")
 
-ID_COUNTERS: list[int] = [0]
 JSON: dict[str, Any] = {}
-JSON_FIELDS: list[dict[str, Any]] = [JSON]
+_THREAD_NUMBERS = itertools.count()
+
+# Defaults for the log sinks, see `set_log_sinks`
+LOG_RING_BUFFER_CAPACITY: int = 10_000
+LOG_JSONL_FLUSH_EVERY: int = 100
+LOG_DEBUG_KEEP_EVERY: int = 100
+
 __all__ = [
+    "JsonLinesSink",
+    "JsonTreeSink",
+    "LogSink",
     "LoggerStack",
+    "RingBufferSink",
+    "SampledDebugSink",
     "_enter_new_logger_stack",
     "_exit_current_logger_stack",
     "_get_current_json",
     "_save_current_json",
     "add_log_record_to_json",
     "logger",
+    "set_log_sinks",
 ]
 
 
@@ -51,28 +65,245 @@ def last(items: Sequence[T]) -> T | None:
     return None if not items else items[-1]
 
 
-def add_log_record_to_json(record: logging.LogRecord) -> None:
-    """Persist the current log record into the in-memory JSON structure."""
-    global STACK_LABELS, ID_COUNTERS, JSON_FIELDS
-    stack_label = last(STACK_LABELS)
+class _StackState(threading.local):
+    """The LoggerStacks entered in the current thread.
+
+    Every thread has its own stack, so code logging in several threads at the
+    same time (like the quality suite) keeps its labels and indentation apart.
+    The records of other threads than the main thread are kept in `JSON`
+    under a field of their own.
+    """
+
+    def __init__(self) -> None:
+        self.level = 0
+        self.labels: list[str] = []
+        self.id_counters = [0]
+        self.entering = False
+        self.exiting = False
+        if threading.current_thread() is threading.main_thread():
+            self.json_fields = [JSON]
+        else:
+            field_name = f"{threading.current_thread().name}-{next(_THREAD_NUMBERS)}"
+            JSON[field_name] = {}
+            self.json_fields = [JSON[field_name]]
 
-    level = record.levelname
-    msg = record.msg
 
-    CURRENT_ID_COUNTER = ID_COUNTERS.pop()
-    name = f"{level}-{stack_label}-{CURRENT_ID_COUNTER}"
-    ID_COUNTERS.append(CURRENT_ID_COUNTER + 1)
+_STACK = _StackState()
 
-    current_json_field = last(JSON_FIELDS)
-    if current_json_field is None:
-        raise RuntimeError("JSON_FIELDS is unexpectedly empty while logging.")
 
-    current_json_field[name] = {
+def _log_entry(record: logging.LogRecord) -> dict[str, Any]:
+    """Describe a log record, with the labels of the LoggerStacks it was logged in."""
+    stack_label = last(_STACK.labels)
+    level = record.levelname
+
+    CURRENT_ID_COUNTER = _STACK.id_counters.pop()
+    _STACK.id_counters.append(CURRENT_ID_COUNTER + 1)
+
+    entry = {
+        "name": f"{level}-{stack_label}-{CURRENT_ID_COUNTER}",
         "id": CURRENT_ID_COUNTER,
         "level": level,
-        "msg": msg,
+        "msg": record.msg,
         "time": str(datetime.now()),
+        "stack": list(_STACK.labels),
     }
+    # Structured data logged with `extra={"nudb_data": ...}`, such as query profiles
+    if hasattr(record, "nudb_data"):
+        entry["data"] = record.nudb_data
+    return entry
+
+
+class LogSink(ABC):
+    """Receives every log record that is formatted, choose them with `set_log_sinks`."""
+
+    @abstractmethod
+    def write(self, entry: dict[str, Any]) -> None:
+        """Store one log entry, made by `_log_entry`."""
+
+    # Optional hooks, sinks that keep no nesting or resources leave them empty
+    def enter_stack(self, field_name: str) -> None:  # noqa: B027
+        """Called when a LoggerStack is entered."""
+
+    def exit_stack(self) -> None:  # noqa: B027
+        """Called when a LoggerStack is exited."""
+
+    def close(self) -> None:  # noqa: B027
+        """Release any resources, called when the sink is replaced."""
+
+
+class JsonTreeSink(LogSink):
+    """Keeps every record in the nested `JSON` structure, one dict per LoggerStack.
+
+    This is the default sink. It grows without bound, so long runs should use
+    a `RingBufferSink` or `JsonLinesSink` instead.
+    """
+
+    def write(self, entry: dict[str, Any]) -> None:
+        """Add the entry to the dict of the current LoggerStack."""
+        current_json_field = last(_STACK.json_fields)
+        if current_json_field is None:
+            raise RuntimeError("The JSON fields are unexpectedly empty while logging.")
+
+        current_json_field[entry["name"]] = {
+            "id": entry["id"],
+            "level": entry["level"],
+            "msg": entry["msg"],
+            "time": entry["time"],
+        }
+        if "data" in entry:
+            current_json_field[entry["name"]]["data"] = entry["data"]
+
+    def enter_stack(self, field_name: str) -> None:
+        """Nest the following entries in a new dict."""
+        current_json_field = last(_STACK.json_fields)
+        if current_json_field is None:
+            raise RuntimeError("The JSON fields are unexpectedly empty while entering.")
+
+        current_json_field[field_name] = {}
+        _STACK.json_fields.append(current_json_field[field_name])
+
+    def exit_stack(self) -> None:
+        """Go back to the dict of the enclosing LoggerStack."""
+        if len(_STACK.json_fields) > 1:
+            _STACK.json_fields.pop()
+
+
+class RingBufferSink(LogSink):
+    """Keeps only the latest log entries in memory.
+
+    Args:
+        capacity: Max number of entries to keep, the oldest are dropped first.
+    """
+
+    def __init__(self, capacity: int = LOG_RING_BUFFER_CAPACITY) -> None:
+        self.entries: deque[dict[str, Any]] = deque(maxlen=capacity)
+
+    def write(self, entry: dict[str, Any]) -> None:
+        """Keep the entry, dropping the oldest one if the buffer is full."""
+        self.entries.append(entry)
+
+    def save(self, path: str | Path) -> None:
+        """Write the kept entries to a JSON Lines file.
+
+        Args:
+            path: The file to write to, overwritten if it exists.
+        """
+        with Path(path).open("w", encoding="utf-8") as file:
+            for entry in self.entries:
+                file.write(json.dumps(entry, default=str) + "\n")
+
+
+class JsonLinesSink(LogSink):
+    """Appends each log entry as a line of JSON to a file, so nothing is kept in memory.
+
+    The file is closed when the sink is replaced with `set_log_sinks`, or else
+    when Python exits, so the last entries are not lost in the buffer.
+
+    Args:
+        path: The file to append to.
+        flush_every: Flush the file after this many entries.
+    """
+
+    def __init__(
+        self, path: str | Path, flush_every: int = LOG_JSONL_FLUSH_EVERY
+    ) -> None:
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self._file: IO[str] | None = None
+        self._unflushed = 0
+        self._lock = threading.Lock()  # Records can be logged from several threads
+
+    def write(self, entry: dict[str, Any]) -> None:
+        """Append the entry to the file."""
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = self.path.open("a", encoding="utf-8")
+                atexit.register(self.close)
+            self._file.write(line)
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self._file.flush()
+                self._unflushed = 0
+
+    def flush(self) -> None:
+        """Write the buffered entries to disk."""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            self._unflushed = 0
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                atexit.unregister(self.close)
+            self._unflushed = 0
+
+
+class SampledDebugSink(LogSink):
+    """Passes on every record to another sink, except most DEBUG records.
+
+    Args:
+        sink: The sink to pass the records on to.
+        keep_every: Keep one of every `keep_every` DEBUG records.
+    """
+
+    def __init__(self, sink: LogSink, keep_every: int = LOG_DEBUG_KEEP_EVERY) -> None:
+        self.sink = sink
+        self.keep_every = keep_every
+        self._n_debug = 0
+
+    def write(self, entry: dict[str, Any]) -> None:
+        """Pass the entry on, if it is not a DEBUG record sampled away."""
+        if entry["level"] == "DEBUG":
+            self._n_debug += 1
+            if (self._n_debug - 1) % self.keep_every:
+                return
+        self.sink.write(entry)
+
+    def enter_stack(self, field_name: str) -> None:
+        """Pass the LoggerStack on to the sink."""
+        self.sink.enter_stack(field_name)
+
+    def exit_stack(self) -> None:
+        """Pass the LoggerStack on to the sink."""
+        self.sink.exit_stack()
+
+    def close(self) -> None:
+        """Close the sink."""
+        self.sink.close()
+
+
+LOG_SINKS: list[LogSink] = [JsonTreeSink()]
+
+
+def set_log_sinks(*sinks: LogSink) -> None:
+    """Choose where log records are stored, replacing (and closing) the current sinks.
+
+    Args:
+        *sinks: The sinks to write every log record to, e.g.
+            `set_log_sinks(SampledDebugSink(JsonLinesSink("run.jsonl")))`.
+            With no sinks, log records are only printed.
+    """
+    for sink in LOG_SINKS:
+        if sink not in sinks:
+            sink.close()
+    LOG_SINKS[:] = sinks
+
+
+def add_log_record_to_json(record: logging.LogRecord) -> None:
+    """Persist the current log record into the in-memory JSON structure."""
+    JsonTreeSink().write(_log_entry(record))
+
+
+def _write_to_log_sinks(record: logging.LogRecord) -> None:
+    entry = _log_entry(record)
+    for sink in LOG_SINKS:
+        sink.write(entry)
 
 
 def _split_string_by_n(string: str, n: int) -> list[str]:
@@ -106,23 +337,21 @@ class ColoredFormatter(logging.Formatter):
         record.color = self.colors.get(record.levelname, "")
         record.reset = Style.RESET_ALL
 
-        global INDENT_WIDTH, STACK_LEVEL, EXITING_STACK, WIDTH_LEVEL_NAME, ENTERING_STACK
-
-        if not ENTERING_STACK and not EXITING_STACK:
-            add_log_record_to_json(record)
+        if not _STACK.entering and not _STACK.exiting:
+            _write_to_log_sinks(record)
 
         if INDENT_WIDTH < 1:
             raise ValueError(
                 f"INDENT_WIDTH must have at least length 1! ({INDENT_WIDTH})"
             )
-        if STACK_LEVEL < 0:
-            raise ValueError(f"STACK_LEVEL is negative! ({STACK_LEVEL})")
+        if _STACK.level < 0:
+            raise ValueError(f"The stack level is negative! ({_STACK.level})")
 
-        if ENTERING_STACK:
+        if _STACK.entering:
             nlpad = 11
             lpad = " " * nlpad
             width = nlpad * 2 + len(record.msg)
-            prepad = ("│" + " " * (INDENT_WIDTH - 1)) * (STACK_LEVEL)
+            prepad = ("│" + " " * (INDENT_WIDTH - 1)) * (_STACK.level)
 
             line1 = prepad + "┌" + "─" * width + "┐"
             line2 = prepad + "│" + lpad + record.msg + lpad + "│"
@@ -131,10 +360,10 @@ class ColoredFormatter(logging.Formatter):
 
             return prepad + "\n" + line1 + "\n" + line2 + "\n" + line3 + "\n" + line4
 
-        if STACK_LEVEL:
-            prepad = ("│" + " " * (INDENT_WIDTH - 1)) * (STACK_LEVEL - 1)
+        if _STACK.level:
+            prepad = ("│" + " " * (INDENT_WIDTH - 1)) * (_STACK.level - 1)
 
-            if EXITING_STACK:
+            if _STACK.exiting:
                 pad_l1 = prepad + "└" + "─" * (INDENT_WIDTH - 1)
                 pad_l2 = prepad + " " * INDENT_WIDTH + " " * WIDTH_LEVEL_NAME + "   "
             else:
@@ -200,35 +429,29 @@ class LoggerStack:
 
     def __init__(self, label: str | None = None, level: str = "info") -> None:
         if label is None:
-            label = str(STACK_LEVEL + 1)
+            label = str(_STACK.level + 1)
         self.label = label
         self.log_msg = getattr(logger, level)
         self.level = getattr(logging, level.upper())
 
     def __enter__(self) -> LoggerStack:
-        """Enter the stack scope and adjust global logging state."""
-        global STACK_LEVEL, STACK_LABELS, ENTERING_STACK, JSON_FIELDS, ID_COUNTERS
-
+        """Enter the stack scope and adjust the logging state of this thread."""
         if self.level < logger.getEffectiveLevel():  # don't register
             return self
 
         CURRENT_ID_COUNTER = 0
         FIELD_NAME = f"{self.label}-{CURRENT_ID_COUNTER}"
-        ID_COUNTERS.append(CURRENT_ID_COUNTER + 1)
-
-        current_json_field = last(JSON_FIELDS)
-        if current_json_field is None:
-            raise RuntimeError("JSON_FIELDS is unexpectedly empty while entering.")
 
-        current_json_field[FIELD_NAME] = {}
-        JSON_FIELDS.append(current_json_field[FIELD_NAME])
+        for sink in LOG_SINKS:
+            sink.enter_stack(FIELD_NAME)
+        _STACK.id_counters.append(CURRENT_ID_COUNTER + 1)
 
-        ENTERING_STACK = True
+        _STACK.entering = True
         self.log_msg(str(self.label))
-        ENTERING_STACK = False
+        _STACK.entering = False
 
-        STACK_LABELS.append(self.label)
-        STACK_LEVEL += 1
+        _STACK.labels.append(self.label)
+        _STACK.level += 1
         return self
 
     def __exit__(
@@ -238,18 +461,33 @@ class LoggerStack:
         exc_tb: TracebackType | None,
     ) -> None:
         """Exit the stack scope and clean up state."""
-        global STACK_LEVEL, STACK_LABELS, EXITING_STACK, JSON_FIELDS
-
         if self.level < logger.getEffectiveLevel():  # don't register
             return None
 
-        JSON_FIELDS.pop()
-        EXITING_STACK = True
+        for sink in LOG_SINKS:
+            sink.exit_stack()
+        _STACK.exiting = True
         self.log_msg(f"EXITING STACK [{self.label}]\n")
 
-        EXITING_STACK = False
-        STACK_LABELS.pop()
-        STACK_LEVEL -= 1
+        _STACK.exiting = False
+        _STACK.labels.pop()
+        _STACK.level -= 1
+        if len(_STACK.id_counters) > 1:  # Continue the counter of the enclosing stack
+            _STACK.id_counters.pop()
+
+
+@functools.cache
+def _source_code(func: Callable[..., Any]) -> str:
+    return inspect.getsource(func)
+
+
+def _log_source_code(func: Callable[..., Any], name: str) -> None:
+    """Log the source code of a function at debug level.
+
+    The source is only read when DEBUG records are logged, and then only once per function.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Source code for {name}:\n{_source_code(func)}")
 
 
 def function_logger_context(
@@ -267,16 +505,13 @@ def function_logger_context(
 
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
         funcname = func.__name__
+        params = inspect.signature(func).parameters
+        funcall = funcname + "(" + ", ".join(params) + ")"
 
         @functools.wraps(func)
         def wrapped(*args: Any, **kwargs: Any) -> Any:
-            signature = inspect.signature(func)
-            params = signature.parameters
-
-            funcall = funcname + "(" + ", ".join(params) + ")"
-
             with LoggerStack(funcall, level=level):
-                logger.debug(f"Source code for {funcname}:\n{inspect.getsource(func)}")
+                _log_source_code(func, funcname)
                 return func(*args, **kwargs)
 
         return wrapped
@@ -295,7 +530,7 @@ def _enter_new_logger_stack(label: str | None = None) -> None:
     stack.__enter__()
 
 
-def _exit_current_logger_stack(label: str | None = last(STACK_LABELS)) -> None:
+def _exit_current_logger_stack(label: str | None = None) -> None:
     """Exit the current logger stack context in a safe way."""
     stack = LoggerStack(label)
     stack.__exit__(None, None, None)
@@ -1,5 +1,11 @@
 """Quality checking utilities for NUDB datasets."""
 
+from .duckdb_suite import run_quality_suite_duckdb
 from .suite import run_quality_suite
+from .suite import run_quality_suite_profiled
 
-__all__ = ["run_quality_suite"]
+__all__ = [
+    "run_quality_suite",
+    "run_quality_suite_duckdb",
+    "run_quality_suite_profiled",
+]
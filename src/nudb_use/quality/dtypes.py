@@ -1,3 +1,5 @@
+from typing import Any
+
 import pandas as pd
 
 from nudb_use import settings
@@ -8,6 +10,112 @@ from nudb_use.metadata.nudb_config.map_get_dtypes import DTYPE_MAPPINGS
 from nudb_use.nudb_logger import LoggerStack
 from nudb_use.nudb_logger import logger
 
+# Distinct values cast at a time when checking if a column can be casted
+CAST_CHECK_CHUNK_SIZE = 100_000
+MAX_REPORTED_UNCASTABLE_VALUES = 10
+# Only cast the distinct values when the sample has fewer than this share distinct values
+DISTINCT_FRACTION_TO_DEDUPLICATE = 0.5
+
+
+def _always_castable(x: pd.Series, target: str) -> bool:
+    """Check if every value of a column with this dtype can be cast to target, without casting anything."""
+    have = x.dtype
+    if target == "string[pyarrow]":
+        return True
+    if target == "Float64":
+        return pd.api.types.is_numeric_dtype(
+            have
+        ) and not pd.api.types.is_complex_dtype(have)
+    if target == "Int64":
+        return pd.api.types.is_bool_dtype(have) or pd.api.types.is_signed_integer_dtype(
+            have
+        )
+    if target == "bool[pyarrow]":
+        return pd.api.types.is_bool_dtype(have)
+    if target == "datetime64[s]":
+        # Naive datetimes of finer units are always within the bounds of seconds
+        return pd.api.types.is_datetime64_dtype(have)
+    return False
+
+
+def _find_uncastable_values(
+    values: pd.Series, target: Any, limit: int = MAX_REPORTED_UNCASTABLE_VALUES
+) -> list[Any]:
+    """Bisect values that fail to cast as a whole, down to the single values that fail."""
+    try:
+        values.astype(target)
+        return []
+    except Exception:
+        if len(values) == 1:
+            return [values.iloc[0]]
+    middle = len(values) // 2
+    found = _find_uncastable_values(values.iloc[:middle], target, limit)
+    if len(found) < limit:
+        found += _find_uncastable_values(
+            values.iloc[middle:], target, limit - len(found)
+        )
+    return found
+
+
+def _cast_error(x: pd.Series, target: Any) -> tuple[Exception, pd.Series | None] | None:
+    """Find out if a column can be cast to target, without making a casted copy of it.
+
+    The column is cast a chunk at a time, so at most a chunk is ever converted.
+    The first chunk works as a sample, which fails fast on columns that are
+    obviously wrong. Casting is elementwise, so when the sample shows that
+    values repeat a lot, only the distinct values are cast.
+
+    Args:
+        x: The column to check.
+        target: The pandas dtype to cast to.
+
+    Returns:
+        tuple[Exception, pd.Series | None] | None: The error from casting, and the number
+            of rows per value that could not be casted, or None if the column can be cast.
+    """
+    if _always_castable(x, target):
+        return None
+
+    sample = x.iloc[:CAST_CHECK_CHUNK_SIZE]
+    try:
+        sample.astype(target)
+    except Exception as err:
+        return _uncastable_rows_error(x, target, err, sample)
+
+    values = x.iloc[CAST_CHECK_CHUNK_SIZE:]
+    try:
+        if sample.nunique(dropna=False) < DISTINCT_FRACTION_TO_DEDUPLICATE * len(
+            sample
+        ):
+            # First appearance order is kept, so casts that look at the first value behave the same
+            values = pd.Series(values.unique(), dtype=values.dtype)
+    except TypeError:  # Unhashable values
+        pass
+
+    for start in range(0, len(values), CAST_CHECK_CHUNK_SIZE):
+        chunk = values.iloc[start : start + CAST_CHECK_CHUNK_SIZE]
+        try:
+            chunk.astype(target)
+        except Exception as err:
+            return _uncastable_rows_error(x, target, err, chunk)
+    return None
+
+
+def _uncastable_rows_error(
+    x: pd.Series, target: Any, err: Exception, failed_chunk: pd.Series
+) -> tuple[Exception, pd.Series | None]:
+    uncastable = _find_uncastable_values(failed_chunk, target)
+    try:
+        uncastable_rows = x[x.isin(uncastable)]
+    except TypeError:  # Unhashable values can not be looked up
+        return err, None
+    try:
+        # Casting only the failing rows, in order, gives the error casting the whole column would
+        uncastable_rows.iloc[:CAST_CHECK_CHUNK_SIZE].astype(target)
+    except Exception as rows_err:
+        err = rows_err
+    return err, uncastable_rows.value_counts(dropna=False)
+
 
 def _check_dtype_column(x: pd.Series, name: str) -> NudbQualityError | None:
     # Is the variable defined in the config?
@@ -36,14 +144,19 @@ def _check_dtype_column(x: pd.Series, name: str) -> NudbQualityError | None:
             f"Variable '{name}' does not have the correct dtype (got={have}, want={target})"
         )
 
-        try:
-            x.astype(target)
+        cast_error = _cast_error(x, target)
+        if cast_error is None:
             logger.info(f"Variable '{name}' can be casted to '{target}'")
             return None
-        except Exception as err:
-            return NudbQualityError(
-                f"Variable could not be casted to the correct dtype ({target})! Message:\n{err}"
+
+        err, uncastable_counts = cast_error
+        message = f"Variable could not be casted to the correct dtype ({target})! Message:\n{err}"
+        if uncastable_counts is not None and len(uncastable_counts):
+            counts = ", ".join(
+                f"{value!r}: {count}" for value, count in uncastable_counts.items()
             )
+            message += f"\nValues that could not be casted (rows): {counts}"
+        return NudbQualityError(message)
 
     return None
 
@@ -0,0 +1,361 @@
+"""Quality checks run as DuckDB aggregates over a parquet path or a NudbData view.
+
+The checks in `run_quality_suite` need the whole dataset loaded into pandas.
+Here the same checks are computed in DuckDB instead, so files larger than
+memory can be validated before publishing: widths, missing values, the
+literal bool strings and the number of distinct values checked against KLASS
+are gathered in one aggregate scan, and uniqueness per person in one grouped scan.
+The distinct values themselves are fetched afterwards with a limited query per
+column, so a column with millions of distinct values is never collected into one list.
+The errors are the same `NudbQualityError` messages as from the pandas checks.
+"""
+
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+import duckdb as db
+import pandas as pd
+import pyarrow.parquet as pq
+
+from nudb_use.datasets.nudb_data import NudbData
+from nudb_use.datasets.nudb_database import nudb_database
+from nudb_use.exceptions.exception_classes import NudbQualityError
+from nudb_use.exceptions.groups import raise_exception_group
+from nudb_use.exceptions.groups import warn_exception_group
+from nudb_use.metadata.nudb_config.get_variable_info import get_var_metadata
+from nudb_use.metadata.nudb_klass.codes import _check_column_against_klass
+from nudb_use.nudb_logger import LoggerStack
+from nudb_use.nudb_logger import logger
+from nudb_use.quality.check_bool_string_columns import _BOOL_LITERALS
+from nudb_use.quality.check_bool_string_columns import _SKIP_COLUMNS
+from nudb_use.quality.missing import get_thresholds_from_config
+from nudb_use.quality.specific_variables.unique_per_person import UNIQUE_PER_PERSON_COLS
+from nudb_use.quality.widths import _get_widths_definition
+from nudb_use.quality.widths import _width_error
+from nudb_use.variables.var_utils.duped_columns import find_duplicated_columns
+
+_STRING_TYPES = {"VARCHAR"}
+_FLOAT_TYPES = {"FLOAT", "DOUBLE"}
+_KLASS_FIELDS = ["klass_codelist", "klass_variant", "klass_variant_search_term"]
+
+# Mismatched values listed in a width error
+WIDTH_MISMATCHES_SHOWN: int = 50
+# Distinct values of a column checked against KLASS, more than any codelist has
+KLASS_MAX_DISTINCT_VALUES: int = int(
+    os.environ.get("NUDB_QUALITY_KLASS_MAX_DISTINCT_VALUES", 100_000)
+)
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+@contextmanager
+def _quality_source(
+    source: str | Path | NudbData,
+) -> Iterator[tuple[db.DuckDBPyConnection, str, list[str]]]:
+    """Get a connection, the FROM-expression and the column names of the data to check."""
+    if isinstance(source, NudbData):
+        connection = nudb_database.get_connection()
+        from_sql = f"(\n{source._get_query(check_validity=True)}\n)"
+        columns = list(connection.sql(f"SELECT * FROM {from_sql} LIMIT 0").columns)
+        yield connection, from_sql, columns
+        return
+
+    path = Path(source)
+    pattern = str(path / "**" / "*.parquet") if path.is_dir() else str(source)
+    # DuckDB renames repeated column names, so they are read from the parquet schema
+    schema_columns = pq.read_schema(path).names if path.is_file() else None
+    with db.connect() as connection:
+        from_sql = f"read_parquet({_sql_string(pattern)}, union_by_name = true)"
+        columns = (
+            schema_columns
+            if schema_columns is not None
+            else list(connection.sql(f"SELECT * FROM {from_sql} LIMIT 0").columns)
+        )
+        yield connection, from_sql, columns
+
+
+def _column_types(connection: db.DuckDBPyConnection, from_sql: str) -> dict[str, str]:
+    described = connection.sql(f"DESCRIBE SELECT * FROM {from_sql}").fetchall()
+    return {str(row[0]): str(row[1]) for row in described}
+
+
+def _has_klass_codelist(metadata: pd.DataFrame, col: str) -> bool:
+    if col not in metadata.index:
+        return False
+    values = [metadata.loc[col, field] for field in _KLASS_FIELDS]
+    return any(value is not None and not pd.isna(value) and value for value in values)
+
+
+class _Aggregates:
+    """The aggregates of the one scan over the data, named so their results can be looked up."""
+
+    def __init__(self) -> None:
+        self.expressions: list[str] = ["COUNT(*) AS n_rows"]
+        self.names: list[str] = []
+
+    def add(self, kind: str, col: str, expression: str) -> None:
+        self.names.append(f"{kind}:{col}")
+        self.expressions.append(f"{expression} AS agg_{len(self.names)}")
+
+    def run(
+        self, connection: db.DuckDBPyConnection, from_sql: str
+    ) -> tuple[int, dict[str, Any]]:
+        select = ",\n    ".join(self.expressions)
+        query = f"SELECT\n    {select}\nFROM {from_sql}"
+        logger.debug(query)
+        row = connection.sql(query).fetchone()
+        if row is None:
+            raise RuntimeError("The aggregate query over the dataset returned no rows.")
+        return int(row[0]), dict(zip(self.names, row[1:], strict=True))
+
+
+def _distinct_values(
+    connection: db.DuckDBPyConnection,
+    from_sql: str,
+    col: str,
+    where: str,
+    limit: int,
+) -> list[Any]:
+    """Get the first `limit` distinct values of a column in sorted order, without collecting the rest."""
+    quoted = _quote(col)
+    query = f"""
+        SELECT LIST(value ORDER BY value)
+        FROM (
+            SELECT DISTINCT {quoted} AS value
+            FROM {from_sql}
+            WHERE {where}
+            ORDER BY value
+            LIMIT {int(limit)}
+        )
+    """
+    logger.debug(query)
+    row = connection.sql(query).fetchone()
+    return list(row[0] or []) if row else []
+
+
+def _unique_per_person_errors(
+    connection: db.DuckDBPyConnection, from_sql: str, columns: list[str]
+) -> list[NudbQualityError]:
+    unique_cols = [col for col in columns if col.lower() in UNIQUE_PER_PERSON_COLS]
+    if not unique_cols or "snr" not in columns or "fnr" not in columns:
+        return []
+
+    with LoggerStack(
+        f"Checking columns that should be unique per person: {UNIQUE_PER_PERSON_COLS}"
+    ):
+        n_values = ", ".join(
+            f"COUNT(DISTINCT {_quote(col)}) AS n_{i}"
+            for i, col in enumerate(unique_cols)
+        )
+        most_values = ", ".join(f"MAX(n_{i})" for i in range(len(unique_cols)))
+        row = connection.sql(f"""
+            SELECT {most_values}
+            FROM (
+                SELECT {n_values}
+                FROM {from_sql}
+                WHERE COALESCE("snr", "fnr") IS NOT NULL
+                GROUP BY COALESCE("snr", "fnr")
+            )
+        """).fetchone()
+
+        errors: list[NudbQualityError] = []
+        for col, most in zip(unique_cols, row or [], strict=False):
+            if most is not None and most > 1:
+                err_msg = f"Found several values per person, in {col} that should only have a single value per person."
+                logger.warning(err_msg)
+                errors.append(NudbQualityError(err_msg))
+        return errors
+
+
+def run_quality_suite_duckdb(
+    source: str | Path | NudbData,
+    dataset_name: str | None = None,
+    data_time_start: str | None = None,
+    data_time_end: str | None = None,
+    widths: dict[str, list[int]] | None = None,
+    raise_errors: bool = True,
+) -> list[NudbQualityError]:
+    """Run the quality checks that can be expressed as SQL aggregates, without loading the data.
+
+    Covers the duplicated-column, width, bool-string, only-missing, missing-threshold,
+    KLASS-code and unique-per-person checks from `run_quality_suite`.
+
+    Args:
+        source: A parquet file, a directory or glob of parquet files, or a NudbData view.
+        dataset_name: Name of the dataset in config, to check its missing thresholds.
+            The thresholds are not checked when None.
+        data_time_start: Optional start date used by codelist validations.
+        data_time_end: Optional end date used by codelist validations.
+        widths: Optional mapping of column names to allowed string lengths, from config if None.
+        raise_errors: When True, raise grouped exceptions if any check fails.
+
+    Returns:
+        list[NudbQualityError]: All collected quality errors, or an empty list
+        when every check passes.
+
+    Raises:
+        TypeError: If a column with widths in the config is not a string column.
+    """
+    with (
+        LoggerStack(f"Running SQL quality checks over {source}"),
+        _quality_source(source) as (connection, from_sql, columns),
+    ):
+        types = _column_types(connection, from_sql)
+        errors: list[NudbQualityError] = [
+            NudbQualityError(f"You have duplicated columns in your column: {col}")
+            for col in find_duplicated_columns(pd.DataFrame(columns=columns))
+        ]
+
+        widths_def = {
+            col: widths_conf
+            for col, widths_conf in _get_widths_definition(
+                pd.DataFrame(columns=list(types)), widths
+            ).items()
+            if widths_conf
+        }
+        metadata = get_var_metadata()
+        klass_cols = [
+            col
+            for col, col_type in types.items()
+            if col_type != "BOOLEAN" and _has_klass_codelist(metadata, col)
+        ]
+
+        aggregates = _Aggregates()
+        for col, col_type in types.items():
+            quoted = _quote(col)
+            if col_type in _FLOAT_TYPES:
+                aggregates.add(
+                    "non_missing",
+                    col,
+                    f"COUNT_IF({quoted} IS NOT NULL AND NOT isnan({quoted}))",
+                )
+            else:
+                aggregates.add("non_missing", col, f"COUNT({quoted})")
+
+            if col in widths_def:
+                if col_type not in _STRING_TYPES:
+                    raise TypeError(
+                        f"Checking char widths using config: {col} should be string, but its a {col_type}."
+                    )
+                allowed = ", ".join(str(int(width)) for width in widths_def[col])
+                aggregates.add(
+                    "width_mismatches",
+                    col,
+                    f"COUNT(DISTINCT {quoted}) FILTER (WHERE length({quoted}) NOT IN ({allowed}))",
+                )
+            if col_type in _STRING_TYPES and col not in _SKIP_COLUMNS:
+                literals = ", ".join(_sql_string(x) for x in sorted(_BOOL_LITERALS))
+                aggregates.add(
+                    "bool_strings",
+                    col,
+                    f"COUNT(DISTINCT {quoted}) FILTER (WHERE {quoted} IN ({literals}))",
+                )
+            if col in klass_cols:
+                aggregates.add("distinct", col, f"COUNT(DISTINCT {quoted})")
+
+        n_rows, results = aggregates.run(connection, from_sql)
+
+        for col, widths_conf in widths_def.items():
+            n_mismatched = results[f"width_mismatches:{col}"]
+            if n_mismatched:
+                logger.debug(
+                    f"{n_mismatched} distinct values in {col} have other widths."
+                )
+                allowed = ", ".join(str(int(width)) for width in widths_conf)
+                mismatched = _distinct_values(
+                    connection,
+                    from_sql,
+                    col,
+                    where=f"length({_quote(col)}) NOT IN ({allowed})",
+                    limit=WIDTH_MISMATCHES_SHOWN,
+                )
+                errors.append(
+                    _width_error(col, widths_conf, mismatched, WIDTH_MISMATCHES_SHOWN)
+                )
+
+        for col in types:
+            count = results.get(f"bool_strings:{col}")
+            if count:
+                errors.append(
+                    NudbQualityError(
+                        f"Column {col} contains {count} booleans encoded as strings. "
+                        "This may indicate a bool column converted to string by accident."
+                    )
+                )
+
+        for col in types:
+            if not results[f"non_missing:{col}"]:
+                errors.append(
+                    NudbQualityError(
+                        f"Column {col} only contains empty values. Why is it in the dataset if it contains nothing?"
+                    )
+                )
+
+        if dataset_name is not None:
+            for col, threshold in get_thresholds_from_config(dataset_name).items():
+                if col not in types:
+                    errors.append(
+                        NudbQualityError(
+                            f"Cant find {col} that has defined emptiness {threshold} in the config. It should probably be in the dataset?"
+                        )
+                    )
+                    continue
+                missing = n_rows - results[f"non_missing:{col}"]
+                percent_empty = missing / n_rows * 100 if n_rows else 0.0
+                if percent_empty > threshold:
+                    errors.append(
+                        NudbQualityError(
+                            f"{col} has above the accepted threshold {threshold} amount of empty cells: {percent_empty} percent"
+                        )
+                    )
+
+        for col in klass_cols:
+            # Membership only depends on the distinct values, which are few for coded columns
+            n_distinct = results[f"distinct:{col}"]
+            if n_distinct > KLASS_MAX_DISTINCT_VALUES:
+                errors.append(
+                    NudbQualityError(
+                        f"Column {col} has {n_distinct} distinct values, more than any KLASS codelist, "
+                        f"only the first {KLASS_MAX_DISTINCT_VALUES} are checked against KLASS."
+                    )
+                )
+            distinct = (
+                _distinct_values(
+                    connection,
+                    from_sql,
+                    col,
+                    where=f"{_quote(col)} IS NOT NULL",
+                    limit=KLASS_MAX_DISTINCT_VALUES,
+                )
+                if n_distinct
+                else []
+            )
+            dtype = "string[pyarrow]" if types[col] in _STRING_TYPES else None
+            errors.extend(
+                _check_column_against_klass(
+                    pd.Series(distinct, dtype=dtype),
+                    col,
+                    metadata,
+                    data_time_start=data_time_start,
+                    data_time_end=data_time_end,
+                )
+            )
+
+        errors += _unique_per_person_errors(connection, from_sql, list(types))
+
+        if errors and raise_errors:
+            raise_exception_group(errors)
+        elif errors:
+            warn_exception_group(errors)
+        else:
+            logger.info(f"No quality errors in {source}.")
+        return errors
@@ -236,31 +236,32 @@ def subcheck_orgnrbed_orgnr_foretak_connected(
     )
 
     logger.info("Registering input orgnr connection pairs in DuckDB.")
-    con = nudb_database.get_connection()
-    con.register("orgnr_connection_check_input", check_connections)
-    lookup_sql = _bof_dated_orgnr_connections_lookup_sql(
-        input_alias="orgnr_connection_check_input",
-        orgnr_col=col_foretak_name,
-        orgnrbed_col=col_orgnrbed_name,
-    )
-
-    if lookup_sql is None:
-        logger.warning(
-            "Found no BOF files to build targeted orgnr connection lookup. Treating BOF lookup as empty."
-        )
-        bof_connections = pd.DataFrame(columns=["orgnr", "orgnrbed"])
-    else:
-        logger.info(
-            "Executing targeted BOF connection lookup query. If processing stops here, "
-            "DuckDB is scanning BOF files for only the orgnr values present in this dataset."
-        )
-        start = perf_counter()
-        bof_connections = con.sql(lookup_sql).df()
-        logger.info(
-            "Finished targeted BOF connection lookup query in "
-            f"{perf_counter() - start:.1f}s. Got {len(bof_connections)} distinct BOF pairs."
+    with nudb_database.registered(
+        check_connections, "orgnr_connection_check_input"
+    ) as input_alias:
+        lookup_sql = _bof_dated_orgnr_connections_lookup_sql(
+            input_alias=input_alias,
+            orgnr_col=col_foretak_name,
+            orgnrbed_col=col_orgnrbed_name,
         )
 
+        if lookup_sql is None:
+            logger.warning(
+                "Found no BOF files to build targeted orgnr connection lookup. Treating BOF lookup as empty."
+            )
+            bof_connections = pd.DataFrame(columns=["orgnr", "orgnrbed"])
+        else:
+            logger.info(
+                "Executing targeted BOF connection lookup query. If processing stops here, "
+                "DuckDB is scanning BOF files for only the orgnr values present in this dataset."
+            )
+            start = perf_counter()
+            bof_connections = nudb_database.get_connection().sql(lookup_sql).df()
+            logger.info(
+                "Finished targeted BOF connection lookup query in "
+                f"{perf_counter() - start:.1f}s. Got {len(bof_connections)} distinct BOF pairs."
+            )
+
     logger.info(
         "Finished BOF connection lookup preparation for "
         f"{n_unique_orgnr_foretak} unique {col_foretak_name} values and "
@@ -1,6 +1,31 @@
-"""High-level orchestration for NUDB quality checks."""
+"""High-level orchestration for NUDB quality checks.
 
+The checks only read the dataframe, so they can run concurrently, but by default
+they run one after another. The number of workers and the kind of pool can be
+configured with these environment variables:
+
+- `NUDB_QUALITY_SUITE_MAX_WORKERS`: Checks to run at the same time, defaults to 1,
+  which runs them one after another.
+- `NUDB_QUALITY_SUITE_EXECUTOR`: "thread" (the default) or "process". Processes avoid
+  the GIL, but need a copy of the dataframe. It is sent to each worker process once,
+  when the worker starts, instead of with every check.
+
+Every thread has its own logger stack, so checks can log from threads at the same
+time, only the printed lines of the checks are interleaved. Log records from worker
+processes are printed, but not kept by the log sinks of the calling process.
+"""
+
+import os
+import time
+import tracemalloc
+from collections.abc import Callable
 from collections.abc import Sequence
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Literal
 
 import pandas as pd
 
@@ -17,17 +42,188 @@ from nudb_use.quality.specific_variables import run_all_specific_variable_tests
 from nudb_use.quality.widths import check_column_widths
 from nudb_use.variables.checks import check_column_presence
 
+QUALITY_SUITE_MAX_WORKERS: int = int(
+    os.environ.get("NUDB_QUALITY_SUITE_MAX_WORKERS", 1)
+)
+QUALITY_SUITE_EXECUTOR: str = os.environ.get("NUDB_QUALITY_SUITE_EXECUTOR", "thread")
 
-def run_quality_suite(
+PROFILE_COLUMNS = ["check", "seconds", "peak_memory_mb", "n_errors"]
+
+_QualityCheck = tuple[str, Callable[..., Sequence[Exception]], dict[str, Any]]
+_CheckResult = tuple[list[Exception], float, float | None]
+
+# The dataframe checked in a worker process, set once by `_set_worker_df`
+_WORKER_DF: pd.DataFrame | None = None
+
+
+def _quality_checks(
+    df: pd.DataFrame,
+    dataset_name: str,
+    data_time_start: str | None,
+    data_time_end: str | None,
+    use_external_datasets: bool,
+    **kwargs: object,
+) -> list[_QualityCheck]:
+    """List the checks in the suite, in the order their errors are reported."""
+    return [
+        (
+            "check_column_presence",
+            check_column_presence,
+            {"df": df, "dataset_name": dataset_name, "raise_errors": False},
+        ),
+        ("check_outdated_variables", check_outdated_variables, {"df": df}),
+        ("check_duplicated_columns", check_duplicated_columns, {"df": df}),
+        ("check_dtypes", check_dtypes, {"df": df, "raise_errors": False}),
+        ("check_column_widths", check_column_widths, {"df": df, "raise_errors": False}),
+        (
+            "check_bool_string_columns",
+            check_bool_string_columns,
+            {"df": df, "raise_errors": False},
+        ),
+        (
+            "check_klass_codes",
+            check_klass_codes,
+            {
+                "df": df,
+                "data_time_start": data_time_start,
+                "data_time_end": data_time_end,
+                "raise_errors": False,
+            },
+        ),
+        (
+            "check_columns_only_missing",
+            check_columns_only_missing,
+            {"df": df, "raise_errors": False},
+        ),
+        (
+            "check_missing_thresholds_dataset_name",
+            check_missing_thresholds_dataset_name,
+            {"df": df, "dataset_name": dataset_name, "raise_errors": False},
+        ),
+        (
+            "run_all_specific_variable_tests",
+            run_all_specific_variable_tests,
+            {
+                "df": df,
+                "dataset_name": dataset_name,
+                "raise_errors": False,
+                "use_external_datasets": use_external_datasets,
+                **kwargs,
+            },
+        ),
+    ]
+
+
+def _run_check(
+    func: Callable[..., Sequence[Exception]],
+    kwargs: dict[str, Any],
+    trace_memory: bool,
+) -> _CheckResult:
+    """Run one check, timing it and optionally tracing its peak Python memory."""
+    started_tracing = False
+    if trace_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    try:
+        errors = list(func(**kwargs))
+    finally:
+        seconds = time.perf_counter() - start
+        peak_memory_mb = None
+        if trace_memory:
+            peak_memory_mb = (
+                tracemalloc.get_traced_memory()[1] - memory_before
+            ) / 1024**2
+        if started_tracing:
+            tracemalloc.stop()
+
+    return errors, seconds, peak_memory_mb
+
+
+def _set_worker_df(df: pd.DataFrame) -> None:
+    """Keep the dataframe in a worker process, for all the checks it runs."""
+    global _WORKER_DF
+    _WORKER_DF = df
+
+
+def _run_check_on_worker_df(
+    func: Callable[..., Sequence[Exception]],
+    kwargs: dict[str, Any],
+    trace_memory: bool,
+) -> _CheckResult:
+    """Run one check in a worker process, on the dataframe it was started with."""
+    return _run_check(func, {**kwargs, "df": _WORKER_DF}, trace_memory)
+
+
+def _make_executor(
+    executor: Literal["thread", "process"], max_workers: int, df: pd.DataFrame
+) -> Executor:
+    if executor == "thread":
+        return ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="nudb_quality"
+        )
+    if executor == "process":
+        return ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_set_worker_df, initargs=(df,)
+        )
+    raise ValueError(f"executor must be 'thread' or 'process', not {executor!r}.")
+
+
+def _run_checks(
+    checks: list[_QualityCheck],
+    df: pd.DataFrame,
+    max_workers: int,
+    executor: Literal["thread", "process"],
+    trace_memory: bool,
+) -> list[_CheckResult]:
+    """Run the checks, returning their results in the order of `checks`, however they finish."""
+    max_workers = min(max_workers, len(checks))
+    if max_workers <= 1:
+        return [_run_check(func, kwargs, trace_memory) for _, func, kwargs in checks]
+
+    # Traced memory is shared by all threads, so a thread cannot tell its own peak apart
+    trace_memory = trace_memory and executor == "process"
+    with _make_executor(executor, max_workers, df) as pool:
+        futures: list[Future[_CheckResult]]
+        if executor == "process":
+            # Pickling the dataframe with every check would copy it once per check
+            futures = [
+                pool.submit(
+                    _run_check_on_worker_df,
+                    func,
+                    {name: value for name, value in kwargs.items() if name != "df"},
+                    trace_memory,
+                )
+                for _, func, kwargs in checks
+            ]
+        else:
+            futures = [
+                pool.submit(_run_check, func, kwargs, trace_memory)
+                for _, func, kwargs in checks
+            ]
+        return [future.result() for future in futures]
+
+
+def run_quality_suite_profiled(
     df: pd.DataFrame,
     dataset_name: str,
     data_time_start: str | None = None,
     data_time_end: str | None = None,
     raise_errors: bool = True,
     use_external_datasets: bool = True,
+    max_workers: int | None = None,
+    executor: Literal["thread", "process"] | None = None,
+    trace_memory: bool = True,
     **kwargs: object,
-) -> Sequence[Exception]:
-    """Run the full NUDB quality suite over a dataset.
+) -> tuple[list[Exception], pd.DataFrame]:
+    """Run the full NUDB quality suite over a dataset, and profile each check.
+
+    Errors are collected in the same order as when the checks run one after
+    another, however many workers are used.
 
     Args:
         df: DataFrame to validate.
@@ -36,11 +232,17 @@ def run_quality_suite(
         data_time_end: Optional end date used by codelist validations.
         raise_errors: When True, raise grouped exceptions if any check fails.
         use_external_datasets: When True will use external datasets (not Nudbs datasets) to verify data.
+        max_workers: Checks to run at the same time, defaults to `QUALITY_SUITE_MAX_WORKERS`.
+        executor: Run concurrent checks in threads or processes, defaults to `QUALITY_SUITE_EXECUTOR`.
+        trace_memory: Trace the peak Python memory of each check with tracemalloc, which slows
+            the checks down. Traced when the checks run one after another, or in worker
+            processes. Checks running in threads share the traced memory, so their
+            peak_memory_mb is None.
         **kwargs: Additional keyword arguments forwarded to specific checks.
 
     Returns:
-        Sequence[Exception]: All collected quality errors, or an empty sequence
-        when every check passes.
+        tuple[list[Exception], pd.DataFrame]: All collected quality errors, and one row per
+            check with its wall time in seconds, peak memory in MB and number of errors.
 
     Raises:
         TypeError: If the first parameter df is not a pandas dataframe.
@@ -49,31 +251,82 @@ def run_quality_suite(
         raise TypeError(
             f"First parameter (df) into `run_quality_suite` must be a pandas dataframe, not a {type(df)}."
         )
+    max_workers = QUALITY_SUITE_MAX_WORKERS if max_workers is None else max_workers
+    if executor is None:
+        executor = "process" if QUALITY_SUITE_EXECUTOR == "process" else "thread"
 
-    errors = []
-    errors += check_column_presence(df, dataset_name=dataset_name, raise_errors=False)
-    errors += check_outdated_variables(df)
-    errors += check_duplicated_columns(df)
-    errors += check_dtypes(df, raise_errors=False)
-    errors += check_column_widths(df, raise_errors=False)
-    errors += check_bool_string_columns(df, raise_errors=False)
-
-    errors += check_klass_codes(df, data_time_start, data_time_end, raise_errors=False)
-    errors += check_columns_only_missing(df, raise_errors=False)
-    errors += check_missing_thresholds_dataset_name(
-        df, dataset_name=dataset_name, raise_errors=False
-    )
-
-    errors += run_all_specific_variable_tests(
+    checks = _quality_checks(
         df,
         dataset_name=dataset_name,
-        raise_errors=False,
+        data_time_start=data_time_start,
+        data_time_end=data_time_end,
         use_external_datasets=use_external_datasets,
         **kwargs,
     )
+    results = _run_checks(checks, df, max_workers, executor, trace_memory)
+
+    errors: list[Exception] = []
+    for check_errors, _, _ in results:
+        errors += check_errors
+    profile = pd.DataFrame(
+        [
+            (name, seconds, peak_memory_mb, len(check_errors))
+            for (name, _, _), (check_errors, seconds, peak_memory_mb) in zip(
+                checks, results, strict=True
+            )
+        ],
+        columns=PROFILE_COLUMNS,
+    )
+    slowest_name, slowest_seconds = max(
+        zip(profile["check"], profile["seconds"], strict=True), key=lambda x: x[1]
+    )
+    logger.debug(f"Slowest quality check: {slowest_name} ({slowest_seconds:.2f}s)")
 
     if errors and raise_errors:
         raise_exception_group(errors)
     if not errors:
         logger.info(f"No quality errors for dataset {dataset_name}.")
+    return errors, profile
+
+
+def run_quality_suite(
+    df: pd.DataFrame,
+    dataset_name: str,
+    data_time_start: str | None = None,
+    data_time_end: str | None = None,
+    raise_errors: bool = True,
+    use_external_datasets: bool = True,
+    max_workers: int | None = None,
+    executor: Literal["thread", "process"] | None = None,
+    **kwargs: object,
+) -> Sequence[Exception]:
+    """Run the full NUDB quality suite over a dataset.
+
+    Args:
+        df: DataFrame to validate.
+        dataset_name: Name of the dataset in config; controls which part of the config to choose for values used in the valiadations.
+        data_time_start: Optional start date used by codelist validations.
+        data_time_end: Optional end date used by codelist validations.
+        raise_errors: When True, raise grouped exceptions if any check fails.
+        use_external_datasets: When True will use external datasets (not Nudbs datasets) to verify data.
+        max_workers: Checks to run at the same time, defaults to `QUALITY_SUITE_MAX_WORKERS`.
+        executor: Run concurrent checks in threads or processes, defaults to `QUALITY_SUITE_EXECUTOR`.
+        **kwargs: Additional keyword arguments forwarded to specific checks.
+
+    Returns:
+        Sequence[Exception]: All collected quality errors, or an empty sequence
+        when every check passes.
+    """
+    errors, _ = run_quality_suite_profiled(
+        df,
+        dataset_name=dataset_name,
+        data_time_start=data_time_start,
+        data_time_end=data_time_end,
+        raise_errors=raise_errors,
+        use_external_datasets=use_external_datasets,
+        max_workers=max_workers,
+        executor=executor,
+        trace_memory=False,
+        **kwargs,
+    )
     return errors
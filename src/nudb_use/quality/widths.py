@@ -47,6 +47,18 @@ def _ensure_string_column(series: pd.Series, col: str) -> None:
     )
 
 
+def _width_error(
+    col: str, widths_conf: list[int], mismatched_values: list[str], maxprint: int = 50
+) -> NudbQualityError:
+    unique_mismatch_vals = ",\n".join(mismatched_values[:maxprint])
+    too_many_message = (
+        f"first {maxprint}" if len(unique_mismatch_vals) > maxprint else ""
+    )
+    return NudbQualityError(
+        f"In {col} found values not of the defined widths: {widths_conf}, the {too_many_message} mismatched codes:\n{unique_mismatch_vals}"
+    )
+
+
 def _find_width_errors(
     df: pd.DataFrame, widths_def: dict[str, list[int]], maxprint: int = 50
 ) -> list[NudbQualityError]:
@@ -61,17 +73,10 @@ def _find_width_errors(
         try:
             len_mask_diff = (~df[col].str.len().isin(widths_conf)) & (~df[col].isna())
             if len_mask_diff.sum():
-                first_values = pd.Series(df[len_mask_diff][col].unique()).head(
-                    maxprint
-                )  # pd.Series.unique() doesn't return a Series object if dtype is a pyarrow type
-                unique_mismatch_vals = ",\n".join(list(first_values))
-                too_many_message = (
-                    f"first {maxprint}" if len(unique_mismatch_vals) > maxprint else ""
-                )
+                # pd.Series.unique() doesn't return a Series object if dtype is a pyarrow type
+                mismatched_values = list(pd.Series(df[len_mask_diff][col].unique()))
                 errors.append(
-                    NudbQualityError(
-                        f"In {col} found values not of the defined widths: {widths_conf}, the {too_many_message} mismatched codes:\n{unique_mismatch_vals}"
-                    )
+                    _width_error(col, widths_conf, mismatched_values, maxprint)
                 )
         except AttributeError as e:
             raise TypeError(
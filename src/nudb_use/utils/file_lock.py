@@ -0,0 +1,139 @@
+"""A lock on a directory, shared by the sessions and hosts writing to it.
+
+The lock is a file created exclusively in the directory, so it also works on
+shared file systems without `flock`. It holds the host, pid and time of its
+holder, so a lock left behind by a crashed process can be taken over.
+"""
+
+import json
+import os
+import socket
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from nudb_use.nudb_logger import logger
+
+LOCK_FILE = ".lock"
+
+
+def _read_lock(lock_path: Path) -> str:
+    try:
+        return lock_path.read_text(encoding="utf-8", errors="replace")
+    except FileNotFoundError:
+        return ""
+
+
+def _pid_running(pid: int) -> bool:
+    if os.name == "nt":  # os.kill would end the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Running, as another user
+        return True
+    return True
+
+
+def _stale_lock_reason(lock_path: Path, content: str, stale_after: float) -> str | None:
+    """Tell why a lock is stale, or None if its holder may still be writing."""
+    host: str | None = None
+    pid: int | None = None
+    try:
+        holder = json.loads(content)
+        host, pid = str(holder["host"]), int(holder["pid"])
+        locked_at = float(holder["time"])
+    except (ValueError, KeyError, TypeError):
+        # Taken by an older version, or its holder has not written to it yet
+        try:
+            locked_at = lock_path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    if host == socket.gethostname() and pid is not None and not _pid_running(pid):
+        return f"process {pid} on {host} is no longer running"
+    age = time.time() - locked_at
+    if age > stale_after:
+        return f"it was taken {age:.0f} seconds ago"
+    return None
+
+
+def _break_stale_lock(lock_path: Path, stale_content: str) -> None:
+    """Remove a stale lock, unless another writer took the lock after it was found stale."""
+    broken = lock_path.with_name(f"{lock_path.name}.stale-{uuid.uuid4().hex}")
+    try:
+        os.rename(lock_path, broken)
+    except FileNotFoundError:
+        return
+    if _read_lock(broken) != stale_content:
+        try:  # Give the lock back, if nobody has taken it in the meantime
+            os.link(broken, lock_path)
+        except FileExistsError:
+            pass
+    broken.unlink(missing_ok=True)
+
+
+@contextmanager
+def directory_lock(
+    directory: Path, timeout: float, stale_after: float
+) -> Iterator[None]:
+    """Hold the lock of a directory, waiting for other holders to finish.
+
+    A lock left behind by a process that is no longer running on this host,
+    or taken more than `stale_after` seconds ago, is stale and taken over.
+
+    Args:
+        directory: The directory to lock, created if it does not exist.
+        timeout: Seconds to wait for the lock.
+        stale_after: Seconds after which a lock is taken over, even if its
+            holder may still be running.
+
+    Yields:
+        None: While the lock is held.
+
+    Raises:
+        TimeoutError: If the lock is not released by its holder within the timeout.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    lock_path = directory / LOCK_FILE
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            holder = _read_lock(lock_path)
+            stale_reason = _stale_lock_reason(lock_path, holder, stale_after)
+            if stale_reason is not None:
+                logger.warning(
+                    f"Taking over the stale lock of {directory}, {stale_reason}."
+                )
+                _break_stale_lock(lock_path, holder)
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f"{directory} is locked by {holder!r}. If that process is no longer running, delete {lock_path}."
+                ) from None
+            time.sleep(0.1)
+
+    own = json.dumps(
+        {
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "time": time.time(),
+            "token": uuid.uuid4().hex,
+        }
+    )
+    try:
+        try:
+            os.write(lock_fd, own.encode())
+        finally:
+            os.close(lock_fd)
+        yield
+    finally:
+        # Taken over as stale by another writer if held for too long, that lock is not ours
+        if _read_lock(lock_path) in {own, ""}:
+            lock_path.unlink(missing_ok=True)
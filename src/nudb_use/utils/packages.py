@@ -1,17 +1,49 @@
 from __future__ import annotations
 
+import configparser
+import importlib.metadata
+import json
+import os
 import re
+import socket
 import subprocess
 import sys
+import threading
+import time
 import warnings
 from collections.abc import Callable
 from functools import wraps
+from pathlib import Path
 from typing import ParamSpec
 from typing import Self
 from typing import TypeVar
+from urllib.parse import urlparse
+
+import requests
 
 from nudb_use.nudb_logger import logger
 
+# Checking for new versions can be configured with these environment variables:
+# - `NUDB_VERSION_CHECK`: Set to "0" or "false" to skip the check, e.g. in offline batch jobs.
+# - `NUDB_VERSION_CHECK_MAX_AGE_HOURS`: Hours before the latest version is looked up again.
+# - `NUDB_VERSION_CHECK_CACHE_DIR`: Directory to store the latest versions in.
+# The latest version is looked up in the index pip installs from, set by `PIP_INDEX_URL`
+# or `index-url` in a pip config file. The PyPI JSON API is only used for PyPI itself,
+# other indexes (mirrors) are asked with `pip index versions`.
+VERSION_CHECK_MAX_AGE_HOURS: float = float(
+    os.environ.get("NUDB_VERSION_CHECK_MAX_AGE_HOURS", 24)
+)
+VERSION_CHECK_CACHE_DIR: Path = Path(
+    os.environ.get(
+        "NUDB_VERSION_CHECK_CACHE_DIR",
+        Path.home() / ".cache" / "nudb_use" / "version_check",
+    )
+)
+PYPI_INDEX_URL: str = "https://pypi.org/simple"
+VERSION_CHECK_URL: str = "https://pypi.org/pypi/{package}/json"
+VERSION_CHECK_TIMEOUT: float = 2.0
+VERSION_CHECK_PIP_TIMEOUT: float = 60.0
+
 P = ParamSpec("P")
 R = TypeVar("R")
 
@@ -96,27 +128,121 @@ def _parse_version_number(version: str) -> _VersionNumber:
     return _VersionNumber(nums)
 
 
-def _check_package_version(package: str) -> None:
+def _version_check_disabled() -> bool:
+    return os.environ.get("NUDB_VERSION_CHECK", "1").strip().lower() in {
+        "0",
+        "false",
+        "no",
+        "off",
+    }
+
+
+def _version_cache_path(package: str) -> Path:
+    return VERSION_CHECK_CACHE_DIR / f"{package}.json"
+
+
+def _read_cached_latest_version(package: str, max_age_hours: float) -> str | None:
+    """Get the latest version found by an earlier check, if it is recent enough."""
+    try:
+        cached = json.loads(_version_cache_path(package).read_text(encoding="utf-8"))
+        if time.time() - float(cached["checked_at"]) > max_age_hours * 60 * 60:
+            return None
+        return str(cached["latest"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_cached_latest_version(package: str, latest: str) -> None:
+    path = _version_cache_path(package)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(
+        json.dumps({"latest": latest, "checked_at": time.time()}), encoding="utf-8"
+    )
+    os.replace(tmp_path, path)
+
+
+def _network_available(url: str, timeout: float = VERSION_CHECK_TIMEOUT) -> bool:
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        with socket.create_connection((parsed.hostname or "", port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def _pip_config_files() -> list[Path]:
+    """List the config files pip reads, the later ones override the earlier ones."""
+    xdg_config_dirs = os.environ.get("XDG_CONFIG_DIRS", "/etc/xdg").split(os.pathsep)
+    xdg_config_home = os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config")
+    files = [Path(config_dir) / "pip" / "pip.conf" for config_dir in xdg_config_dirs]
+    files += [
+        Path("/etc/pip.conf"),
+        Path.home() / ".pip" / "pip.conf",
+        Path(xdg_config_home) / "pip" / "pip.conf",
+        Path(sys.prefix) / "pip.conf",
+    ]
+    if os.environ.get("PIP_CONFIG_FILE"):
+        files.append(Path(os.environ["PIP_CONFIG_FILE"]))
+    return files
+
+
+def _pip_index_url() -> str:
+    """Get the index pip installs from, like pip reads it from the environment and its config files."""
+    if os.environ.get("PIP_INDEX_URL"):
+        return os.environ["PIP_INDEX_URL"]
+
+    index_url = PYPI_INDEX_URL
+    for path in _pip_config_files():
+        config = configparser.ConfigParser()
+        try:
+            config.read(path, encoding="utf-8")
+        except (OSError, configparser.Error):
+            continue
+        for section in ("global", "install"):
+            index_url = config.get(section, "index-url", fallback=index_url)
+    return index_url.strip()
+
+
+def _is_pypi(index_url: str) -> bool:
+    parsed = urlparse(index_url)
+    return parsed.hostname == "pypi.org" and parsed.path.rstrip("/") in {"", "/simple"}
+
+
+def _fetch_latest_version_with_pip(package: str) -> str | None:
+    """Ask pip for the latest version, so its index, credentials and certificates are used."""
     result = subprocess.run(
         [sys.executable, "-m", "pip", "index", "versions", package],
         capture_output=True,
+        timeout=VERSION_CHECK_PIP_TIMEOUT,
     )
-    stdout = result.stdout.decode("utf-8")
+    # The first line is "<package> (<latest version>)"
+    latest = re.match(r"\S+ \(([^)]+)\)", result.stdout.decode("utf-8"))
+    if latest is None:
+        logger.debug(f"pip found no versions of `{package}`.")
+        return None
+    return latest.group(1)
 
-    version_pattern = "([\\.0-9\\-]+)"
-    installed = re.search(f"INSTALLED:\\s+{version_pattern}", stdout)
-    latest = re.search(f"LATEST:\\s+{version_pattern}", stdout)
 
-    if not installed:
-        logger.warning(f"Unable to determine installed version of `{package}`")
+def _fetch_latest_version(package: str) -> str | None:
+    """Ask the package index for the latest version, None when it can't be reached."""
+    index_url = _pip_index_url()
+    if not _network_available(index_url):
+        logger.debug(f"No network, skipping the version check of `{package}`.")
         return None
+    if not _is_pypi(index_url):
+        return _fetch_latest_version_with_pip(package)
+    response = requests.get(
+        VERSION_CHECK_URL.format(package=package), timeout=VERSION_CHECK_TIMEOUT
+    )
+    response.raise_for_status()
+    return str(response.json()["info"]["version"])
 
-    elif not latest:
-        logger.warning(f"Unable to determine latest version of `{package}`")
-        return None
 
-    v_installed = _parse_version_number(installed.group(1))
-    v_latest = _parse_version_number(latest.group(1))
+def _warn_if_outdated(package: str, installed: str, latest: str) -> None:
+    v_installed = _parse_version_number(installed)
+    v_latest = _parse_version_number(latest)
 
     if v_installed < v_latest:
         logger.warning(
@@ -124,8 +250,58 @@ def _check_package_version(package: str) -> None:
         )
 
 
+def _check_package_version(package: str, use_cache: bool = True) -> None:
+    try:
+        installed = importlib.metadata.version(package)
+    except importlib.metadata.PackageNotFoundError:
+        logger.warning(f"Unable to determine installed version of `{package}`")
+        return None
+
+    latest = (
+        _read_cached_latest_version(package, VERSION_CHECK_MAX_AGE_HOURS)
+        if use_cache
+        else None
+    )
+    if latest is None:
+        latest = _fetch_latest_version(package)
+        if latest is None:
+            return None
+        _write_cached_latest_version(package, latest)
+
+    _warn_if_outdated(package, installed, latest)
+
+
 def _try_check_package_version(package: str) -> None:
     try:
         _check_package_version(package)
     except Exception as err:
         logger.warning(f"Unable to validate `{package}` version!\nMessage: {err}")
+
+
+def check_package_versions_in_background(
+    packages: list[str],
+) -> threading.Thread | None:
+    """Warn about outdated packages without delaying the caller.
+
+    The latest versions are looked up in a daemon thread, and stored on disk for
+    `VERSION_CHECK_MAX_AGE_HOURS`, so most imports only read a small file.
+    The thread logs in a logger stack of its own, so it does not end up inside
+    the LoggerStack the importing code happens to be in.
+    Nothing is checked when the environment variable `NUDB_VERSION_CHECK` is "0" or "false".
+
+    Args:
+        packages: Names of the installed distributions to check, e.g. "ssb-nudb-use".
+
+    Returns:
+        threading.Thread | None: The started thread, or None when the check is disabled.
+    """
+    if _version_check_disabled():
+        return None
+
+    def check_all() -> None:
+        for package in packages:
+            _try_check_package_version(package)
+
+    thread = threading.Thread(target=check_all, name="nudb_version_check", daemon=True)
+    thread.start()
+    return thread
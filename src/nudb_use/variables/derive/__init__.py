@@ -1,95 +1,113 @@
-"""Variable-derivation helpers for NUDB pipelines."""
+"""Variable-derivation helpers for NUDB pipelines.
 
-module = __import__(__name__, fromlist=[""])  # pass nonempty fromlist
-from collections.abc import Callable
+The derive functions live in the submodules, some of them generated from the
+config. Submodules are imported, and generated functions created, the first
+time they are used (PEP 562), so importing `derive` costs almost nothing.
+"""
+
+import importlib
+import importlib.util
 from types import ModuleType
+from typing import TYPE_CHECKING
+from typing import Any
 
-from nudb_use.nudb_logger import logger
-
-from . import bof
-from . import fullfoert
-from . import fullfoert_foerste
-from . import klass_correspondences_and_variants
-from . import klass_labels
-from . import land
-from . import person
-from . import person_idents
-from . import registrert
-from . import registrert_foerste
-from . import utd_foreldres_utdnivaa
-from . import utd_hoeyeste
-from .derive_decorator import get_derive_function
-
-derive_all_submodules = (
-    fullfoert_foerste,
-    fullfoert,
-    utd_hoeyeste,
-    utd_foreldres_utdnivaa,
-    registrert_foerste,
-    registrert,
-    klass_correspondences_and_variants,
-    klass_labels,
-    land,
-    person_idents,
-    person,
-    bof,
-)
+if TYPE_CHECKING:  # Lets type checkers and IDEs see the lazy attributes
+    from .bof import bof_eierforhold as bof_eierforhold
+    from .derive_decorator import get_derive_function as get_derive_function
+    from .derive_planner import derive_variables as derive_variables
+    from .derive_planner import plan_derive_variables as plan_derive_variables
+    from .nus_variants import utd_erforeldet_kode_nus as utd_erforeldet_kode_nus
+    from .nus_variants import utd_klassetrinn_hoey_nus as utd_klassetrinn_hoey_nus
+    from .nus_variants import utd_klassetrinn_lav_nus as utd_klassetrinn_lav_nus
+    from .person import pers_foedselsdato as pers_foedselsdato
+    from .person import pers_invkat as pers_invkat
+    from .person import pers_kjoenn as pers_kjoenn
+    from .utd_hoeyeste import utd_hoeyeste_rangering as utd_hoeyeste_rangering
+    from .utd_skoleaar import utd_skoleaar_slutt as utd_skoleaar_slutt
 
-from .bof import bof_eierforhold
-from .nus_variants import utd_erforeldet_kode_nus
-from .nus_variants import utd_klassetrinn_hoey_nus
-from .nus_variants import utd_klassetrinn_lav_nus
-from .person import pers_foedselsdato
-from .person import pers_invkat
-from .person import pers_kjoenn
+# Has the same name as its submodule, importing the submodule would otherwise bind the module here
 from .uh_univ_eller_hoegskole import uh_univ_eller_hoegskole
-from .utd_hoeyeste import utd_hoeyeste_rangering
-from .utd_skoleaar import utd_skoleaar_slutt
-
-__all__ = [
-    "bof_eierforhold",
-    "pers_foedselsdato",
-    "pers_invkat",
-    "pers_kjoenn",
-    "uh_univ_eller_hoegskole",
-    "utd_erforeldet_kode_nus",
-    "utd_hoeyeste_rangering",
-    "utd_klassetrinn_hoey_nus",
-    "utd_klassetrinn_lav_nus",
-    "utd_skoleaar_slutt",
-]
-
-
-# We add to __all__ dynamically from these
+
+# Functions exported from submodules without an `__all__`, or outside the loop below
+_EXPLICIT_EXPORTS: dict[str, str] = {
+    "bof_eierforhold": "bof",
+    "pers_foedselsdato": "person",
+    "pers_invkat": "person",
+    "pers_kjoenn": "person",
+    "uh_univ_eller_hoegskole": "uh_univ_eller_hoegskole",
+    "utd_erforeldet_kode_nus": "nus_variants",
+    "utd_hoeyeste_rangering": "utd_hoeyeste",
+    "utd_klassetrinn_hoey_nus": "nus_variants",
+    "utd_klassetrinn_lav_nus": "nus_variants",
+    "utd_skoleaar_slutt": "utd_skoleaar",
+}
+
+# Helpers available from `derive`, but not derive functions themselves
+_HELPERS: dict[str, str] = {
+    "derive_variables": "derive_planner",
+    "get_derive_function": "derive_decorator",
+    "plan_derive_variables": "derive_planner",
+}
+
+# Only annotated, so the first lookup goes through `__getattr__`, which builds it
+__all__: list[str]
+
+# We add to __all__ from the `__all__` of these, in this order
 DERIVE_ALL_SUBMODULES = (
-    fullfoert_foerste,
-    fullfoert,
-    utd_hoeyeste,
-    utd_foreldres_utdnivaa,
-    registrert_foerste,
-    registrert,
-    klass_correspondences_and_variants,
-    klass_labels,
-    land,
-    person_idents,
-    person,
+    "fullfoert_foerste",
+    "fullfoert",
+    "utd_hoeyeste",
+    "utd_foreldres_utdnivaa",
+    "registrert_foerste",
+    "registrert",
+    "klass_correspondences_and_variants",
+    "klass_labels",
+    "land",
+    "person_idents",
+    "person",
 )
 
 
-def add_function(name: str, submodule: ModuleType) -> None:
-    try:
-        setattr(module, name, getattr(submodule, name))
-        __all__.append(name)
-    except Exception as err:
-        logger.warning(
-            f"Unable to attach '{name}' function to 'derive' module!\nMessage: {err}"
-        )
+def _import_submodule(name: str) -> ModuleType:
+    return importlib.import_module(f"{__name__}.{name}")
+
+
+def _derive_all() -> list[str]:
+    names = list(_EXPLICIT_EXPORTS)
+    for submodule_name in DERIVE_ALL_SUBMODULES:
+        names += _import_submodule(submodule_name).__all__
+    return names
+
+
+def _find_in_derive_all_submodules(name: str) -> ModuleType | None:
+    for submodule_name in DERIVE_ALL_SUBMODULES:
+        submodule = _import_submodule(submodule_name)
+        if name in submodule.__all__:
+            return submodule
+    return None
 
 
-def add_all_from_module(submodule: ModuleType) -> None:
-    for func in submodule.__all__:
-        add_function(func, submodule)
+def __getattr__(name: str) -> Any:
+    """Import derive functions and submodules the first time they are used."""
+    if name == "__all__":
+        value: Any = _derive_all()
+    elif name.startswith("__"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    elif name in _EXPLICIT_EXPORTS:
+        value = getattr(_import_submodule(_EXPLICIT_EXPORTS[name]), name)
+    elif name in _HELPERS:
+        value = getattr(_import_submodule(_HELPERS[name]), name)
+    elif importlib.util.find_spec(f"{__name__}.{name}") is not None:
+        return _import_submodule(name)
+    elif (submodule := _find_in_derive_all_submodules(name)) is not None:
+        value = getattr(submodule, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
 
 
-for submodule in DERIVE_ALL_SUBMODULES:
-    add_all_from_module(submodule)
+def __dir__() -> list[str]:
+    """List the derive functions for autocompletion, without creating them."""
+    derive_all = globals().get("__all__") or __getattr__("__all__")
+    return sorted({*globals(), *derive_all, *_HELPERS})
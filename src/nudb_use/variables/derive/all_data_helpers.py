@@ -69,7 +69,7 @@ def _get_column_aliases(columns: list[str], available: list[str]) -> str:
     )
 
 
-def get_source_data(
+def get_source_data(  # noqa: DOC503
     variable_name: str,
     df_left: pd.DataFrame | None = None,
 ) -> pd.DataFrame:
@@ -120,17 +120,51 @@ def get_source_data(
         set(dict.fromkeys([*derived_join_keys, *baselevel_derived_from]))
     )
 
-    datasets = [NudbData(ds_name) for ds_name in derived_uses_datasets]
+    return read_source_columns(
+        variable_name,
+        datasets=list(derived_uses_datasets),
+        join_keys=list(derived_join_keys),
+        cols_to_read=cols_to_read,
+        df_left=df_left,
+    )
+
+
+def read_source_columns(
+    label: str,
+    datasets: list[str],
+    join_keys: list[str],
+    cols_to_read: list[str],
+    df_left: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """Read some columns from a union of NUDB-datasets, limited to the keys in `df_left`.
+
+    Columns missing from a dataset are read as NULL, so all datasets can be unioned.
+
+    Args:
+        label: What the data is read for, used in logging and error messages.
+        datasets: Names of the NudbData-datasets to union.
+        join_keys: Columns to filter on the key combinations in `df_left`.
+        cols_to_read: Columns to select from each dataset, should include the join keys.
+        df_left: If provided, limits source rows to those matching the join-key
+            combinations present in this dataframe.
+
+    Returns:
+        pd.DataFrame: A pandas DataFrame containing the unioned (and possibly filtered) source data.
+
+    Raises:
+        KeyError: If `df_left` is missing required join key columns.
+    """
+    nudb_datasets = [NudbData(ds_name) for ds_name in datasets]
 
-    aliases = [dataset.alias for dataset in datasets]
+    aliases = [dataset.alias for dataset in nudb_datasets]
 
-    available_cols = [dataset.get_available_cols() for dataset in datasets]
+    available_cols = [dataset.get_available_cols() for dataset in nudb_datasets]
 
     col_aliases = [
         _get_column_aliases(cols_to_read, available) for available in available_cols
     ]
 
-    logger.info(f"datasets used to form `source_data`:\n{datasets}")
+    logger.info(f"datasets used to form `source_data`:\n{nudb_datasets}")
 
     # Build a UNION ALL over all datasets, selecting only needed columns.
     union_sql = "\nUNION ALL BY NAME\n".join(
@@ -147,17 +181,17 @@ def get_source_data(
         return connection.execute(union_sql).df()
 
     # Validate presence of join keys in df_left
-    missing = [k for k in derived_join_keys if k not in df_left.columns]
+    missing = [k for k in join_keys if k not in df_left.columns]
     if missing:
         raise KeyError(
-            f"{variable_name}: df_left is missing join keys {missing}. "
-            f"Expected columns: {list(derived_join_keys)}"
+            f"{label}: df_left is missing join keys {missing}. "
+            f"Expected columns: {list(join_keys)}"
         )
 
     # Build a distinct key table from the incoming data, dropping rows where any join key is NA.
     key_filter_df = (
-        df_left.loc[:, list(derived_join_keys)]
-        .dropna(subset=list(derived_join_keys), how="any")
+        df_left.loc[:, list(join_keys)]
+        .dropna(subset=list(join_keys), how="any")
         .drop_duplicates()
         .reset_index(drop=True)
     )
@@ -167,7 +201,7 @@ def get_source_data(
         return pd.DataFrame(columns=cols_to_read)
 
     # Filter source rows to overlap join-key combinations using an INNER JOIN.
-    using_keys = ", ".join(derived_join_keys)
+    using_keys = ", ".join(join_keys)
 
     filtered_sql = f"""
     SELECT DISTINCT
@@ -1,17 +1,82 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from nudb_config import settings
 
 from nudb_use.datasets import NudbData
+from nudb_use.datasets.nudb_database import nudb_database
 from nudb_use.nudb_logger import logger
 from nudb_use.variables.derive.derive_decorator import wrap_derive
 
 __all__ = ["bof_eierforhold"]
 
+# Orgnr filled with zeros means missing, and should not match the catalogue
+MISSING_ORGNR = "000000000"
+
 
 def _percent_notna(s: pd.Series) -> float:
     return 0.0 if not len(s) else float(round(s.notna().sum() / len(s) * 100, 2))
 
 
+def _orgnr_keys(df: pd.DataFrame) -> pa.Table:
+    """The orgnr of each row, numbered by position so the results can be aligned."""
+    keys = {"_row_id": pa.array(np.arange(len(df), dtype=np.int64))}
+    for col in ("orgnr_foretak", "orgnrbed"):
+        values = df[col] if col in df.columns else pd.Series(pd.NA, index=df.index)
+        keys[col] = pa.array(values.astype("string[pyarrow]").array, type=pa.string())
+    return pa.table(keys)
+
+
+def _bof_eierforhold_lookup_sql(keys_alias: str, catalogue_alias: str) -> str:
+    """Match the input rows to the eierforhold from the latest BOF period of their orgnr.
+
+    The catalogue is semi-joined on the orgnr in the input, before the latest
+    period of each orgnr_foretak and orgnrbed is picked. Within a period, an
+    eierforhold is preferred over a missing one.
+    """
+    return f"""
+        WITH input AS (
+            SELECT
+                _row_id,
+                NULLIF(orgnr_foretak, '{MISSING_ORGNR}') AS orgnr_foretak,
+                NULLIF(orgnrbed, '{MISSING_ORGNR}') AS orgnrbed
+            FROM {keys_alias}
+        ),
+        foretak AS (
+            SELECT
+                c.orgnr_foretak,
+                ARG_MAX_NULL(
+                    c.bof_eierforhold, (c.bof_period_date, COALESCE(c.bof_eierforhold, ''))
+                ) AS bof_eierforhold
+            FROM {catalogue_alias} AS c
+            SEMI JOIN input AS i
+                ON c.orgnr_foretak = i.orgnr_foretak
+            GROUP BY c.orgnr_foretak
+        ),
+        bedrift AS (
+            SELECT
+                c.orgnrbed,
+                ARG_MAX_NULL(
+                    c.bof_eierforhold, (c.bof_period_date, COALESCE(c.bof_eierforhold, ''))
+                ) AS bof_eierforhold
+            FROM {catalogue_alias} AS c
+            SEMI JOIN input AS i
+                ON c.orgnrbed = i.orgnrbed
+            GROUP BY c.orgnrbed
+        )
+        SELECT
+            i._row_id,
+            f.bof_eierforhold AS eierforhold_foretak,
+            b.bof_eierforhold AS eierforhold_bedrift
+        FROM input AS i
+        LEFT JOIN foretak AS f
+            ON i.orgnr_foretak = f.orgnr_foretak
+        LEFT JOIN bedrift AS b
+            ON i.orgnrbed = b.orgnrbed
+        ORDER BY i._row_id
+    """
+
+
 @wrap_derive
 def bof_eierforhold(df: pd.DataFrame) -> pd.Series:
     """Derive bof_eierforhold."""
@@ -23,62 +88,25 @@ def bof_eierforhold(df: pd.DataFrame) -> pd.Series:
     else:
         dataset: str = datasets[0]
 
-    unique_orgnr_foretak = "', '".join(
-        df["orgnr_foretak"].replace("000000000", pd.NA).dropna().unique()
-    )
-    where = f"orgnr_foretak in ('{unique_orgnr_foretak}')"
-    if "orgnrbed" in df.columns:
-        unique_orgnrbed = "', '".join(
-            df["orgnrbed"].replace("000000000", pd.NA).dropna().unique()
-        )
-        where += f" or orgnrbed in ('{unique_orgnrbed}')"
-
     logger.info(
         "Getting bof-catalogue for bof_eierforhold (combination of bof-situttak)."
     )
-    catalogue = (
-        NudbData(dataset)
-        .select("orgnr_foretak, orgnrbed, bof_eierforhold")
-        .where(where)
-        .df()
-    )
+    catalogue = NudbData(dataset)
+    with nudb_database.registered(_orgnr_keys(df), "orgnr_keys") as keys_alias:
+        matched = (
+            nudb_database.get_connection()
+            .sql(_bof_eierforhold_lookup_sql(keys_alias, catalogue.alias))
+            .df()
+        )
 
-    eierf = (
-        df.merge(
-            (
-                catalogue[["orgnr_foretak", "bof_eierforhold"]].drop_duplicates(
-                    subset=["orgnr_foretak"], keep="last"
-                )
-            ),  # This assumes that "the last eierforhold is the correct one"...
-            on="orgnr_foretak",
-            how="left",
-            validate="m:1",
-        )["bof_eierforhold"]
-        .astype("string[pyarrow]")
-        .set_axis(df.index)
-    )
+    eierf = matched["eierforhold_foretak"].astype("string[pyarrow]").set_axis(df.index)
     logger.info(
         f"Joining `bof_eierforhold` first on orgnr_fortak (preferred by UH). Filled on {_percent_notna(eierf)}%"
     )
 
     if "orgnrbed" in df.columns:
-        orgnr_bed_missing_value = (
-            df.loc[eierf.isna(), "orgnrbed"]
-            .replace("000000000", pd.NA)
-            .dropna()
-            .unique()
-        )
-        filtered_catalogue = catalogue[
-            catalogue["orgnrbed"].isin(orgnr_bed_missing_value).astype("bool[pyarrow]")
-        ][["orgnrbed", "bof_eierforhold"]].drop_duplicates(
-            subset="orgnrbed", keep="last"
-        )  # This assumes that "the last eierforhold is the correct one"...
         eierf = eierf.fillna(
-            df.merge(filtered_catalogue, on="orgnrbed", how="left", validate="m:1")[
-                "bof_eierforhold"
-            ]
-            .astype("string[pyarrow]")
-            .set_axis(df.index)
+            matched["eierforhold_bedrift"].astype("string[pyarrow]").set_axis(df.index)
         )
         logger.info(
             f"Joining `bof_eierforhold` second on orgnrbed. After both joins, eierforhold filled on {_percent_notna(eierf)}%"
@@ -1,5 +1,5 @@
-import inspect
 from collections.abc import Callable
+from typing import Any
 from typing import Concatenate
 from typing import Literal
 from typing import ParamSpec
@@ -10,6 +10,7 @@ from nudb_config import settings
 import nudb_use.variables.derive as derive
 from nudb_use.exceptions.exception_classes import NudbDerivedFromNotFoundError
 from nudb_use.nudb_logger import LoggerStack
+from nudb_use.nudb_logger import _log_source_code
 from nudb_use.nudb_logger import logger
 from nudb_use.variables.derive.all_data_helpers import get_source_data
 from nudb_use.variables.derive.all_data_helpers import join_variable_data
@@ -21,6 +22,9 @@ from nudb_use.variables.derive.derive_decorator_utils import swap_temp_colnames_
 
 P = ParamSpec("P")
 
+# The undecorated functions behind `wrap_derive_join_all_data`, by variable name
+_JOIN_ALL_DATA_BASEFUNCS: dict[str, Callable[..., pd.DataFrame]] = {}
+
 
 class DeriveError(Exception):
     """For errors that occur during deriving variables."""
@@ -94,7 +98,7 @@ def wrap_derive(
     ) -> pd.DataFrame:
 
         with LoggerStack(f"Deriving {name} from {', '.join(derived_from)}..."):
-            logger.debug(f"Source code for {name}:\n{inspect.getsource(basefunc)}")
+            _log_source_code(basefunc, name)
 
             df, rename_state = swap_temp_colnames_to_temp(
                 df, derived_from, temp_col_renames
@@ -239,6 +243,7 @@ def wrap_derive_join_all_data(
         writes/updates the derived column using whole NUDB-datasets.
     """
     name = basefunc.__name__
+    _JOIN_ALL_DATA_BASEFUNCS[name] = basefunc
 
     def subfunc(
         df: pd.DataFrame | None = None,
@@ -249,26 +254,16 @@ def wrap_derive_join_all_data(
     ) -> pd.DataFrame:
         with LoggerStack(f"Deriving variable {name}, using whole NUDB-datasets."):
             source_data = get_source_data(name, df)
-
-            basefunc_wrapped = wrap_derive(basefunc)
-            derived_source = basefunc_wrapped(
+            return _derive_from_source_data(
+                name,
                 source_data,
+                df,
                 *args,
                 priority=priority,
                 temp_col_renames=temp_col_renames,
                 **kwargs,
             )
 
-            if df is None:
-                logger.warning("data is None, why u do this?")
-                return derived_source
-
-            try:
-                return join_variable_data(name, derived_source, df)
-            except Exception:
-                logger.warning(f"Unable to join {name} onto data! Returning as is...")
-                return df
-
     subfunc.__name__ = basefunc.__name__
     docstring = basefunc.__doc__ or ""
     subfunc.__doc__ = f"""{docstring}
@@ -283,3 +278,33 @@ def wrap_derive_join_all_data(
         """
 
     return subfunc
+
+
+def _derive_from_source_data(
+    name: str,
+    source_data: pd.DataFrame,
+    df: pd.DataFrame | None,
+    *args: Any,
+    priority: Literal["old", "new"] = "old",
+    temp_col_renames: dict[str, str] | None = None,
+    **kwargs: Any,
+) -> pd.DataFrame:
+    """Derive a `wrap_derive_join_all_data` variable on already read source data, and join it onto `df`."""
+    basefunc_wrapped = wrap_derive(_JOIN_ALL_DATA_BASEFUNCS[name])
+    derived_source = basefunc_wrapped(
+        source_data,
+        *args,
+        priority=priority,
+        temp_col_renames=temp_col_renames,
+        **kwargs,
+    )
+
+    if df is None:
+        logger.warning("data is None, why u do this?")
+        return derived_source
+
+    try:
+        return join_variable_data(name, derived_source, df)
+    except Exception:
+        logger.warning(f"Unable to join {name} onto data! Returning as is...")
+        return df
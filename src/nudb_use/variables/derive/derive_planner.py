@@ -0,0 +1,159 @@
+"""Derive many variables at once, reading the NUDB-datasets they share only once.
+
+Every variable decorated with `wrap_derive_join_all_data` reads its own union of
+source datasets. When several of them are derived together, the planner groups
+them by the datasets and join keys they use, and reads the union of the columns
+they need in a single scan per group.
+"""
+
+from __future__ import annotations
+
+from typing import Literal
+
+import pandas as pd
+from nudb_config import settings
+
+from nudb_use.nudb_logger import LoggerStack
+from nudb_use.nudb_logger import logger
+from nudb_use.variables.derive.all_data_helpers import (
+    _get_baselevel_derived_from_variables,
+)
+from nudb_use.variables.derive.all_data_helpers import read_source_columns
+from nudb_use.variables.derive.derive_decorator import _JOIN_ALL_DATA_BASEFUNCS
+from nudb_use.variables.derive.derive_decorator import _derive_from_source_data
+from nudb_use.variables.derive.derive_decorator import get_derive_function
+
+
+class DeriveSourceGroup:
+    """Variables derived from the same NUDB-datasets and join keys, read in one scan.
+
+    Args:
+        datasets: Names of the NudbData-datasets the variables are derived from.
+        join_keys: Columns the derived variables are joined back on.
+        variables: The variables in the group, in the order they are derived.
+    """
+
+    def __init__(
+        self, datasets: list[str], join_keys: list[str], variables: list[str]
+    ) -> None:
+        self.datasets = datasets
+        self.join_keys = join_keys
+        self.variables = variables
+        self.variable_columns: dict[str, list[str]] = {
+            variable: _columns_to_read(variable, join_keys) for variable in variables
+        }
+        # Projection: only the join keys and baselevel columns some variable needs
+        self.cols_to_read: list[str] = list(
+            dict.fromkeys(
+                col for cols in self.variable_columns.values() for col in cols
+            )
+        )
+
+    def __repr__(self) -> str:
+        """Get string representation of the group."""
+        return f"DeriveSourceGroup(datasets={self.datasets}, join_keys={self.join_keys}, variables={self.variables}, cols_to_read={self.cols_to_read})"
+
+
+def _columns_to_read(variable: str, join_keys: list[str]) -> list[str]:
+    derived_from = list(settings.variables[variable].derived_from or [])
+    baselevel = sorted(_get_baselevel_derived_from_variables(derived_from))
+    return list(dict.fromkeys([*join_keys, *baselevel]))
+
+
+def _uses_datasets(variable: str) -> bool:
+    return variable in settings.variables and bool(
+        settings.variables[variable].derived_uses_datasets
+    )
+
+
+def plan_derive_variables(
+    variables: list[str],
+) -> tuple[list[DeriveSourceGroup], list[str]]:
+    """Group the variables that are derived from whole NUDB-datasets by the sources they read.
+
+    Args:
+        variables: Names of the variables to derive.
+
+    Returns:
+        tuple[list[DeriveSourceGroup], list[str]]: The groups to read once each, and the
+            other variables, which are derived directly on the input data.
+    """
+    grouped: dict[tuple[tuple[str, ...], tuple[str, ...]], list[str]] = {}
+    others: list[str] = []
+
+    for variable in dict.fromkeys(variables):
+        # Derive functions are created, and registered, the first time they are looked up
+        if variable not in _JOIN_ALL_DATA_BASEFUNCS and _uses_datasets(variable):
+            get_derive_function(variable)
+        if variable not in _JOIN_ALL_DATA_BASEFUNCS:
+            others.append(variable)
+            continue
+        cfg = settings.variables[variable]
+        key = (
+            tuple(cfg.derived_uses_datasets or []),
+            tuple(cfg.derived_join_keys or []),
+        )
+        grouped.setdefault(key, []).append(variable)
+
+    groups = [
+        DeriveSourceGroup(list(datasets), list(join_keys), group_variables)
+        for (datasets, join_keys), group_variables in grouped.items()
+    ]
+    return groups, others
+
+
+def derive_variables(
+    df: pd.DataFrame,
+    variables: list[str],
+    priority: Literal["old", "new"] = "old",
+    temp_col_renames: dict[str, str] | None = None,
+) -> pd.DataFrame:
+    """Derive many variables onto `df`, reading each group of shared source datasets only once.
+
+    Variables derived from whole NUDB-datasets are derived first, group by group.
+    The rest are derived afterwards, in the given order, with their own derive functions.
+
+    Args:
+        df: Dataframe to add the variables to, must contain the join keys of the variables.
+        variables: Names of the variables to derive.
+        priority: 'old' keeps existing values when present, 'new' prefers freshly derived values.
+        temp_col_renames: Temporary source-to-prerequisite rename mapping passed through to `wrap_derive`.
+
+    Returns:
+        pd.DataFrame: The dataframe with the variables added/updated.
+    """
+    groups, others = plan_derive_variables(variables)
+
+    for group in groups:
+        with LoggerStack(
+            f"Deriving {', '.join(group.variables)} from one read of {', '.join(group.datasets)}"
+        ):
+            source_data = read_source_columns(
+                ", ".join(group.variables),
+                datasets=group.datasets,
+                join_keys=group.join_keys,
+                cols_to_read=group.cols_to_read,
+                df_left=df,
+            )
+            for variable in group.variables:
+                # The same rows a read of only this variable's columns would give
+                variable_source = source_data[group.variable_columns[variable]]
+                variable_source = variable_source.drop_duplicates().reset_index(
+                    drop=True
+                )
+                df = _derive_from_source_data(
+                    variable,
+                    variable_source,
+                    df,
+                    priority=priority,
+                    temp_col_renames=temp_col_renames,
+                )
+
+    for variable in others:
+        derive_func = get_derive_function(variable)
+        if derive_func is None:
+            logger.warning(f"Found no way to derive {variable}, skipping it.")
+            continue
+        df = derive_func(df, priority=priority, temp_col_renames=temp_col_renames)
+
+    return df
@@ -9,9 +9,6 @@ from nudb_use.nudb_logger import logger
 
 from .derive_decorator import wrap_derive
 
-module = __import__(__name__, fromlist=[""])  # pass non-empty fromlist
-__all__ = []
-
 
 def _map_klass_correspondence(
     df: pd.DataFrame, corresponds_to: str, varname: str
@@ -65,15 +62,41 @@ def _generate_klass_derive_function(
     return wrap_derive(basefunc)
 
 
-for varname in settings.variables.keys():
-    try:
-        derivefunc = _generate_klass_derive_function(varname)
+def _has_klass_derive_function(varname: str) -> bool:
+    var_meta = settings.variables[varname]
+    is_relevant = var_meta.klass_variant_search_term or var_meta.klass_correspondence_to
+    derived_from = var_meta.derived_from
+    if not is_relevant or not derived_from:
+        return False
+    if len(derived_from) > 1:
+        logger.warning(f"""Don't know which variable to derive {varname} from!\n
+                       as there are multiple options: {derived_from}""")
+        return False
+    return True
+
 
-        if derivefunc:  # returns None if not applicable
-            __all__.append(varname)
-            setattr(module, varname, derivefunc)
+# The functions are generated the first time they are used, see `__getattr__`
+__all__ = [
+    varname
+    for varname in settings.variables.keys()
+    if _has_klass_derive_function(varname)
+]
 
+
+def __getattr__(name: str) -> Callable[[pd.DataFrame], pd.DataFrame]:
+    """Generate the KLASS derive function for a variable the first time it is used."""
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        derivefunc = _generate_klass_derive_function(name)
     except Exception as err:
         logger.warning(
-            f"Unable to generate derive function for '{varname}'!\nMessage: {err}"
+            f"Unable to generate derive function for '{name}'!\nMessage: {err}"
         )
+        raise AttributeError(
+            f"Unable to generate derive function for '{name}'"
+        ) from err
+    if derivefunc is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = derivefunc
+    return derivefunc
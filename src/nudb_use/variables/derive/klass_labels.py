@@ -7,9 +7,6 @@ from nudb_use.metadata.nudb_klass.labels import get_klass_label_mapping
 from nudb_use.nudb_logger import logger
 from nudb_use.variables.derive.derive_decorator import wrap_derive
 
-module = __import__(__name__, fromlist=[""])  # pass non-empty fromlist
-__all__ = []
-
 
 class MissingLabelMappingError(Exception): ...
 
@@ -36,15 +33,31 @@ def _generate_label_function(
     return wrap_derive(basefunc)
 
 
-confvars: list[str] = list(settings.variables.keys())
-labvars: list[str] = [var for var in confvars if var.endswith("_label")]
+def _has_label_function(varname: str) -> bool:
+    # wrap_derive needs `derived_from` to make a derive function
+    return varname.endswith("_label") and bool(settings.variables[varname].derived_from)
+
+
+# The functions are generated the first time they are used, see `__getattr__`
+__all__ = [
+    varname for varname in settings.variables.keys() if _has_label_function(varname)
+]
+
 
-for labvar in labvars:
+def __getattr__(name: str) -> Callable[[pd.DataFrame], pd.DataFrame]:
+    """Generate the label derive function for a variable the first time it is used."""
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
     try:
-        labfunc = _generate_label_function(labvar)
-        __all__.append(labvar)
-        setattr(module, labvar, labfunc)
+        labfunc = _generate_label_function(name)
     except Exception as err:
         logger.warning(
-            f"Unable to generate derive function for '{labvar}'!\nMessage: {err}"
+            f"Unable to generate derive function for '{name}'!\nMessage: {err}"
         )
+        raise AttributeError(
+            f"Unable to generate derive function for '{name}'"
+        ) from err
+    if labfunc is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = labfunc
+    return labfunc
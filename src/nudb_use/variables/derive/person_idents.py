@@ -1,5 +1,3 @@
-from typing import TypeGuard
-
 import pandas as pd
 from nudb_config import settings
 
@@ -10,6 +8,7 @@ BOOL_DTYPE = DTYPE_MAPPINGS["pandas"][BOOL_DTYPE_NAME]
 ALLNUMERIC_7DIGIT_THRESHOLD_PERCENT = (
     settings.constants.snr_allnumeric_7digit_threshold_percent
 )
+SNR_PATTERN = r"[0-9A-Za-z]{7}"
 
 from nudb_use.nudb_logger import LoggerStack
 from nudb_use.nudb_logger import logger
@@ -25,7 +24,7 @@ def snr_mrk(  # noqa:DOC201
 ) -> pd.Series:
     """Derive the column snr_mrk from snr-column, True if values in snr_col is notna, has a length of 7 and are wholly alphanumeric."""
     with LoggerStack("Looking for weird content in the snr column"):
-        if df["snr"].str.contains(" ").any():
+        if df["snr"].str.contains(" ", regex=False).any():
             logger.warning("Some of your snr contain spaces, why bro?")
 
         # If there is above the threshold percent snr that are 7 digit snr that contain only numbers, give a warning.
@@ -40,21 +39,14 @@ def snr_mrk(  # noqa:DOC201
             )
 
     with LoggerStack("Deriving snr_mrk from snr."):
-        # This function helps mypy realize that we might reach isascii
-        def is_str(x: object) -> TypeGuard[str]:
-            return isinstance(x, str)
-
+        # Seven ASCII letters or digits, the same as checking isalnum and isascii
         snr_mrk: pd.Series = (
-            (df["snr"].notna())
-            & (df["snr"].str.strip().str.len() == 7)
-            & (df["snr"].str.strip().str.isalnum())
-            & (
-                df["snr"]
-                .str.strip()
-                .apply(lambda x: is_str(x) and x.isascii())
-                .astype(BOOL_DTYPE)
-            )  # Workaround because isascii is not supported in earlier versions of pandas, isascii fails on NAtypes?
-        ).astype(BOOL_DTYPE)
+            df["snr"]
+            .str.strip()
+            .str.fullmatch(SNR_PATTERN)
+            .fillna(False)
+            .astype(BOOL_DTYPE)
+        )
         percent = round(snr_mrk.sum() / len(snr_mrk) * 100, 2) if len(snr_mrk) else 0.00
         logger.info(
             f"{percent}%: {snr_mrk.sum()} of {len(snr_mrk)} rows have valid snr -> snr_mrk."
@@ -54,20 +54,18 @@ def _derive_utd_foreldres_utdnivaa_var(df: pd.DataFrame, *, varname: str) -> pd.
 
     df["snr"] = df["snr"].astype(STRING_DTYPE)
     sosbak = NudbData("utd_foreldres_utdnivaa")
-    con = nudb_database.get_connection()
-    con.register("_tmp_df", df[["snr"]].drop_duplicates())
-
-    mapping = con.sql(f"""
-        SELECT DISTINCT
-            T1.snr,
-            T2.{varname} AS {varname}
-        FROM
-            _tmp_df AS T1
-        LEFT JOIN
-            {sosbak.alias} AS T2
-        ON
-            T1.snr = T2.snr;
-    """).df()
+    with nudb_database.registered(df[["snr"]].drop_duplicates()) as tmp_df:
+        mapping = nudb_database.get_connection().sql(f"""
+            SELECT DISTINCT
+                T1.snr,
+                T2.{varname} AS {varname}
+            FROM
+                {tmp_df} AS T1
+            LEFT JOIN
+                {sosbak.alias} AS T2
+            ON
+                T1.snr = T2.snr;
+        """).df()
 
     result = df.merge(right=mapping, on="snr", how="left", validate="m:1")
 
@@ -31,27 +31,35 @@ def utd_hoeyeste_rangering(df: pd.DataFrame) -> pd.Series:
     df = df.reset_index(drop=True).reset_index(
         names="__index_level_0"
     )  # drop twice in case of MultiIndex...
-    con = nudb_database.get_connection()
-    con.register("tmp_df_rangering", df)
-
-    result = con.sql("""
-        SELECT
-            UTD_HOEYESTE_RANGERING(
-                nus2000,
-                uh_eksamen_dato,
-                uh_eksamen_studpoeng,
-                uh_gruppering_nus,
-                utd_aktivitet_slutt,
-                utd_klassetrinn,
-                utd_skoleaar_start
-        ) AS rangering
-
-        FROM
-            tmp_df_rangering
-
-        ORDER BY
-            __index_level_0 ASC;
-    """).df()
+    # Not in derived_from, the ranking treats them as missing if they are not in df
+    optional = {
+        col: col if col in df.columns else "NULL"
+        for col in ["utd_rectype", "utd_studieland", "utd_datakilde"]
+    }
+
+    with nudb_database.registered(df, "tmp_df_rangering") as tmp_df:
+        # As the zero-padded string of digits, so it sorts like the ranking number
+        result = nudb_database.get_connection().sql(f"""
+            SELECT
+                RANGERING2STR(UTD_HOEYESTE_RANGERING(
+                    nus2000,
+                    uh_eksamen_dato,
+                    uh_eksamen_studpoeng,
+                    uh_gruppering_nus,
+                    utd_aktivitet_slutt,
+                    utd_klassetrinn,
+                    utd_skoleaar_start,
+                    {optional["utd_rectype"]},
+                    {optional["utd_studieland"]},
+                    {optional["utd_datakilde"]}
+            )) AS rangering
+
+            FROM
+                {tmp_df}
+
+            ORDER BY
+                __index_level_0 ASC;
+        """).df()
 
     return result["rangering"]
 
@@ -78,22 +86,22 @@ def utd_hoeyeste_nus2000(df: pd.DataFrame, year_col: str | None = None) -> pd.Se
 
     utd_hoeyeste = NudbData("utd_hoeyeste")
 
-    con = nudb_database.get_connection()
-    con.register("_tmp_df", df[["snr", year_col_right]].drop_duplicates())
-
-    mapping = con.sql(f"""
-        SELECT DISTINCT
-            T1.snr,
-            T1.{year_col_right},
-            T2.utd_hoeyeste_nus2000 AS {varname}
-        FROM
-            _tmp_df AS T1
-        ASOF LEFT JOIN
-            {utd_hoeyeste.alias} AS T2
-        ON
-            T1.snr = T2.snr AND
-            T2.{year_col_right} <= T1.{year_col_right};
-    """).df()
+    with nudb_database.registered(
+        df[["snr", year_col_right]].drop_duplicates()
+    ) as tmp_df:
+        mapping = nudb_database.get_connection().sql(f"""
+            SELECT DISTINCT
+                T1.snr,
+                T1.{year_col_right},
+                T2.utd_hoeyeste_nus2000 AS {varname}
+            FROM
+                {tmp_df} AS T1
+            ASOF LEFT JOIN
+                {utd_hoeyeste.alias} AS T2
+            ON
+                T1.snr = T2.snr AND
+                T2.{year_col_right} <= T1.{year_col_right};
+        """).df()
 
     result = df.merge(
         right=mapping, on=["snr", year_col_right], how="left", validate="m:1"
@@ -0,0 +1,331 @@
+"""An append-only catalog of the UUIDs given as snr to fnr without one.
+
+The catalog is a directory of parquet files, split into buckets by a hash of
+the fnr. New pairs are appended as one small file per bucket, and the files
+of a bucket are compacted into one when there are `UUID_CATALOG_COMPACT_AFTER`
+of them. Lookups only read the buckets of the fnr looked up. Writers take the
+catalog lock, so concurrent runs do not give the same fnr different UUIDs.
+
+    catalog/
+        _catalog.json
+        bucket=00/base-<time>.parquet
+        bucket=00/part-<time>-<id>.parquet
+        ...
+"""
+
+import json
+import os
+import re
+import time
+import uuid
+from collections.abc import Iterable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from nudb_use.nudb_logger import logger
+from nudb_use.utils.file_lock import directory_lock
+
+UUID_CATALOG_FORMAT_VERSION: int = 1
+# The number of buckets is stored in each catalog, this is used for new catalogs
+UUID_CATALOG_BUCKETS: int = 16
+UUID_CATALOG_COMPACT_AFTER: int = 16
+UUID_CATALOG_LOCK_TIMEOUT: float = float(
+    os.environ.get("NUDB_UUID_CATALOG_LOCK_TIMEOUT", 600)
+)
+# Seconds after which a lock is taken over, even if its holder may still be running
+UUID_CATALOG_LOCK_STALE_AFTER: float = float(
+    os.environ.get("NUDB_UUID_CATALOG_LOCK_STALE_AFTER", 60 * 60)
+)
+
+_METADATA_FILE = "_catalog.json"
+# Fixed, so an fnr lands in the same bucket in every session
+_BUCKET_HASH_KEY = "nudb-fnr-catalog"
+
+
+def fnr_uuid_catalog_dir(path: str | Path) -> Path:
+    """Get the catalog directory for a catalog path.
+
+    Paths to parquet files, as used by the versioned catalogs before, give a
+    directory next to the file, named like it without the version.
+
+    Args:
+        path: The catalog directory, or a path to a versioned parquet catalog.
+
+    Returns:
+        Path: The catalog directory.
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".parquet":
+        return path.parent / re.sub(r"_v\d+$", "", path.stem)
+    return path
+
+
+def fnr_uuid_catalog_exists(catalog_dir: Path) -> bool:
+    """Check if a catalog has been created in the directory.
+
+    Args:
+        catalog_dir: The catalog directory.
+
+    Returns:
+        bool: True if the directory has catalog metadata.
+    """
+    return (catalog_dir / _METADATA_FILE).is_file()
+
+
+def _n_buckets(catalog_dir: Path) -> int:
+    if not fnr_uuid_catalog_exists(catalog_dir):
+        return UUID_CATALOG_BUCKETS
+    metadata = json.loads((catalog_dir / _METADATA_FILE).read_text(encoding="utf-8"))
+    return int(metadata["buckets"])
+
+
+def _catalog_columns(catalog_dir: Path, fnr_col: str, snr_col: str) -> tuple[str, str]:
+    """The names of the fnr and snr columns stored in a catalog.
+
+    New catalogs store the names they are first written with.
+
+    Args:
+        catalog_dir: The catalog directory.
+        fnr_col: Name of the fnr column used by the caller.
+        snr_col: Name of the snr column used by the caller.
+
+    Returns:
+        tuple[str, str]: The stored names of the fnr and snr columns.
+
+    Raises:
+        ValueError: If the caller uses the same name for both columns, or the
+            catalog metadata does not have the stored names.
+    """
+    if fnr_col == snr_col:
+        raise ValueError(
+            f"The fnr and snr columns must have different names, not {fnr_col!r}."
+        )
+    if not fnr_uuid_catalog_exists(catalog_dir):
+        return fnr_col, snr_col
+    metadata = json.loads((catalog_dir / _METADATA_FILE).read_text(encoding="utf-8"))
+    stored_fnr_col, stored_snr_col = metadata.get("fnr_col"), metadata.get("snr_col")
+    if not isinstance(stored_fnr_col, str) or not isinstance(stored_snr_col, str):
+        raise ValueError(
+            f"The metadata of the catalog {catalog_dir} does not name its fnr and snr columns, so they cannot be mapped to {fnr_col} and {snr_col}."
+        )
+    return stored_fnr_col, stored_snr_col
+
+
+def _write_metadata(catalog_dir: Path, fnr_col: str, snr_col: str) -> None:
+    if fnr_uuid_catalog_exists(catalog_dir):
+        return
+    metadata = {
+        "format": UUID_CATALOG_FORMAT_VERSION,
+        "buckets": UUID_CATALOG_BUCKETS,
+        "fnr_col": fnr_col,
+        "snr_col": snr_col,
+    }
+    (catalog_dir / _METADATA_FILE).write_text(json.dumps(metadata), encoding="utf-8")
+
+
+def _buckets(fnr: np.ndarray, n_buckets: int) -> np.ndarray:
+    hashed = pd.util.hash_array(
+        fnr.astype(object), hash_key=_BUCKET_HASH_KEY, categorize=False
+    )
+    return (hashed % np.uint64(n_buckets)).astype(np.int64)
+
+
+def _bucket_dir(catalog_dir: Path, bucket: int) -> Path:
+    return catalog_dir / f"bucket={bucket:02d}"
+
+
+def _bucket_files(catalog_dir: Path, bucket: int) -> list[Path]:
+    # The base file sorts before the parts, which sort by the time they were written
+    return sorted(_bucket_dir(catalog_dir, bucket).glob("*.parquet"))
+
+
+@contextmanager
+def fnr_uuid_catalog_lock(
+    catalog_dir: Path, timeout: float | None = None
+) -> Iterator[None]:
+    """Hold the write lock of a catalog, waiting for other writers to finish.
+
+    The lock is a file created exclusively in the catalog directory, so it also
+    works on shared file systems without `flock`. It holds the host, pid and time
+    of its holder. A lock left behind by a process that is no longer running on
+    this host, or taken more than `UUID_CATALOG_LOCK_STALE_AFTER` seconds ago,
+    is stale and taken over. Raises TimeoutError if the lock is not released by
+    its holder within the timeout.
+
+    Args:
+        catalog_dir: The catalog directory.
+        timeout: Seconds to wait for the lock, `UUID_CATALOG_LOCK_TIMEOUT` if None.
+
+    Yields:
+        None: While the lock is held.
+    """
+    with directory_lock(
+        catalog_dir,
+        timeout=UUID_CATALOG_LOCK_TIMEOUT if timeout is None else timeout,
+        stale_after=UUID_CATALOG_LOCK_STALE_AFTER,
+    ):
+        yield
+
+
+def read_fnr_uuid_catalog(
+    catalog_dir: Path,
+    fnr: Iterable[str] | None = None,
+    fnr_col: str = "fnr",
+    snr_col: str = "snr",
+) -> pd.DataFrame:
+    """Read the fnr and snr pairs of a catalog, only from the buckets of the fnr asked for.
+
+    Args:
+        catalog_dir: The catalog directory.
+        fnr: The fnr to look up, all of the catalog if None.
+        fnr_col: Name of the fnr column to return.
+        snr_col: Name of the snr column to return.
+
+    Returns:
+        pd.DataFrame: One row per fnr found in the catalog, with the columns
+            renamed from the names stored in the catalog.
+
+    Raises:
+        ValueError: If the stored columns are not in the catalog files.
+    """
+    stored_fnr_col, stored_snr_col = _catalog_columns(catalog_dir, fnr_col, snr_col)
+    n_buckets = _n_buckets(catalog_dir)
+    wanted = None if fnr is None else pd.unique(np.asarray(list(fnr), dtype=object))
+    buckets = (
+        range(n_buckets) if wanted is None else np.unique(_buckets(wanted, n_buckets))
+    )
+    files = [path for bucket in buckets for path in _bucket_files(catalog_dir, bucket)]
+
+    if not files:
+        return pd.DataFrame({fnr_col: [], snr_col: []}, dtype="string[pyarrow]")
+
+    missing_cols = {stored_fnr_col, stored_snr_col} - set(
+        pq.read_schema(files[0]).names
+    )
+    if missing_cols:
+        raise ValueError(
+            f"The catalog {catalog_dir} has no columns {sorted(missing_cols)}, which its metadata names."
+        )
+    schema = pa.schema([(stored_fnr_col, pa.string()), (stored_snr_col, pa.string())])
+    dataset = ds.dataset([str(path) for path in files], format="parquet", schema=schema)
+    row_filter = (
+        None if wanted is None else pc.field(stored_fnr_col).isin(wanted.tolist())
+    )
+    table = dataset.to_table(filter=row_filter)
+    # Pairs written before a compaction can be read twice, they hold the same UUID
+    catalog: pd.DataFrame = (
+        table.to_pandas()
+        .rename(columns={stored_fnr_col: fnr_col, stored_snr_col: snr_col})
+        .astype("string[pyarrow]")
+        .drop_duplicates(subset=fnr_col, keep="first")
+        .reset_index(drop=True)
+    )
+    return catalog
+
+
+def _write_part(path: Path, table: pa.Table) -> None:
+    tmp_path = path.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def append_to_fnr_uuid_catalog(  # noqa: DOC502
+    catalog_dir: Path,
+    pairs: pd.DataFrame,
+    fnr_col: str = "fnr",
+    snr_col: str = "snr",
+) -> None:
+    """Append new fnr and snr pairs to a catalog, as one file per bucket.
+
+    Should be called while holding `fnr_uuid_catalog_lock`. Buckets with
+    `UUID_CATALOG_COMPACT_AFTER` files or more are compacted afterwards. The
+    pairs are stored under the column names of the catalog.
+
+    Args:
+        catalog_dir: The catalog directory.
+        pairs: The new pairs, with fnr not already in the catalog.
+        fnr_col: Name of the fnr column in `pairs`.
+        snr_col: Name of the snr column in `pairs`.
+
+    Raises:
+        ValueError: If the column names of the catalog are not in its metadata.
+    """
+    catalog_dir.mkdir(parents=True, exist_ok=True)
+    _write_metadata(catalog_dir, fnr_col, snr_col)
+    stored_fnr_col, stored_snr_col = _catalog_columns(catalog_dir, fnr_col, snr_col)
+    pairs = (
+        pairs[[fnr_col, snr_col]]
+        .rename(columns={fnr_col: stored_fnr_col, snr_col: stored_snr_col})
+        .dropna()
+        .drop_duplicates(subset=stored_fnr_col)
+    )
+    if pairs.empty:
+        return
+
+    n_buckets = _n_buckets(catalog_dir)
+    buckets = _buckets(pairs[stored_fnr_col].to_numpy(), n_buckets)
+    part_name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+    schema = pa.schema([(stored_fnr_col, pa.string()), (stored_snr_col, pa.string())])
+    for bucket in np.unique(buckets):
+        bucket_pairs = pairs[buckets == bucket].sort_values(stored_fnr_col)
+        bucket_dir = _bucket_dir(catalog_dir, int(bucket))
+        bucket_dir.mkdir(exist_ok=True)
+        _write_part(
+            bucket_dir / part_name,
+            pa.Table.from_pandas(bucket_pairs, schema=schema, preserve_index=False),
+        )
+        if len(_bucket_files(catalog_dir, int(bucket))) >= UUID_CATALOG_COMPACT_AFTER:
+            _compact_bucket(catalog_dir, int(bucket), schema)
+    logger.info(
+        f"Appended {len(pairs)} fnr to the catalog {catalog_dir}, in {len(np.unique(buckets))} buckets."
+    )
+
+
+def _compact_bucket(catalog_dir: Path, bucket: int, schema: pa.Schema) -> None:
+    files = _bucket_files(catalog_dir, bucket)
+    dataset = ds.dataset([str(path) for path in files], format="parquet", schema=schema)
+    compacted = (
+        dataset.to_table()
+        .to_pandas()
+        .drop_duplicates(subset=schema.names[0], keep="first")
+        .sort_values(schema.names[0])
+    )
+    _write_part(
+        _bucket_dir(catalog_dir, bucket) / f"base-{time.time_ns()}.parquet",
+        pa.Table.from_pandas(compacted, schema=schema, preserve_index=False),
+    )
+    for path in files:
+        path.unlink()
+    logger.debug(f"Compacted {len(files)} files in bucket {bucket} of {catalog_dir}.")
+
+
+def compact_fnr_uuid_catalog(catalog_dir: Path) -> int:
+    """Compact every bucket of a catalog with more than one file into one file.
+
+    Args:
+        catalog_dir: The catalog directory.
+
+    Returns:
+        int: The number of buckets compacted.
+    """
+    if not fnr_uuid_catalog_exists(catalog_dir):
+        return 0
+    metadata = json.loads((catalog_dir / _METADATA_FILE).read_text(encoding="utf-8"))
+    schema = pa.schema(
+        [(metadata["fnr_col"], pa.string()), (metadata["snr_col"], pa.string())]
+    )
+    compacted = 0
+    with fnr_uuid_catalog_lock(catalog_dir):
+        for bucket in range(int(metadata["buckets"])):
+            if len(_bucket_files(catalog_dir, bucket)) > 1:
+                _compact_bucket(catalog_dir, bucket, schema)
+                compacted += 1
+    return compacted
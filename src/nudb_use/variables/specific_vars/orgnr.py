@@ -10,8 +10,10 @@ from nudb_use.datasets.bof import _bof_foretak_to_orgnrbed_lookup_sql
 from nudb_use.datasets.bof import _bof_orgnrbed_to_foretak_lookup_sql
 from nudb_use.datasets.nudb_data import NudbData
 from nudb_use.datasets.nudb_database import nudb_database
+from nudb_use.metadata.external_apis import brreg_index
 from nudb_use.metadata.external_apis.brreg_api import get_enhet
 from nudb_use.metadata.external_apis.brreg_api import orgnr_is_underenhet
+from nudb_use.metadata.external_apis.brreg_index import lookup_brreg_enhet_types
 from nudb_use.nudb_logger import LoggerStack
 from nudb_use.nudb_logger import logger
 
@@ -166,12 +168,34 @@ def _split_orgnr_col(
     is_bed = orgnr_col.isin(bof_orgnrbed)
     is_foretak = orgnr_col.isin(bof_orgnr_foretak)
     missing_from_bof = orgnr_col[~is_bed & ~is_foretak].dropna().unique()
-    missing_orgnr_er_orgnrbed: dict[str, bool] = {}
+
+    # Resolve what we can with one join against the local Brreg index, the API only gets the residue
+    brreg_enhet_types: dict[str, str] | None = {}
     if len(missing_from_bof):
         logger.info(
-            f"Looking for {len(missing_from_bof)} orgnr in brregs API because the orgnr(s) are missing from the BOF-sittuttak."
+            f"Looking for {len(missing_from_bof)} orgnr in the local Brreg index because the orgnr(s) are missing from the BOF-sittuttak."
+        )
+        brreg_enhet_types = lookup_brreg_enhet_types(missing_from_bof)
+    if brreg_enhet_types is None:
+        logger.warning(
+            "Found no local Brreg index, looking up all orgnr missing from BOF in the Brreg API."
+        )
+        brreg_enhet_types = {}
+        api_residue = list(missing_from_bof)
+    else:
+        api_residue = _cap_api_residue(
+            [nr for nr in missing_from_bof if nr not in brreg_enhet_types]
+        )
+
+    # The residue left out by the cap is handled like orgnr the API does not find
+    missing_orgnr_er_orgnrbed: dict[str, bool] = dict.fromkeys(
+        missing_from_bof, False
+    ) | {nr: enhet_type == "underenhet" for nr, enhet_type in brreg_enhet_types.items()}
+    if len(api_residue):
+        logger.info(
+            f"Looking for {len(api_residue)} orgnr in brregs API because the orgnr(s) are missing from the BOF-sittuttak and the local Brreg index."
         )
-        for nr in _progress(missing_from_bof):
+        for nr in _progress(api_residue):
             missing_orgnr_er_orgnrbed[nr] = orgnr_is_underenhet(nr)
     orgnr_is_orgnrbed = (
         missing_orgnr_er_orgnrbed
@@ -185,9 +209,9 @@ def _split_orgnr_col(
     if put_invalid_in_orgnr_foretak:
         orgnr_foretak_out.loc[~mask_orgnrbed] = orgnr_col
     else:
-        # Do the work with actually looking these up in brreg, maybe for the second time
-        is_orgnr_foretak_missing: list[str] = []
-        for nr in _progress(missing_from_bof):
+        # Everything found in the Brreg index exists, the residue needs the API, maybe for the second time
+        is_orgnr_foretak_missing: list[str] = list(brreg_enhet_types)
+        for nr in _progress(api_residue):
             if get_enhet(nr) is not None:
                 is_orgnr_foretak_missing.append(nr)
         orgnr_foretak_out.loc[is_foretak | orgnr_col.isin(is_orgnr_foretak_missing)] = (
@@ -198,6 +222,28 @@ def _split_orgnr_col(
     ), _empty_orgnr_sentinel_values(orgnrbed_out)
 
 
+def _cap_api_residue(residue: list[str]) -> list[str]:
+    """Cap the orgnr missing from the local Brreg index to the number we look up one by one.
+
+    Orgnr missing from both BOF and the Brreg index are mostly invalid or
+    historical, so the ones over `BRREG_API_RESIDUE_LIMIT` are not looked up
+    and end up as not found in Brreg.
+
+    Args:
+        residue: The orgnr missing from both BOF and the local Brreg index.
+
+    Returns:
+        list[str]: The residue to look up in the Brreg API.
+    """
+    limit = brreg_index.BRREG_API_RESIDUE_LIMIT
+    if len(residue) > limit:
+        logger.warning(
+            f"{len(residue)} orgnr are missing from both BOF and the local Brreg index, only looking up {limit} of them in the Brreg API and handling the rest as not found. "
+            f"Raise NUDB_BRREG_API_RESIDUE_LIMIT to look them all up, some examples: {residue[limit : limit + 5]}"
+        )
+    return residue[:limit]
+
+
 def _find_orgnr_foretak_bof(
     orgnrbed_col: pd.Series,
     time_col: pd.Series,
@@ -243,25 +289,23 @@ def _find_orgnr_foretak_bof(
         original_index = orgnrbed_col.index
 
         logger.info("Attach created pandas dataframe to the nudb_database connection.")
-        con = nudb_database.get_connection()
-        con.register("input_df", input_df)
-
-        lookup_sql = _bof_orgnrbed_to_foretak_lookup_sql(
-            input_alias="input_df",
-            orgnrbed_col="orgnrbed",
-            join_date_col="join_date",
-            row_id_col="_row_id",
-        )
-        if lookup_sql is None:
-            logger.warning(
-                "Found no BOF files to build targeted orgnrbed -> orgnr_foretak lookup. Returning empty result."
+        with nudb_database.registered(input_df, "input_df") as input_alias:
+            lookup_sql = _bof_orgnrbed_to_foretak_lookup_sql(
+                input_alias=input_alias,
+                orgnrbed_col="orgnrbed",
+                join_date_col="join_date",
+                row_id_col="_row_id",
             )
-            return pd.Series(pd.NA, index=original_index, dtype="string")
+            if lookup_sql is None:
+                logger.warning(
+                    "Found no BOF files to build targeted orgnrbed -> orgnr_foretak lookup. Returning empty result."
+                )
+                return pd.Series(pd.NA, index=original_index, dtype="string")
 
-        logger.info(
-            "Executing targeted join on dates for data and orgnrbed -> orgnr_foretak connections"
-        )
-        result_df = con.sql(lookup_sql).df()
+            logger.info(
+                "Executing targeted join on dates for data and orgnrbed -> orgnr_foretak connections"
+            )
+            result_df = nudb_database.get_connection().sql(lookup_sql).df()
 
         result = result_df["orgnr"].astype("string").set_axis(original_index)
         return result
@@ -316,23 +360,21 @@ def _find_orgnrbed_enkelbedforetak_bof(
         original_index = orgnr_foretak_col.index
 
         logger.info("Attach created pandas dataframe to the nudb_database connection.")
-        con = nudb_database.get_connection()
-        con.register("input_df", input_df)
-
-        lookup_sql = _bof_foretak_to_orgnrbed_lookup_sql(
-            input_alias="input_df",
-            orgnr_col="orgnr",
-            join_date_col="join_date",
-            row_id_col="_row_id",
-        )
-        if lookup_sql is None:
-            logger.warning(
-                "Found no BOF files to build targeted orgnr_foretak -> orgnrbed lookup. Returning empty result."
+        with nudb_database.registered(input_df, "input_df") as input_alias:
+            lookup_sql = _bof_foretak_to_orgnrbed_lookup_sql(
+                input_alias=input_alias,
+                orgnr_col="orgnr",
+                join_date_col="join_date",
+                row_id_col="_row_id",
             )
-            return pd.Series(pd.NA, index=original_index, dtype="string")
+            if lookup_sql is None:
+                logger.warning(
+                    "Found no BOF files to build targeted orgnr_foretak -> orgnrbed lookup. Returning empty result."
+                )
+                return pd.Series(pd.NA, index=original_index, dtype="string")
 
-        logger.info("Executing join from orgnr_foretak to orgnrbed")
-        result_df = con.sql(lookup_sql).df()
+            logger.info("Executing join from orgnr_foretak to orgnrbed")
+            result_df = nudb_database.get_connection().sql(lookup_sql).df()
 
         result = result_df["orgnrbed"].astype("string").set_axis(original_index)
         return result
@@ -1,11 +1,11 @@
-import uuid
+import os
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from fagfunksjoner.paths.versions import latest_version_path
-from fagfunksjoner.paths.versions import next_version_path
 
-from nudb_use.datasets.nudb_data import NudbData
+from nudb_use.datasets.snrkat import snrkat_lookup
 from nudb_use.metadata.nudb_config.map_get_dtypes import BOOL_DTYPE_NAME
 from nudb_use.metadata.nudb_config.map_get_dtypes import DTYPE_MAPPINGS
 from nudb_use.metadata.nudb_config.map_get_dtypes import STRING_DTYPE_NAME
@@ -15,6 +15,11 @@ from nudb_use.utils.packages import move_to_use_deprecate
 
 # Moved function
 from nudb_use.variables.derive.person_idents import snr_mrk
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import append_to_fnr_uuid_catalog
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import fnr_uuid_catalog_dir
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import fnr_uuid_catalog_exists
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import fnr_uuid_catalog_lock
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import read_fnr_uuid_catalog
 
 derive_snr_mrk = move_to_use_deprecate(
     snr_mrk,
@@ -74,56 +79,35 @@ def _ensure_temp_cols_absent(df: pd.DataFrame, temp_cols: list[str]) -> None:
         )
 
 
-def _load_snrkat(update_fnr: bool) -> pd.DataFrame:
-    """Load snrkat with the required columns.
-
-    Args:
-        update_fnr: Whether to include current FNR in the selection.
-
-    Returns:
-        pd.DataFrame: snrkat contents.
-    """
-    want_cols = ["fnr", "snr_utgatt", "snr"]
-    if update_fnr:
-        want_cols += ["fnr_naa"]
-    return NudbData("snrkat").select(", ".join(want_cols)).df()
-
-
-def _merge_cols(
+def _lookup_col(
     df: pd.DataFrame,
-    snrkat: pd.DataFrame,
     ident_col_name: str,
-    snrkat_renames: dict[str, str],
+    snrkat_key_col: str,
+    snrkat_value_col: str,
+    merge_col_name: str,
 ) -> pd.DataFrame:
-    """Merge new columns onto the dataset using snrkat.
+    """Add a column looked up in snrkat for each identifier in the dataset.
 
     Args:
-        df: The dataframe we are merging onto.
-        snrkat: The dataframe we have content we want to update with.
+        df: The dataframe we are adding the column to.
         ident_col_name: The ident column of the original dataset.
-        snrkat_renames: How the snrkat-columns should be renamed to fit into the logic.
+        snrkat_key_col: The snrkat column matching the ident column.
+        snrkat_value_col: The snrkat column we want the values from.
+        merge_col_name: What to name the added column.
 
     Returns:
-        pd.DataFrame: The dataframe with added columns from snrkat.
+        pd.DataFrame: The dataframe with the added column from snrkat.
     """
     logger.info(
-        f"Merging {list(snrkat_renames.keys())[-1]} from snrkat using {next(iter(snrkat_renames.keys()))} -> {ident_col_name}"
-    )
-    merged = df.merge(
-        snrkat[list(snrkat_renames.keys())]
-        .dropna(how="any")
-        .drop_duplicates()
-        .rename(columns=snrkat_renames),
-        left_on=ident_col_name,
-        right_on=next(iter(snrkat_renames.values())),
-        how="left",
+        f"Looking up {snrkat_value_col} from snrkat using {snrkat_key_col} -> {ident_col_name}"
     )
-    return _set_index_if_length_matches(merged, df.index, context="_merge_cols")
+    lookup = snrkat_lookup(snrkat_key_col, snrkat_value_col)
+    df[merge_col_name] = lookup.resolve(df[ident_col_name])
+    return df
 
 
 def _apply_snrkat_merges(
     df: pd.DataFrame,
-    snrkat: pd.DataFrame,
     snr_col_name: str,
     fnr_col_name: str,
     update_fnr: bool,
@@ -132,7 +116,6 @@ def _apply_snrkat_merges(
 
     Args:
         df: Input dataframe.
-        snrkat: snrkat contents.
         snr_col_name: Name of the SNR column.
         fnr_col_name: Name of the FNR column.
         update_fnr: Whether to update FNR values as well.
@@ -146,33 +129,18 @@ def _apply_snrkat_merges(
     df_lengths = {"read": len(df)}
 
     if fnr_col_name in df.columns:
-        df = _merge_cols(
-            df,
-            snrkat,
-            ident_col_name=fnr_col_name,
-            snrkat_renames={"fnr": "fnr", "snr": "snr_from_fnr"},
-        )
+        df = _lookup_col(df, fnr_col_name, "fnr", "snr", "snr_from_fnr")
         df_lengths["after fnr > snr merge"] = len(df)
 
     if snr_col_name in df.columns:
-        df = _merge_cols(
-            df,
-            snrkat,
-            ident_col_name=snr_col_name,
-            snrkat_renames={"snr_utgatt": "snr", "snr": "snr_from_snr"},
-        )
+        df = _lookup_col(df, snr_col_name, "snr_utgatt", "snr", "snr_from_snr")
         df_lengths["after snr > snr merge"] = len(df)
 
     if update_fnr and fnr_col_name in df.columns:
         logger.warning(
             "We want original FNR as reported in, in most cases. Consider carefully before updating fnr. Ask a friend."
         )
-        df = _merge_cols(
-            df,
-            snrkat,
-            ident_col_name=fnr_col_name,
-            snrkat_renames={"fnr": "fnr", "fnr_naa": "fnr_from_fnr"},
-        )
+        df = _lookup_col(df, fnr_col_name, "fnr", "fnr_naa", "fnr_from_fnr")
         df_lengths["after fnr merge"] = len(df)
 
     if not all(length == len(df) for length in df_lengths.values()):
@@ -326,8 +294,7 @@ def update_snr_with_snrkat(
             df, ["fnr_from_fnr", "snr_from_fnr", "snr_from_snr", "new_col"]
         )
 
-        snrkat = _load_snrkat(update_fnr)
-        df = _apply_snrkat_merges(df, snrkat, snr_col_name, fnr_col_name, update_fnr)
+        df = _apply_snrkat_merges(df.copy(), snr_col_name, fnr_col_name, update_fnr)
         df, return_dupes_now = _apply_merged_columns(
             df, snr_col_name, fnr_col_name, return_dupes
         )
@@ -337,6 +304,23 @@ def update_snr_with_snrkat(
         return _maybe_derive_snr_mrk(df, create_snr_mrk)
 
 
+def _uuid4_strings(n: int) -> np.ndarray:
+    """Generate n random (version 4) UUIDs as strings, from one call for random bytes."""
+    raw = np.frombuffer(os.urandom(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # Version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    hexed = np.frombuffer(raw.tobytes().hex().encode("ascii"), dtype=np.uint8)
+    hexed = hexed.reshape(n, 32)
+
+    # Lay out as 8-4-4-4-12 hex digits separated by dashes
+    uuids = np.full((n, 36), ord("-"), dtype=np.uint8)
+    for dashes, (start, end) in enumerate(
+        ((0, 8), (8, 12), (12, 16), (16, 20), (20, 32))
+    ):
+        uuids[:, start + dashes : end + dashes] = hexed[:, start:end]
+    return uuids.view("S36").ravel().astype(str)
+
+
 def generate_uuid_for_snr_with_fnr_col(
     df: pd.DataFrame,
     snr_col: str = "snr",
@@ -383,7 +367,7 @@ def generate_uuid_for_snr_with_fnr_col(
         fnr_uuid_katalog = pd.DataFrame(
             {
                 "_fnr_identificator": unique_id_missing_snr,
-                snr_col: [str(uuid.uuid4()) for _ in range(len(unique_id_missing_snr))],
+                snr_col: _uuid4_strings(len(unique_id_missing_snr)),
             }
         )
 
@@ -430,7 +414,7 @@ To avoid this, ensure all rows have a non-missing `{fnr_col}` (and subset column
 before running generate_uuid_for_snr_with_fnr_col."""
             )
             mask = invalid_after
-            df.loc[mask, snr_col] = [str(uuid.uuid4()) for _ in range(int(mask.sum()))]
+            df.loc[mask, snr_col] = _uuid4_strings(int(mask.sum()))
 
         df[fnr_col] = df[fnr_col].astype(STRING_DTYPE)
         df[snr_col] = df[snr_col].astype(STRING_DTYPE)
@@ -446,35 +430,33 @@ def generate_uuid_for_snr_with_fnr_catalog(
 ) -> pd.DataFrame:
     """Fill missing SNR values using a persisted FNR-to-UUID catalog.
 
-    Loads an existing catalog from `fnr_catalog_path` (if present), uses it to
-    fill missing `snr_col` values based on `fnr_col`, then generates new UUIDs
-    for any remaining missing SNRs via `generate_uuid_for_snr_with_fnr_col`.
-    Newly created FNR/SNR pairs are appended to the catalog and written back
-    to disk.
+    Looks up the FNR of rows missing `snr_col` in the catalog, then generates
+    new UUIDs for any remaining missing SNRs via `generate_uuid_for_snr_with_fnr_col`.
+    Newly created FNR/SNR pairs are appended to the catalog. The catalog is
+    locked while it is read and written, so concurrent runs agree on the UUIDs.
+    A versioned parquet catalog at `fnr_catalog_path` is copied into the new
+    catalog the first time it is used.
 
     Args:
         df: Input DataFrame to update (modified in place).
-        fnr_catalog_path: Path to a parquet file holding FNR/SNR mappings.
+        fnr_catalog_path: Directory of the catalog, or path to a versioned
+            parquet catalog, the catalog is then in a directory next to it.
         snr_col: Name of the SNR column to fill.
         fnr_col: Name of the FNR column used as the key.
 
     Returns:
         pd.DataFrame: The same DataFrame instance with filled SNR values.
     """
-    with LoggerStack(
-        "Using a catalog for persisting invalid FNR -> UUIDs through a catalog"
+    catalog_dir = fnr_uuid_catalog_dir(fnr_catalog_path)
+    with (
+        LoggerStack(
+            "Using a catalog for persisting invalid FNR -> UUIDs through a catalog"
+        ),
+        fnr_uuid_catalog_lock(catalog_dir),
     ):
-        # Open existing catalog from path if it exists
-        catalog = pd.DataFrame(columns=[fnr_col, snr_col]).astype(
-            {fnr_col: STRING_DTYPE, snr_col: STRING_DTYPE}
-        )
-        catalog_path = latest_version_path(Path(fnr_catalog_path))
-        if catalog_path.exists():
-            catalog = pd.read_parquet(catalog_path)
-            catalog = catalog[catalog[fnr_col].notna()]
-        else:
-            logger.info(
-                f"Fnr-uuid catalog does not exist, so we are starting with an empty one, and writing to: {fnr_catalog_path}"
+        if not fnr_uuid_catalog_exists(catalog_dir):
+            _import_versioned_catalog(
+                Path(fnr_catalog_path), catalog_dir, snr_col, fnr_col
             )
 
         # Log a warning if there are FNR that are empty, they will not be stored in the catalog
@@ -485,11 +467,15 @@ def generate_uuid_for_snr_with_fnr_catalog(
             )
 
         # Apply the previously generated uuids into the snr_col
+        lookup_fnr = df.loc[df[snr_col].isna() & df[fnr_col].notna(), fnr_col].unique()
+        catalog = read_fnr_uuid_catalog(
+            catalog_dir, lookup_fnr, fnr_col=fnr_col, snr_col=snr_col
+        )
         catalog_fill = (
-            df[[fnr_col]]
-            .merge(catalog, on=fnr_col, how="left")[snr_col]
+            df[fnr_col]
+            .astype(STRING_DTYPE)
+            .map(catalog.set_index(fnr_col)[snr_col])
             .astype(STRING_DTYPE)
-            .set_axis(df.index)
         )
         df[snr_col] = df[snr_col].fillna(catalog_fill)
         snr_missing_pre_generate_mask = df[snr_col].isna()
@@ -503,15 +489,38 @@ def generate_uuid_for_snr_with_fnr_catalog(
             & (df[fnr_col].notna())
             & (df[snr_col].notna())
         ][[fnr_col, snr_col]].drop_duplicates()
-        # Write updated catalog back to drive with added generated values
-        catalog = (
-            pd.concat([catalog, filled_fnr_snr])
-            .drop_duplicates()
-            .reset_index(drop=True)
+        append_to_fnr_uuid_catalog(
+            catalog_dir, filled_fnr_snr, fnr_col=fnr_col, snr_col=snr_col
         )
-        catalog.to_parquet(next_version_path(catalog_path))
 
         df[fnr_col] = df[fnr_col].astype(STRING_DTYPE)
         df[snr_col] = df[snr_col].astype(STRING_DTYPE)
 
         return df
+
+
+def _import_versioned_catalog(
+    fnr_catalog_path: Path, catalog_dir: Path, snr_col: str, fnr_col: str
+) -> None:
+    """Copy the latest version of a parquet catalog into a new catalog directory."""
+    if fnr_catalog_path.suffix.lower() != ".parquet":
+        logger.info(
+            f"Fnr-uuid catalog does not exist, so we are starting with an empty one in: {catalog_dir}"
+        )
+        return
+
+    versioned_path = Path(latest_version_path(fnr_catalog_path))
+    if not versioned_path.is_file():
+        logger.info(
+            f"Fnr-uuid catalog does not exist, so we are starting with an empty one in: {catalog_dir}"
+        )
+        return
+
+    logger.info(f"Copying the fnr-uuid catalog {versioned_path} into {catalog_dir}")
+    versioned = pd.read_parquet(versioned_path, columns=[fnr_col, snr_col])
+    append_to_fnr_uuid_catalog(
+        catalog_dir,
+        versioned.astype(STRING_DTYPE),
+        fnr_col=fnr_col,
+        snr_col=snr_col,
+    )
@@ -1,10 +1,15 @@
+import os
 import shutil
+import time
 from pathlib import Path
 from types import SimpleNamespace
 from typing import Any
 from uuid import uuid4
 
+import duckdb as db
+import numpy as np
 import pandas as pd
+import pytest
 
 from nudb_use.datasets import bof as bof_module
 from nudb_use.datasets.bof import _bof_connection_lookup_sql_parts
@@ -101,47 +106,144 @@ def test_first_date_from_path_period_accepts_datetime(monkeypatch: Any) -> None:
     assert result.isoformat() == "2024-10-02"
 
 
-def test_bof_connection_lookup_sql_parts_builds_union_and_latest_cte(
-    monkeypatch: Any,
-) -> None:
-    workdir = Path.cwd() / f".pytest-bof-sql-{uuid4().hex}"
-    workdir.mkdir()
-    bof_path = workdir / "vof's_p2025-10_v1.parquet"
-    bof_path.touch()
+def _write_bof_files(workdir: Path, monkeypatch: Any) -> dict[Path, Any]:
+    """Write two small BOF files, and point the BOF path lookup at them."""
+    files = {
+        workdir
+        / "vof's_p2024-10_v1.parquet": (
+            "2024-10-01",
+            pd.DataFrame(
+                {
+                    "org_nr": ["900000001", "900000001", "900000002", None],
+                    "orgnrbed": ["800000001", "800000002", "900000001", "800000003"],
+                }
+            ),
+        ),
+        workdir
+        / "vof's_p2025-10_v1.parquet": (
+            "2025-10-01",
+            pd.DataFrame(
+                {
+                    "org_nr": ["900000003", "900000003", "000000000"],
+                    "orgnrbed": ["800000001", "800000002", "800000004"],
+                }
+            ),
+        ),
+    }
+    for path, (_period, df) in files.items():
+        df.to_parquet(path)
 
     monkeypatch.setattr(
         bof_module,
         "_get_all_bof_situttak_october_paths",
-        lambda want_cols=None: [bof_path],
+        lambda want_cols=None: sorted(files),
     )
     monkeypatch.setattr(
         bof_module,
         "_first_date_from_path_period",
-        lambda _path: pd.Timestamp("2025-10-01").date(),
+        lambda path: pd.Timestamp(files[Path(path)][0]).date(),
     )
-    monkeypatch.setattr(
+    monkeypatch.setattr(bof_module, "BOF_CACHE_DIR", workdir / "cache")
+    monkeypatch.setattr(  # avoid registering the paths in the global nudb_database
         bof_module,
-        "_bof_latest_orgnr_placement_ctes_sql",
-        lambda relevant_orgnr_cte=None, alias="": f"latest_placement AS (SELECT '{relevant_orgnr_cte}' AS source)",
-    )
-    monkeypatch.setattr(  # _bof_connection_lookup_sql_parts calls _nudb_read_parquet
-        bof_module, "_nudb_read_parquet", lambda path, alias: f"read_parquet('{path}')"
+        "_nudb_read_parquet",
+        lambda path, alias: (
+            f"read_parquet('{str(path).replace(chr(39), chr(39) * 2)}')"
+        ),
     )
+    return files
 
-    try:
-        result = _bof_connection_lookup_sql_parts(
-            alias="TEST_BOF_CONNECTION_LOOKUP_SQL_PARTS"
-        )
-    finally:
-        shutil.rmtree(workdir)
+
+def test_bof_connection_lookup_sql_parts_reads_materialized_tables(
+    monkeypatch: Any, tmp_path: Path
+) -> None:
+    _write_bof_files(tmp_path, monkeypatch)
+
+    result = _bof_connection_lookup_sql_parts(
+        alias="TEST_BOF_CONNECTION_LOOKUP_SQL_PARTS"
+    )
 
     assert result is not None
     union_sql, latest_cte_sql = result
-    assert "CAST(org_nr AS VARCHAR) AS orgnr" in union_sql
-    assert "CAST(orgnrbed AS VARCHAR) AS orgnrbed" in union_sql
-    assert "2025-10-01" in union_sql
-    assert "vof''s_p2025-10_v1.parquet" in union_sql
+    assert "bof_connections_" in union_sql
     assert "relevant_orgnr" in latest_cte_sql
+    assert len(list((tmp_path / "cache").glob("*.parquet"))) == 2
+
+    connections = (
+        db.sql(f"SELECT * FROM ({union_sql}) ORDER BY bof_period_date, orgnrbed")
+        .df()
+        .astype({"bof_period_date": "string"})
+    )
+    assert connections.shape == (7, 3)
+    assert connections.iloc[0].tolist() == ["900000001", "800000001", "2024-10-01"]
+
+    latest = db.sql(f"""
+        WITH relevant_orgnr AS (SELECT '900000001' AS orgnr UNION ALL SELECT '800000003'),
+        {latest_cte_sql}
+        SELECT * FROM latest_placement ORDER BY orgnr
+    """).df()
+    # 900000001 is a foretak in 2024, but placed as orgnrbed since it is both
+    assert latest.values.tolist() == [
+        ["800000003", "orgnrbed"],
+        ["900000001", "orgnrbed"],
+    ]
+
+
+def test_bof_connection_lookup_sql_parts_lists_bof_files_once(
+    monkeypatch: Any, tmp_path: Path
+) -> None:
+    files = _write_bof_files(tmp_path, monkeypatch)
+    calls: list[object] = []
+
+    def bof_paths(want_cols: object = None) -> list[Path]:
+        calls.append(want_cols)
+        return sorted(files)
+
+    monkeypatch.setattr(bof_module, "_get_all_bof_situttak_october_paths", bof_paths)
+
+    assert _bof_connection_lookup_sql_parts(alias="TEST_BOF_ONCE") is not None
+    assert len(calls) == 1
+
+
+def test_materialize_bof_placements_reuses_cache_until_files_change(
+    monkeypatch: Any, tmp_path: Path
+) -> None:
+    files = _write_bof_files(tmp_path, monkeypatch)
+
+    first = bof_module._materialize_bof_placements()
+    assert first is not None
+    built_as = first[0].stat().st_ino
+
+    second = bof_module._materialize_bof_placements()
+    assert second == first
+    assert second[0].stat().st_ino == built_as
+
+    changed = next(iter(files))
+    os.utime(
+        changed, ns=(changed.stat().st_atime_ns, changed.stat().st_mtime_ns + 10**9)
+    )
+    third = bof_module._materialize_bof_placements()
+    assert third is not None
+    assert third != first
+    # Other sessions may still read the first tables
+    assert sorted((tmp_path / "cache").glob("*")) == sorted([*first, *third])
+
+    # Until they have been unused for a while
+    unused_since = time.time() - (bof_module.BOF_CACHE_MAX_AGE_DAYS + 1) * 24 * 60 * 60
+    for path in first:
+        os.utime(path, (unused_since, unused_since))
+    os.utime(
+        changed, ns=(changed.stat().st_atime_ns, changed.stat().st_mtime_ns + 10**9)
+    )
+    fourth = bof_module._materialize_bof_placements()
+    assert fourth is not None
+    assert sorted((tmp_path / "cache").glob("*")) == sorted([*third, *fourth])
+
+    latest = db.sql(
+        f"SELECT * FROM read_parquet('{str(fourth[1]).replace(chr(39), chr(39) * 2)}')"
+    ).df()
+    assert "000000000" not in latest["orgnr"].tolist()
+    assert latest["orgnr"].is_unique
 
 
 def test_bof_connection_lookup_sql_parts_returns_none_without_inputs(
@@ -304,3 +406,131 @@ def test_get_all_bof_situttak_october_paths_filters_and_adds_first_last(
         shutil.rmtree(workdir)
 
     assert result == [first, october]
+
+
+def _random_bof_lookup_data(
+    seed: int,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    periods = pd.to_datetime([f"{year}-10-01" for year in range(2015, 2025)])
+    foretak = [f"9{i:08d}" for i in range(15)]
+    bedrifter = [f"8{i:08d}" for i in range(30)]
+
+    # Each bedrift has at most one foretak per period, but a foretak may have many bedrifter
+    connections = pd.DataFrame(
+        [
+            (rng.choice(foretak), bed, period)
+            for bed in bedrifter
+            for period in periods
+            if rng.random() < 0.4
+        ],
+        columns=["orgnr", "orgnrbed", "bof_period_date"],
+    )
+    n = 400
+    dates = pd.Series(
+        pd.to_datetime("2013-01-01")
+        + pd.to_timedelta(rng.integers(0, 365 * 13, n), unit="D")
+    )
+    dates[rng.random(n) < 0.05] = pd.NaT
+    inputs = pd.DataFrame(
+        {
+            "_row_id": np.arange(n),
+            "orgnrbed": rng.choice([*bedrifter, "", "000000000", "812345678"], n),
+            "orgnr": rng.choice([*foretak, "", "912345678"], n),
+            "join_date": dates,
+        }
+    )
+    return connections, inputs
+
+
+def _patch_lookup_parts(monkeypatch: Any) -> None:
+    monkeypatch.setattr(
+        bof_module,
+        "_bof_connection_lookup_sql_parts",
+        lambda alias: (
+            "SELECT orgnr, orgnrbed, CAST(bof_period_date AS DATE) AS bof_period_date FROM bof_connections",
+            """latest_placement AS (
+                SELECT DISTINCT orgnr, 'foretak' AS orgnr_type FROM bof_connections
+                UNION ALL
+                SELECT DISTINCT orgnrbed, 'orgnrbed' FROM bof_connections
+            )""",
+        ),
+    )
+
+
+def _nearest_period_rows(
+    candidates: pd.DataFrame, join_date: pd.Timestamp
+) -> pd.DataFrame:
+    """Rows in the latest period at or before the date, otherwise the first period after."""
+    before = candidates[candidates["bof_period_date"] <= join_date]
+    if len(before):
+        return before[before["bof_period_date"] == before["bof_period_date"].max()]
+    return candidates[
+        candidates["bof_period_date"] == candidates["bof_period_date"].min()
+    ]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_bof_orgnrbed_to_foretak_lookup_matches_reference(
+    monkeypatch: Any, seed: int
+) -> None:
+    connections, inputs = _random_bof_lookup_data(seed)
+    _patch_lookup_parts(monkeypatch)
+    sql = _bof_orgnrbed_to_foretak_lookup_sql(
+        input_alias="input_rows",
+        orgnrbed_col="orgnrbed",
+        join_date_col="join_date",
+        row_id_col="_row_id",
+    )
+    assert sql is not None
+
+    connection = db.connect()
+    connection.register("bof_connections", connections)
+    connection.register("input_rows", inputs)
+    result = connection.sql(sql).df()
+
+    expected: list[str | None] = []
+    for row in inputs.itertuples():
+        candidates = connections[connections["orgnrbed"] == row.orgnrbed]
+        if pd.isna(row.join_date) or candidates.empty:
+            expected.append(None)
+            continue
+        expected.append(
+            _nearest_period_rows(candidates, row.join_date)["orgnr"].iloc[0]
+        )
+
+    assert result["_row_id"].tolist() == inputs["_row_id"].tolist()
+    assert [None if pd.isna(x) else x for x in result["orgnr"]] == expected
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_bof_foretak_to_orgnrbed_lookup_matches_reference(
+    monkeypatch: Any, seed: int
+) -> None:
+    connections, inputs = _random_bof_lookup_data(seed)
+    _patch_lookup_parts(monkeypatch)
+    sql = _bof_foretak_to_orgnrbed_lookup_sql(
+        input_alias="input_rows",
+        orgnr_col="orgnr",
+        join_date_col="join_date",
+        row_id_col="_row_id",
+    )
+    assert sql is not None
+
+    connection = db.connect()
+    connection.register("bof_connections", connections)
+    connection.register("input_rows", inputs)
+    result = connection.sql(sql).df()
+
+    expected: list[str | None] = []
+    for row in inputs.itertuples():
+        candidates = connections[connections["orgnr"] == row.orgnr]
+        if pd.isna(row.join_date) or candidates.empty:
+            expected.append(None)
+            continue
+        chosen = _nearest_period_rows(candidates, row.join_date)["orgnrbed"].unique()
+        expected.append(chosen[0] if len(chosen) == 1 else None)
+
+    assert result["_row_id"].tolist() == inputs["_row_id"].tolist()
+    assert [None if pd.isna(x) else x for x in result["orgnrbed"]] == expected
+    assert result["orgnrbed"].notna().any()
@@ -0,0 +1,184 @@
+from types import SimpleNamespace
+from typing import Any
+
+import duckdb as db
+import numpy as np
+import pandas as pd
+import pytest
+
+from nudb_use.datasets.bu_igang import _generate_bu_igang_table
+from nudb_use.datasets.nudb_database import _NudbDatabase
+
+
+def _register_synthetic_sources(
+    connection: db.DuckDBPyConnection, n: int = 300, seed: int = 42
+) -> None:
+    rng = np.random.default_rng(seed)
+    snrs = [f"{i:07d}" for i in range(n)] + ["123", "12345678"]
+    nus = ["211111", "311111", "411111", "611111", "711111"]
+    bools = [True, False, None]
+
+    def sample(values: list[Any], size: int) -> list[Any]:
+        return [values[i] for i in rng.integers(0, len(values), size)]
+
+    size = n * 4
+    igang = pd.DataFrame(
+        {
+            "snr": sample(snrs, size),
+            "nus2000": sample(nus, size),
+            "utd_skoleaar_start": [str(x) for x in rng.integers(2015, 2022, size)],
+            "uh_erhovedaktivitet": sample(bools, size),
+            "fa_erhovedaktivitet": sample(bools, size),
+            "vg_erhovedaktivitet": sample(bools, size),
+        }
+    )
+    avslutta = pd.DataFrame(
+        {
+            "snr": sample(snrs, n),
+            "utd_skoleaar_start": [str(x) for x in rng.integers(2013, 2020, n)],
+        }
+    )
+    eksamen = pd.DataFrame({"snr": sample(snrs, n)})
+    utd_hoeyeste = (
+        pd.DataFrame(
+            {
+                "snr": sample(snrs, size),
+                "utd_hoeyeste_nus2000": sample(nus, size),
+                "utd_hoeyeste_aar": rng.integers(2010, 2024, size),
+            }
+        )
+        # utd_hoeyeste has one row per snr and year
+        .drop_duplicates(["snr", "utd_hoeyeste_aar"])
+    )
+
+    for name, df in {
+        "igang": igang,
+        "avslutta": avslutta,
+        "eksamen": eksamen,
+        "utd_hoeyeste": utd_hoeyeste,
+    }.items():
+        connection.register(f"{name}_df", df)
+        connection.execute(f"CREATE TABLE {name} AS SELECT * FROM {name}_df")
+
+
+def _legacy_bu_igang(
+    connection: db.DuckDBPyConnection, yfirst: int, ylast: int
+) -> pd.DataFrame:
+    """The year by year implementation that the set-based query replaced."""
+    bu_igang = connection.sql("""
+        SELECT DISTINCT snr
+        FROM (
+            SELECT DISTINCT snr FROM igang    UNION
+            SELECT DISTINCT snr FROM avslutta UNION
+            SELECT DISTINCT snr FROM eksamen
+        )
+        WHERE LENGTH(snr) == 7
+    """).df()
+
+    for year in range(yfirst, ylast + 1):
+        igang_y = connection.query(f"""
+                SELECT snr, nus2000
+                FROM (
+                    SELECT DISTINCT
+                        snr,
+                        nus2000,
+                        UTD_HOVEDAKTIVITET_PRIO(
+                            uh_erhovedaktivitet, fa_erhovedaktivitet, vg_erhovedaktivitet
+                        ) AS utd_hovedaktivitet_prio
+                    FROM igang
+                    WHERE utd_skoleaar_start = '{year}'
+                )
+                QUALIFY row_number() OVER (
+                    PARTITION BY snr ORDER BY utd_hovedaktivitet_prio DESC, nus2000 DESC
+                ) = 1;
+            """).df().rename(columns={"nus2000": f"igang_{year}"})
+        bu_y = connection.sql(f"""
+            SELECT DISTINCT snr, utd_hoeyeste_nus2000 AS bu_{year}
+            FROM (
+                SELECT
+                    snr,
+                    utd_hoeyeste_nus2000,
+                    utd_hoeyeste_aar,
+                    MAX(utd_hoeyeste_aar) OVER (PARTITION BY SNR) AS last_utd_hoeyeste_aar
+                FROM utd_hoeyeste
+                WHERE LENGTH(snr) = 7 AND utd_hoeyeste_aar <= {year}
+            )
+            WHERE last_utd_hoeyeste_aar = utd_hoeyeste_aar;
+        """).df()
+        bu_igang = bu_igang.merge(igang_y, how="left", on="snr", validate="1:1").merge(
+            bu_y, how="left", on="snr", validate="1:1"
+        )
+
+    return bu_igang.astype("string[pyarrow]")
+
+
+def _fake_nudb_data(name: str) -> SimpleNamespace:
+    return SimpleNamespace(alias=name)
+
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values("snr").reset_index(drop=True)
+
+
+def test_generate_bu_igang_table_matches_legacy_output(monkeypatch: Any) -> None:
+    database = _NudbDatabase()
+    connection = database.get_connection()
+    _register_synthetic_sources(connection)
+    monkeypatch.setattr("nudb_use.datasets.NudbData", _fake_nudb_data)
+
+    _generate_bu_igang_table("TEST_BU_IGANG", connection)
+
+    result = connection.sql("SELECT * FROM TEST_BU_IGANG").df()
+    expected = _legacy_bu_igang(connection, 2013, 2021)
+
+    assert result.columns.tolist() == expected.columns.tolist()
+    pd.testing.assert_frame_equal(
+        _sorted(result.astype("string[pyarrow]")), _sorted(expected)
+    )
+
+    del database
+
+
+def test_generate_bu_igang_table_respects_year_range(monkeypatch: Any) -> None:
+    database = _NudbDatabase()
+    connection = database.get_connection()
+    _register_synthetic_sources(connection, n=50, seed=1)
+    monkeypatch.setattr("nudb_use.datasets.NudbData", _fake_nudb_data)
+
+    _generate_bu_igang_table("TEST_BU_IGANG", connection, from_year=2017, to_year=2018)
+
+    result = connection.sql("SELECT * FROM TEST_BU_IGANG").df()
+    expected = _legacy_bu_igang(connection, 2017, 2018)
+
+    assert result.columns.tolist() == [
+        "snr",
+        "igang_2017",
+        "bu_2017",
+        "igang_2018",
+        "bu_2018",
+    ]
+    pd.testing.assert_frame_equal(
+        _sorted(result.astype("string[pyarrow]")), _sorted(expected)
+    )
+
+    del database
+
+
+def test_generate_bu_igang_table_fails_on_duplicated_utd_hoeyeste_year(
+    monkeypatch: Any,
+) -> None:
+    database = _NudbDatabase()
+    connection = database.get_connection()
+    _register_synthetic_sources(connection, n=50, seed=1)
+    connection.execute("""
+        INSERT INTO utd_hoeyeste
+        SELECT snr, '999999', utd_hoeyeste_aar FROM utd_hoeyeste
+        WHERE LENGTH(snr) = 7 AND utd_hoeyeste_aar <= 2021
+        LIMIT 1
+    """)
+    monkeypatch.setattr("nudb_use.datasets.NudbData", _fake_nudb_data)
+
+    with pytest.raises(ValueError, match="same snr and year"):
+        _generate_bu_igang_table("TEST_BU_IGANG", connection)
+
+    del database
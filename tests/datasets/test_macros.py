@@ -0,0 +1,221 @@
+import datetime
+
+import duckdb as db
+import numpy as np
+import pandas as pd
+import pytest
+
+from nudb_use.datasets.macros import _DUCKDB_MACROS
+from nudb_use.datasets.macros import RANGERING_WIDTH
+
+# The ranking as the string it was concatenated to before it was packed in an integer
+_LEGACY_RANGERING_MACRO = """
+CREATE OR REPLACE MACRO LEGACY_DATE2STR(x) AS strftime(x, '%Y%m%d');
+
+CREATE OR REPLACE MACRO LEGACY_UTD_HOEYESTE_RANGERING(
+    _nus2000, _uh_eksamen_dato, _uh_eksamen_studpoeng, _uh_gruppering_nus, _utd_aktivitet_slutt,
+    _utd_klassetrinn, _utd_skoleaar_start, _utd_rectype, _utd_studieland, _utd_datakilde
+) AS (
+    WITH T0 AS (
+        SELECT
+            PREP_NUS2000(_nus2000) AS nus2000,
+            _uh_eksamen_dato AS uh_eksamen_dato,
+            PREP_UH_EKSAMEN_STUDPOENG(_uh_eksamen_studpoeng) AS uh_eksamen_studpoeng,
+            PREP_UHGRUPPE(_uh_gruppering_nus) AS uh_gruppering_nus,
+            PREP_UTD_AKTIVITET_SLUTT(_utd_aktivitet_slutt, _uh_eksamen_dato, _utd_skoleaar_start) AS utd_aktivitet_slutt,
+            PREP_UTD_KLASSETRINN(_utd_klassetrinn) AS utd_klassetrinn,
+            PREP_UTD_DATAKILDE(_utd_datakilde) AS utd_datakilde,
+            LPAD(CAST(PREP_AND_INVERT_UTD_STUDIELAND(_utd_studieland) AS VARCHAR), 3, '0') AS utd_inverse_studieland,
+            _utd_rectype AS utd_rectype
+    ),
+    T1 AS (
+        SELECT
+            *,
+            IS_EKSAMENER_120_STUDP(uh_eksamen_dato, uh_eksamen_studpoeng, uh_gruppering_nus, utd_rectype) AS is_eksamener_120_studp,
+            SUBSTR(nus2000, 1, 1) AS nivaa2000
+        FROM T0
+    ),
+    T2 AS (
+        SELECT
+            *,
+            CAST(TRINN_PLASSERING(
+                nus2000, nivaa2000, uh_eksamen_dato, uh_eksamen_studpoeng, utd_aktivitet_slutt,
+                is_eksamener_120_studp, utd_klassetrinn, utd_rectype
+            ) AS VARCHAR) AS trinn_plassering
+        FROM T1
+    ),
+    T3 AS (
+        SELECT
+            *,
+            CASE
+                WHEN trinn_plassering == '3'        THEN LPAD(CAST(99999999 - CAST(LEGACY_DATE2STR(utd_aktivitet_slutt) AS INTEGER) AS VARCHAR), 8, '0')
+                WHEN trinn_plassering IN ('2', '4') THEN '00000000'
+                                                    ELSE LEGACY_DATE2STR(utd_aktivitet_slutt)
+            END AS first_date_tiebreak,
+            LEGACY_DATE2STR(utd_aktivitet_slutt) AS last_date_tiebreak,
+            RIGHT(CAST(CAST(nivaa2000 AS INTEGER) + 1 AS VARCHAR), 1) AS nivaa2000_overflowed,
+            CASE WHEN SUBSTR(nus2000, 2, 1) == '0' THEN '0' ELSE '1' END AS allmenne_fag,
+            CASE WHEN uh_gruppering_nus == '01' THEN '0'
+                 WHEN uh_gruppering_nus == '23' THEN '1'
+                                                ELSE '9'
+            END AS ppu_forberedende_proever
+        FROM T2
+    )
+    SELECT CONCAT(
+        trinn_plassering, first_date_tiebreak, nivaa2000_overflowed, utd_klassetrinn, allmenne_fag,
+        ppu_forberedende_proever, last_date_tiebreak, nus2000, utd_inverse_studieland, utd_datakilde
+    ) FROM T3
+);
+"""
+
+_RANGERING_ARGS = """
+    nus2000, uh_eksamen_dato, uh_eksamen_studpoeng, uh_gruppering_nus, utd_aktivitet_slutt,
+    utd_klassetrinn, utd_skoleaar_start, utd_rectype, utd_studieland, utd_datakilde
+"""
+
+
+@pytest.fixture
+def connection() -> db.DuckDBPyConnection:
+    connection = db.connect()
+    connection.execute(_DUCKDB_MACROS)
+    connection.execute(_LEGACY_RANGERING_MACRO)
+    return connection
+
+
+def _rankings(connection: db.DuckDBPyConnection, records: str) -> pd.DataFrame:
+    """Rank the records both ways, only where the legacy string had every field."""
+    rankings: pd.DataFrame = connection.sql(f"""
+        SELECT
+            rangering,
+            RANGERING2STR(rangering) AS rangering_str,
+            legacy
+        FROM (
+            SELECT
+                UTD_HOEYESTE_RANGERING({_RANGERING_ARGS}) AS rangering,
+                LEGACY_UTD_HOEYESTE_RANGERING({_RANGERING_ARGS}) AS legacy
+            FROM {records}
+        )
+        WHERE LENGTH(legacy) == {RANGERING_WIDTH}
+    """).df()
+    return rankings
+
+
+def _assert_same_ordering(connection: db.DuckDBPyConnection, records: str) -> int:
+    rankings = _rankings(connection, records)
+    assert (rankings["rangering_str"] == rankings["legacy"]).all()
+
+    # Sorting by either gives the same sequence, with ties in the same places
+    same_order = connection.sql(f"""
+        SELECT
+            list(legacy ORDER BY rangering) == list(legacy ORDER BY legacy),
+            COUNT(DISTINCT rangering) == COUNT(DISTINCT legacy)
+        FROM (
+            SELECT
+                UTD_HOEYESTE_RANGERING({_RANGERING_ARGS}) AS rangering,
+                LEGACY_UTD_HOEYESTE_RANGERING({_RANGERING_ARGS}) AS legacy
+            FROM {records}
+        )
+        WHERE LENGTH(legacy) == {RANGERING_WIDTH}
+    """).fetchone()
+    assert same_order == (True, True)
+    return len(rankings)
+
+
+def test_rangering_orders_like_legacy_string_for_every_combination(
+    connection: db.DuckDBPyConnection,
+) -> None:
+    # Every combination of the values each branch of the ranking looks at
+    nus2000: list[object] = [None, "999999"]
+    nus2000 += [f"{n}{a}1199" for n in range(10) for a in (0, 5)]
+    values: dict[str, list[object]] = {
+        "nus2000": nus2000,
+        "uh_eksamen_dato": [None, "DATE '2021-12-20'"],
+        "uh_eksamen_studpoeng": [None, 0, 30],
+        "uh_gruppering_nus": [None, "01", "23", "05"],
+        "utd_aktivitet_slutt": [None, "DATE '1975-09-30'", "DATE '1995-10-01'"],
+        "utd_klassetrinn": [None, 10, 11, 12],
+        "utd_skoleaar_start": [None, "1994"],
+        "utd_rectype": [None, "3", "4"],
+        "utd_studieland": [None, "000", "999"],
+        "utd_datakilde": [None, "11"],
+    }
+
+    def sql_value(value: object) -> str:
+        if value is None:
+            return "NULL"
+        if isinstance(value, str) and not value.startswith("DATE"):
+            return f"'{value}'"
+        return str(value)
+
+    records = " CROSS JOIN ".join(
+        f"(VALUES {', '.join(f'({sql_value(v)})' for v in vals)}) AS {col}({col})"
+        for col, vals in values.items()
+    )
+    n_compared = _assert_same_ordering(connection, f"(SELECT * FROM {records})")
+
+    # Only the records without any date had a shorter legacy string
+    n_records = int(np.prod([len(vals) for vals in values.values()]))
+    n_without_date = n_records // (2 * 3 * 2)
+    assert n_compared == n_records - n_without_date
+
+
+def test_rangering_orders_like_legacy_string_for_random_records(
+    connection: db.DuckDBPyConnection,
+) -> None:
+    rng = np.random.default_rng(20260601)
+    n_rows = 20_000
+
+    def dates() -> pd.Series:
+        first = datetime.date(1000, 1, 1).toordinal()
+        last = datetime.date(9999, 12, 31).toordinal()
+        ordinals = rng.integers(first, last + 1, n_rows)
+        return pd.Series(
+            [datetime.date.fromordinal(int(o)) for o in ordinals], dtype=object
+        )
+
+    def codes(width: int, high: int) -> pd.Series:
+        return pd.Series(
+            [str(x).zfill(width) for x in rng.integers(0, high, n_rows)],
+            dtype="string[pyarrow]",
+        )
+
+    records = pd.DataFrame(
+        {
+            "nus2000": codes(6, 1_000_000),
+            "uh_eksamen_dato": dates(),
+            "uh_eksamen_studpoeng": rng.integers(0, 300, n_rows).astype(float),
+            "uh_gruppering_nus": codes(2, 100),
+            "utd_aktivitet_slutt": dates(),
+            "utd_klassetrinn": rng.integers(0, 100, n_rows),
+            "utd_skoleaar_start": codes(4, 10_000),
+            "utd_rectype": codes(1, 10),
+            "utd_studieland": codes(3, 1000),
+            "utd_datakilde": codes(2, 100),
+        }
+    )
+    # Missing values in a fifth of each column
+    for col in records.columns:
+        records[col] = records[col].astype(object).where(rng.random(n_rows) > 0.2)
+    records["utd_klassetrinn"] = records["utd_klassetrinn"].astype("Int64")
+    records["uh_eksamen_studpoeng"] = records["uh_eksamen_studpoeng"].astype("Float64")
+    records["utd_skoleaar_start"] = records["utd_skoleaar_start"].where(
+        records["utd_skoleaar_start"].astype(str) < "9999", "2005"
+    )
+
+    connection.register("records", records)
+    assert _assert_same_ordering(connection, "records") > 0.9 * n_rows
+
+
+def test_rangering_trinn_and_downgrade(connection: db.DuckDBPyConnection) -> None:
+    result = connection.sql("""
+        SELECT
+            UTD_HOEYESTE_RANGERING_TRINN(rangering),
+            DOWNGRADE_UTD_HOEYESTE_NUS2000('311102', rangering)
+        FROM (
+            SELECT UTD_HOEYESTE_RANGERING(
+                '311102', NULL, NULL, NULL, DATE '2010-06-20', 11, '2009', NULL, '000', '01'
+            ) AS rangering
+        )
+    """).fetchone()
+    # Completed VG2 is record type 1, and downgraded to completed grunnskole
+    assert result == (1, "201199")
@@ -0,0 +1,137 @@
+import os
+from pathlib import Path
+from typing import Any
+
+import duckdb as db
+import pandas as pd
+
+import nudb_use.datasets.nudb_data as nudb_data_module
+import nudb_use.datasets.nudb_database as nudb_database_module
+from nudb_use.datasets import materialization_cache
+from nudb_use.datasets.materialization_cache import MATERIALIZATION_TABLE
+from nudb_use.datasets.nudb_data import NudbData
+from nudb_use.datasets.nudb_database import _NudbDatabase
+from nudb_use.datasets.nudb_read_parquet import _nudb_read_parquet
+
+
+def _new_session(
+    database_path: Path | None,
+    source: Path,
+    monkeypatch: Any,
+    threshold: int = 1,
+    source_filter: str = "TRUE",
+) -> _NudbDatabase:
+    """Start a fresh database, like a new Python session would."""
+    database = _NudbDatabase(database_path)
+
+    def generate_source(alias: str, connection: db.DuckDBPyConnection) -> None:
+        connection.execute(f"""
+            CREATE VIEW {alias} AS
+            SELECT * FROM {_nudb_read_parquet(source, alias)}
+            WHERE {source_filter}
+        """)
+
+    def generate_summary(alias: str, connection: db.DuckDBPyConnection) -> None:
+        connection.execute(f"""
+            CREATE TABLE {alias} AS
+            SELECT COUNT(*) AS n, SUM(x) AS total
+            FROM {NudbData("test_source").alias}
+            WHERE x >= {threshold}
+        """)
+
+    database._dataset_generators["test_source"] = generate_source
+    database._dataset_generators["test_summary"] = generate_summary
+    monkeypatch.setattr(nudb_data_module, "nudb_database", database)
+    monkeypatch.setattr(nudb_database_module, "nudb_database", database)
+    return database
+
+
+def _summary(database: _NudbDatabase) -> tuple[Any, ...]:
+    alias = NudbData("test_summary").alias
+    row = database.get_connection().sql(f"SELECT n, total FROM {alias}").fetchone()
+    assert row is not None
+    return tuple(row)
+
+
+def test_persistent_database_reuses_materialized_tables(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    database_path = tmp_path / "nudb.duckdb"
+    source = tmp_path / "source.parquet"
+    pd.DataFrame({"x": [1, 2, 3]}).to_parquet(source)
+
+    first = _new_session(database_path, source, monkeypatch)
+    assert _summary(first) == (3, 6)
+    assert first._materialization_stats == {"reused": 0, "built": 1}
+    first.get_connection().close()
+
+    second = _new_session(database_path, source, monkeypatch)
+    assert _summary(second) == (3, 6)
+    assert second._materialization_stats == {"reused": 1, "built": 0}
+    second.get_connection().close()
+
+    # New content in the input file makes the stored table stale
+    pd.DataFrame({"x": [1, 2, 3, 4]}).to_parquet(source)
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    third = _new_session(database_path, source, monkeypatch)
+    assert _summary(third) == (4, 10)
+    assert third._materialization_stats == {"reused": 0, "built": 1}
+    third.get_connection().close()
+
+    # So does a change in the SQL that generates it
+    fourth = _new_session(database_path, source, monkeypatch, threshold=3)
+    assert _summary(fourth) == (2, 7)
+    assert fourth._materialization_stats == {"reused": 0, "built": 1}
+    stored = (
+        fourth.get_connection()
+        .sql(f"SELECT alias, input_paths FROM {MATERIALIZATION_TABLE}")
+        .fetchall()
+    )
+    assert stored == [("NUDB_DATA_TEST_SUMMARY", [str(source)])]
+    fourth.get_connection().close()
+
+
+def test_stored_table_is_stale_when_upstream_or_versions_change(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    database_path = tmp_path / "nudb.duckdb"
+    source = tmp_path / "source.parquet"
+    pd.DataFrame({"x": [1, 2, 3]}).to_parquet(source)
+
+    def session(**kwargs: Any) -> dict[str, int]:
+        database = _new_session(database_path, source, monkeypatch, **kwargs)
+        _summary(database)
+        database.get_connection().close()
+        return database._materialization_stats
+
+    assert session() == {"reused": 0, "built": 1}
+    assert session() == {"reused": 1, "built": 0}
+
+    # The SQL of the view the table reads from changed
+    assert session(source_filter="x < 3") == {"reused": 0, "built": 1}
+    assert session(source_filter="x < 3") == {"reused": 1, "built": 0}
+
+    # So did the macros, or the version of nudb_use
+    monkeypatch.setattr(
+        materialization_cache, "_DUCKDB_MACROS", "CREATE MACRO CHANGED() AS 1;"
+    )
+    assert session(source_filter="x < 3") == {"reused": 0, "built": 1}
+    monkeypatch.setattr(materialization_cache, "_nudb_use_version", lambda: "9999.1.1")
+    assert session(source_filter="x < 3") == {"reused": 0, "built": 1}
+    assert session(source_filter="x < 3") == {"reused": 1, "built": 0}
+
+
+def test_in_memory_database_does_not_store_materializations(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    source = tmp_path / "source.parquet"
+    pd.DataFrame({"x": [1, 2, 3]}).to_parquet(source)
+
+    database = _new_session(None, source, monkeypatch)
+
+    assert _summary(database) == (3, 6)
+    assert database._materialization_stats == {"reused": 0, "built": 0}
+    assert database._input_paths("NUDB_DATA_TEST_SUMMARY") == [source]
+    tables = database.get_connection().sql("SHOW TABLES").df()["name"].tolist()
+    assert MATERIALIZATION_TABLE not in tables
@@ -0,0 +1,158 @@
+import gc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import duckdb as db
+import pandas as pd
+import pytest
+
+import nudb_use.datasets.nudb_data as nudb_data_module
+import nudb_use.datasets.nudb_database as nudb_database_module
+from nudb_use.datasets.nudb_data import NudbData
+from nudb_use.datasets.nudb_data import fetch_concurrently
+from nudb_use.datasets.nudb_database import _NudbDatabase
+from nudb_use.datasets.nudb_read_parquet import _nudb_read_parquet
+
+
+def _database_with_source(
+    tmp_path: Path, monkeypatch: Any
+) -> tuple[_NudbDatabase, list[int]]:
+    """A fresh database with one dataset, counting how often it is attached."""
+    source = tmp_path / "source.parquet"
+    pd.DataFrame({"x": range(1000), "group": [i % 7 for i in range(1000)]}).to_parquet(
+        source
+    )
+    database = _NudbDatabase()
+    attached: list[int] = []
+
+    def generate_source(alias: str, connection: db.DuckDBPyConnection) -> None:
+        attached.append(threading.get_ident())
+        connection.execute(
+            f"CREATE VIEW {alias} AS SELECT * FROM {_nudb_read_parquet(source, alias)}"
+        )
+
+    database._dataset_generators["test_source"] = generate_source
+    monkeypatch.setattr(nudb_data_module, "nudb_database", database)
+    monkeypatch.setattr(nudb_database_module, "nudb_database", database)
+    return database, attached
+
+
+def test_threads_get_their_own_cursor() -> None:
+    database = _NudbDatabase()
+    assert database.get_connection() is database._connection
+
+    def connections() -> tuple[db.DuckDBPyConnection, db.DuckDBPyConnection]:
+        return database.get_connection(), database.get_connection()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        barrier = threading.Barrier(2)
+
+        def in_thread(_: int) -> tuple[db.DuckDBPyConnection, ...]:
+            barrier.wait()
+            return connections()
+
+        (first, again), (second, _) = list(executor.map(in_thread, range(2)))
+
+    assert first is again
+    assert first is not second
+    assert first is not database._connection
+    # The cursors see the macros of the database
+    assert first.sql("SELECT PREP_NUS2000(NULL)").fetchone() == ("999999",)
+
+
+def test_registered_names_are_unique_and_removed() -> None:
+    database = _NudbDatabase()
+    df = pd.DataFrame({"x": [1, 2]})
+
+    with (
+        database.registered(df) as first,
+        database.registered(df.assign(x=df["x"] * 10)) as second,
+    ):
+        assert first != second
+        assert first.startswith("_tmp_df_")
+        total = database.get_connection().sql(
+            f"SELECT (SELECT SUM(x) FROM {first}) + (SELECT SUM(x) FROM {second})"
+        )
+        assert total.fetchone() == (33,)
+
+    with pytest.raises(db.CatalogException):
+        database.get_connection().sql(f"SELECT * FROM {first}").fetchall()
+
+
+def test_registered_data_is_scoped_to_the_thread() -> None:
+    database = _NudbDatabase()
+
+    with database.registered(pd.DataFrame({"x": [1]})) as name:
+
+        def query_in_thread() -> None:
+            database.get_connection().sql(f"SELECT * FROM {name}").fetchall()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with pytest.raises(db.CatalogException):
+                executor.submit(query_in_thread).result()
+
+
+def test_fetch_concurrently_returns_results_in_order(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    _, attached = _database_with_source(tmp_path, monkeypatch)
+    source = NudbData("test_source")
+    queries = [
+        source.select("SUM(x) AS total").where(f'"group" = {group}')
+        for group in range(7)
+    ]
+
+    results = fetch_concurrently(queries, max_workers=4)
+
+    assert [int(result["total"].iloc[0]) for result in results] == [
+        sum(x for x in range(1000) if x % 7 == group) for group in range(7)
+    ]
+    assert fetch_concurrently([]) == []
+    assert len(attached) == 1
+
+
+def test_fetch_concurrently_with_dataframe_joins(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    database, _ = _database_with_source(tmp_path, monkeypatch)
+    source = NudbData("test_source")
+    first = source.join(pd.DataFrame({"group": [1], "label": ["one"]})).using('"group"')
+    second = source.join(pd.DataFrame({"group": [2], "label": ["two"]})).using(
+        '"group"'
+    )
+
+    # Each join has its own table, which the cursors of the worker threads can read
+    first_df, second_df = fetch_concurrently([first, second], max_workers=2)
+    assert set(first_df["label"]) == {"one"}
+    assert set(second_df["label"]) == {"two"}
+    assert set(first.df()["label"]) == {"one"}
+    assert len(first_df) == sum(1 for x in range(1000) if x % 7 == 1)
+
+    # The table lives as long as a query refers to it
+    filtered = first.where("x < 100")
+    del first
+    gc.collect()
+    assert set(filtered.df()["label"]) == {"one"}
+    del filtered, first_df, second, second_df
+    gc.collect()
+    tables = database.get_connection().sql(
+        "SELECT table_name FROM duckdb_tables() WHERE database_name = '_nudb_shared_frames'"
+    )
+    assert tables.fetchall() == []
+
+
+def test_datasets_are_attached_once_from_several_threads(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    _, attached = _database_with_source(tmp_path, monkeypatch)
+    barrier = threading.Barrier(4)
+
+    def count_rows(_: int) -> int:
+        barrier.wait()
+        return len(NudbData("test_source").df())
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(executor.map(count_rows, range(4))) == [1000] * 4
+    assert len(attached) == 1
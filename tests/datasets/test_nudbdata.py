@@ -2,6 +2,9 @@ from pathlib import Path
 from typing import Any
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
 
 import nudb_use
 from nudb_use.datasets import NudbData
@@ -177,3 +180,56 @@ def test_microdata(
     )
 
     MicroData("utd_hoeyeste_nus2000")
+
+
+def _nudb_data_from_frame(tmp_path: Path, name: str, n: int = 10) -> NudbData:
+    path = tmp_path / f"{name}.parquet"
+    pd.DataFrame(
+        {
+            "snr": [f"{i:07d}" for i in range(n)],
+            "aar": ["2020"] * 4 + ["2021"] * (n - 4),
+            "x": list(range(n)),
+        }
+    ).to_parquet(path)
+    return NudbData.from_parquet(path, name=name)
+
+
+def test_nudbdata_arrow_and_record_batches(tmp_path: Path) -> None:
+    reset_nudb_database()
+    data = _nudb_data_from_frame(tmp_path, "arrow_source").where("x >= 2")
+
+    table = data.arrow()
+    batches = list(data.record_batches(batch_size=3))
+
+    assert table.column_names == ["snr", "aar", "x"]
+    assert table.column("x").to_pylist() == list(range(2, 10))
+    assert [batch.num_rows for batch in batches] == [3, 3, 2]
+    assert pa.Table.from_batches(batches).equals(table)
+
+
+def test_nudbdata_to_parquet_and_csv(tmp_path: Path) -> None:
+    reset_nudb_database()
+    data = _nudb_data_from_frame(tmp_path, "copy_source")
+
+    parquet_path = data.to_parquet(tmp_path / "out.parquet")
+    assert pq.read_table(parquet_path).num_rows == 10
+
+    # DuckDB sizes row groups in multiples of its vector size, 2048 rows
+    large = _nudb_data_from_frame(tmp_path, "copy_source_large", n=5000)
+    metadata = pq.ParquetFile(
+        large.to_parquet(tmp_path / "large.parquet", row_group_size=2048)
+    ).metadata
+    assert [metadata.row_group(i).num_rows for i in range(3)] == [2048, 2048, 904]
+
+    with pytest.raises(FileExistsError):
+        data.to_parquet(parquet_path)
+    data.select("snr").to_parquet(parquet_path, overwrite=True)
+    assert pq.read_table(parquet_path).column_names == ["snr"]
+
+    partitioned = data.to_parquet(tmp_path / "partitioned", partition_by=["aar"])
+    assert sorted(p.name for p in partitioned.iterdir()) == ["aar=2020", "aar=2021"]
+    data.to_parquet(partitioned, partition_by=["aar"], overwrite=True)
+
+    csv_path = data.where("aar = '2020'").to_csv(tmp_path / "out.csv", delimiter=";")
+    csv = pd.read_csv(csv_path, sep=";", dtype="string")
+    assert csv["snr"].tolist() == ["0000000", "0000001", "0000002", "0000003"]
@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import duckdb as db
+import pandas as pd
+import pytest
+
+import nudb_use.datasets.nudb_data as nudb_data_module
+import nudb_use.datasets.nudb_database as nudb_database_module
+from nudb_use import nudb_logger
+from nudb_use.datasets.nudb_data import NudbData
+from nudb_use.datasets.nudb_database import _NudbDatabase
+from nudb_use.datasets.nudb_read_parquet import _nudb_read_parquet
+from nudb_use.datasets.profiling import profile_dataset_generators
+from nudb_use.datasets.profiling import write_profiles
+
+
+@pytest.fixture
+def database(tmp_path: Path, monkeypatch: Any) -> _NudbDatabase:
+    """A fresh database with a parquet view, and a table summarizing it."""
+    source = tmp_path / "source.parquet"
+    pd.DataFrame(
+        {"x": range(10_000), "group": [i % 3 for i in range(10_000)]}
+    ).to_parquet(source)
+    database = _NudbDatabase()
+
+    def generate_source(alias: str, connection: db.DuckDBPyConnection) -> None:
+        connection.execute(
+            f"CREATE VIEW {alias} AS SELECT * FROM {_nudb_read_parquet(source, alias)}"
+        )
+
+    def generate_summary(alias: str, connection: db.DuckDBPyConnection) -> None:
+        connection.sql(f"""
+            CREATE TABLE {alias} AS
+            SELECT "group", COUNT(*) AS n
+            FROM {NudbData("test_source").alias}
+            GROUP BY "group"
+        """)
+
+    database._dataset_generators["test_source"] = generate_source
+    database._dataset_generators["test_summary"] = generate_summary
+    monkeypatch.setattr(nudb_data_module, "nudb_database", database)
+    monkeypatch.setattr(nudb_database_module, "nudb_database", database)
+    return database
+
+
+def test_profile_nudb_data_query(
+    database: _NudbDatabase, tmp_path: Path, monkeypatch: Any
+) -> None:
+    ring = nudb_logger.RingBufferSink()
+    monkeypatch.setattr(nudb_logger, "LOG_SINKS", [ring])
+
+    profile = (
+        NudbData("test_source")
+        .select("SUM(x) AS total")
+        .where("x >= 100")
+        .profile(tmp_path / "profile.html")
+    )
+
+    operators = {op["type"]: op for op in profile.operators()}
+    assert operators["TABLE_SCAN"]["cardinality"] == 9_900
+    assert profile.summary()["rows_returned"] == 1
+    assert profile.summary()["peak_temp_dir_size"] == 0
+    assert "READ_PARQUET" in profile.plan()
+    assert "READ_PARQUET" in (tmp_path / "profile.html").read_text(encoding="utf-8")
+
+    logged = [entry["data"] for entry in ring.entries if "data" in entry]
+    assert logged == [profile.summary()]
+
+    # Profiling is turned off afterwards
+    setting = database.get_connection().sql(
+        "SELECT current_setting('enable_profiling')"
+    )
+    assert setting.fetchone() == (None,)
+
+
+def test_profile_dataset_generators_one_by_one(
+    database: _NudbDatabase, tmp_path: Path
+) -> None:
+    profiles = profile_dataset_generators(
+        "test_summary", path=tmp_path / "generators.json"
+    )
+
+    # The source view is generated while generating the summary
+    assert [profile.name for profile in profiles] == ["test_source", "test_summary"]
+    assert "CREATE TABLE" in profiles[1].query
+    group_by = [op for op in profiles[1].operators() if "GROUP_BY" in op["type"]]
+    assert [op["cardinality"] for op in group_by] == [3]
+    assert database._profiles is None
+
+    written = json.loads((tmp_path / "generators.json").read_text(encoding="utf-8"))
+    assert [profile["name"] for profile in written] == ["test_source", "test_summary"]
+
+    # Attached datasets are not generated again
+    assert profile_dataset_generators("test_summary") == []
+
+
+def test_write_profiles_only_json_or_html(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match=r"\.json or \.html"):
+        write_profiles([], tmp_path / "profiles.txt")
@@ -0,0 +1,130 @@
+import os
+from pathlib import Path
+from typing import Any
+
+import duckdb as db
+import numpy as np
+import pandas as pd
+import pytest
+
+import nudb_use.datasets.nudb_data as nudb_data_module
+import nudb_use.datasets.nudb_database as nudb_database_module
+from nudb_use.datasets import snrkat as snrkat_module
+from nudb_use.datasets.nudb_database import _NudbDatabase
+from nudb_use.datasets.nudb_read_parquet import _nudb_read_parquet
+from nudb_use.datasets.snrkat import SnrkatLookup
+from nudb_use.datasets.snrkat import snrkat_lookup
+
+
+def _use_snrkat_file(snrkat: pd.DataFrame, tmp_path: Path, monkeypatch: Any) -> Path:
+    """Read snrkat from a parquet file in a fresh database, caching lookups in tmp_path."""
+    path = tmp_path / "snrkat.parquet"
+    snrkat.to_parquet(path)
+    database = _NudbDatabase()
+
+    def generate_snrkat(alias: str, connection: db.DuckDBPyConnection) -> None:
+        connection.execute(
+            f"CREATE VIEW {alias} AS SELECT * FROM {_nudb_read_parquet(path, alias)}"
+        )
+
+    database._dataset_generators["snrkat"] = generate_snrkat
+    monkeypatch.setattr(nudb_data_module, "nudb_database", database)
+    monkeypatch.setattr(nudb_database_module, "nudb_database", database)
+    monkeypatch.setattr(snrkat_module, "SNRKAT_CACHE_DIR", tmp_path / "cache")
+    return path
+
+
+def test_snrkat_lookup_resolves_identifiers() -> None:
+    lookup = SnrkatLookup.from_pairs(
+        pd.Series(["fnr03", "fnr01", "fnr02", None, "fnr01"]),
+        pd.Series(["snr3", "snr1", "snr2", "snr4", "snr1"]),
+    )
+    idents = pd.Series(
+        ["fnr02", "fnr01", None, "missing", "fnr01", "fnr0", "fnr011"],
+        index=[5, 4, 3, 2, 1, 0, 9],
+    )
+
+    resolved = lookup.resolve(idents)
+
+    assert lookup.keys.tolist() == [b"fnr01", b"fnr02", b"fnr03"]
+    assert resolved.index.tolist() == idents.index.tolist()
+    assert resolved.tolist() == ["snr2", "snr1", pd.NA, pd.NA, "snr1", pd.NA, pd.NA]
+
+
+def test_snrkat_lookup_raises_on_ambiguous_identifiers() -> None:
+    lookup = SnrkatLookup.from_pairs(
+        pd.Series(["fnr01", "fnr01"]), pd.Series(["snr1", "snr2"])
+    )
+
+    assert lookup.resolve(pd.Series(["fnr02"])).isna().all()
+    with pytest.raises(ValueError, match="several values"):
+        lookup.resolve(pd.Series(["fnr01"]))
+
+
+def test_snrkat_lookup_is_cached_and_memory_mapped(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    snrkat = pd.DataFrame(
+        {
+            "fnr": ["11111111111", "22222222222", None],
+            "snr_utgatt": ["OLD0001", None, "OLD0003"],
+            "snr": ["NEW0001", "NEW0002", "NEW0003"],
+        }
+    )
+    path = _use_snrkat_file(snrkat, tmp_path, monkeypatch)
+    idents = pd.Series(["22222222222", "33333333333", "11111111111"])
+
+    first = snrkat_lookup("fnr", "snr")
+    assert isinstance(first.keys, np.memmap)
+    assert first.resolve(idents).tolist() == ["NEW0002", pd.NA, "NEW0001"]
+    cached = sorted((tmp_path / "cache").glob("*.npy"))
+    assert len(cached) == 2
+
+    def build_again(*_args: Any) -> SnrkatLookup:
+        raise AssertionError("The cached lookup should be reused")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(snrkat_module, "_build_snrkat_lookup", build_again)
+        second = snrkat_lookup("fnr", "snr")
+    assert second.resolve(idents).tolist() == ["NEW0002", pd.NA, "NEW0001"]
+
+    # A new version of snrkat gets a new lookup, replacing the old one
+    snrkat.loc[0, "snr"] = "NEW0004"
+    snrkat.to_parquet(path)
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+    third = snrkat_lookup("fnr", "snr")
+    assert third.resolve(idents).tolist() == ["NEW0002", pd.NA, "NEW0004"]
+    assert not set(cached) & set((tmp_path / "cache").glob("*.npy"))
+
+    utgatt = snrkat_lookup("snr_utgatt", "snr")
+    assert utgatt.resolve(pd.Series(["OLD0003"])).tolist() == ["NEW0003"]
+    assert len(list((tmp_path / "cache").glob("*.npy"))) == 4
+
+
+def test_save_array_writes_through_a_tmp_file_of_its_own(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    path = tmp_path / "lookup.npy"
+    replaced: list[str] = []
+    os_replace = os.replace
+
+    def recording_replace(src: Path, dst: Path) -> None:
+        replaced.append(Path(src).name)
+        os_replace(src, dst)
+
+    monkeypatch.setattr(snrkat_module.os, "replace", recording_replace)
+    snrkat_module._save_array(path, np.arange(3))
+    snrkat_module._save_array(path, np.arange(4))
+
+    # Sessions building the same lookup never share a tmp file
+    assert len(set(replaced)) == 2
+    assert all(name.startswith("lookup.npy.") for name in replaced)
+    assert np.load(path).tolist() == [0, 1, 2, 3]
+
+    def failing_replace(src: Path, dst: Path) -> None:
+        raise OSError("Interrupted")
+
+    monkeypatch.setattr(snrkat_module.os, "replace", failing_replace)
+    with pytest.raises(OSError, match="Interrupted"):
+        snrkat_module._save_array(path, np.arange(5))
+    assert [p.name for p in tmp_path.iterdir()] == ["lookup.npy"]
@@ -0,0 +1,209 @@
+import datetime
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import duckdb as db
+import numpy as np
+import pandas as pd
+import pytest
+
+import nudb_use.datasets.nudb_data as nudb_data_module
+import nudb_use.datasets.nudb_database as nudb_database_module
+from nudb_use.datasets import utd_hoeyeste as utd_hoeyeste_module
+from nudb_use.datasets.nudb_data import NudbData
+from nudb_use.datasets.nudb_database import _NudbDatabase
+from nudb_use.datasets.nudb_read_parquet import _nudb_read_parquet
+
+
+def _synthetic_records(
+    n_rows: int, first_year: int, last_year: int, seed: int
+) -> pd.DataFrame:
+    """Records like eksamen_avslutta_hoeyeste, for 100 persons."""
+    rng = np.random.default_rng(seed)
+    days = (datetime.date(last_year, 9, 30) - datetime.date(first_year, 1, 1)).days
+    dates = pd.to_datetime(datetime.date(first_year, 1, 1)) + pd.to_timedelta(
+        rng.integers(0, days, n_rows), unit="D"
+    )
+    is_uh = rng.random(n_rows) < 0.3
+    return pd.DataFrame(
+        {
+            "snr": [f"S{i:06d}" for i in rng.integers(0, 100, n_rows)],
+            "nus2000": rng.choice(
+                np.array(
+                    ["201199", "401101", "311102", "651199", "731101", "999999", None],
+                    dtype=object,
+                ),
+                n_rows,
+            ),
+            "uh_eksamen_dato": pd.Series(dates.date).where(is_uh, None),
+            "uh_eksamen_studpoeng": pd.Series(
+                rng.integers(0, 180, n_rows).astype(float)
+            ).where(is_uh, None),
+            "uh_gruppering_nus": rng.choice(
+                np.array(["01", "23", "05", None], dtype=object), n_rows
+            ),
+            "utd_aktivitet_slutt": pd.Series(dates.date).where(~is_uh, None),
+            "utd_klassetrinn": rng.choice(
+                np.array(["10", "11", "12", "13", None], dtype=object), n_rows
+            ),
+            "utd_skoleaar_start": [str(d.year - 1) for d in dates],
+            "utd_rectype": rng.choice(np.array(["3", "4", None], dtype=object), n_rows),
+            "utd_studieland": rng.choice(
+                np.array(["000", "106", None], dtype=object), n_rows
+            ),
+            "utd_datakilde": rng.choice(
+                np.array(["01", "02", "11"], dtype=object), n_rows
+            ),
+        }
+    )
+
+
+def _session(source: Path, monkeypatch: Any) -> _NudbDatabase:
+    """A fresh database reading the records, like a new session."""
+    database = _NudbDatabase()
+
+    def generate_source(alias: str, connection: db.DuckDBPyConnection) -> None:
+        connection.execute(
+            f"CREATE VIEW {alias} AS SELECT * FROM {_nudb_read_parquet(source, alias)}"
+        )
+
+    database._dataset_generators["eksamen_avslutta_hoeyeste"] = generate_source
+    monkeypatch.setattr(nudb_data_module, "nudb_database", database)
+    monkeypatch.setattr(nudb_database_module, "nudb_database", database)
+    return database
+
+
+def _utd_hoeyeste(source: Path, incremental: bool, monkeypatch: Any) -> pd.DataFrame:
+    """Build utd_hoeyeste from the records in a fresh database, like a new session."""
+    _session(source, monkeypatch)
+    df: pd.DataFrame = NudbData("utd_hoeyeste", incremental=incremental).df()
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def _assert_incremental_matches_full_rebuild(
+    source: Path, monkeypatch: Any
+) -> pd.DataFrame:
+    incremental = _utd_hoeyeste(source, True, monkeypatch)
+    full = _utd_hoeyeste(source, False, monkeypatch)
+    assert len(full)
+    pd.testing.assert_frame_equal(incremental, full, check_dtype=False)
+    return incremental
+
+
+def _partition_mtimes(state_dir: Path) -> dict[str, int]:
+    state = json.loads((state_dir / "state.json").read_text(encoding="utf-8"))
+    return {
+        path.parent.name: path.stat().st_mtime_ns
+        for year_dir in state["dirs"].values()
+        for path in (state_dir / year_dir).glob("*.parquet")
+    }
+
+
+def test_incremental_utd_hoeyeste_matches_full_rebuild(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    state_dir = tmp_path / "state"
+    monkeypatch.setattr(utd_hoeyeste_module, "UTD_HOEYESTE_STATE_DIR", state_dir)
+    source = tmp_path / "eksamen_avslutta_hoeyeste.parquet"
+    records = _synthetic_records(2000, 2010, 2019, seed=1)
+    records.to_parquet(source)
+
+    _assert_incremental_matches_full_rebuild(source, monkeypatch)
+    built = _partition_mtimes(state_dir)
+    assert "aar=2015" in built
+
+    # Nothing changed, so nothing is rebuilt
+    _assert_incremental_matches_full_rebuild(source, monkeypatch)
+    assert _partition_mtimes(state_dir) == built
+
+    # A new annual delivery only recomputes the new year
+    records = pd.concat([records, _synthetic_records(300, 2020, 2020, seed=2)])
+    records.to_parquet(source)
+    _assert_incremental_matches_full_rebuild(source, monkeypatch)
+    appended = _partition_mtimes(state_dir)
+    assert {aar: appended[aar] for aar in built} == built
+    assert "aar=2020" in appended
+
+    # A corrected year recomputes that year and the later ones
+    changed = records["utd_skoleaar_start"] == "2015"
+    records.loc[changed, "nus2000"] = "731101"
+    records.to_parquet(source)
+    _assert_incremental_matches_full_rebuild(source, monkeypatch)
+    corrected = _partition_mtimes(state_dir)
+    assert corrected["aar=2012"] == built["aar=2012"]
+    assert corrected["aar=2020"] != appended["aar=2020"]
+
+    # Removed years, and records without a date
+    records = records[~records["utd_skoleaar_start"].isin(["2016", "2017"])].copy()
+    undated = _synthetic_records(50, 2010, 2019, seed=3)
+    undated["uh_eksamen_dato"] = None
+    undated["utd_aktivitet_slutt"] = None
+    pd.concat([records, undated]).to_parquet(source)
+    _assert_incremental_matches_full_rebuild(source, monkeypatch)
+    state = json.loads((state_dir / "state.json").read_text(encoding="utf-8"))
+    assert "null" in state["years"]
+    assert "2018" not in state["years"]
+    assert "aar=2018" not in _partition_mtimes(state_dir)
+
+
+def _state_versions(state_dir: Path) -> set[str]:
+    state = json.loads((state_dir / "state.json").read_text(encoding="utf-8"))
+    return {Path(year_dir).parts[1] for year_dir in state["dirs"].values()}
+
+
+def test_live_view_survives_a_rebuild_by_another_session(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    state_dir = tmp_path / "state"
+    monkeypatch.setattr(utd_hoeyeste_module, "UTD_HOEYESTE_STATE_DIR", state_dir)
+    source = tmp_path / "eksamen_avslutta_hoeyeste.parquet"
+    records = _synthetic_records(1000, 2010, 2019, seed=4)
+    records.to_parquet(source)
+
+    # A view in one session, reading the stored state
+    database = _session(source, monkeypatch)
+    view = NudbData("utd_hoeyeste", incremental=True)
+    query = f"SELECT * FROM {view.alias} ORDER BY ALL"
+    before = database.get_connection().sql(query).df()
+    (first_version,) = _state_versions(state_dir)
+
+    # Another session recomputes every year
+    records["nus2000"] = records["nus2000"].to_numpy()[::-1]
+    records.to_parquet(source)
+    _utd_hoeyeste(source, True, monkeypatch)
+    assert first_version not in _state_versions(state_dir)
+    pd.testing.assert_frame_equal(database.get_connection().sql(query).df(), before)
+
+    # The replaced version is removed once it is old enough
+    os.utime(state_dir / "versions" / first_version, (0, 0))
+    records["nus2000"] = records["nus2000"].to_numpy()[::-1]
+    records.to_parquet(source)
+    _assert_incremental_matches_full_rebuild(source, monkeypatch)
+    assert not (state_dir / "versions" / first_version).exists()
+    assert len(list((state_dir / "versions").iterdir())) == 2
+
+
+def test_failed_build_keeps_the_stored_state(tmp_path: Path, monkeypatch: Any) -> None:
+    state_dir = tmp_path / "state"
+    monkeypatch.setattr(utd_hoeyeste_module, "UTD_HOEYESTE_STATE_DIR", state_dir)
+    source = tmp_path / "eksamen_avslutta_hoeyeste.parquet"
+    records = _synthetic_records(1000, 2010, 2019, seed=5)
+    records.to_parquet(source)
+    _utd_hoeyeste(source, True, monkeypatch)
+    state = (state_dir / "state.json").read_text(encoding="utf-8")
+    versions = set((state_dir / "versions").iterdir())
+
+    def failing_year_filter(first_year: str) -> str:
+        return "error('Interrupted') IS NULL"
+
+    records["nus2000"] = records["nus2000"].to_numpy()[::-1]
+    records.to_parquet(source)
+    monkeypatch.setattr(utd_hoeyeste_module, "_year_filter", failing_year_filter)
+    with pytest.raises(db.Error, match="Interrupted"):
+        _utd_hoeyeste(source, True, monkeypatch)
+
+    assert (state_dir / "state.json").read_text(encoding="utf-8") == state
+    assert set((state_dir / "versions").iterdir()) == versions
+    assert not (state_dir / ".lock").exists()
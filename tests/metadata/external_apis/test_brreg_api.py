@@ -1,6 +1,11 @@
 import gzip
+import io
+from datetime import date
+from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 from brreg.enhetsregisteret import Cursor
 from brreg.enhetsregisteret import Enhet
@@ -38,31 +43,128 @@ def test_download_csv_content_enheter_parses_gzip(
     pd.testing.assert_frame_equal(df.reset_index(drop=True), expected)
 
 
-def test_filter_utd_csv_enheter(monkeypatch: pytest.MonkeyPatch) -> None:
+def _write_enheter_csv_gz(path: Path) -> Path:
+    csv_text = (
+        "organisasjonsnummer,navn,naeringskode1.kode,naeringskode2.kode,"
+        "naeringskode3.kode,antallAnsatte,stiftelsesdato,konkurs\n"
+        "1,Skole AS,85.200,01.100,,12,2001-02-03,false\n"
+        "2,Gard AS,01.100,02.200,03.300,,,\n"
+        "3,Kurs AS,,,85.200,,1999-12-31,true\n"
+        "4,Fiske AS,03.100,,,4,,false\n"
+    )
+    path.write_bytes(gzip.compress(csv_text.encode("utf-8")))
+    return path
+
+
+def test_filter_utd_csv_enheter(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
     monkeypatch.setattr(brreg_api, "UTD_NACEKODER", ["85.200"])
+    source = _write_enheter_csv_gz(tmp_path / "enheter.csv.gz")
+
+    filtered = brreg_api.filter_utd_csv_enheter(source)
+
+    assert filtered["organisasjonsnummer"].tolist() == ["1", "3"]
+    assert filtered["naeringskode3.kode"].tolist() == ["", "85.200"]
 
-    source_df = pd.DataFrame(
-        [
-            {
-                "orgnr": "1",
-                "naeringskode1.kode": "85.200",
-                "naeringskode2.kode": "01.100",
-                "naeringskode3.kode": None,
-            },
-            {
-                "orgnr": "2",
-                "naeringskode1.kode": "01.100",
-                "naeringskode2.kode": "02.200",
-                "naeringskode3.kode": "03.300",
-            },
-        ]
+
+def test_iter_csv_enheter_chunks_streams_in_chunks(tmp_path: Path) -> None:
+    source = _write_enheter_csv_gz(tmp_path / "enheter.csv.gz")
+
+    chunks = list(
+        brreg_api.iter_csv_enheter_chunks(
+            source, chunksize=3, usecols=["organisasjonsnummer"]
+        )
     )
 
-    monkeypatch.setattr(brreg_api, "download_csv_content_enheter", lambda: source_df)
+    assert [len(chunk) for chunk in chunks] == [3, 1]
+    assert chunks[0].columns.tolist() == ["organisasjonsnummer"]
+    assert str(chunks[0]["organisasjonsnummer"].dtype) == "string"
+
+
+def test_iter_csv_enheter_chunks_streams_from_url(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    gzipped = gzip.compress(b"organisasjonsnummer,navn\n123456789,Test AS\n")
+    calls: list[dict[str, object]] = []
+
+    class FakeRaw(io.BytesIO):
+        decode_content = False
+
+    class FakeResponse:
+        raw = FakeRaw(gzipped)
+
+        def __enter__(self) -> "FakeResponse":
+            return self
+
+        def __exit__(self, *args: object) -> None:
+            return None
+
+        @staticmethod
+        def raise_for_status() -> None:
+            return None
+
+    def fake_get(url: str, **kwargs: object) -> FakeResponse:
+        calls.append(kwargs)
+        return FakeResponse()
+
+    monkeypatch.setattr(brreg_api.requests, "get", fake_get)  # type: ignore[attr-defined]
+
+    chunks = list(brreg_api.iter_csv_enheter_chunks())
+
+    assert calls[0]["stream"] is True
+    assert chunks[0]["navn"].tolist() == ["Test AS"]
+
+
+def test_iter_utd_csv_enheter_chunks_skips_empty_chunks(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(brreg_api, "UTD_NACEKODER", ["85.200"])
+    source = _write_enheter_csv_gz(tmp_path / "enheter.csv.gz")
+
+    chunks = list(brreg_api.iter_utd_csv_enheter_chunks(source, chunksize=1))
+
+    assert [chunk["organisasjonsnummer"].tolist() for chunk in chunks] == [
+        ["1"],
+        ["3"],
+    ]
 
-    filtered = brreg_api.filter_utd_csv_enheter()
 
-    assert filtered["orgnr"].tolist() == ["1"]
+def test_write_utd_csv_enheter_parquet_types_known_columns(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(brreg_api, "UTD_NACEKODER", ["85.200"])
+    source = _write_enheter_csv_gz(tmp_path / "enheter.csv.gz")
+
+    path = brreg_api.write_utd_csv_enheter_parquet(
+        tmp_path / "utd_enheter.parquet", source, chunksize=2
+    )
+
+    table = pq.read_table(path)
+    assert table.schema.field("organisasjonsnummer").type == pa.string()
+    assert table.schema.field("antallAnsatte").type == pa.int64()
+    assert table.schema.field("stiftelsesdato").type == pa.date32()
+    assert table.schema.field("konkurs").type == pa.bool_()
+    assert table.column("organisasjonsnummer").to_pylist() == ["1", "3"]
+    assert table.column("antallAnsatte").to_pylist() == [12, None]
+    assert table.column("stiftelsesdato").to_pylist() == [
+        date(2001, 2, 3),
+        date(1999, 12, 31),
+    ]
+    assert table.column("konkurs").to_pylist() == [False, True]
+    assert table.column("naeringskode3.kode").to_pylist() == [None, "85.200"]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_write_utd_csv_enheter_parquet_raises_without_matches(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(brreg_api, "UTD_NACEKODER", ["99.999"])
+    source = _write_enheter_csv_gz(tmp_path / "enheter.csv.gz")
+
+    with pytest.raises(ValueError):
+        brreg_api.write_utd_csv_enheter_parquet(tmp_path / "out.parquet", source)
+    assert not (tmp_path / "out.parquet").exists()
 
 
 def test_orgnr_is_underenhet(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -0,0 +1,80 @@
+import gzip
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from nudb_use.metadata.external_apis import brreg_index
+
+
+def _write_gzipped_csv(path: Path, df: pd.DataFrame) -> Path:
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        df.to_csv(f, index=False)
+    return path
+
+
+def test_build_and_lookup_brreg_orgnr_index(tmp_path: Path) -> None:
+    enheter = _write_gzipped_csv(
+        tmp_path / "enheter.csv.gz",
+        pd.DataFrame(
+            {"organisasjonsnummer": ["900000001", "900000002"], "navn": ["A", "B"]}
+        ),
+    )
+    underenheter = _write_gzipped_csv(
+        tmp_path / "underenheter.csv.gz",
+        pd.DataFrame(
+            {
+                "organisasjonsnummer": ["800000001"],
+                "navn": ["C"],
+                "overordnetEnhet": ["900000001"],
+            }
+        ),
+    )
+
+    index_path = brreg_index.build_brreg_orgnr_index(
+        sources={"enhet": enheter, "underenhet": underenheter},
+        index_path=tmp_path / "index.parquet",
+    )
+
+    result = brreg_index.lookup_brreg_enhet_types(
+        ["900000001", "800 000 001", "123456789", None, "900000001"],
+        index_path=index_path,
+    )
+
+    assert result == {"900000001": "enhet", "800 000 001": "underenhet"}
+
+
+def test_brreg_orgnr_index_path_reuses_fresh_index(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(brreg_index, "BRREG_CACHE_DIR", tmp_path)
+    builds: list[Path] = []
+
+    def fake_build(index_path: Path) -> Path:
+        builds.append(index_path)
+        pd.DataFrame({"orgnr": ["1"], "enhet_type": ["enhet"]}).to_parquet(index_path)
+        return index_path
+
+    monkeypatch.setattr(brreg_index, "build_brreg_orgnr_index", fake_build)
+
+    first = brreg_index.brreg_orgnr_index_path(max_age_days=1)
+    second = brreg_index.brreg_orgnr_index_path(max_age_days=1)
+    assert first == second == tmp_path / brreg_index.BRREG_INDEX_FILENAME
+    assert len(builds) == 1
+
+    brreg_index.brreg_orgnr_index_path(max_age_days=0)
+    assert len(builds) == 2
+
+
+def test_brreg_orgnr_index_path_returns_none_when_build_fails(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(brreg_index, "BRREG_CACHE_DIR", tmp_path)
+
+    def failing_build(index_path: Path) -> Path:
+        raise OSError("offline")
+
+    monkeypatch.setattr(brreg_index, "build_brreg_orgnr_index", failing_build)
+
+    assert brreg_index.brreg_orgnr_index_path() is None
+    assert brreg_index.lookup_brreg_enhet_types(["900000001"]) is None
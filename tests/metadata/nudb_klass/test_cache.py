@@ -0,0 +1,109 @@
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+from pytest import MonkeyPatch
+
+from nudb_use.exceptions.exception_classes import NudbKlassOfflineError
+from nudb_use.metadata.nudb_klass import cache
+from nudb_use.metadata.nudb_klass import labels
+
+
+@pytest.fixture
+def tmp_klass_cache(tmp_path: Path, monkeypatch: MonkeyPatch) -> Path:
+    monkeypatch.setattr(cache, "KLASS_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "KLASS_CACHE_TTL_SECONDS", 60.0)
+    monkeypatch.setattr(cache, "KLASS_CACHE_ENABLED", True)
+    monkeypatch.setattr(cache, "KLASS_OFFLINE", False)
+    monkeypatch.setattr(cache, "_MEMORY_CACHE", {})
+    monkeypatch.setattr(
+        cache, "KLASS_CACHE_STATS", {"hits": 0, "disk_hits": 0, "misses": 0}
+    )
+    return tmp_path
+
+
+def _counting_lookup() -> tuple[Any, list[int]]:
+    calls: list[int] = []
+
+    @cache.klass_cached("test")
+    def lookup(klassid: int, from_date: str | None = None) -> list[str]:
+        calls.append(klassid)
+        return [f"{klassid}-{from_date}"]
+
+    return lookup, calls
+
+
+def test_klass_cache_hits_memory_then_disk(tmp_klass_cache: Path) -> None:
+    lookup, calls = _counting_lookup()
+
+    assert lookup(36, "2020-01-01") == ["36-2020-01-01"]
+    assert lookup(36, from_date="2020-01-01") == ["36-2020-01-01"]
+    assert lookup(36) == ["36-None"]
+    assert calls == [36, 36]
+    assert len(list((tmp_klass_cache / "test").glob("*.json"))) == 2
+
+    cache.clear_klass_cache(memory_only=True)
+    assert lookup(36, "2020-01-01") == ["36-2020-01-01"]
+    assert calls == [36, 36]
+    assert cache.klass_cache_stats() == {"hits": 2, "disk_hits": 1, "misses": 2}
+
+
+def test_klass_cache_refetches_expired_entries(
+    tmp_klass_cache: Path, monkeypatch: MonkeyPatch
+) -> None:
+    lookup, calls = _counting_lookup()
+    lookup(1)
+    monkeypatch.setattr(cache, "KLASS_CACHE_TTL_SECONDS", 0.0)
+    lookup(1)
+    assert calls == [1, 1]
+
+
+def test_klass_cache_offline_serves_only_cached(
+    tmp_klass_cache: Path, monkeypatch: MonkeyPatch
+) -> None:
+    lookup, calls = _counting_lookup()
+    lookup(1)
+    monkeypatch.setattr(cache, "KLASS_CACHE_TTL_SECONDS", 0.0)
+    monkeypatch.setattr(cache, "KLASS_OFFLINE", True)
+
+    assert lookup(1) == ["1-None"]  # Stale entries are still served offline
+    with pytest.raises(NudbKlassOfflineError):
+        lookup(2)
+    assert calls == [1]
+
+
+def test_klass_cache_disabled_always_calls(
+    tmp_klass_cache: Path, monkeypatch: MonkeyPatch
+) -> None:
+    lookup, calls = _counting_lookup()
+    monkeypatch.setattr(cache, "KLASS_CACHE_ENABLED", False)
+    lookup(1)
+    lookup(1)
+    assert calls == [1, 1]
+    assert not list(tmp_klass_cache.glob("*/*.json"))
+
+
+def test_klass_label_mapping_is_cached(
+    tmp_klass_cache: Path, monkeypatch: MonkeyPatch
+) -> None:
+    created: list[int] = []
+
+    class FakeCodes:
+        def to_dict(self, key: str, value: str) -> dict[str, Any]:
+            return {"1": "Grunnskole", "2": pd.NA}
+
+    class FakeClassification:
+        def __init__(self, classification_id: int) -> None:
+            created.append(classification_id)
+
+        def get_codes(self) -> FakeCodes:
+            return FakeCodes()
+
+    monkeypatch.setattr(labels.klass, "KlassClassification", FakeClassification)
+
+    first = labels._get_klass_code_name_mapping(36)
+    second = labels._get_klass_code_name_mapping(36)
+
+    assert first == second == {"1": "Grunnskole", "2": None}
+    assert created == [36]
@@ -3,6 +3,7 @@ from typing import Any
 import pandas as pd
 
 import nudb_use.quality.specific_variables.orgnr as orgnr_quality
+import nudb_use.variables.specific_vars.orgnr as orgnr_module
 from nudb_use.exceptions.exception_classes import NudbQualityError
 from nudb_use.quality.specific_variables.orgnr import check_orgnr_foretak
 from nudb_use.quality.specific_variables.orgnr import check_orgnrbed
@@ -44,6 +45,43 @@ def _stub_split_orgnr_col(
     return orgnr_foretak, orgnrbed
 
 
+def test_subcheck_col_contains_invalid_orgnr_with_more_unknown_than_the_api_limit(
+    monkeypatch: Any,
+) -> None:
+    class FakeNudbData:
+        def __init__(self, name: str) -> None:
+            self.name = name
+
+        def df(self) -> pd.DataFrame:
+            if self.name == "_bof_unique_orgnrbed":
+                return pd.DataFrame({"orgnrbed": pd.Series([], dtype="string")})
+            return pd.DataFrame(
+                {"orgnr": pd.Series(sorted(FORETAK_VALUES), dtype="string")}
+            )
+
+    api_calls: list[str] = []
+
+    def fake_get_enhet(orgnr: str) -> None:
+        api_calls.append(orgnr)
+
+    monkeypatch.setattr(orgnr_module, "NudbData", FakeNudbData)
+    monkeypatch.setattr(orgnr_module, "_progress", lambda iterable: iterable)
+    monkeypatch.setattr(orgnr_module, "orgnr_is_underenhet", lambda orgnr: False)
+    monkeypatch.setattr(orgnr_module, "get_enhet", fake_get_enhet)
+    monkeypatch.setattr(orgnr_module, "lookup_brreg_enhet_types", lambda orgnr: {})
+    monkeypatch.setattr(orgnr_module.brreg_index, "BRREG_API_RESIDUE_LIMIT", 3)
+    unknown = [f"9{i:08d}" for i in range(20)]
+
+    err = subcheck_col_contains_invalid_orgnr(
+        pd.Series(["100000001", *unknown], dtype="string[pyarrow]"),
+        "orgnr_foretak",
+    )
+
+    assert isinstance(err, NudbQualityError)
+    assert "Found 20 invalid values" in str(err)
+    assert len(api_calls) == 3
+
+
 def test_check_outdated_orgnr_cols_reports_old_names() -> None:
     df = pd.DataFrame({"org_nr": ["100000001"], "keep": [1]})
 
@@ -128,9 +166,12 @@ def test_subcheck_orgnrbed_orgnr_foretak_connected_reports_missing_bof_pairs(
 
     class FakeConnection:
         def register(self, alias: str, df: pd.DataFrame) -> None:
-            assert alias == "orgnr_connection_check_input"
+            assert alias.startswith("orgnr_connection_check_input_")
             assert len(df) == 3
 
+        def unregister(self, alias: str) -> None:
+            assert alias.startswith("orgnr_connection_check_input_")
+
         def sql(self, sql: str) -> FakeResult:
             assert sql == "SELECT fake_bof_connections"
             return FakeResult()
@@ -186,9 +227,12 @@ def test_check_orgnrbed_reports_invalid_connections_with_stubbed_bof(
 
     class FakeConnection:
         def register(self, alias: str, df: pd.DataFrame) -> None:
-            assert alias == "orgnr_connection_check_input"
+            assert alias.startswith("orgnr_connection_check_input_")
             assert len(df) == 3
 
+        def unregister(self, alias: str) -> None:
+            assert alias.startswith("orgnr_connection_check_input_")
+
         def sql(self, sql: str) -> FakeResult:
             assert sql == "SELECT fake_bof_connections"
             return FakeResult()
@@ -1,5 +1,10 @@
+import re
+
 import pandas as pd
+import pytest
 
+from nudb_use.quality import dtypes
+from nudb_use.quality.dtypes import _cast_error
 from nudb_use.quality.dtypes import check_dtypes
 from tests.utils_testing.validate_errors import validate_NudbQualityError_list
 
@@ -19,3 +24,71 @@ def test_check_dtypes() -> None:
 
     errors = check_dtypes(df, raise_errors=False)
     validate_NudbQualityError_list(errors, n=2)
+
+
+CAST_CASES = [
+    (pd.Series(["J", "N", "J"], dtype="string[pyarrow]"), "bool[pyarrow]"),
+    (pd.Series(["true", "False", None], dtype="string[pyarrow]"), "bool[pyarrow]"),
+    (
+        pd.Series(["202404", "197101", "177608"], dtype="string[pyarrow]"),
+        "datetime64[s]",
+    ),
+    (
+        pd.Series(["2024-01-01", None, "2024-01-01"], dtype="string[pyarrow]"),
+        "datetime64[s]",
+    ),
+    (pd.Series(["1", "2", "3.0", None, "1"], dtype="string[pyarrow]"), "Int64"),
+    (pd.Series(["1", "2", None], dtype="string[pyarrow]"), "Int64"),
+    (pd.Series(["1.5", "2", None], dtype="string[pyarrow]"), "Float64"),
+    (pd.Series([1.0, 2.5, None]), "Int64"),
+    (pd.Series([1.0, 2.0, None]), "Int64"),
+    (pd.Series(["a", 1, None], dtype=object), "Int64"),
+    (pd.Series([1, 2, 3]), "Float64"),
+    (pd.Series(pd.to_datetime(["2020-01-01", None])), "datetime64[s]"),
+    (pd.Series(["x", "y", "x"], dtype="category"), "string[pyarrow]"),
+]
+
+
+@pytest.mark.parametrize(("x", "target"), CAST_CASES)
+def test_cast_error_matches_astype(x: pd.Series, target: str) -> None:
+    try:
+        x.astype(target)  # type: ignore[call-overload]
+        expected = None
+    except Exception as err:
+        expected = str(err)
+
+    result = _cast_error(x, target)
+
+    assert (result is None) == (expected is None)
+    if result is not None:
+        assert str(result[0]) == expected
+
+
+def test_cast_error_finds_uncastable_values_in_chunks(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(dtypes, "CAST_CHECK_CHUNK_SIZE", 4)
+    values = [str(i) for i in range(20)] + ["1.5", "x"]
+    x = pd.Series(values * 3 + ["x"], dtype="string[pyarrow]")
+
+    result = _cast_error(x, "Int64")
+
+    assert result is not None
+    err, uncastable_counts = result
+    assert uncastable_counts is not None
+    assert uncastable_counts.to_dict() == {"x": 4, "1.5": 3}
+    with pytest.raises(Exception, match=re.escape(str(err))):
+        x.astype("Int64")
+
+
+def test_check_dtypes_reports_uncastable_rows() -> None:
+    df = pd.DataFrame({"snr_mrk": ["J", "N", "J", None]}).astype("string[pyarrow]")
+
+    errors = check_dtypes(df, raise_errors=False)
+
+    assert len(errors) == 1
+    message = str(errors[0])
+    assert message.startswith(
+        "Variable could not be casted to the correct dtype (bool[pyarrow])! Message:\n"
+    )
+    assert "Values that could not be casted (rows): 'J': 2, 'N': 1" in message
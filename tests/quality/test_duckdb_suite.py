@@ -0,0 +1,179 @@
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+
+from nudb_use.datasets import NudbData
+from nudb_use.datasets.nudb_database import nudb_database
+from nudb_use.exceptions.exception_classes import NudbQualityError
+from nudb_use.metadata.nudb_klass.klass_utils import _outside_codes_handeling
+from nudb_use.quality import duckdb_suite
+from nudb_use.quality.check_bool_string_columns import check_bool_string_columns
+from nudb_use.quality.duckdb_suite import run_quality_suite_duckdb
+from nudb_use.quality.missing import check_columns_only_missing
+from nudb_use.quality.missing import df_within_missing_thresholds
+from nudb_use.quality.specific_variables.unique_per_person import (
+    check_unique_per_person,
+)
+from nudb_use.quality.widths import check_column_widths
+
+WIDTHS = {"kode": [2]}
+THRESHOLDS = {"kode": 10.0, "tall": 50.0, "mangler_i_data": 1.0}
+
+
+def _quality_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "snr": pd.Series(["a", "a", "b", None, "c"], dtype="string[pyarrow]"),
+            "fnr": pd.Series(["1", "1", "2", "3", None], dtype="string[pyarrow]"),
+            "kode": pd.Series(["01", "123", "02", None, "9"], dtype="string[pyarrow]"),
+            "flagg": pd.Series(
+                ["True", "False", "True", "x", None], dtype="string[pyarrow]"
+            ),
+            "tall": pd.Series([1.0, float("nan"), None, 2.0, 3.0], dtype="float64"),
+            "tom": pd.Series([None] * 5, dtype="string[pyarrow]"),
+            "pers_kjoenn": pd.Series(
+                ["1", "2", "1", "2", "1"], dtype="string[pyarrow]"
+            ),
+        }
+    )
+
+
+@pytest.fixture
+def no_klass(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(duckdb_suite, "get_var_metadata", lambda: pd.DataFrame())
+    monkeypatch.setattr(
+        duckdb_suite, "get_thresholds_from_config", lambda dataset_name: THRESHOLDS
+    )
+
+
+def _messages(errors: list[NudbQualityError]) -> list[str]:
+    return sorted(str(err) for err in errors)
+
+
+def test_run_quality_suite_duckdb_matches_pandas_checks(
+    tmp_path: Path, no_klass: None
+) -> None:
+    df = _quality_df()
+    path = tmp_path / "quality.parquet"
+    df.to_parquet(path)
+
+    expected = (
+        check_column_widths(df, widths=WIDTHS, raise_errors=False)
+        + check_bool_string_columns(df, raise_errors=False)
+        + check_columns_only_missing(df, raise_errors=False)
+        + df_within_missing_thresholds(df, THRESHOLDS, raise_errors=False)
+        + check_unique_per_person(df)
+    )
+    errors = run_quality_suite_duckdb(
+        path, dataset_name="test", widths=WIDTHS, raise_errors=False
+    )
+
+    assert all(isinstance(err, NudbQualityError) for err in errors)
+    assert _messages(errors) == _messages(expected)
+    assert len(errors) == 6
+
+
+def test_run_quality_suite_duckdb_over_nudb_data_and_directory(
+    tmp_path: Path, no_klass: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        nudb_database, "_dataset_generators", dict(nudb_database._dataset_generators)
+    )
+    df = _quality_df()
+    directory = tmp_path / "parts"
+    directory.mkdir()
+    df.iloc[:3].to_parquet(directory / "part_0.parquet")
+    df.iloc[3:].to_parquet(directory / "part_1.parquet")
+    NudbData.from_parquet(directory / "part_0.parquet", name="duckdb_quality_part")
+
+    from_directory = run_quality_suite_duckdb(
+        directory, dataset_name="test", widths=WIDTHS, raise_errors=False
+    )
+    from_view = run_quality_suite_duckdb(
+        NudbData("duckdb_quality_part").where("kode IS NOT NULL"),
+        widths=WIDTHS,
+        raise_errors=False,
+    )
+
+    assert len(from_directory) == 6
+    assert _messages(from_view) == _messages(
+        check_column_widths(df.iloc[:3], widths=WIDTHS, raise_errors=False)
+        + check_bool_string_columns(df.iloc[:3], raise_errors=False)
+        + check_columns_only_missing(df.iloc[:3], raise_errors=False)
+        + check_unique_per_person(df.iloc[:3])
+    )
+
+
+def test_run_quality_suite_duckdb_checks_distinct_values_against_klass(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    metadata = pd.DataFrame(
+        {
+            "klass_codelist": [123],
+            "klass_variant": [None],
+            "klass_variant_search_term": [None],
+        },
+        index=["kode"],
+    )
+    monkeypatch.setattr(duckdb_suite, "get_var_metadata", lambda: metadata)
+    checked: list[list[Any]] = []
+
+    def fake_check(series: pd.Series, col: str, *args: Any, **kwargs: Any) -> Any:
+        checked.append(sorted(series.dropna()))
+        return _outside_codes_handeling(series, {"01", "02"}, col)
+
+    monkeypatch.setattr(duckdb_suite, "_check_column_against_klass", fake_check)
+    path = tmp_path / "klass.parquet"
+    pd.DataFrame({"kode": ["01", "03", "01", "02", None, "03"] * 1000}).to_parquet(path)
+
+    with pytest.raises(ExceptionGroup) as excinfo:
+        run_quality_suite_duckdb(path, widths={})
+
+    assert checked == [["01", "02", "03"]]
+    assert [str(err) for err in excinfo.value.exceptions] == [
+        "Codes in kode outside codelist: <ArrowStringArray>\n['03']\nLength: 1, dtype: string"
+    ]
+
+
+def test_run_quality_suite_duckdb_width_on_non_string_raises(
+    tmp_path: Path, no_klass: None
+) -> None:
+    path = tmp_path / "ints.parquet"
+    pd.DataFrame({"kode": [1, 2]}).to_parquet(path)
+
+    with pytest.raises(TypeError, match="should be string"):
+        run_quality_suite_duckdb(path, widths=WIDTHS)
+
+
+def test_run_quality_suite_duckdb_fetches_a_limited_number_of_distinct_values(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    metadata = pd.DataFrame(
+        {
+            "klass_codelist": [123],
+            "klass_variant": [None],
+            "klass_variant_search_term": [None],
+        },
+        index=["kode"],
+    )
+    monkeypatch.setattr(duckdb_suite, "get_var_metadata", lambda: metadata)
+    monkeypatch.setattr(duckdb_suite, "KLASS_MAX_DISTINCT_VALUES", 100)
+    checked: list[int] = []
+
+    def fake_check(series: pd.Series, col: str, *args: Any, **kwargs: Any) -> Any:
+        checked.append(len(series))
+        return []
+
+    monkeypatch.setattr(duckdb_suite, "_check_column_against_klass", fake_check)
+    path = tmp_path / "many_codes.parquet"
+    pd.DataFrame({"kode": [f"{i:04}" for i in range(1000)]}).to_parquet(path)
+
+    errors = run_quality_suite_duckdb(path, widths={"kode": [2]}, raise_errors=False)
+
+    assert checked == [100]
+    width_error, klass_error = errors
+    shown = str(width_error).split("mismatched codes:\n")[1].split(",\n")
+    assert shown == [f"{i:04}" for i in range(duckdb_suite.WIDTH_MISMATCHES_SHOWN)]
+    assert "kode has 1000 distinct values" in str(klass_error)
@@ -0,0 +1,158 @@
+import threading
+import time
+from typing import Any
+
+import pandas as pd
+import pytest
+
+from nudb_use.exceptions.exception_classes import NudbQualityError
+from nudb_use.quality import suite
+from nudb_use.quality.suite import PROFILE_COLUMNS
+from nudb_use.quality.suite import run_quality_suite
+from nudb_use.quality.suite import run_quality_suite_profiled
+
+CHECK_NAMES = [
+    "check_column_presence",
+    "check_outdated_variables",
+    "check_duplicated_columns",
+    "check_dtypes",
+    "check_column_widths",
+    "check_bool_string_columns",
+    "check_klass_codes",
+    "check_columns_only_missing",
+    "check_missing_thresholds_dataset_name",
+    "run_all_specific_variable_tests",
+]
+
+
+# Module level, so the fake checks can be pickled into worker processes
+def _slow_failing_check(df: pd.DataFrame, **kwargs: Any) -> list[NudbQualityError]:
+    time.sleep(0.2)
+    return [NudbQualityError("slow"), NudbQualityError("slow again")]
+
+
+def _fast_failing_check(df: pd.DataFrame, **kwargs: Any) -> list[NudbQualityError]:
+    return [NudbQualityError(f"fast {len(df)}")]
+
+
+def _allocating_check(df: pd.DataFrame, **kwargs: Any) -> list[NudbQualityError]:
+    data = list(range(500_000))
+    return [] if data else [NudbQualityError("unreachable")]
+
+
+def _passing_check(df: pd.DataFrame, **kwargs: Any) -> list[NudbQualityError]:
+    return []
+
+
+class _CountsPickling:
+    pickled = 0
+
+    def __reduce__(self) -> tuple[type["_CountsPickling"], tuple[()]]:
+        type(self).pickled += 1
+        return (_CountsPickling, ())
+
+
+@pytest.fixture
+def fake_checks(monkeypatch: pytest.MonkeyPatch) -> None:
+    for name in CHECK_NAMES:
+        monkeypatch.setattr(suite, name, _passing_check)
+    monkeypatch.setattr(suite, "check_column_presence", _slow_failing_check)
+    monkeypatch.setattr(suite, "check_dtypes", _allocating_check)
+    monkeypatch.setattr(suite, "run_all_specific_variable_tests", _fast_failing_check)
+
+
+@pytest.mark.parametrize(
+    ("max_workers", "executor"), [(1, "thread"), (4, "thread"), (2, "process")]
+)
+def test_run_quality_suite_profiled_keeps_error_order(
+    fake_checks: None, max_workers: int, executor: Any
+) -> None:
+    df = pd.DataFrame({"snr": ["a", "b"]})
+
+    errors, profile = run_quality_suite_profiled(
+        df,
+        dataset_name="test",
+        raise_errors=False,
+        max_workers=max_workers,
+        executor=executor,
+    )
+
+    # The slow first check finishes last, but its errors are still reported first
+    assert [str(err) for err in errors] == ["slow", "slow again", "fast 2"]
+    assert list(profile.columns) == PROFILE_COLUMNS
+    assert profile["check"].tolist() == CHECK_NAMES
+    assert profile["n_errors"].tolist() == [2, 0, 0, 0, 0, 0, 0, 0, 0, 1]
+    assert profile["seconds"].iloc[0] >= 0.2
+
+
+def test_run_quality_suite_runs_checks_one_after_another_by_default(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    threads: set[str] = set()
+
+    def check(df: pd.DataFrame, **kwargs: Any) -> list[NudbQualityError]:
+        threads.add(threading.current_thread().name)
+        return []
+
+    for name in CHECK_NAMES:
+        monkeypatch.setattr(suite, name, check)
+
+    _, profile = run_quality_suite_profiled(
+        pd.DataFrame({"snr": ["a"]}), dataset_name="test"
+    )
+
+    assert threads == {threading.current_thread().name}
+    assert profile["peak_memory_mb"].notna().all()
+
+
+def test_run_quality_suite_profiled_traces_memory(fake_checks: None) -> None:
+    df = pd.DataFrame({"snr": ["a", "b"]})
+
+    _, profile = run_quality_suite_profiled(
+        df, dataset_name="test", raise_errors=False, max_workers=1
+    )
+    peak = profile.set_index("check")["peak_memory_mb"]
+
+    assert peak["check_dtypes"] > 10
+    assert peak["check_dtypes"] > peak["check_duplicated_columns"]
+
+    _, profile = run_quality_suite_profiled(
+        df, dataset_name="test", raise_errors=False, max_workers=4, executor="thread"
+    )
+    # Threads share the traced memory, so no check can be profiled on its own
+    assert profile["peak_memory_mb"].isna().all()
+
+
+def test_run_quality_suite_raises_grouped_errors(fake_checks: None) -> None:
+    df = pd.DataFrame({"snr": ["a", "b"]})
+
+    with pytest.raises(ExceptionGroup) as excinfo:
+        run_quality_suite(df, dataset_name="test", max_workers=3)
+
+    assert [str(err) for err in excinfo.value.exceptions] == [
+        "slow",
+        "slow again",
+        "fast 2",
+    ]
+
+
+def test_run_quality_suite_rejects_unknown_executor(fake_checks: None) -> None:
+    df = pd.DataFrame({"snr": ["a"]})
+
+    with pytest.raises(ValueError, match="executor"):
+        run_quality_suite(df, dataset_name="test", max_workers=2, executor="fork")  # type: ignore[arg-type]
+
+
+def test_process_workers_get_the_dataframe_once(
+    fake_checks: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(_CountsPickling, "pickled", 0)
+    df = pd.DataFrame({"snr": ["a", "b"], "counter": [_CountsPickling(), None]})
+
+    errors, _ = run_quality_suite_profiled(
+        df, dataset_name="test", raise_errors=False, max_workers=2, executor="process"
+    )
+
+    assert [str(err) for err in errors] == ["slow", "slow again", "fast 2"]
+    # At most once per worker, not once for each of the checks
+    assert _CountsPickling.pickled <= 2
@@ -1,5 +1,8 @@
 import json
 import logging
+import subprocess
+import sys
+import threading
 from pathlib import Path
 
 import pytest
@@ -10,9 +13,9 @@ from nudb_use import nudb_logger
 def test_add_logrecord_raises_when_json_fields_missing(
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
-    monkeypatch.setattr(nudb_logger, "STACK_LABELS", [])
-    monkeypatch.setattr(nudb_logger, "ID_COUNTERS", [0])
-    monkeypatch.setattr(nudb_logger, "JSON_FIELDS", [])
+    monkeypatch.setattr(nudb_logger._STACK, "labels", [])
+    monkeypatch.setattr(nudb_logger._STACK, "id_counters", [0])
+    monkeypatch.setattr(nudb_logger._STACK, "json_fields", [])
 
     record = logging.LogRecord("n", logging.INFO, __file__, 1, "msg", None, None)
 
@@ -22,11 +25,11 @@ def test_add_logrecord_raises_when_json_fields_missing(
 
 def test_formatter_validates_indent_width(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(nudb_logger, "INDENT_WIDTH", 0)
-    monkeypatch.setattr(nudb_logger, "STACK_LEVEL", 0)
-    monkeypatch.setattr(nudb_logger, "STACK_LABELS", ["x"])
-    monkeypatch.setattr(nudb_logger, "ID_COUNTERS", [0])
+    monkeypatch.setattr(nudb_logger._STACK, "level", 0)
+    monkeypatch.setattr(nudb_logger._STACK, "labels", ["x"])
+    monkeypatch.setattr(nudb_logger._STACK, "id_counters", [0])
     monkeypatch.setattr(nudb_logger, "JSON", {})
-    monkeypatch.setattr(nudb_logger, "JSON_FIELDS", [nudb_logger.JSON])
+    monkeypatch.setattr(nudb_logger._STACK, "json_fields", [nudb_logger.JSON])
 
     record = logging.LogRecord("n", logging.INFO, __file__, 1, "msg", None, None)
 
@@ -36,11 +39,11 @@ def test_formatter_validates_indent_width(monkeypatch: pytest.MonkeyPatch) -> No
 
 def test_formatter_validates_stack_level(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(nudb_logger, "INDENT_WIDTH", 2)
-    monkeypatch.setattr(nudb_logger, "STACK_LEVEL", -1)
-    monkeypatch.setattr(nudb_logger, "STACK_LABELS", ["x"])
-    monkeypatch.setattr(nudb_logger, "ID_COUNTERS", [0])
+    monkeypatch.setattr(nudb_logger._STACK, "level", -1)
+    monkeypatch.setattr(nudb_logger._STACK, "labels", ["x"])
+    monkeypatch.setattr(nudb_logger._STACK, "id_counters", [0])
     monkeypatch.setattr(nudb_logger, "JSON", {})
-    monkeypatch.setattr(nudb_logger, "JSON_FIELDS", [nudb_logger.JSON])
+    monkeypatch.setattr(nudb_logger._STACK, "json_fields", [nudb_logger.JSON])
 
     record = logging.LogRecord("n", logging.INFO, __file__, 1, "msg", None, None)
 
@@ -51,7 +54,7 @@ def test_formatter_validates_stack_level(monkeypatch: pytest.MonkeyPatch) -> Non
 def test_loggerstack_default_label_uses_stack_level(
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
-    monkeypatch.setattr(nudb_logger, "STACK_LEVEL", 0)
+    monkeypatch.setattr(nudb_logger._STACK, "level", 0)
     stack = nudb_logger.LoggerStack()
 
     assert stack.label == "1"
@@ -60,10 +63,10 @@ def test_loggerstack_default_label_uses_stack_level(
 def test_loggerstack_enter_raises_when_json_missing(
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
-    monkeypatch.setattr(nudb_logger, "STACK_LEVEL", 0)
-    monkeypatch.setattr(nudb_logger, "STACK_LABELS", [])
-    monkeypatch.setattr(nudb_logger, "ID_COUNTERS", [0])
-    monkeypatch.setattr(nudb_logger, "JSON_FIELDS", [])
+    monkeypatch.setattr(nudb_logger._STACK, "level", 0)
+    monkeypatch.setattr(nudb_logger._STACK, "labels", [])
+    monkeypatch.setattr(nudb_logger._STACK, "id_counters", [0])
+    monkeypatch.setattr(nudb_logger._STACK, "json_fields", [])
 
     with pytest.raises(RuntimeError):
         with nudb_logger.LoggerStack():
@@ -72,23 +75,23 @@ def test_loggerstack_enter_raises_when_json_missing(
 
 def test_enter_and_exit_helpers_manage_state(monkeypatch: pytest.MonkeyPatch) -> None:
     base_json: dict[str, object] = {}
-    monkeypatch.setattr(nudb_logger, "STACK_LEVEL", 0)
-    monkeypatch.setattr(nudb_logger, "STACK_LABELS", [])
-    monkeypatch.setattr(nudb_logger, "ID_COUNTERS", [0])
+    monkeypatch.setattr(nudb_logger._STACK, "level", 0)
+    monkeypatch.setattr(nudb_logger._STACK, "labels", [])
+    monkeypatch.setattr(nudb_logger._STACK, "id_counters", [0])
     monkeypatch.setattr(nudb_logger, "JSON", base_json)
-    monkeypatch.setattr(nudb_logger, "JSON_FIELDS", [base_json])
+    monkeypatch.setattr(nudb_logger._STACK, "json_fields", [base_json])
 
     nudb_logger._enter_new_logger_stack("LBL")
 
-    assert nudb_logger.STACK_LEVEL == 1
-    assert nudb_logger.STACK_LABELS == ["LBL"]
+    assert nudb_logger._STACK.level == 1
+    assert nudb_logger._STACK.labels == ["LBL"]
     assert "LBL-0" in nudb_logger.JSON
 
     nudb_logger._exit_current_logger_stack("LBL")
 
-    assert nudb_logger.STACK_LEVEL == 0
-    assert nudb_logger.STACK_LABELS == []
-    assert nudb_logger.JSON_FIELDS == [base_json]
+    assert nudb_logger._STACK.level == 0
+    assert nudb_logger._STACK.labels == []
+    assert nudb_logger._STACK.json_fields == [base_json]
 
 
 def test__get_current_json_returns_copy(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -113,3 +116,167 @@ def test__save_current_json_writes_file(
         saved = json.load(fh)
 
     assert saved == {"saved": True}
+
+
+@pytest.fixture
+def fresh_log_state(monkeypatch: pytest.MonkeyPatch) -> None:
+    base_json: dict[str, object] = {}
+    monkeypatch.setattr(nudb_logger._STACK, "level", 0)
+    monkeypatch.setattr(nudb_logger._STACK, "labels", [])
+    monkeypatch.setattr(nudb_logger._STACK, "id_counters", [0])
+    monkeypatch.setattr(nudb_logger, "JSON", base_json)
+    monkeypatch.setattr(nudb_logger._STACK, "json_fields", [base_json])
+    monkeypatch.setattr(nudb_logger, "LOG_SINKS", list(nudb_logger.LOG_SINKS))
+
+
+def _log_nested() -> None:
+    nudb_logger.logger.info("outer")
+    with nudb_logger.LoggerStack("A"):
+        nudb_logger.logger.info("inner")
+    nudb_logger.logger.info("after")
+
+
+def test_default_sink_keeps_nested_json(fresh_log_state: None) -> None:
+    _log_nested()
+
+    assert list(nudb_logger.JSON) == ["INFO-None-0", "A-0", "INFO-None-1"]
+    assert list(nudb_logger.JSON["A-0"]) == ["INFO-A-1"]
+    assert nudb_logger.JSON["A-0"]["INFO-A-1"]["msg"] == "inner"
+    assert nudb_logger._STACK.id_counters == [2]
+
+
+def test_ring_buffer_sink_keeps_latest_entries_with_stack(
+    fresh_log_state: None, tmp_path: Path
+) -> None:
+    ring = nudb_logger.RingBufferSink(capacity=2)
+    nudb_logger.set_log_sinks(ring)
+
+    _log_nested()
+
+    assert [entry["msg"] for entry in ring.entries] == ["inner", "after"]
+    assert [entry["stack"] for entry in ring.entries] == [["A"], []]
+    assert nudb_logger.JSON == {}
+
+    target = tmp_path / "ring.jsonl"
+    ring.save(target)
+    assert len(target.read_text().splitlines()) == 2
+
+
+def test_json_lines_sink_appends_and_flushes(
+    fresh_log_state: None, tmp_path: Path
+) -> None:
+    target = tmp_path / "logs" / "run.jsonl"
+    sink = nudb_logger.JsonLinesSink(target, flush_every=1)
+    nudb_logger.set_log_sinks(sink)
+
+    _log_nested()
+    # Flushed before closing
+    lines = [json.loads(line) for line in target.read_text().splitlines()]
+    nudb_logger.set_log_sinks(nudb_logger.JsonTreeSink())
+
+    assert [line["msg"] for line in lines] == ["outer", "inner", "after"]
+    assert [line["name"] for line in lines] == [
+        "INFO-None-0",
+        "INFO-A-1",
+        "INFO-None-1",
+    ]
+    assert lines[1]["stack"] == ["A"]
+    assert sink._file is None
+
+
+def test_json_lines_sink_is_closed_when_python_exits(tmp_path: Path) -> None:
+    target = tmp_path / "exit.jsonl"
+    code = f"""
+from nudb_use import nudb_logger
+
+nudb_logger.set_log_sinks(nudb_logger.JsonLinesSink({str(target)!r}, flush_every=100))
+nudb_logger.logger.info("before exit")
+"""
+    subprocess.run([sys.executable, "-c", code], check=True, timeout=120)
+
+    lines = [json.loads(line) for line in target.read_text().splitlines()]
+    assert [line["msg"] for line in lines] == ["before exit"]
+
+
+def test_log_sinks_must_write() -> None:
+    class NoWrite(nudb_logger.LogSink): ...
+
+    with pytest.raises(TypeError, match="write"):
+        NoWrite()  # type: ignore[abstract]
+
+
+def test_sampled_debug_sink_keeps_every_nth_debug_record() -> None:
+    ring = nudb_logger.RingBufferSink()
+    sampled = nudb_logger.SampledDebugSink(ring, keep_every=10)
+
+    for i in range(25):
+        sampled.write({"level": "DEBUG", "msg": f"debug {i}"})
+    sampled.write({"level": "WARNING", "msg": "warning"})
+
+    msgs = [entry["msg"] for entry in ring.entries]
+    assert msgs == ["debug 0", "debug 10", "debug 20", "warning"]
+
+
+def test_log_source_code_skipped_unless_debug_and_cached(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[object] = []
+
+    def fake_getsource(func: object) -> str:
+        calls.append(func)
+        return "source"
+
+    def func() -> None: ...
+
+    monkeypatch.setattr(nudb_logger.inspect, "getsource", fake_getsource)
+    monkeypatch.setattr(nudb_logger.logger, "level", logging.INFO)
+    nudb_logger._source_code.cache_clear()
+
+    nudb_logger._log_source_code(func, "func")
+    assert calls == []
+
+    monkeypatch.setattr(nudb_logger.logger, "level", logging.DEBUG)
+    nudb_logger.logger.manager._clear_cache()
+    nudb_logger._log_source_code(func, "func")
+    nudb_logger._log_source_code(func, "func")
+    assert calls == [func]
+
+    nudb_logger.logger.manager._clear_cache()
+    nudb_logger._source_code.cache_clear()
+
+
+def test_structured_data_is_kept_in_json(fresh_log_state: None) -> None:
+    nudb_logger.logger.info("profiled", extra={"nudb_data": {"rows": 3}})
+    nudb_logger.logger.info("plain")
+
+    assert nudb_logger.JSON["INFO-None-0"]["data"] == {"rows": 3}
+    assert "data" not in nudb_logger.JSON["INFO-None-1"]
+
+
+def test_threads_log_in_their_own_logger_stacks(fresh_log_state: None) -> None:
+    ring = nudb_logger.RingBufferSink()
+    nudb_logger.set_log_sinks(ring, nudb_logger.JsonTreeSink())
+    both_in_stack = threading.Barrier(2)
+
+    def log_in_stack(label: str) -> None:
+        with nudb_logger.LoggerStack(label):
+            both_in_stack.wait()
+            nudb_logger.logger.info(f"in {label}")
+            both_in_stack.wait()
+
+    threads = [threading.Thread(target=log_in_stack, args=(label,)) for label in "AB"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted((entry["msg"], entry["stack"]) for entry in ring.entries) == [
+        ("in A", ["A"]),
+        ("in B", ["B"]),
+    ]
+    # Each thread gets a field of its own, so their record names cannot collide
+    assert sorted(list(field) for field in nudb_logger.JSON.values()) == [
+        ["A-0"],
+        ["B-0"],
+    ]
+    assert nudb_logger._STACK.level == 0
@@ -0,0 +1,15 @@
+from pathlib import Path
+
+from nudb_use.utils.file_lock import _break_stale_lock
+
+
+def test_breaking_a_stale_lock_keeps_a_lock_taken_in_the_meantime(
+    tmp_path: Path,
+) -> None:
+    lock_path = tmp_path / ".lock"
+    lock_path.write_text("new holder")
+
+    _break_stale_lock(lock_path, stale_content="stale holder")
+
+    assert list(tmp_path.iterdir()) == [lock_path]
+    assert lock_path.read_text() == "new holder"
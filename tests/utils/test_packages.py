@@ -1,7 +1,16 @@
+import os
+import subprocess
+import sys
+import time
 import warnings
+from pathlib import Path
 
 import pytest
 
+from nudb_use import nudb_logger
+from nudb_use.utils import packages
+from nudb_use.utils.packages import _check_package_version
+from nudb_use.utils.packages import check_package_versions_in_background
 from nudb_use.utils.packages import move_to_use_deprecate
 
 
@@ -41,3 +50,182 @@ def test_move_to_use_deprecate_custom_message_and_category() -> None:
 
     assert len(caught) == 2
     assert all("custom message" in str(w.message) for w in caught)
+
+
+@pytest.fixture
+def version_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    monkeypatch.setattr(packages, "VERSION_CHECK_CACHE_DIR", tmp_path)
+    monkeypatch.delenv("NUDB_VERSION_CHECK", raising=False)
+    fetched: list[str] = []
+
+    def fake_fetch(package: str) -> str:
+        fetched.append(package)
+        return "9999.1.1"
+
+    monkeypatch.setattr(packages, "_fetch_latest_version", fake_fetch)
+    return fetched
+
+
+def test_check_package_version_reuses_cached_result(
+    version_cache: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _check_package_version("ssb-nudb-use")
+    _check_package_version("ssb-nudb-use")
+    assert version_cache == ["ssb-nudb-use"]
+
+    monkeypatch.setattr(packages, "VERSION_CHECK_MAX_AGE_HOURS", 0)
+    _check_package_version("ssb-nudb-use")
+    assert version_cache == ["ssb-nudb-use", "ssb-nudb-use"]
+
+
+def test_check_package_version_offline_stores_nothing(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(packages, "VERSION_CHECK_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(packages, "_network_available", lambda url: False)
+
+    _check_package_version("ssb-nudb-use")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_check_package_versions_in_background_does_not_block(
+    version_cache: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def slow_fetch(package: str) -> str:
+        time.sleep(1)
+        version_cache.append(package)
+        return "0.0.1"
+
+    monkeypatch.setattr(packages, "_fetch_latest_version", slow_fetch)
+
+    start = time.perf_counter()
+    thread = check_package_versions_in_background(["ssb-nudb-use"])
+    assert time.perf_counter() - start < 0.5
+
+    assert thread is not None
+    thread.join(timeout=10)
+    assert version_cache == ["ssb-nudb-use"]
+
+
+def test_check_package_versions_in_background_can_be_disabled(
+    version_cache: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("NUDB_VERSION_CHECK", "false")
+
+    assert check_package_versions_in_background(["ssb-nudb-use"]) is None
+    assert version_cache == []
+
+
+def test_import_does_not_wait_for_version_check(tmp_path: Path) -> None:
+    # The index never answers, so the import only finishes if it does not wait for the check
+    code = """
+import socket
+import threading
+
+connecting = threading.Event()
+
+def never_connect(*args, **kwargs):
+    connecting.set()
+    threading.Event().wait()
+
+socket.create_connection = never_connect
+import nudb_use
+
+checking = [t for t in threading.enumerate() if t.name == "nudb_version_check"]
+print("version_check", connecting.wait(60), all(t.is_alive() for t in checking))
+"""
+    env = {
+        **os.environ,
+        "NUDB_VERSION_CHECK": "1",
+        "NUDB_VERSION_CHECK_CACHE_DIR": str(tmp_path / "version_cache"),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env=env,
+        capture_output=True,
+        check=True,
+        timeout=120,
+    )
+
+    assert "version_check True True" in result.stdout.decode("utf-8")
+
+
+def test_pip_index_url_from_environment_and_config(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delenv("PIP_INDEX_URL", raising=False)
+    global_config = tmp_path / "global.conf"
+    global_config.write_text("[global]\nindex-url = https://global.example/simple\n")
+    user_config = tmp_path / "user.conf"
+    user_config.write_text("[install]\nindex-url = https://nexus.example/simple\n")
+    monkeypatch.setattr(
+        packages,
+        "_pip_config_files",
+        lambda: [global_config, user_config, tmp_path / "missing.conf"],
+    )
+
+    assert packages._pip_index_url() == "https://nexus.example/simple"
+
+    monkeypatch.setenv("PIP_INDEX_URL", "https://env.example/simple")
+    assert packages._pip_index_url() == "https://env.example/simple"
+
+    monkeypatch.delenv("PIP_INDEX_URL")
+    monkeypatch.setattr(packages, "_pip_config_files", lambda: [])
+    assert packages._is_pypi(packages._pip_index_url())
+
+
+def test_fetch_latest_version_asks_pip_for_other_indexes(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    probed: list[str] = []
+    monkeypatch.setattr(
+        packages, "_pip_index_url", lambda: "https://user:pw@nexus.example/simple"
+    )
+
+    def offline(url: str) -> bool:
+        probed.append(url)
+        return False
+
+    monkeypatch.setattr(packages, "_network_available", offline)
+
+    def fake_run(
+        args: list[str], **kwargs: object
+    ) -> subprocess.CompletedProcess[bytes]:
+        assert args[1:] == ["-m", "pip", "index", "versions", "ssb-nudb-use"]
+        stdout = b"ssb-nudb-use (1.2.3)\nAvailable versions: 1.2.3, 1.2.2\n"
+        return subprocess.CompletedProcess(args, 0, stdout=stdout)
+
+    def no_pypi(*args: object, **kwargs: object) -> None:
+        raise AssertionError("PyPI should not be asked when pip uses another index")
+
+    monkeypatch.setattr(packages.subprocess, "run", fake_run)
+    monkeypatch.setattr(packages.requests, "get", no_pypi)
+
+    # The configured index is probed, not PyPI
+    assert packages._fetch_latest_version("ssb-nudb-use") is None
+    assert probed == ["https://user:pw@nexus.example/simple"]
+
+    monkeypatch.setattr(packages, "_network_available", lambda url: True)
+    assert packages._fetch_latest_version("ssb-nudb-use") == "1.2.3"
+
+
+def test_version_check_logs_outside_the_importers_logger_stack(
+    version_cache: list[str],
+) -> None:
+    ring = nudb_logger.RingBufferSink()
+    sinks = list(nudb_logger.LOG_SINKS)
+    nudb_logger.set_log_sinks(ring)
+    try:
+        with nudb_logger.LoggerStack("Importing"):
+            thread = check_package_versions_in_background(["ssb-nudb-use"])
+            assert thread is not None
+            thread.join(timeout=10)
+            nudb_logger.logger.info("still importing")
+    finally:
+        nudb_logger.set_log_sinks(*sinks)
+
+    stacks = {entry["msg"]: entry["stack"] for entry in ring.entries}
+    outdated = next(msg for msg in stacks if "is outdated" in msg)
+    assert stacks[outdated] == []
+    assert stacks["still importing"] == ["Importing"]
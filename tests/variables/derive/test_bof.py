@@ -1,35 +1,50 @@
+from pathlib import Path
 from typing import Any
 
+import duckdb as db
 import pandas as pd
 
+import nudb_use.datasets.nudb_data as nudb_data_module
+import nudb_use.datasets.nudb_database as nudb_database_module
+from nudb_use.datasets.nudb_database import _NudbDatabase
+from nudb_use.datasets.nudb_read_parquet import _nudb_read_parquet
 from nudb_use.variables.derive import bof as bof_module
 
 
+def _use_catalogue(
+    catalogue: pd.DataFrame, tmp_path: Path, monkeypatch: Any
+) -> _NudbDatabase:
+    """A fresh database where `_bof_eierforhold` reads the catalogue."""
+    path = tmp_path / "bof_eierforhold.parquet"
+    catalogue.assign(
+        bof_period_date=pd.to_datetime(catalogue["bof_period_date"]).dt.date
+    ).to_parquet(path)
+    database = _NudbDatabase()
+
+    def generate_catalogue(alias: str, connection: db.DuckDBPyConnection) -> None:
+        connection.execute(
+            f"CREATE VIEW {alias} AS SELECT * FROM {_nudb_read_parquet(path, alias)}"
+        )
+
+    database._dataset_generators["_bof_eierforhold"] = generate_catalogue
+    monkeypatch.setattr(nudb_data_module, "nudb_database", database)
+    monkeypatch.setattr(nudb_database_module, "nudb_database", database)
+    monkeypatch.setattr(bof_module, "nudb_database", database)
+    return database
+
+
 def test_bof_eierforhold_preserves_index_and_falls_back_on_orgnrbed(
-    monkeypatch: Any,
+    tmp_path: Path, monkeypatch: Any
 ) -> None:
     catalogue = pd.DataFrame(
         {
             "orgnr_foretak": ["111", "999", "999"],
             "orgnrbed": ["bed-a", "bed-b", "bed-c"],
+            "bof_period_date": ["2020-10-01", "2020-10-01", "2021-10-01"],
             "bof_eierforhold": ["1", "4", "5"],
         }
     )
-
-    class FakeNudbData:
-        def __init__(self, _name: str) -> None:
-            pass
-
-        def select(self, _cols: str) -> "FakeNudbData":
-            return self
-
-        def where(self, _expr: str) -> "FakeNudbData":
-            return self
-
-        def df(self) -> pd.DataFrame:
-            return catalogue
-
-    monkeypatch.setattr(bof_module, "NudbData", FakeNudbData)
+    _use_catalogue(catalogue, tmp_path, monkeypatch)
 
     df = pd.DataFrame(
         {
@@ -47,3 +62,43 @@ def test_bof_eierforhold_preserves_index_and_falls_back_on_orgnrbed(
         pd.Series(["1", "5", pd.NA], index=[10, 20, 30], name="bof_eierforhold"),
         check_dtype=False,
     )
+
+
+def test_bof_eierforhold_takes_the_latest_period(
+    tmp_path: Path, monkeypatch: Any
+) -> None:
+    catalogue = pd.DataFrame(
+        {
+            "orgnr_foretak": ["111", "111", "111", "222", "222", "000000000"],
+            "orgnrbed": [None, None, None, None, None, "bed-a"],
+            "bof_period_date": [
+                "2021-10-01",
+                "2019-10-01",
+                "2021-10-01",
+                "2018-10-01",
+                "2022-10-01",
+                "2022-10-01",
+            ],
+            "bof_eierforhold": ["3", "1", None, "4", None, "5"],
+        }
+    )
+    _use_catalogue(catalogue, tmp_path, monkeypatch)
+
+    # Without orgnrbed, and with duplicated and missing orgnr in the input
+    df = pd.DataFrame(
+        {"orgnr_foretak": ["222", "111", "000000000", None, "111", "444"]},
+        index=list("abcdef"),
+    )
+
+    result = bof_module.bof_eierforhold(df.copy())
+
+    # Missing in the latest period is kept, unless the same period has an eierforhold
+    pd.testing.assert_series_equal(
+        result["bof_eierforhold"],
+        pd.Series(
+            [pd.NA, "3", pd.NA, pd.NA, "3", pd.NA],
+            index=list("abcdef"),
+            name="bof_eierforhold",
+        ),
+        check_dtype=False,
+    )
@@ -0,0 +1,165 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pandas as pd
+import pytest
+from nudb_config import settings
+
+from nudb_use.datasets import NudbData
+from nudb_use.datasets import reset_nudb_database
+from nudb_use.datasets.nudb_database import nudb_database
+from nudb_use.variables.derive import all_data_helpers
+from nudb_use.variables.derive import derive_decorator
+from nudb_use.variables.derive import derive_planner
+from nudb_use.variables.derive.derive_planner import derive_variables
+from nudb_use.variables.derive.derive_planner import plan_derive_variables
+
+
+def _variable(
+    derived_from: list[str] | None = None,
+    datasets: list[str] | None = None,
+    join_keys: list[str] | None = None,
+) -> SimpleNamespace:
+    return SimpleNamespace(
+        derived_from=derived_from,
+        derived_uses_datasets=datasets,
+        derived_join_keys=join_keys,
+    )
+
+
+def _first_x_where(flag: str, name: str) -> Any:
+    def basefunc(df: pd.DataFrame) -> pd.DataFrame:
+        return (
+            df.loc[df[flag].fillna(False).astype(bool), ["snr", "x"]]
+            .groupby("snr", as_index=False)["x"]
+            .min()
+            .rename(columns={"x": name})
+        )
+
+    basefunc.__name__ = name
+    return basefunc
+
+
+@pytest.fixture
+def fake_variables(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> list[Any]:
+    reset_nudb_database()
+    # from_parquet registers a generator, undo it after the test
+    monkeypatch.setattr(
+        nudb_database, "_dataset_generators", dict(nudb_database._dataset_generators)
+    )
+    source = pd.DataFrame(
+        {
+            "snr": ["a", "a", "b", "b", "c", "c"],
+            "x": [3, 1, 5, 5, 2, 7],
+            "flag_a": [True, False, True, True, False, True],
+            "flag_b": [False, True, True, False, True, False],
+            "unused": ["u"] * 6,
+        }
+    )
+    source.to_parquet(tmp_path / "planner_source.parquet")
+    NudbData.from_parquet(tmp_path / "planner_source.parquet", name="planner_source")
+
+    variables = {
+        "snr": _variable(),
+        "x": _variable(),
+        "flag_a": _variable(),
+        "flag_b": _variable(),
+        "first_a": _variable(["snr", "flag_a", "x"], ["planner_source"], ["snr"]),
+        "first_b": _variable(["snr", "flag_b", "x"], ["planner_source"], ["snr"]),
+    }
+    fake_settings = SimpleNamespace(variables=variables)
+    for module in (all_data_helpers, derive_decorator, derive_planner):
+        monkeypatch.setattr(module, "settings", fake_settings)
+    basefuncs: dict[str, Any] = {}
+    monkeypatch.setattr(derive_decorator, "_JOIN_ALL_DATA_BASEFUNCS", basefuncs)
+    monkeypatch.setattr(derive_planner, "_JOIN_ALL_DATA_BASEFUNCS", basefuncs)
+
+    return [
+        derive_decorator.wrap_derive_join_all_data(_first_x_where("flag_a", "first_a")),
+        derive_decorator.wrap_derive_join_all_data(_first_x_where("flag_b", "first_b")),
+    ]
+
+
+def test_plan_derive_variables_groups_by_shared_sources(
+    fake_variables: list[Any],
+) -> None:
+    groups, others = plan_derive_variables(["first_a", "snr", "first_b", "first_a"])
+
+    assert others == ["snr"]
+    assert len(groups) == 1
+    assert groups[0].datasets == ["planner_source"]
+    assert groups[0].variables == ["first_a", "first_b"]
+    assert groups[0].cols_to_read == ["snr", "flag_a", "x", "flag_b"]
+
+
+def test_derive_variables_reads_shared_sources_once(
+    fake_variables: list[Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[list[str]] = []
+    original = all_data_helpers.read_source_columns
+
+    def spy(*args: Any, **kwargs: Any) -> pd.DataFrame:
+        calls.append(kwargs["cols_to_read"])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(all_data_helpers, "read_source_columns", spy)
+    monkeypatch.setattr(derive_planner, "read_source_columns", spy)
+    df = pd.DataFrame({"snr": ["c", "a", "b", "d"]}, index=[10, 11, 12, 13])
+
+    expected = df
+    for derive_func in fake_variables:
+        expected = derive_func(expected)
+    assert len(calls) == 2
+
+    calls.clear()
+    result = derive_variables(df, ["first_a", "first_b"])
+
+    assert calls == [["snr", "flag_a", "x", "flag_b"]]
+    pd.testing.assert_frame_equal(result, expected)
+    assert result["first_a"].tolist()[:3] == [7, 3, 5]
+    assert pd.isna(result.loc[13, "first_a"])
+
+
+def test_plan_derive_variables_on_config() -> None:
+    variables = [
+        "gr_foerste_fullfoert_dato",
+        "vg_foerste_fullfoert_dato",
+        "uh_master_foerste_fullfoert_dato",
+    ]
+
+    groups, others = plan_derive_variables(variables)
+
+    assert others == []
+    assert [group.variables for group in groups] == [variables]
+    assert set(groups[0].datasets) == set(
+        settings.variables["gr_foerste_fullfoert_dato"].derived_uses_datasets
+    )
+    assert "utd_aktivitet_slutt" in groups[0].cols_to_read
+
+
+def test_plan_derive_variables_in_a_fresh_session() -> None:
+    # Only the planner is imported, so no derive function has been created yet
+    code = """
+from nudb_use.variables.derive.derive_planner import plan_derive_variables
+
+groups, others = plan_derive_variables(
+    ["gr_foerste_fullfoert_dato", "vg_foerste_fullfoert_dato", "snr"]
+)
+print("planned", [group.variables for group in groups], others)
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, "NUDB_VERSION_CHECK": "0"},
+        capture_output=True,
+        check=True,
+        timeout=300,
+    )
+
+    assert (
+        "planned [['gr_foerste_fullfoert_dato', 'vg_foerste_fullfoert_dato']] ['snr']"
+        in result.stdout.decode("utf-8")
+    )
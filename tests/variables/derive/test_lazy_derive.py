@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+from nudb_use.variables import derive
+from nudb_use.variables.derive import DERIVE_ALL_SUBMODULES
+from nudb_use.variables.derive import get_derive_function
+
+# Run in a fresh interpreter, since other tests import the derive submodules
+LAZY_IMPORT_SCRIPT = """
+import json
+import sys
+
+import nudb_use
+from nudb_use.variables import derive
+
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("nudb_use.variables.derive."))
+
+
+after_import = loaded()
+label_func = derive.get_derive_function("nus2000_label")
+after_get = loaded()
+generated = sorted(
+    name
+    for name in vars(sys.modules["nudb_use.variables.derive.klass_labels"])
+    if name.endswith("_label")
+)
+print(json.dumps({
+    "after_import": after_import,
+    "after_get": after_get,
+    "label_func": label_func.__name__ if label_func else None,
+    "generated": generated,
+}))
+"""
+
+
+def test_import_nudb_use_does_not_import_derive_submodules() -> None:
+    env = {**os.environ, "NUDB_VERSION_CHECK": "0"}
+    result = subprocess.run(
+        [sys.executable, "-c", LAZY_IMPORT_SCRIPT],
+        env=env,
+        capture_output=True,
+        check=True,
+    )
+    output = json.loads(result.stdout.decode("utf-8").strip().splitlines()[-1])
+
+    submodules = {f"nudb_use.variables.derive.{name}" for name in DERIVE_ALL_SUBMODULES}
+    assert not submodules & set(output["after_import"])
+    assert "nudb_use.variables.derive.klass_labels" in output["after_get"]
+    assert output["label_func"] == "nus2000_label"
+    # Only the function that was asked for is generated
+    assert output["generated"] == ["nus2000_label"]
+
+
+def test_lazy_derive_namespace_resolves_functions() -> None:
+    assert "pers_kjoenn" in derive.__all__
+    assert "nus2000_label" in dir(derive)
+    assert get_derive_function("pers_kjoenn") is derive.pers_kjoenn
+    assert derive.uh_univ_eller_hoegskole.__name__ == "uh_univ_eller_hoegskole"
+    assert get_derive_function("not_a_variable") is None
@@ -1,4 +1,6 @@
+import numpy as np
 import pandas as pd
+import pytest
 
 from nudb_use.variables.derive.person_idents import snr_mrk
 
@@ -10,3 +12,40 @@ def test_snr_mrk() -> None:
 
     assert result["snr_mrk"].tolist() == [True, False, False]
     assert str(result["snr_mrk"].dtype) == "bool[pyarrow]"
+
+
+def _legacy_snr_mrk(snr: pd.Series) -> list[bool]:
+    """The row-wise check snr_mrk used before it was vectorized."""
+    stripped = snr.str.strip()
+    return [
+        (
+            bool(pd.notna(x) and len(x) == 7 and x.isalnum() and x.isascii())
+            if isinstance(x, str)
+            else False
+        )
+        for x in stripped
+    ]
+
+
+@pytest.mark.parametrize("dtype", ["string[pyarrow]", "str", "object"])
+def test_snr_mrk_matches_row_wise_check(dtype: str) -> None:
+    alphabet = list("abcXYZ0189" * 8 + " -_\tæÅé٣²ǅ\n")
+    rng = np.random.default_rng(7)
+    random_snr = [
+        "".join(rng.choice(alphabet, size=rng.integers(5, 10))) for _ in range(2000)
+    ]
+    special = [" abc1234 ", "abc123\n", "ABCDEFG", "1234567", "١٢٣٤٥٦٧", "", None]
+    snr = pd.Series(random_snr + special, dtype=dtype)
+
+    result = snr_mrk(pd.DataFrame({"snr": snr}))
+
+    expected = _legacy_snr_mrk(snr)
+    assert 100 < sum(expected) < len(expected) - 100
+    assert result["snr_mrk"].tolist() == expected
+    assert str(result["snr_mrk"].dtype) == "bool[pyarrow]"
+
+
+def test_snr_mrk_is_false_for_values_that_are_not_strings() -> None:
+    df = pd.DataFrame({"snr": pd.Series(["abc1234", 1234567, None], dtype=object)})
+
+    assert snr_mrk(df)["snr_mrk"].tolist() == [True, False, False]
@@ -0,0 +1,196 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+
+from nudb_use.variables.specific_vars import fnr_uuid_catalog as catalog_module
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import (
+    UUID_CATALOG_LOCK_STALE_AFTER,
+)
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import append_to_fnr_uuid_catalog
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import compact_fnr_uuid_catalog
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import fnr_uuid_catalog_dir
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import fnr_uuid_catalog_lock
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import read_fnr_uuid_catalog
+
+
+def _pairs(start: int, stop: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "fnr": [f"{i:011d}" for i in range(start, stop)],
+            "snr": [f"uuid-{i}" for i in range(start, stop)],
+        }
+    )
+
+
+def test_fnr_uuid_catalog_dir_strips_parquet_version(tmp_path: Path) -> None:
+    assert fnr_uuid_catalog_dir(tmp_path / "katalog_v3.parquet") == tmp_path / "katalog"
+    assert fnr_uuid_catalog_dir(tmp_path / "katalog") == tmp_path / "katalog"
+
+
+def test_append_writes_new_parts_and_reads_only_needed_buckets(
+    tmp_path: Path,
+) -> None:
+    catalog_dir = tmp_path / "katalog"
+    append_to_fnr_uuid_catalog(catalog_dir, _pairs(0, 100))
+    append_to_fnr_uuid_catalog(catalog_dir, _pairs(100, 150))
+
+    n_files = len(list(catalog_dir.glob("bucket=*/*.parquet")))
+    assert n_files > catalog_module.UUID_CATALOG_BUCKETS
+
+    everything = read_fnr_uuid_catalog(catalog_dir)
+    assert sorted(everything["fnr"]) == _pairs(0, 150)["fnr"].tolist()
+
+    found = read_fnr_uuid_catalog(catalog_dir, ["00000000003", "00000000120", "nope"])
+    assert dict(zip(found["fnr"], found["snr"], strict=True)) == {
+        "00000000003": "uuid-3",
+        "00000000120": "uuid-120",
+    }
+    assert read_fnr_uuid_catalog(tmp_path / "empty", ["1"]).empty
+
+
+def test_catalog_is_read_and_written_with_its_stored_column_names(
+    tmp_path: Path,
+) -> None:
+    catalog_dir = tmp_path / "katalog"
+    append_to_fnr_uuid_catalog(catalog_dir, _pairs(0, 10))
+
+    found = read_fnr_uuid_catalog(
+        catalog_dir, ["00000000003"], fnr_col="fnr_x", snr_col="snr_x"
+    )
+    assert found.to_dict("records") == [{"fnr_x": "00000000003", "snr_x": "uuid-3"}]
+
+    append_to_fnr_uuid_catalog(
+        catalog_dir,
+        _pairs(10, 20).rename(columns={"fnr": "fnr_x", "snr": "snr_x"}),
+        fnr_col="fnr_x",
+        snr_col="snr_x",
+    )
+    everything = read_fnr_uuid_catalog(catalog_dir)
+    assert everything.notna().all().all()
+    assert sorted(everything["snr"]) == sorted(_pairs(0, 20)["snr"])
+
+
+def test_catalog_without_column_names_cannot_be_mapped(tmp_path: Path) -> None:
+    catalog_dir = tmp_path / "katalog"
+    append_to_fnr_uuid_catalog(catalog_dir, _pairs(0, 10))
+    metadata_path = catalog_dir / "_catalog.json"
+    metadata = json.loads(metadata_path.read_text(encoding="utf-8"))
+    del metadata["snr_col"]
+    metadata_path.write_text(json.dumps(metadata), encoding="utf-8")
+
+    with pytest.raises(ValueError, match="cannot be mapped"):
+        read_fnr_uuid_catalog(catalog_dir, ["00000000003"], snr_col="snr_x")
+    with pytest.raises(ValueError, match="cannot be mapped"):
+        append_to_fnr_uuid_catalog(catalog_dir, _pairs(10, 20))
+
+
+def test_buckets_are_compacted(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(catalog_module, "UUID_CATALOG_BUCKETS", 2)
+    monkeypatch.setattr(catalog_module, "UUID_CATALOG_COMPACT_AFTER", 3)
+    catalog_dir = tmp_path / "katalog"
+
+    for start in range(0, 40, 10):
+        append_to_fnr_uuid_catalog(catalog_dir, _pairs(start, start + 10))
+        for bucket_dir in catalog_dir.glob("bucket=*"):
+            assert len(list(bucket_dir.glob("*.parquet"))) < 3
+
+    # The last append left two files per bucket
+    assert compact_fnr_uuid_catalog(catalog_dir) == 2
+    for bucket_dir in catalog_dir.glob("bucket=*"):
+        assert [path.name[:5] for path in bucket_dir.glob("*.parquet")] == ["base-"]
+    assert (
+        sorted(read_fnr_uuid_catalog(catalog_dir)["fnr"])
+        == _pairs(0, 40)["fnr"].tolist()
+    )
+
+
+def test_catalog_lock_waits_for_other_writers(tmp_path: Path) -> None:
+    catalog_dir = tmp_path / "katalog"
+    order: list[str] = []
+    held = threading.Event()
+
+    def other_writer() -> None:
+        with fnr_uuid_catalog_lock(catalog_dir):
+            held.set()
+            order.append("other start")
+            threading.Event().wait(0.3)
+            order.append("other end")
+
+    thread = threading.Thread(target=other_writer)
+    thread.start()
+    held.wait()
+    with pytest.raises(TimeoutError, match="locked"):
+        with fnr_uuid_catalog_lock(catalog_dir, timeout=0):
+            pass
+    with fnr_uuid_catalog_lock(catalog_dir, timeout=5):
+        order.append("this")
+    thread.join()
+
+    assert order == ["other start", "other end", "this"]
+    assert not (catalog_dir / ".lock").exists()
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+@pytest.mark.parametrize(
+    "holder",
+    [
+        # A process on this host that is no longer running
+        lambda: {"host": socket.gethostname(), "pid": _dead_pid(), "time": time.time()},
+        # Too long ago, on another host where the pid cannot be checked
+        lambda: {
+            "host": "other-host",
+            "pid": 1,
+            "time": time.time() - 2 * UUID_CATALOG_LOCK_STALE_AFTER,
+        },
+    ],
+)
+def test_catalog_lock_takes_over_stale_locks(
+    tmp_path: Path, holder: Callable[[], dict[str, Any]]
+) -> None:
+    catalog_dir = tmp_path / "katalog"
+    catalog_dir.mkdir()
+    (catalog_dir / ".lock").write_text(json.dumps(holder()))
+
+    with fnr_uuid_catalog_lock(catalog_dir, timeout=0):
+        own = json.loads((catalog_dir / ".lock").read_text())
+        assert (own["host"], own["pid"]) == (socket.gethostname(), os.getpid())
+
+    assert list(catalog_dir.iterdir()) == []
+
+
+def test_catalog_lock_waits_for_live_or_recent_holders(tmp_path: Path) -> None:
+    catalog_dir = tmp_path / "katalog"
+    catalog_dir.mkdir()
+    lock_path = catalog_dir / ".lock"
+    lock_path.write_text(
+        json.dumps({"host": "other-host", "pid": 1, "time": time.time()})
+    )
+    with pytest.raises(TimeoutError, match="other-host"):
+        with fnr_uuid_catalog_lock(catalog_dir, timeout=0):
+            pass
+
+    # Locks of older versions are only taken over when they are old enough
+    lock_path.write_text("other-host pid 1")
+    with pytest.raises(TimeoutError, match="other-host"):
+        with fnr_uuid_catalog_lock(catalog_dir, timeout=0):
+            pass
+    old = time.time() - 2 * UUID_CATALOG_LOCK_STALE_AFTER
+    os.utime(lock_path, (old, old))
+    with fnr_uuid_catalog_lock(catalog_dir, timeout=0):
+        pass
+    assert not lock_path.exists()
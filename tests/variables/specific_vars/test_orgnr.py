@@ -54,6 +54,7 @@ def test_split_orgnr_col_uses_bof_and_brreg_api(monkeypatch: Any) -> None:
         lambda iterable: iterable,
     )
     monkeypatch.setattr(orgnr_module, "orgnr_is_underenhet", fake_orgnr_is_underenhet)
+    monkeypatch.setattr(orgnr_module, "lookup_brreg_enhet_types", lambda orgnr: {})
 
     orgnr_foretak, orgnrbed = _split_orgnr_col(
         pd.Series(
@@ -81,6 +82,124 @@ def test_split_orgnr_col_uses_bof_and_brreg_api(monkeypatch: Any) -> None:
     ]
 
 
+def test_split_orgnr_col_uses_brreg_index_before_api(monkeypatch: Any) -> None:
+    class FakeNudbData:
+        def __init__(self, name: str) -> None:
+            self.name = name
+
+        def df(self) -> pd.DataFrame:
+            if self.name == "_bof_unique_orgnrbed":
+                return pd.DataFrame({"orgnrbed": ["111111111"]})
+            return pd.DataFrame({"orgnr": ["222222222"]})
+
+    underenhet_calls: list[str] = []
+    enhet_calls: list[str] = []
+
+    def fake_orgnr_is_underenhet(orgnr: str) -> bool:
+        underenhet_calls.append(orgnr)
+        return False
+
+    def fake_get_enhet(orgnr: str) -> dict[str, str] | None:
+        enhet_calls.append(orgnr)
+        return {"organisasjonsnummer": orgnr} if orgnr == "555555555" else None
+
+    monkeypatch.setattr(orgnr_module, "NudbData", FakeNudbData)
+    monkeypatch.setattr(orgnr_module, "_progress", lambda iterable: iterable)
+    monkeypatch.setattr(orgnr_module, "orgnr_is_underenhet", fake_orgnr_is_underenhet)
+    monkeypatch.setattr(orgnr_module, "get_enhet", fake_get_enhet)
+    monkeypatch.setattr(
+        orgnr_module,
+        "lookup_brreg_enhet_types",
+        lambda orgnr: {"333333333": "underenhet", "444444444": "enhet"},
+    )
+    monkeypatch.setattr(orgnr_module.brreg_index, "BRREG_API_RESIDUE_LIMIT", 2)
+
+    orgnr_col = pd.Series(
+        ["111111111", "222222222", "333333333", "444444444", "555555555", "666666666"],
+        dtype="string[pyarrow]",
+    )
+    orgnr_foretak, orgnrbed = _split_orgnr_col(
+        orgnr_col, put_invalid_in_orgnr_foretak=False
+    )
+
+    # Only the residue missing from the index goes to the API
+    assert underenhet_calls == ["555555555", "666666666"]
+    assert enhet_calls == ["555555555", "666666666"]
+    assert orgnrbed.tolist() == [
+        "111111111",
+        pd.NA,
+        "333333333",
+        pd.NA,
+        pd.NA,
+        pd.NA,
+    ]
+    assert orgnr_foretak.tolist() == [
+        pd.NA,
+        "222222222",
+        "333333333",
+        "444444444",
+        "555555555",
+        pd.NA,
+    ]
+
+
+def _fake_bof_without_orgnr(monkeypatch: Any) -> list[str]:
+    """Nothing is in BOF, and the orgnr looked up in the Brreg API are recorded."""
+
+    class FakeNudbData:
+        def __init__(self, name: str) -> None:
+            self.name = name
+
+        def df(self) -> pd.DataFrame:
+            if self.name == "_bof_unique_orgnrbed":
+                return pd.DataFrame({"orgnrbed": pd.Series([], dtype="string")})
+            return pd.DataFrame({"orgnr": pd.Series([], dtype="string")})
+
+    underenhet_calls: list[str] = []
+
+    def fake_orgnr_is_underenhet(orgnr: str) -> bool:
+        underenhet_calls.append(orgnr)
+        return orgnr == "111111111"
+
+    monkeypatch.setattr(orgnr_module, "NudbData", FakeNudbData)
+    monkeypatch.setattr(orgnr_module, "_progress", lambda iterable: iterable)
+    monkeypatch.setattr(orgnr_module, "orgnr_is_underenhet", fake_orgnr_is_underenhet)
+    monkeypatch.setattr(orgnr_module.brreg_index, "BRREG_API_RESIDUE_LIMIT", 1)
+    return underenhet_calls
+
+
+def test_split_orgnr_col_looks_up_a_capped_residue_after_index(
+    monkeypatch: Any,
+) -> None:
+    underenhet_calls = _fake_bof_without_orgnr(monkeypatch)
+    monkeypatch.setattr(orgnr_module, "lookup_brreg_enhet_types", lambda orgnr: {})
+
+    orgnr_foretak, orgnrbed = _split_orgnr_col(
+        pd.Series(["111111111", "222222222"], dtype="string[pyarrow]")
+    )
+
+    # Over the limit, the orgnr that are not looked up are handled as not found
+    assert underenhet_calls == ["111111111"]
+    assert orgnrbed.tolist() == ["111111111", pd.NA]
+    assert orgnr_foretak.tolist() == [pd.NA, "222222222"]
+
+
+def test_split_orgnr_col_looks_up_everything_without_brreg_index(
+    monkeypatch: Any,
+) -> None:
+    underenhet_calls = _fake_bof_without_orgnr(monkeypatch)
+    monkeypatch.setattr(orgnr_module, "lookup_brreg_enhet_types", lambda orgnr: None)
+
+    orgnr_foretak, orgnrbed = _split_orgnr_col(
+        pd.Series(["111111111", "222222222"], dtype="string[pyarrow]")
+    )
+
+    # The limit is for the residue after the index, not for everything missing from BOF
+    assert underenhet_calls == ["111111111", "222222222"]
+    assert orgnrbed.tolist() == ["111111111", pd.NA]
+    assert orgnr_foretak.tolist() == [pd.NA, "222222222"]
+
+
 def test_find_orgnr_foretak_bof_resolves_before_and_after_fallback(
     monkeypatch: Any,
 ) -> None:
@@ -104,7 +223,7 @@ def test_find_orgnr_foretak_bof_resolves_before_and_after_fallback(
     monkeypatch.setattr(
         orgnr_module,
         "_bof_orgnrbed_to_foretak_lookup_sql",
-        lambda **_kwargs: """
+        lambda **_kwargs: ("""
             WITH input_clean AS (
                 SELECT
                     _row_id,
@@ -202,7 +321,7 @@ def test_find_orgnr_foretak_bof_resolves_before_and_after_fallback(
             LEFT JOIN resolved
                 ON raw._row_id = resolved._row_id
             ORDER BY raw._row_id
-            """,
+            """),
     )
 
     result = _find_orgnr_foretak_bof(
@@ -253,7 +372,7 @@ def test_find_orgnrbed_enkelbedforetak_bof_requires_one_to_one_period(
     monkeypatch.setattr(
         orgnr_module,
         "_bof_foretak_to_orgnrbed_lookup_sql",
-        lambda **_kwargs: """
+        lambda **_kwargs: ("""
             WITH input_clean AS (
                 SELECT
                     _row_id,
@@ -349,7 +468,7 @@ def test_find_orgnrbed_enkelbedforetak_bof_requires_one_to_one_period(
             LEFT JOIN resolved
                 ON raw._row_id = resolved._row_id
             ORDER BY raw._row_id
-            """,
+            """),
     )
 
     result = _find_orgnrbed_enkelbedforetak_bof(
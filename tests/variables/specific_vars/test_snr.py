@@ -1,17 +1,34 @@
 from __future__ import annotations
 
 import uuid as uuidlib
+from collections.abc import Iterator
 from typing import Any
 
 import pandas as pd
 import pytest
 
+from nudb_use.datasets.snrkat import SnrkatLookup
 from nudb_use.variables.specific_vars import snr as snr_module
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import fnr_uuid_catalog_dir
+from nudb_use.variables.specific_vars.fnr_uuid_catalog import read_fnr_uuid_catalog
 from nudb_use.variables.specific_vars.snr import generate_uuid_for_snr_with_fnr_catalog
 from nudb_use.variables.specific_vars.snr import generate_uuid_for_snr_with_fnr_col
 from nudb_use.variables.specific_vars.snr import update_snr_with_snrkat
 
 
+def _fake_uuids(monkeypatch: Any, uuids: Iterator[uuidlib.UUID]) -> None:
+    monkeypatch.setattr(
+        snr_module, "_uuid4_strings", lambda n: [str(next(uuids)) for _ in range(n)]
+    )
+
+
+def _use_snrkat(monkeypatch: Any, snrkat: pd.DataFrame) -> None:
+    def fake_snrkat_lookup(key_col: str, value_col: str) -> SnrkatLookup:
+        return SnrkatLookup.from_pairs(snrkat[key_col], snrkat[value_col])
+
+    monkeypatch.setattr(snr_module, "snrkat_lookup", fake_snrkat_lookup)
+
+
 def test_generate_uuid_for_snr_with_fnr_col(monkeypatch: Any) -> None:
     uuids = iter(
         [
@@ -19,7 +36,7 @@ def test_generate_uuid_for_snr_with_fnr_col(monkeypatch: Any) -> None:
             uuidlib.UUID("00000000-0000-0000-0000-000000000002"),
         ]
     )
-    monkeypatch.setattr(snr_module.uuid, "uuid4", lambda: next(uuids))  # type: ignore[attr-defined]
+    _fake_uuids(monkeypatch, uuids)
 
     df = pd.DataFrame(
         {
@@ -39,6 +56,17 @@ def test_generate_uuid_for_snr_with_fnr_col(monkeypatch: Any) -> None:
     assert str(result["snr"].dtype) in ["string", "string[pyarrow]"]
 
 
+def test_uuid4_strings_are_random_version_4_uuids() -> None:
+    generated = snr_module._uuid4_strings(1000)
+
+    parsed = [uuidlib.UUID(value) for value in generated]
+    assert [str(value) for value in parsed] == generated.tolist()
+    assert {value.version for value in parsed} == {4}
+    assert {value.variant for value in parsed} == {uuidlib.RFC_4122}
+    assert len(set(generated)) == 1000
+    assert len(snr_module._uuid4_strings(0)) == 0
+
+
 def test_generate_uuid_for_snr_with_fnr_col_preserves_index(monkeypatch: Any) -> None:
     uuids = iter(
         [
@@ -46,7 +74,7 @@ def test_generate_uuid_for_snr_with_fnr_col_preserves_index(monkeypatch: Any) ->
             uuidlib.UUID("00000000-0000-0000-0000-000000000102"),
         ]
     )
-    monkeypatch.setattr(snr_module.uuid, "uuid4", lambda: next(uuids))  # type: ignore[attr-defined]
+    _fake_uuids(monkeypatch, uuids)
 
     df = pd.DataFrame(
         {
@@ -69,7 +97,7 @@ def test_generate_uuid_for_snr_with_fnr_col_subset(monkeypatch: Any) -> None:
             uuidlib.UUID("00000000-0000-0000-0000-000000000003"),
         ]
     )
-    monkeypatch.setattr(snr_module.uuid, "uuid4", lambda: next(uuids))  # type: ignore[attr-defined]
+    _fake_uuids(monkeypatch, uuids)
 
     df = pd.DataFrame(
         {
@@ -101,7 +129,7 @@ def test_generate_uuid_for_snr_with_fnr_catalog(
             uuidlib.UUID("00000000-0000-0000-0000-000000000011"),
         ]
     )
-    monkeypatch.setattr(snr_module.uuid, "uuid4", lambda: next(uuids))  # type: ignore[attr-defined]
+    _fake_uuids(monkeypatch, uuids)
 
     catalog_path = tmp_path / "fnr_catalog.parquet"
     existing_catalog = pd.DataFrame({"fnr": ["1"], "snr": ["existing-uuid"]}).astype(
@@ -114,11 +142,6 @@ def test_generate_uuid_for_snr_with_fnr_catalog(
         "latest_version_path",
         lambda path: path,
     )
-    monkeypatch.setattr(
-        snr_module,
-        "next_version_path",
-        lambda path: path,
-    )
 
     df = pd.DataFrame({"fnr": ["1", "2", pd.NA], "snr": [pd.NA, pd.NA, pd.NA]})
 
@@ -132,11 +155,26 @@ def test_generate_uuid_for_snr_with_fnr_catalog(
         "00000000-0000-0000-0000-000000000011",
     ]
 
-    updated_catalog = pd.read_parquet(catalog_path).sort_values("fnr")
+    updated_catalog = read_fnr_uuid_catalog(
+        fnr_uuid_catalog_dir(catalog_path)
+    ).sort_values("fnr")
     assert updated_catalog[["fnr", "snr"]].values.tolist() == [
         ["1", "existing-uuid"],
         ["2", "00000000-0000-0000-0000-000000000010"],
     ]
+    # The versioned catalog is copied, not rewritten
+    assert pd.read_parquet(catalog_path)["fnr"].tolist() == ["1"]
+
+    # The next run reuses the catalog, and only generates UUIDs for new fnr
+    _fake_uuids(monkeypatch, iter([uuidlib.UUID(int=12)]))
+    df = pd.DataFrame({"fnr": ["2", "3"], "snr": [pd.NA, pd.NA]})
+    result = generate_uuid_for_snr_with_fnr_catalog(
+        df, fnr_catalog_path=catalog_path, snr_col="snr", fnr_col="fnr"
+    )
+    assert result["snr"].tolist() == [
+        "00000000-0000-0000-0000-000000000010",
+        "00000000-0000-0000-0000-00000000000c",
+    ]
 
 
 def test_generate_uuid_for_snr_with_fnr_catalog_preserves_index(
@@ -148,7 +186,7 @@ def test_generate_uuid_for_snr_with_fnr_catalog_preserves_index(
             uuidlib.UUID("00000000-0000-0000-0000-000000000202"),
         ]
     )
-    monkeypatch.setattr(snr_module.uuid, "uuid4", lambda: next(uuids))  # type: ignore[attr-defined]
+    _fake_uuids(monkeypatch, uuids)
 
     catalog_path = tmp_path / "fnr_catalog.parquet"
     pd.DataFrame({"fnr": ["1"], "snr": ["existing-uuid"]}).astype(
@@ -156,7 +194,6 @@ def test_generate_uuid_for_snr_with_fnr_catalog_preserves_index(
     ).to_parquet(catalog_path)
 
     monkeypatch.setattr(snr_module, "latest_version_path", lambda path: path)
-    monkeypatch.setattr(snr_module, "next_version_path", lambda path: path)
 
     df = pd.DataFrame(
         {"fnr": ["1", "2", pd.NA], "snr": [pd.NA, pd.NA, pd.NA]},
@@ -202,17 +239,7 @@ def test_update_snr_with_snrkat_remaps_and_preserves_snr(
         }
     )
 
-    class FakeNudbData:
-        def __init__(self, name: str) -> None:
-            assert name == "snrkat"
-
-        def select(self, _cols: str) -> FakeNudbData:
-            return self
-
-        def df(self) -> pd.DataFrame:
-            return snrkat
-
-    monkeypatch.setattr(snr_module, "NudbData", FakeNudbData)
+    _use_snrkat(monkeypatch, snrkat)
 
     result = update_snr_with_snrkat(df)
 
@@ -239,17 +266,7 @@ def test_update_snr_with_snrkat_preserves_index(monkeypatch: Any) -> None:
         }
     )
 
-    class FakeNudbData:
-        def __init__(self, name: str) -> None:
-            assert name == "snrkat"
-
-        def select(self, _cols: str) -> FakeNudbData:
-            return self
-
-        def df(self) -> pd.DataFrame:
-            return snrkat
-
-    monkeypatch.setattr(snr_module, "NudbData", FakeNudbData)
+    _use_snrkat(monkeypatch, snrkat)
 
     result = update_snr_with_snrkat(df)
 
@@ -296,17 +313,7 @@ def test_update_snr_with_snrkat_accepts_supported_join_column_combinations(
         }
     )
 
-    class FakeNudbData:
-        def __init__(self, name: str) -> None:
-            assert name == "snrkat"
-
-        def select(self, _cols: str) -> FakeNudbData:
-            return self
-
-        def df(self) -> pd.DataFrame:
-            return snrkat
-
-    monkeypatch.setattr(snr_module, "NudbData", FakeNudbData)
+    _use_snrkat(monkeypatch, snrkat)
 
     result = update_snr_with_snrkat(df)
 
@@ -316,3 +323,26 @@ def test_update_snr_with_snrkat_accepts_supported_join_column_combinations(
         pd.Series(expected_snr, name="snr"),
         check_dtype=False,
     )
+
+
+def test_update_snr_with_snrkat_updates_fnr_without_changing_input(
+    monkeypatch: Any,
+) -> None:
+    df = pd.DataFrame({"fnr": ["7KFQKZih4ha", "unknown"], "snr": ["OLD0001", pd.NA]})
+    snrkat = pd.DataFrame(
+        {
+            "fnr": ["7KFQKZih4ha"],
+            "fnr_naa": ["NEWFNR00001"],
+            "snr_utgatt": ["OLD0001"],
+            "snr": ["NEW0001"],
+        }
+    )
+    _use_snrkat(monkeypatch, snrkat)
+
+    result = update_snr_with_snrkat(df, update_fnr=True)
+
+    assert result["fnr"].tolist() == ["NEWFNR00001", "unknown"]
+    assert result["snr"].iloc[0] == "NEW0001"
+    assert pd.isna(result["snr"].iloc[1])
+    assert df.columns.tolist() == ["fnr", "snr"]
+    assert df["fnr"].tolist() == ["7KFQKZih4ha", "unknown"]